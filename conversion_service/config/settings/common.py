@@ -277,7 +277,21 @@ OSMAXX_CONVERSION_SERVICE = {
     'PBF_PLANET_FILE_PATH': env.str(
         'OSMAXX_CONVERSION_SERVICE_PBF_PLANET_FILE_PATH',
         default='/var/data/osm-planet/pbf/planet-latest.osm.pbf'),
-    'RESULT_TTL': env.str('OSMAXX_CONVERSION_SERVICE_RESULT_TTL', default=-1),  # never expire!
+    'PBF_EXTRACTION_ENGINE': env.str('OSMAXX_CONVERSION_SERVICE_PBF_EXTRACTION_ENGINE', default='osmconvert'),
+    'CALLBACK_MAX_CONCURRENT_DELIVERIES': env.int(
+        'OSMAXX_CONVERSION_SERVICE_CALLBACK_MAX_CONCURRENT_DELIVERIES', default=8),
+    'CALLBACK_TIMEOUT_SECONDS': env.int('OSMAXX_CONVERSION_SERVICE_CALLBACK_TIMEOUT_SECONDS', default=10),
+    'CALLBACK_MAX_ATTEMPTS': env.int('OSMAXX_CONVERSION_SERVICE_CALLBACK_MAX_ATTEMPTS', default=5),
+    'HEARTBEAT_TIMEOUT_SECONDS': env.int('OSMAXX_CONVERSION_SERVICE_HEARTBEAT_TIMEOUT_SECONDS', default=180),
+    'STALE_JOB_MAX_REQUEUES': env.int('OSMAXX_CONVERSION_SERVICE_STALE_JOB_MAX_REQUEUES', default=1),
+    'CAPACITY_DEFAULT_JOB_SECONDS': env.int('OSMAXX_CONVERSION_SERVICE_CAPACITY_DEFAULT_JOB_SECONDS', default=600),
+    'RESULT_TTL': env.int('OSMAXX_CONVERSION_SERVICE_RESULT_TTL', default=int(timedelta(days=1).total_seconds())),
+    'FAILURE_TTL': env.int('OSMAXX_CONVERSION_SERVICE_FAILURE_TTL', default=int(timedelta(days=1).total_seconds())),
+    'CLUSTER_OUTPUT_TABLES': env.bool('OSMAXX_CONVERSION_SERVICE_CLUSTER_OUTPUT_TABLES', default=False),
+    'INCREMENTAL_EXPORTS': env.bool('OSMAXX_CONVERSION_SERVICE_INCREMENTAL_EXPORTS', default=False),
+    'INCREMENTAL_EXPORT_DATABASES': env.int('OSMAXX_CONVERSION_SERVICE_INCREMENTAL_EXPORT_DATABASES', default=3),
+    'PREGENERATED_EXPORTS': env.int('OSMAXX_CONVERSION_SERVICE_PREGENERATED_EXPORTS', default=20),
+    'PREGENERATION_MIN_ORDERS': env.int('OSMAXX_CONVERSION_SERVICE_PREGENERATION_MIN_ORDERS', default=3),
 }
 
 # Security - defaults taken from Django 1.8 (not secure enough for production)
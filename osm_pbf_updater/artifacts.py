@@ -0,0 +1,137 @@
+"""
+Artifacts derived from the planet, rebuilt for each generation before it's published.
+
+The artifacts to build are configured in a JSON file (see `artifacts.example.json`), a list of objects with
+a unique `name` and a `type`:
+
+    blob_index  the blob index of the planet, see `pbf_blob_index.py`
+    extract     `<name>.osm.pbf`, cut with `--complete-ways --complex-ways` along either the polygon file
+                `polygon` or the bounding box `bbox` (`[min_lon, min_lat, max_lon, max_lat]`)
+
+Artifacts are built in parallel, throttled in CPU and I/O priority, and written to the (not yet published)
+generation directory, so they are published atomically together with the planet. `artifacts.json` in the
+generation directory tells which artifacts of which generation have been built.
+"""
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pbf_blob_index import index_path_for
+
+# idle I/O scheduling class: artifacts are only built while nobody else needs the disk
+THROTTLE = ["nice", "-n", "19", "ionice", "-c", "3"]
+MANIFEST_FILE_NAME = 'artifacts.json'
+ARTIFACTS_DIR_NAME = 'artifacts'
+PBF_BLOB_INDEX_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pbf_blob_index.py')
+
+
+class BlobIndex:
+    def __init__(self, name):
+        self.name = name
+
+    def output_path(self, planet_path):
+        return index_path_for(planet_path)
+
+    def build(self, planet_path):
+        # the indexer writes its index atomically by itself
+        subprocess.check_call(THROTTLE + ["python3", PBF_BLOB_INDEX_SCRIPT, planet_path])
+
+    def manifest_entry(self, planet_path):
+        return dict(type='blob_index', path=os.path.basename(self.output_path(planet_path)))
+
+
+class Extract:
+    def __init__(self, name, polygon=None, bbox=None):
+        if (polygon is None) == (bbox is None):
+            raise ValueError('extract {} needs either a polygon or a bbox'.format(name))
+        self.name = name
+        self.polygon = polygon
+        self.bbox = bbox
+
+    def output_path(self, planet_path):
+        return os.path.join(os.path.dirname(planet_path), ARTIFACTS_DIR_NAME, '{}.osm.pbf'.format(self.name))
+
+    def build(self, planet_path):
+        output_path = self.output_path(planet_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        temporary_path = output_path + '.tmp.pbf'
+        if self.polygon is not None:
+            area = "-B={}".format(self.polygon)
+        else:
+            area = "-b={}".format(','.join(str(coordinate) for coordinate in self.bbox))
+        command = [
+            "osmconvert", "--out-pbf", "--complete-ways", "--complex-ways", area,
+            "-o={}".format(temporary_path), planet_path,
+        ]
+        try:
+            subprocess.check_call(THROTTLE + command)
+        except subprocess.CalledProcessError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        os.replace(temporary_path, output_path)
+
+    def manifest_entry(self, planet_path):
+        entry = dict(type='extract', path=os.path.relpath(self.output_path(planet_path), os.path.dirname(planet_path)))
+        if self.bbox is not None:
+            # cut along its bounding box, so it can stand in for the planet when cutting areas within the box
+            entry.update(bbox=list(self.bbox))
+        return entry
+
+
+ARTIFACT_TYPES = {
+    'blob_index': BlobIndex,
+    'extract': Extract,
+}
+
+
+def load_artifacts(config_path):
+    with open(config_path, 'r') as config_file:
+        config = json.load(config_file)
+    artifacts = []
+    for artifact_config in config:
+        artifact_config = dict(artifact_config)
+        artifact_type = artifact_config.pop('type')
+        if artifact_type not in ARTIFACT_TYPES:
+            raise ValueError('unknown artifact type {}'.format(artifact_type))
+        artifacts.append(ARTIFACT_TYPES[artifact_type](**artifact_config))
+    names = [artifact.name for artifact in artifacts]
+    if len(set(names)) != len(names):
+        raise ValueError('artifact names in {} must be unique'.format(config_path))
+    return artifacts
+
+
+def build_artifacts(artifacts, planet_path, *, generation, processes=None):
+    """
+    Builds the artifacts of the planet at `planet_path`, in parallel, and writes the manifest next to it.
+
+    An artifact failing to build is left out of the manifest, but doesn't keep the others from being built.
+
+    Returns:
+        the manifest
+    """
+    def _build(artifact):
+        start = time.monotonic()
+        artifact.build(planet_path)
+        return time.monotonic() - start
+
+    manifest = dict(generation=generation, artifacts={}, failed=[])
+    with ThreadPoolExecutor(processes or os.cpu_count() or 1) as executor:
+        futures = [(artifact, executor.submit(_build, artifact)) for artifact in artifacts]
+        for artifact, future in futures:
+            try:
+                duration = future.result()
+            except (subprocess.CalledProcessError, OSError) as e:
+                print("building artifact {} failed: {}".format(artifact.name, e))
+                manifest['failed'].append(artifact.name)
+                continue
+            print("built artifact {} in {:.0f}s".format(artifact.name, duration))
+            manifest['artifacts'][artifact.name] = dict(artifact.manifest_entry(planet_path), seconds=round(duration, 1))
+
+    manifest_path = os.path.join(os.path.dirname(planet_path), MANIFEST_FILE_NAME)
+    with open(manifest_path + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
@@ -17,3 +17,5 @@ osmconvert /tmp/switzerland-latest.osm.pbf -o=/tmp/switzerland-latest.osm
 osmconvert /tmp/monaco-latest.osm /tmp/switzerland-latest.osm -o=/var/data/osm-planet/pbf/planet-latest.osm.pbf
 
 rm -f /tmp/monaco-latest.osm /tmp/switzerland-latest.osm /tmp/monaco-latest.osm.pbf /tmp/switzerland-latest.osm.pbf
+
+python3 /opt/pbf_blob_index.py /var/data/osm-planet/pbf/planet-latest.osm.pbf
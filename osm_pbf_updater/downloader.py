@@ -0,0 +1,213 @@
+"""
+Downloads a file over several HTTP connections, each fetching a byte range of it.
+
+The progress of each range is saved next to the file (`<file>.progress`), so an interrupted download resumes where
+each range stopped, as long as the file on the server hasn't changed meanwhile. Once complete, the file is verified
+against the `.md5` file the mirror publishes next to it.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1024 * 1024
+# how much is downloaded between saving the progress, i.e. how much is downloaded again at most after an interruption
+PROGRESS_SAVE_INTERVAL = 64 * 1024 * 1024
+RETRIES = 3
+RETRY_DELAY_SECONDS = 5
+TIMEOUT_SECONDS = 60
+
+
+class DownloadError(Exception):
+    pass
+
+
+def download(url, target_path, *, connections=8, verify_md5=True):
+    """
+    Downloads `url` to `target_path`, resuming a previous, interrupted download of it.
+
+    Raises:
+        DownloadError: if the download fails or doesn't match the mirror's checksum, in which case it starts over
+            next time
+
+    Returns:
+        throughput metrics of the download, as a dict
+    """
+    size, version, supports_ranges = _probe(url)
+    progress = _Progress.resume(target_path, size, version)
+    if progress is None:
+        progress = _Progress.start(target_path, size, version, connections if supports_ranges else 1)
+        with open(target_path, 'wb') as target_file:
+            target_file.truncate(size)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max(len(progress.ranges), 1)) as executor:
+        range_metrics = list(executor.map(
+            lambda number: _fetch_range(url, target_path, progress, number), range(len(progress.ranges)),
+        ))
+    duration = time.monotonic() - start
+    progress.save()
+    fetched = sum(metrics['bytes'] for metrics in range_metrics)
+    metrics = dict(
+        url=url, bytes=size, fetched_bytes=fetched, seconds=round(duration, 1), connections=len(progress.ranges),
+        mib_per_second=round(fetched / (1024 * 1024) / duration, 2) if duration > 0 else None,
+        ranges=range_metrics,
+    )
+
+    if verify_md5:
+        expected_md5 = _expected_md5(url)
+        actual_md5 = _md5_of(target_path)
+        if actual_md5 != expected_md5:
+            os.remove(target_path)
+            progress.discard()
+            raise DownloadError('{} has MD5 {}, but {} was expected'.format(target_path, actual_md5, expected_md5))
+        metrics.update(md5=actual_md5)
+    progress.discard()
+    return metrics
+
+
+def _open(url, *, method='GET', headers=None):
+    request = urllib.request.Request(url, method=method, headers=headers or {})
+    return urllib.request.urlopen(request, timeout=TIMEOUT_SECONDS)
+
+
+def _probe(url):
+    """
+    Returns:
+        `(size, version, supports_ranges)` of the file at `url`, where `version` changes whenever the file does
+    """
+    with _open(url, method='HEAD') as response:
+        headers = response.headers
+        size = int(headers['Content-Length'])
+        version = headers.get('ETag') or headers.get('Last-Modified') or str(size)
+        return size, version, headers.get('Accept-Ranges') == 'bytes'
+
+
+def _expected_md5(url):
+    with _open(url + '.md5') as response:
+        # formatted like the output of md5sum: `<md5>  <file name>`
+        return response.read().decode('utf-8').split()[0].lower()
+
+
+def _md5_of(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as downloaded_file:
+        for chunk in iter(lambda: downloaded_file.read(CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _fetch_range(url, target_path, progress, number):
+    """
+    Downloads what's missing of the range, retrying a few times.
+
+    Returns:
+        metrics of the range
+    """
+    fetched, start = 0, time.monotonic()
+    for attempt in range(RETRIES + 1):
+        first, last, done = progress.ranges[number]
+        if first + done > last:
+            break
+        try:
+            fetched += _fetch_remaining_range(url, target_path, progress, number)
+            break
+        except (OSError, DownloadError) as e:
+            progress.save()
+            if attempt == RETRIES:
+                raise DownloadError('downloading bytes {}-{} of {} failed: {}'.format(first + done, last, url, e))
+            time.sleep(RETRY_DELAY_SECONDS * (attempt + 1))
+    duration = time.monotonic() - start
+    return dict(
+        range=number, bytes=fetched, seconds=round(duration, 1),
+        mib_per_second=round(fetched / (1024 * 1024) / duration, 2) if duration > 0 else None,
+    )
+
+
+def _fetch_remaining_range(url, target_path, progress, number):
+    first, last, done = progress.ranges[number]
+    position = first + done
+    fetched = 0
+    with _open(url, headers={'Range': 'bytes={}-{}'.format(position, last)}) as response:
+        if response.status != 206 and position > 0:
+            raise DownloadError('{} ignores range requests'.format(url))
+        # unbuffered, so the saved progress of all ranges never claims more than has been written
+        with open(target_path, 'r+b', buffering=0) as target_file:
+            target_file.seek(position)
+            while position <= last:
+                chunk = response.read(min(CHUNK_SIZE, last - position + 1))
+                if not chunk:
+                    raise DownloadError('connection closed after {} bytes'.format(position - first))
+                _write_fully(target_file, chunk)
+                position += len(chunk)
+                fetched += len(chunk)
+                if progress.advance(number, len(chunk)):
+                    progress.save()
+    return fetched
+
+
+def _write_fully(raw_file, data):
+    view = memoryview(data)
+    while view:
+        view = view[raw_file.write(view):]
+
+
+class _Progress:
+    """
+    The ranges of a download, as `[first_byte, last_byte, bytes_done]`, saved next to the file being downloaded.
+    """
+
+    def __init__(self, target_path, size, version, ranges):
+        self._path = target_path + '.progress'
+        self._size = size
+        self._version = version
+        self._lock = threading.Lock()
+        self._unsaved_bytes = 0
+        self.ranges = ranges
+
+    @classmethod
+    def start(cls, target_path, size, version, connections):
+        range_size = -(-size // max(connections, 1))
+        ranges = [[first, min(first + range_size, size) - 1, 0] for first in range(0, size, range_size or 1)]
+        progress = cls(target_path, size, version, ranges)
+        progress.save()
+        return progress
+
+    @classmethod
+    def resume(cls, target_path, size, version):
+        """
+        Returns:
+            the saved progress, `None` if there is none or it belongs to another version of the file
+        """
+        progress_path = target_path + '.progress'
+        if not os.path.exists(progress_path) or not os.path.exists(target_path):
+            return None
+        with open(progress_path, 'r') as progress_file:
+            saved = json.load(progress_file)
+        if (saved['size'], saved['version']) != (size, version) or os.path.getsize(target_path) != size:
+            return None
+        return cls(target_path, size, version, saved['ranges'])
+
+    def advance(self, number, byte_count):
+        """
+        Returns:
+            whether the progress is due to be saved
+        """
+        with self._lock:
+            self.ranges[number][2] += byte_count
+            self._unsaved_bytes += byte_count
+            return self._unsaved_bytes >= PROGRESS_SAVE_INTERVAL
+
+    def save(self):
+        with self._lock:
+            with open(self._path + '.tmp', 'w') as progress_file:
+                json.dump(dict(size=self._size, version=self._version, ranges=self.ranges), progress_file)
+            os.replace(self._path + '.tmp', self._path)
+            self._unsaved_bytes = 0
+
+    def discard(self):
+        if os.path.exists(self._path):
+            os.remove(self._path)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+A stand-in for a planet mirror, serving a PBF file (e.g. Monaco) laid out like the planet on a real mirror,
+so the updater can be run and tested end to end without downloading the planet:
+
+    ./local_mirror.py monaco-latest.osm.pbf --port 8000
+    osm_planet_mirror=http://localhost:8000 ./pbf_updater.py
+
+Supports `Range` requests, like real mirrors do.
+"""
+import hashlib
+import http.server
+import os
+import re
+import shutil
+import socketserver
+import threading
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def prepare(mirror_dir, pbf_path, path_relative_to_mirror='/pbf/planet-latest.osm.pbf'):
+    """
+    Puts the PBF file and its `.md5` file into `mirror_dir` at the path a real mirror serves the planet at.
+    """
+    target_path = os.path.join(mirror_dir, path_relative_to_mirror.lstrip('/'))
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    shutil.copyfile(pbf_path, target_path)
+    md5 = hashlib.md5()
+    with open(target_path, 'rb') as pbf_file:
+        for chunk in iter(lambda: pbf_file.read(_COPY_BUFFER_SIZE), b''):
+            md5.update(chunk)
+    with open(target_path + '.md5', 'w') as md5_file:
+        md5_file.write('{}  {}\n'.format(md5.hexdigest(), os.path.basename(target_path)))
+    return target_path
+
+
+class MirrorRequestHandler(http.server.BaseHTTPRequestHandler):
+    mirror_dir = None
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, *, send_body):
+        path = os.path.join(self.mirror_dir, self.path.split('?', 1)[0].lstrip('/'))
+        if '..' in self.path or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        range_header = self.headers.get('Range')
+        if range_header:
+            match = _RANGE_PATTERN.match(range_header.strip())
+            if not match or match.groups() == ('', ''):
+                self.send_error(416)
+                return
+            first, last = match.groups()
+            if first:
+                start, end = int(first), min(int(last), size - 1) if last else size - 1
+            else:
+                start = max(size - int(last), 0)
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{}'.format(size))
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end, size))
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.end_headers()
+        if send_body:
+            with open(path, 'rb') as served_file:
+                served_file.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = served_file.read(min(_COPY_BUFFER_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+def serve(mirror_dir, *, host='127.0.0.1', port=0):
+    """
+    Serves `mirror_dir` in a background thread.
+
+    Returns:
+        the server, whose `url` is the value for `osm_planet_mirror`; stop it using `shutdown()`
+    """
+    handler = type('Handler', (MirrorRequestHandler,), dict(mirror_dir=os.path.abspath(mirror_dir)))
+    server = _ThreadingHTTPServer((host, port), handler)
+    server.url = 'http://{}:{}'.format(*server.server_address[:2])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pbf_path', help='the PBF file to serve as the planet')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--host', default='0.0.0.0')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as mirror_dir:
+        prepare(mirror_dir, args.pbf_path)
+        mirror = serve(mirror_dir, host=args.host, port=args.port)
+        print('serving {} as the planet at {}'.format(args.pbf_path, mirror.url))
+        threading.Event().wait()
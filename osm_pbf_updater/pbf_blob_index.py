@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Builds the blob index sidecar of a PBF file, which lets the cutter skip the blobs far off the area being cut.
+
+A PBF file sorted by type and id is a sequence of blobs, each holding a few thousand nodes, ways or relations.
+For every blob, the index holds its position in the file and its bounding box, as well as the cells (of a one degree
+grid) covered by its content, which select blobs much more precisely than bounding boxes do. Way blobs are
+conservatively assumed to cover all cells of the node blobs holding the nodes they reference; these node blobs
+are listed as their dependencies. To complete multipolygons and boundaries (osmconvert's `--complex-ways`), the
+way blobs holding the members of each such relation are listed as well.
+
+The index is written as a numpy `.npz` file next to the PBF file:
+
+    offsets, lengths         int64[n]    position of each blob (including its length prefix and header)
+    kinds                    int8[n]     KIND_* of each blob
+    bboxes                   int64[n, 4] min_lon, min_lat, max_lon, max_lat in nanodegrees (of the nodes only)
+    cell_offsets, cells      CSR         one degree cells covered by each blob, `cells[cell_offsets[i]:cell_offsets[i+1]]`
+    dependency_offsets,      CSR         node blobs needed to complete the ways of each blob
+    dependencies
+    complex_relation_offsets CSR         way blobs holding the members of each multipolygon and boundary relation
+    complex_relation_way_blobs
+    pbf_size, pbf_mtime_ns   int64       identify the version of the PBF file the index belongs to
+
+Keep in sync with `osmaxx.conversion.converters.converter_pbf.blob_index`, which reads it.
+"""
+import mmap
+import multiprocessing
+import os
+
+import numpy as np
+
+from pbf_blobs import blob_data, fields, read_blob_positions
+
+INDEX_FILE_SUFFIX = '.blobindex.npz'
+
+KIND_HEADER = 0
+KIND_NODES = 1
+KIND_WAYS = 2
+KIND_RELATIONS = 3
+KIND_EMPTY = 4
+# blobs holding several kinds of elements (unusual, but valid) are of the first kind they contain
+
+_NANODEGREES_PER_DEGREE = 10 ** 9
+_MEMBER_TYPE_WAY = 1
+_COMPLEX_RELATION_TYPES = {b'multipolygon', b'boundary'}
+
+
+def index_path_for(pbf_path):
+    return pbf_path + INDEX_FILE_SUFFIX
+
+
+# --- protocol buffers decoding, just enough for OSM PBF (the rest is in `pbf_blobs`) ---
+
+def _int64(value):
+    # negative int64 (unlike sint64) are encoded in two's complement
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _sint64(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_packed_varints(buffer):
+    """
+    Decodes a packed field of varints at once.
+
+    Returns:
+        np.uint64 array
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if data.size == 0:
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts + 1
+    position_in_varint = np.arange(data.size) - np.repeat(starts, lengths)
+    parts = (data & 0x7f).astype(np.uint64) << (7 * position_in_varint).astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+def decode_packed_sint64(buffer):
+    values = decode_packed_varints(buffer)
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def decode_packed_delta_sint64(buffer):
+    return np.cumsum(decode_packed_sint64(buffer))
+
+
+class PrimitiveBlock:
+    """
+    The parts of a decoded `PrimitiveBlock` needed for the index.
+    """
+
+    def __init__(self, data):
+        granularity, lat_offset, lon_offset = 100, 0, 0
+        string_table, groups = None, []
+        for field_number, value in fields(data):
+            if field_number == 1:
+                string_table = value
+            elif field_number == 2:
+                groups.append(value)
+            elif field_number == 17:
+                granularity = value
+            elif field_number == 19:
+                lat_offset = _int64(value)
+            elif field_number == 20:
+                lon_offset = _int64(value)
+        self._strings = [bytes(string) for _, string in fields(string_table)] if string_table is not None else []
+        node_ids, lats, lons = [], [], []
+        way_ids, way_refs = [], []
+        self.relation_ids = []
+        self.complex_relation_way_members = []
+        for group in groups:
+            for field_number, value in fields(group):
+                if field_number == 1:
+                    self._read_node(value, node_ids, lats, lons)
+                elif field_number == 2:
+                    self._read_dense_nodes(value, node_ids, lats, lons)
+                elif field_number == 3:
+                    self._read_way(value, way_ids, way_refs)
+                elif field_number == 4:
+                    self._read_relation(value)
+        self.node_ids = _concatenate(node_ids)
+        self.lats = lat_offset + granularity * _concatenate(lats)
+        self.lons = lon_offset + granularity * _concatenate(lons)
+        self.way_ids = np.array(way_ids, dtype=np.int64)
+        self.way_refs = _concatenate(way_refs)
+
+    @staticmethod
+    def _read_node(node, node_ids, lats, lons):
+        values = {field_number: value for field_number, value in fields(node) if field_number in (1, 8, 9)}
+        node_ids.append(np.array([_sint64(values[1])], dtype=np.int64))
+        lats.append(np.array([_sint64(values[8])], dtype=np.int64))
+        lons.append(np.array([_sint64(values[9])], dtype=np.int64))
+
+    @staticmethod
+    def _read_dense_nodes(dense_nodes, node_ids, lats, lons):
+        for field_number, value in fields(dense_nodes):
+            if field_number == 1:
+                node_ids.append(decode_packed_delta_sint64(value))
+            elif field_number == 8:
+                lats.append(decode_packed_delta_sint64(value))
+            elif field_number == 9:
+                lons.append(decode_packed_delta_sint64(value))
+
+    @staticmethod
+    def _read_way(way, way_ids, way_refs):
+        for field_number, value in fields(way):
+            if field_number == 1:
+                way_ids.append(_int64(value))
+            elif field_number == 8:
+                way_refs.append(decode_packed_delta_sint64(value))
+
+    def _read_relation(self, relation):
+        keys = values = member_ids = member_types = None
+        for field_number, value in fields(relation):
+            if field_number == 1:
+                self.relation_ids.append(_int64(value))
+            elif field_number == 2:
+                keys = decode_packed_varints(value)
+            elif field_number == 3:
+                values = decode_packed_varints(value)
+            elif field_number == 9:
+                member_ids = decode_packed_delta_sint64(value)
+            elif field_number == 10:
+                member_types = decode_packed_varints(value)
+        if keys is None or member_ids is None:
+            return
+        tags = {self._strings[int(key)]: self._strings[int(value)] for key, value in zip(keys, values)}
+        if tags.get(b'type') in _COMPLEX_RELATION_TYPES:
+            self.complex_relation_way_members.append(member_ids[member_types == _MEMBER_TYPE_WAY])
+
+
+def _concatenate(arrays):
+    if not arrays:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(arrays).astype(np.int64)
+
+
+def cells_of(lats, lons):
+    """
+    Returns:
+        the sorted, unique one degree cells of the given nanodegree coordinates
+    """
+    lat_cells = np.clip(np.floor_divide(lats, _NANODEGREES_PER_DEGREE) + 90, 0, 179)
+    lon_cells = np.clip(np.floor_divide(lons, _NANODEGREES_PER_DEGREE) + 180, 0, 359)
+    return np.unique(lat_cells * 360 + lon_cells).astype(np.uint16)
+
+
+# --- indexing, run in a process pool ---
+
+_worker_state = {}
+
+
+def _init_worker(pbf_path, id_ranges=None):
+    pbf_file = open(pbf_path, 'rb')
+    _worker_state['pbf'] = mmap.mmap(pbf_file.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker_state['id_ranges'] = id_ranges
+
+
+def _summarize_blob(position):
+    """
+    First pass: what's in the blob and where are its nodes.
+    """
+    offset, length = position
+    block = PrimitiveBlock(blob_data(_worker_state['pbf'], offset, length))
+    summary = dict(
+        kind=KIND_EMPTY, node_id_range=None, way_id_range=None, bbox=None,
+        has_members=bool(block.way_ids.size or block.relation_ids),
+    )
+    if block.relation_ids:
+        summary.update(kind=KIND_RELATIONS)
+    if block.way_ids.size:
+        summary.update(kind=KIND_WAYS, way_id_range=(block.way_ids.min(), block.way_ids.max()))
+    if block.node_ids.size:
+        summary.update(
+            kind=KIND_NODES,
+            node_id_range=(block.node_ids.min(), block.node_ids.max()),
+            bbox=(block.lons.min(), block.lats.min(), block.lons.max(), block.lats.max()),
+        )
+    summary['cells'] = cells_of(block.lats, block.lons)
+    return summary
+
+
+def _blobs_containing(ids, id_range):
+    """
+    Args:
+        ids: ids of one type of element
+        id_range: `(blob_numbers, min_ids, max_ids)` of the blobs containing elements of that type
+
+    Returns:
+        numbers of the blobs containing any of `ids`
+    """
+    blob_numbers, min_ids, max_ids = id_range
+    if ids.size == 0 or blob_numbers.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    ids = np.unique(ids)
+    candidates = np.searchsorted(max_ids, ids)
+    found = candidates < max_ids.size
+    candidates, ids = candidates[found], ids[found]
+    found = min_ids[candidates] <= ids
+    return np.unique(blob_numbers[candidates[found]])
+
+
+def _members_of_blob(position):
+    """
+    Second pass: which blobs hold the members of the ways and complex relations of the blob.
+
+    Returns:
+        `(node_blobs, way_blobs_of_each_complex_relation)`
+    """
+    offset, length = position
+    block = PrimitiveBlock(blob_data(_worker_state['pbf'], offset, length))
+    node_id_range, way_id_range = _worker_state['id_ranges']
+    return (
+        _blobs_containing(block.way_refs, node_id_range),
+        [_blobs_containing(way_ids, way_id_range) for way_ids in block.complex_relation_way_members],
+    )
+
+
+def _id_range(summaries, key):
+    blob_numbers = np.array(
+        [number for number, summary in enumerate(summaries) if summary[key] is not None], dtype=np.int64
+    )
+    min_ids = np.array([summaries[number][key][0] for number in blob_numbers], dtype=np.int64)
+    max_ids = np.array([summaries[number][key][1] for number in blob_numbers], dtype=np.int64)
+    if np.any(min_ids[1:] <= max_ids[:-1]):
+        raise ValueError('the PBF file is not sorted by type and id, which the blob index relies on')
+    return blob_numbers, min_ids, max_ids
+
+
+def build_blob_index(pbf_path, index_path=None, *, processes=None):
+    """
+    Indexes the blobs of the PBF file at `pbf_path`, see the module documentation.
+
+    Returns:
+        the path of the index
+    """
+    index_path = index_path or index_path_for(pbf_path)
+    pbf_stat = os.stat(pbf_path)
+    with open(pbf_path, 'rb') as pbf_file:
+        positions = read_blob_positions(pbf_file)
+    data_blobs = [number for number, (_, _, blob_type) in enumerate(positions) if blob_type == 'OSMData']
+
+    summaries = [
+        dict(
+            kind=KIND_HEADER, node_id_range=None, way_id_range=None, bbox=None, has_members=False,
+            cells=np.zeros(0, dtype=np.uint16),
+        )
+        for _ in positions
+    ]
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(pbf_path,)) as pool:
+        data_positions = [positions[number][:2] for number in data_blobs]
+        for number, summary in zip(data_blobs, pool.imap(_summarize_blob, data_positions, chunksize=16)):
+            summaries[number] = summary
+
+    id_ranges = (_id_range(summaries, 'node_id_range'), _id_range(summaries, 'way_id_range'))
+    blobs_with_members = [number for number in data_blobs if summaries[number]['has_members']]
+    dependencies = [np.zeros(0, dtype=np.int64) for _ in positions]
+    complex_relations = []
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(pbf_path, id_ranges)) as pool:
+        member_positions = [positions[number][:2] for number in blobs_with_members]
+        results = pool.imap(_members_of_blob, member_positions, chunksize=16)
+        for number, (node_blobs, way_blobs_of_complex_relations) in zip(blobs_with_members, results):
+            dependencies[number] = node_blobs
+            complex_relations.extend(way_blobs_of_complex_relations)
+
+    cells = [
+        np.unique(np.concatenate([summaries[number]['cells']] + [summaries[node_blob]['cells'] for node_blob in dependencies[number]]))
+        for number in range(len(positions))
+    ]
+
+    _write_index(index_path, positions, summaries, cells, dependencies, complex_relations, pbf_stat)
+    return index_path
+
+
+def _csr(arrays, dtype):
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(values) for values in arrays])
+    if not arrays:
+        return offsets, np.zeros(0, dtype=dtype)
+    return offsets, np.concatenate([np.asarray(values) for values in arrays]).astype(dtype)
+
+
+def _write_index(index_path, positions, summaries, cells, dependencies, complex_relations, pbf_stat):
+    cell_offsets, cell_values = _csr(cells, np.uint16)
+    dependency_offsets, dependency_values = _csr(dependencies, np.int64)
+    complex_relation_offsets, complex_relation_way_blobs = _csr(complex_relations, np.int64)
+    no_bbox = (np.iinfo(np.int64).max, np.iinfo(np.int64).max, np.iinfo(np.int64).min, np.iinfo(np.int64).min)
+    temporary_path = index_path + '.tmp.npz'
+    np.savez(
+        temporary_path,
+        offsets=np.array([offset for offset, _, _ in positions], dtype=np.int64),
+        lengths=np.array([length for _, length, _ in positions], dtype=np.int64),
+        kinds=np.array([summary['kind'] for summary in summaries], dtype=np.int8),
+        bboxes=np.array([summary['bbox'] or no_bbox for summary in summaries], dtype=np.int64).reshape(-1, 4),
+        cell_offsets=cell_offsets,
+        cells=cell_values,
+        dependency_offsets=dependency_offsets,
+        dependencies=dependency_values,
+        complex_relation_offsets=complex_relation_offsets,
+        complex_relation_way_blobs=complex_relation_way_blobs,
+        pbf_size=np.int64(pbf_stat.st_size),
+        pbf_mtime_ns=np.int64(pbf_stat.st_mtime_ns),
+    )
+    os.replace(temporary_path, index_path)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pbf_path')
+    parser.add_argument('--processes', type=int, default=None, help='defaults to the number of CPUs')
+    args = parser.parse_args()
+    print('index written to {}'.format(build_blob_index(args.pbf_path, processes=args.processes)))
@@ -1,19 +1,48 @@
 #!/usr/bin/env python3
+"""
+Keeps the planet up-to-date by applying replication diffs to it.
+
+Every version of the planet is an immutable generation directory below `pbf/generations`, holding the planet
+and the artifacts derived from it (see `artifacts.py`). `pbf/current` points to the latest generation and is
+switched atomically, once the generation is complete; `pbf/planet-latest.osm.pbf` points to the planet in `pbf/current`.
+
+Readers resolve `pbf/current` once and hold a shared `flock` on the `.lock` file in the generation they resolved
+until they're done with it. Generations being read are never deleted.
+
+Disk budget: besides the current generation, `KEEP_GENERATIONS` older ones are kept (more while they're being read),
+and the next one is built next to them, so up to `KEEP_GENERATIONS + 2` planets, each with its artifacts, take up
+space at once, i.e. about 4 planets and their artifacts by default. A full download adds another planet while it
+lasts. The replication diffs osmupdate keeps (in `osmupdate/temp`) are deleted once they're older than the oldest
+generation kept, as no generation needs them anymore, so they only take up the diffs of a few hours.
+"""
+import json
 import os
 import subprocess
 import shutil
 import time
 
 import datetime
+import fcntl
 
 import sentry_sdk
 from sentry_sdk import capture_exception
 
+import artifacts
+import downloader
+from pbf_blobs import read_blob_positions
+
 
 BASE_DIR = '/var/data/osm-planet'
 PBF_DIR = os.path.join(BASE_DIR, 'pbf')
-PLANET_LATEST = os.path.join(PBF_DIR, 'planet-latest.osm.pbf')
-PLANET_LATEST_ON_UPDATE = os.path.join(PBF_DIR, 'new_planet-latest.osm.pbf')
+GENERATIONS_DIR = os.path.join(PBF_DIR, 'generations')
+GENERATION_NAME_FORMAT = '%Y%m%dT%H%M%SZ'  # the time the generation was created at
+CURRENT_GENERATION = os.path.join(PBF_DIR, 'current')
+PLANET_FILE_NAME = 'planet-latest.osm.pbf'
+PLANET_LATEST = os.path.join(PBF_DIR, PLANET_FILE_NAME)
+PLANET_DOWNLOAD = os.path.join(PBF_DIR, 'download_planet-latest.osm.pbf')
+# keep in sync with osmaxx.conversion.converters.converter_pbf.planet
+GENERATION_LOCK_FILE_NAME = '.lock'
+OSMUPDATE_TEMP_FILES = os.path.join(BASE_DIR, 'osmupdate', 'temp')
 NICE = ["nice", "-n", "19"]
 OSM_PLANET_PATH_RELATIVE_TO_MIRROR = os.environ.get(
     'osm_planet_path_relative_to_mirror', '/pbf/planet-latest.osm.pbf'
@@ -21,25 +50,165 @@ OSM_PLANET_PATH_RELATIVE_TO_MIRROR = os.environ.get(
 OSM_PLANET_MIRROR = os.environ.get(
     'osm_planet_mirror', 'https://ftp.gwdg.de/pub/misc/openstreetmap/planet.openstreetmap.org'
 )
+BUILD_BLOB_INDEX = os.environ.get('build_blob_index', 'true').lower() == 'true'
+# JSON file listing the artifacts to derive from each generation, see artifacts.py; only the blob index by default
+ARTIFACTS_CONFIG = os.environ.get('artifacts_config', None)
+ARTIFACT_BUILD_PROCESSES = int(os.environ.get('artifact_build_processes', os.cpu_count() or 1))
+# which replication diffs to apply, the coarser ones are used to catch up after a pause
+REPLICATION_GRANULARITY = os.environ.get('replication_granularity', 'hour')
+OSMUPDATE_GRANULARITY_OPTIONS = {
+    'minute': ['--minute', '--hour', '--day'],
+    'hour': ['--hour', '--day'],
+    'day': ['--day'],
+}
+# besides the current one, older generations are kept for readers that resolved them just before a switch
+KEEP_GENERATIONS = int(os.environ.get('keep_generations', 2))
+DOWNLOAD_CONNECTIONS = int(os.environ.get('download_connections', 8))
 
 
 def planet_url():
     return OSM_PLANET_MIRROR + OSM_PLANET_PATH_RELATIVE_TO_MIRROR
 
 
+def current_planet():
+    return os.path.join(os.path.realpath(CURRENT_GENERATION), PLANET_FILE_NAME)
+
+
+def is_intact(pbf_path):
+    """
+    Whether the file is a complete sequence of blobs, starting with a header blob. Only reads the blob headers.
+    """
+    try:
+        with open(pbf_path, 'rb') as pbf_file:
+            positions = read_blob_positions(pbf_file)
+    except (OSError, ValueError, IndexError, UnicodeDecodeError):
+        return False
+    if not positions or positions[0][2] != 'OSMHeader':
+        return False
+    last_offset, last_length, _ = positions[-1]
+    return last_offset + last_length == os.path.getsize(pbf_path)
+
+
+def new_generation():
+    """
+    Returns:
+        the path of a new, not yet published generation directory
+    """
+    os.makedirs(GENERATIONS_DIR, exist_ok=True)
+    name = datetime.datetime.utcnow().strftime(GENERATION_NAME_FORMAT)
+    generation_dir = os.path.join(GENERATIONS_DIR, name + '.tmp')
+    shutil.rmtree(generation_dir, ignore_errors=True)
+    os.makedirs(generation_dir)
+    open(os.path.join(generation_dir, GENERATION_LOCK_FILE_NAME), 'w').close()
+    return generation_dir
+
+
+def publish(generation_dir):
+    """
+    Makes the complete generation the current one, unless its planet is broken.
+    """
+    planet = os.path.join(generation_dir, PLANET_FILE_NAME)
+    if not is_intact(planet):
+        shutil.rmtree(generation_dir)
+        raise ValueError('{} is broken, keeping the current generation'.format(planet))
+    published_dir = generation_dir[:-len('.tmp')]
+    artifacts.build_artifacts(
+        configured_artifacts(), planet, generation=os.path.basename(published_dir), processes=ARTIFACT_BUILD_PROCESSES,
+    )
+    os.rename(generation_dir, published_dir)
+    _replace_symlink(os.path.relpath(published_dir, PBF_DIR), CURRENT_GENERATION)
+    _replace_symlink(os.path.join(os.path.basename(CURRENT_GENERATION), PLANET_FILE_NAME), PLANET_LATEST)
+    print("published generation {}".format(published_dir))
+    collect_garbage()
+
+
+def configured_artifacts():
+    if ARTIFACTS_CONFIG is not None:
+        return artifacts.load_artifacts(ARTIFACTS_CONFIG)
+    if BUILD_BLOB_INDEX:
+        return [artifacts.BlobIndex('blob-index')]
+    return []
+
+
+def _replace_symlink(target, link_path):
+    temporary_link_path = link_path + '.tmp'
+    if os.path.lexists(temporary_link_path):
+        os.remove(temporary_link_path)
+    os.symlink(target, temporary_link_path)
+    os.replace(temporary_link_path, link_path)
+
+
+def collect_garbage():
+    """
+    Deletes old generations nobody is reading anymore, and the replication diffs older than those kept.
+    """
+    current = os.path.realpath(CURRENT_GENERATION)
+    generations = sorted(
+        os.path.join(GENERATIONS_DIR, name) for name in os.listdir(GENERATIONS_DIR) if not name.endswith('.tmp')
+    )
+    old_generations = [generation for generation in generations if generation != current]
+    for generation_dir in old_generations[:max(len(old_generations) - KEEP_GENERATIONS, 0)]:
+        with open(os.path.join(generation_dir, GENERATION_LOCK_FILE_NAME), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print("generation {} is still being read, keeping it".format(generation_dir))
+                continue
+            shutil.rmtree(generation_dir)
+            print("deleted generation {}".format(generation_dir))
+    kept_generations = [generation for generation in generations if os.path.exists(generation)]
+    if kept_generations:
+        delete_diffs_older_than(_created_at(kept_generations[0]))
+
+
+def _created_at(generation_dir):
+    created_at = datetime.datetime.strptime(os.path.basename(generation_dir), GENERATION_NAME_FORMAT)
+    return created_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def delete_diffs_older_than(timestamp):
+    """
+    Deletes the replication diffs osmupdate kept that were downloaded before `timestamp`.
+    """
+    temp_files_dir = os.path.dirname(OSMUPDATE_TEMP_FILES)
+    if not os.path.isdir(temp_files_dir):
+        return
+    for entry in os.scandir(temp_files_dir):
+        if entry.is_file() and entry.stat().st_mtime < timestamp:
+            os.remove(entry.path)
+
+
+def adopt_planet_of_previous_layout():
+    """
+    Moves a planet downloaded before there were generations into the first generation.
+    """
+    if os.path.isfile(PLANET_LATEST) and not os.path.islink(PLANET_LATEST):
+        generation_dir = new_generation()
+        shutil.move(PLANET_LATEST, os.path.join(generation_dir, PLANET_FILE_NAME))
+        publish(generation_dir)
+
+
 def full_download(complete_planet_mirror_url):
     os.makedirs(PBF_DIR, exist_ok=True)
-    download_pbf_path = "{}_tmp".format(PLANET_LATEST)
-    download_command = ["wget", "--continue", "-O", download_pbf_path, complete_planet_mirror_url]
-    subprocess.check_call(NICE + download_command)
-    shutil.move(download_pbf_path, PLANET_LATEST)
+    metrics = downloader.download(complete_planet_mirror_url, PLANET_DOWNLOAD, connections=DOWNLOAD_CONNECTIONS)
+    print("downloaded {url}: {fetched_bytes} bytes in {seconds}s ({mib_per_second} MiB/s) over {connections} connections".format(**metrics))
+    with open(PLANET_DOWNLOAD + '.metrics.json', 'w') as metrics_file:
+        json.dump(metrics, metrics_file, indent=2)
+    generation_dir = new_generation()
+    shutil.move(PLANET_DOWNLOAD, os.path.join(generation_dir, PLANET_FILE_NAME))
+    publish(generation_dir)
 
 
 def update(osmupdate_extra_params):
-    update_comand = ["osmupdate", "-v"] + osmupdate_extra_params.split() + [PLANET_LATEST, PLANET_LATEST_ON_UPDATE]
+    generation_dir = new_generation()
+    update_comand = ["osmupdate", "-v", "--keep-tempfiles", "-t={}".format(OSMUPDATE_TEMP_FILES)] + \
+        OSMUPDATE_GRANULARITY_OPTIONS[REPLICATION_GRANULARITY] + osmupdate_extra_params.split() + \
+        [current_planet(), os.path.join(generation_dir, PLANET_FILE_NAME)]
+    os.makedirs(os.path.dirname(OSMUPDATE_TEMP_FILES), exist_ok=True)
     try:
         subprocess.check_call(NICE + update_comand)
     except subprocess.CalledProcessError as e:
+        shutil.rmtree(generation_dir)
         # if the file is alright, but already up-to-date we want to continue, not stop!
         #  http://m.m.i24.cc/osmupdate.c
         #     if(loglevel>0)
@@ -56,23 +225,25 @@ def update(osmupdate_extra_params):
             return
         else:
             raise
-    shutil.move(PLANET_LATEST_ON_UPDATE, PLANET_LATEST)
-
-
-def _is_night_time(now):
-    return now.hour < 4 or now.hour > 22
+    publish(generation_dir)
 
 
 def run(*, sleep_seconds=10, osmupdate_extra_params):
-    last_full_download_time = datetime.datetime.min
+    adopt_planet_of_previous_layout()
+    # a full download is only needed to recover from a missing or broken planet, otherwise diffs are applied
+    planet_is_usable = os.path.exists(CURRENT_GENERATION) and is_intact(current_planet())
     while True:
-        now = datetime.datetime.now()
-        full_update_is_due = now - last_full_download_time > datetime.timedelta(weeks=1)
-        if not os.path.exists(PLANET_LATEST) or full_update_is_due and _is_night_time(now):
+        if not planet_is_usable:
             full_download(planet_url())
-            last_full_download_time = datetime.datetime.now()
-        # start updating immediately
-        update(osmupdate_extra_params)
+            planet_is_usable = True
+        try:
+            update(osmupdate_extra_params)
+        except subprocess.CalledProcessError:
+            planet_is_usable = is_intact(current_planet())
+            if planet_is_usable:
+                raise
+            print("the current planet is broken, downloading it again")
+            continue
         print("update done, sleeping for {} seconds".format(sleep_seconds))
         # wait for this seconds
         time.sleep(sleep_seconds)
@@ -63,14 +63,16 @@ class JWTClient(RESTApiClient):
         self.token = None
 
     def authorized_get(self, url, params=None, **kwargs):
-        return self.get(url, params, headers=self._authorization_headers(), **kwargs)
+        return self.get(url, params, headers=self._authorization_headers(timeout=kwargs.get('timeout')), **kwargs)
 
     def authorized_post(self, url, json_data=None, **kwargs):
-        return self.post(url, json_data, headers=self._authorization_headers(), **kwargs)
+        return self.post(url, json_data, headers=self._authorization_headers(timeout=kwargs.get('timeout')), **kwargs)
 
-    def _login(self):
+    def _login(self, timeout=None):
         """
         Logs in the api client by requesting an API token
+
+        :param timeout: passed on to `requests`, so logging in doesn't outlast the request it's done for
         """
         if self.token:
             # already logged in
@@ -78,12 +80,12 @@ class JWTClient(RESTApiClient):
             # TODO: comply to JWT and check whether key is (still) valid, whether it needs reinitialization etc.
         login_url = self._to_fully_qualified_url(self.login_url)
         login_data = dict(username=self.username, password=self.password, next=self.service_base)
-        response = self.post(login_url, json_data=login_data, headers=dict(Referer=login_url))
+        response = self.post(login_url, json_data=login_data, headers=dict(Referer=login_url), timeout=timeout)
         self.token = response.json().get('token')
         return response
 
-    def _authorization_headers(self):
-        self._login()
+    def _authorization_headers(self, timeout=None):
+        self._login(timeout=timeout)
         return {
             'Authorization': 'JWT {token}'.format(token=self.token),
         }
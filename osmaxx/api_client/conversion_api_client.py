@@ -66,6 +66,20 @@ class ConversionApiClient(JWTClient):
         response = self.authorized_post(url='conversion_job/', json_data=json_payload)
         return response.json()
 
+    def cancel_job(self, job_id, *, timeout=None):
+        """
+        Stops the conversion of the job
+
+        Args:
+            job_id: the id of the job at the conversion service
+            timeout: seconds to wait for the conversion service (to log in and cancel the job each), forever if None
+
+        Returns:
+            A dictionary representing the cancelled job
+        """
+        response = self.authorized_post(url=CONVERSION_JOB_URL + '{}/cancel/'.format(job_id), timeout=timeout)
+        return response.json()
+
     def get_result_file_path(self, job_id):
         file_path = self._get_result_file_path(job_id)
         if file_path:
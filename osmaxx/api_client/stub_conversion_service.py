@@ -0,0 +1,301 @@
+"""
+A stand-in for the conversion service, to load test the frontend without one (see `excerptexport/load_test.py`).
+
+It answers the requests `ConversionApiClient` makes like the conversion service does, after a configurable latency,
+but converts nothing: each job is started `queue_seconds` after it was created and finished `conversion_seconds`
+later, with a dummy result file. The status changes are sent to the jobs' callback URLs like the harvester does,
+or kept for the caller to deliver (see `StubConversionService.pop_due_callbacks`).
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import requests
+
+from osmaxx.conversion import output_format, status
+
+logger = logging.getLogger(__name__)
+
+TOKEN = 'stub-token'
+# bytes of PBF per square degree of the bounding box, about the planet's average over land
+PBF_BYTES_PER_SQUARE_DEGREE = 2e8
+# the sizes of the formats relative to the PBF's
+_FORMAT_SIZE_FACTORS = {
+    output_format.FGDB: 4.0,
+    output_format.SHAPEFILE: 6.0,
+    output_format.GPKG: 5.0,
+    output_format.SPATIALITE: 5.0,
+    output_format.GARMIN: 1.5,
+    output_format.PBF: 1.0,
+}
+
+_ROUTES = [
+    ('POST', re.compile(r'^token-auth/$'), 'token_auth'),
+    ('POST', re.compile(r'^clipping_area/$'), 'clipping_area'),
+    ('POST', re.compile(r'^conversion_parametrization/$'), 'conversion_parametrization'),
+    ('POST', re.compile(r'^conversion_job/$'), 'conversion_job'),
+    ('GET', re.compile(r'^conversion_job/(?P<job_id>[0-9]+)/?$'), 'conversion_job_detail'),
+    ('POST', re.compile(r'^conversion_job/(?P<job_id>[0-9]+)/cancel/$'), 'conversion_job_cancel'),
+    ('POST', re.compile(r'^estimate_size_in_bytes/$'), 'estimate_size_in_bytes'),
+    ('POST', re.compile(r'^format_size_estimation/$'), 'format_size_estimation'),
+]
+
+
+class StubConversionService:
+    def __init__(
+            self, *, host='localhost', port=0, base_path='/api/', latency_seconds=0.0, endpoint_latency_seconds=None,
+            queue_seconds=5.0, conversion_seconds=30.0, failure_rate=0.0, deliver_callbacks=True, result_dir=None,
+            seed=0):
+        """
+        Args:
+            port: 0 to listen on any free port, see `url`
+            latency_seconds: how long each request takes to be answered ...
+            endpoint_latency_seconds: ... unless given for its endpoint here, as `{endpoint: seconds}` (see `_ROUTES`)
+            failure_rate: the fraction of the jobs failing instead of being finished
+            deliver_callbacks: whether to send the status changes to the callback URLs, they're kept otherwise
+            result_dir: where to write the result files the frontend then moves away, defaults to a temp directory
+        """
+        self._base_path = base_path
+        self._latency_seconds = latency_seconds
+        self._endpoint_latency_seconds = endpoint_latency_seconds or {}
+        self._queue_seconds = queue_seconds
+        self._conversion_seconds = conversion_seconds
+        self._failure_rate = failure_rate
+        self._deliver_callbacks = deliver_callbacks
+        self._result_dir = result_dir or tempfile.mkdtemp(prefix='stub-conversion-results-')
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = Counter()
+        self._jobs = {}
+        # (due, sequence, job_id, status, callback_url), the sequence keeping the order of callbacks due together
+        self._callbacks = []
+        self._callback_sequence = itertools.count()
+        self._due_callbacks = []
+        self.requests = Counter()
+        self._stopped = threading.Event()
+        self._server = _ThreadingHTTPServer((host, port), _handler_for(self))
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+            threading.Thread(target=self._dispatch_callbacks, daemon=True),
+        ]
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}{}'.format(host, port, self._base_path)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def pop_due_callbacks(self):
+        """
+        Returns:
+            `(callback_url, params)` of the status changes due by now, if they aren't delivered by the stub itself
+        """
+        with self._lock:
+            due_callbacks, self._due_callbacks = self._due_callbacks, []
+        return due_callbacks
+
+    def handle(self, method, path, payload):
+        """
+        Returns:
+            `(status_code, response_payload)`
+        """
+        if not path.startswith(self._base_path):
+            return 404, {'detail': 'Not found.'}
+        relative_path = path[len(self._base_path):]
+        for route_method, pattern, endpoint in _ROUTES:
+            match = pattern.match(relative_path)
+            if match is None or route_method != method:
+                continue
+            with self._lock:
+                self.requests[endpoint] += 1
+            time.sleep(self._endpoint_latency_seconds.get(endpoint, self._latency_seconds))
+            return getattr(self, '_' + endpoint)(payload, **match.groupdict())
+        return 404, {'detail': 'Not found.'}
+
+    def _token_auth(self, payload):
+        return 200, {'token': TOKEN}
+
+    def _clipping_area(self, payload):
+        return 201, dict(payload, id=self._next_id('clipping_area'))
+
+    def _conversion_parametrization(self, payload):
+        return 201, dict(payload, id=self._next_id('conversion_parametrization'))
+
+    def _conversion_job(self, payload):
+        now = time.time()
+        job = dict(
+            id=self._next_id('conversion_job'), callback_url=payload.get('callback_url'),
+            parametrization=payload.get('parametrization'), queue_name=payload.get('queue_name', 'default'),
+            created_at=now, cancelled=False,
+        )
+        with self._lock:
+            job['failing'] = self._random.random() < self._failure_rate
+            self._jobs[job['id']] = job
+            if job['callback_url']:
+                started_at = now + self._queue_seconds
+                done_at = started_at + self._conversion_seconds
+                for due, job_status in [(started_at, status.STARTED), (done_at, self._final_status(job))]:
+                    callback = (due, next(self._callback_sequence), job['id'], job_status, job['callback_url'])
+                    heapq.heappush(self._callbacks, callback)
+        return 201, self._representation(job)
+
+    def _conversion_job_detail(self, payload, job_id):
+        job = self._jobs.get(int(job_id))
+        if job is None:
+            return 404, {'detail': 'Not found.'}
+        return 200, self._representation(job, with_result_file=True)
+
+    def _conversion_job_cancel(self, payload, job_id):
+        job = self._jobs.get(int(job_id))
+        if job is None:
+            return 404, {'detail': 'Not found.'}
+        job['cancelled'] = True
+        return 200, self._representation(job)
+
+    def _estimate_size_in_bytes(self, payload):
+        try:
+            width = abs(float(payload['east']) - float(payload['west']))
+            height = abs(float(payload['north']) - float(payload['south']))
+        except (KeyError, TypeError, ValueError):
+            return 400, {'detail': 'north, east, south and west are required.'}
+        return 200, {'estimated_file_size_in_bytes': width * height * PBF_BYTES_PER_SQUARE_DEGREE}
+
+    def _format_size_estimation(self, payload):
+        try:
+            estimated_pbf_size = float(payload['estimated_pbf_file_size_in_bytes'])
+        except (KeyError, TypeError, ValueError):
+            return 400, {'estimated_pbf_file_size_in_bytes': ['A valid number is required.']}
+        return 200, dict(payload, **{
+            out_format: estimated_pbf_size * factor for out_format, factor in _FORMAT_SIZE_FACTORS.items()
+        })
+
+    def _next_id(self, endpoint):
+        with self._lock:
+            self._ids[endpoint] += 1
+            return self._ids[endpoint]
+
+    def _final_status(self, job):
+        return status.FAILED if job['failing'] else status.FINISHED
+
+    def _status(self, job):
+        if job['cancelled']:
+            return status.FAILED
+        elapsed = time.time() - job['created_at']
+        if elapsed < self._queue_seconds:
+            return status.QUEUED
+        if elapsed < self._queue_seconds + self._conversion_seconds:
+            return status.STARTED
+        return self._final_status(job)
+
+    def _representation(self, job, *, with_result_file=False):
+        job_status = self._status(job)
+        resulting_file_path = None
+        if with_result_file and job_status == status.FINISHED:
+            # the frontend moves the result file away once it's notified, so each request gets one of its own
+            resulting_file_path = self._write_result_file(job)
+        return {
+            'id': job['id'], 'callback_url': job['callback_url'], 'parametrization': job['parametrization'],
+            'rq_job_id': 'stub-{}'.format(job['id']), 'status': job_status, 'resulting_file_path': resulting_file_path,
+            'estimated_pbf_size': None, 'unzipped_result_size': None, 'extraction_duration': None,
+            'queue_name': job['queue_name'],
+        }
+
+    def _write_result_file(self, job):
+        file_descriptor, path = tempfile.mkstemp(
+            prefix='job-{}-'.format(job['id']), suffix='.zip', dir=self._result_dir,
+        )
+        with os.fdopen(file_descriptor, 'wb') as result_file, zipfile.ZipFile(result_file, 'w') as result_zip:
+            result_zip.writestr('README.txt', 'converted by the stub conversion service\n')
+        return path
+
+    def _dispatch_callbacks(self):
+        session = requests.Session()
+        while not self._stopped.wait(0.1):
+            for job_id, job_status, callback_url in self._pop_callbacks_due_by(time.time()):
+                params = {'status': job_status, 'job': '{}conversion_job/{}/'.format(self._base_path, job_id)}
+                if not self._deliver_callbacks:
+                    with self._lock:
+                        self._due_callbacks.append((callback_url, params))
+                    continue
+                try:
+                    session.get(callback_url, params=params, timeout=10).raise_for_status()
+                except requests.RequestException:
+                    logger.exception('failed to notify %s of job %s being %s', callback_url, job_id, job_status)
+
+    def _pop_callbacks_due_by(self, now):
+        due = []
+        with self._lock:
+            while self._callbacks and self._callbacks[0][0] <= now:
+                _, _, job_id, job_status, callback_url = heapq.heappop(self._callbacks)
+                if self._jobs[job_id]['cancelled']:
+                    continue
+                due.append((job_id, job_status, callback_url))
+        return due
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _handler_for(service):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self._respond('GET', None)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            try:
+                payload = json.loads(body.decode()) if body else {}
+            except ValueError:
+                self._send(400, {'detail': 'JSON parse error.'})
+                return
+            self._respond('POST', payload)
+
+        def _respond(self, method, payload):
+            path = self.path.split('?', 1)[0]
+            authorized = self.headers.get('Authorization') == 'JWT {}'.format(TOKEN)
+            if not authorized and not path.endswith('/token-auth/'):
+                self._send(401, {'detail': 'Authentication credentials were not provided.'})
+                return
+            status_code, response_payload = service.handle(method, path, payload)
+            self._send(status_code, response_payload)
+
+        def _send(self, status_code, response_payload):
+            body = json.dumps(response_payload).encode()
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+    return Handler
@@ -4,9 +4,64 @@ from django.conf import settings
 
 CONVERSION_SETTINGS = {
     'result_harvest_interval_seconds': timedelta(minutes=1).total_seconds(),
+    # the harvester handles the events of the jobs as they arrive and only reconciles all jobs with RQ this often
+    'result_reconciliation_interval_seconds': timedelta(minutes=10).total_seconds(),
+    # the frontend is notified of status changes by a pool of threads, retrying with an exponential backoff
+    'CALLBACK_MAX_CONCURRENT_DELIVERIES': 8,
+    'CALLBACK_TIMEOUT_SECONDS': 10,
+    'CALLBACK_MAX_ATTEMPTS': 5,
+    'CALLBACK_BACKOFF_SECONDS': 2,  # before the second attempt, doubled before each further one
+    # workers send a heartbeat for each job; jobs without one for the timeout are re-queued or failed
+    'heartbeat_check_interval_seconds': timedelta(minutes=1).total_seconds(),
+    'HEARTBEAT_INTERVAL_SECONDS': 30,
+    'HEARTBEAT_TIMEOUT_SECONDS': 180,
+    'STALE_JOB_MAX_REQUEUES': 1,
+    # the backlog is estimated from the durations of this many of the latest jobs (see capacity.py) ...
+    'CAPACITY_DURATION_HISTORY_JOBS': 500,
+    # ... or taken to be this many worker-seconds per job as long as too few have been converted
+    'CAPACITY_DEFAULT_JOB_SECONDS': 600,
+    'CAPACITY_DRAIN_RATE_WINDOW': timedelta(hours=1),
     'PBF_PLANET_FILE_PATH': '/var/data/osm-planet/pbf/planet-latest.osm.pbf',
+    # 'osmconvert', or 'osmium' to cut extracts using a pool of processes (see converter_pbf/extraction.py)
+    'PBF_EXTRACTION_ENGINE': 'osmconvert',
+    'PBF_EXTRACTION_PROCESSES': os.cpu_count() or 1,
     'SEA_AND_BOUNDS_ZIP_DIRECTORY': '/var/data/garmin/additional_data/',
-    'RESULT_TTL': -1,  # never expire!
+    'GARMIN_MKGMAP_MAX_JOBS': os.cpu_count() or 1,
+    # compiled Garmin tiles are kept here between jobs; set to None to disable
+    'GARMIN_TILE_CACHE_DIRECTORY': '/var/data/conversion-cache/garmin-tiles',
+    'GARMIN_TILE_CACHE_MAX_BYTES': 20 * 1024 ** 3,  # the tiles used least recently are evicted beyond; None: unlimited
+    # splitter's areas and the geonames of each extract are kept here; set to None to disable
+    'GARMIN_SPLIT_CACHE_DIRECTORY': '/var/data/conversion-cache/garmin-splits',
+    # ... and reused across planet versions for this long, until the data's density is analysed again
+    'GARMIN_SPLIT_CACHE_MAX_AGE': timedelta(days=7),
+    # indexes of the tiles in bounds.zip and sea.zip, so mkgmap only gets those of the extract; set to None to disable
+    'GARMIN_ADDITIONAL_DATA_INDEX_DIRECTORY': '/var/data/conversion-cache/garmin-additional-data',
+    # seconds the RQ jobs are kept in Redis once done; the harvesters copy their results to the jobs long before
+    'RESULT_TTL': int(timedelta(days=1).total_seconds()),
+    'FAILURE_TTL': int(timedelta(days=1).total_seconds()),
+    # the polygons of the areas to export are handed to the workers as files here, see job_dispatcher/polygon_files.py
+    'POLYGON_FILE_DIRECTORY': os.path.join(settings.MEDIA_ROOT, 'job_result_files', 'polygons'),
+    'POLYGON_FILE_MAX_AGE': timedelta(days=7),
+    # the most ordered exports are converted ahead of being ordered during off-peak hours (see pregenerate_exports)
+    'PREGENERATED_EXPORTS': 20,  # how many; 0 to disable
+    'PREGENERATION_MIN_ORDERS': 3,  # how often an export must have been ordered to be pre-generated
+    'PREGENERATION_HISTORY_JOBS': 10000,  # how many of the latest jobs the popularity is ranked by
+    'PREGENERATION_OFF_PEAK_HOURS': (1, 5),  # [start, end) in the server's local time
+    'PREGENERATION_QUEUE_NAME': 'default',
+    # the planet is updated hourly, so pre-generated exports are used until the next night's are done
+    'PREGENERATED_EXPORT_MAX_AGE': timedelta(days=1, hours=6),
+    # transliterated names are kept here between jobs; set to None to disable
+    'TRANSLITERATION_CACHE_FILE_PATH': '/var/data/conversion-cache/transliteration_cache.tsv',
+    'TRANSLITERATION_CACHE_MAX_BYTES': 128 * 1024 ** 2,  # compacted to the latest half beyond; None: unlimited
+    # export spatially sorted and indexed copies of the layers instead of reading the views in heap order
+    'CLUSTER_OUTPUT_TABLES': False,
+    # keep the database of each exported area and update it from the OSM changes when it's exported again,
+    # see converter_gis/bootstrap/incremental.py
+    'INCREMENTAL_EXPORTS': False,
+    'INCREMENTAL_EXPORT_DATABASES': 3,  # of the areas exported most recently
+    # the replication diffs osmupdate downloads are kept here, until they're older than the max age
+    'INCREMENTAL_EXPORT_OSMUPDATE_DIRECTORY': '/var/data/conversion-cache/osmupdate',
+    'INCREMENTAL_EXPORT_OSMUPDATE_MAX_AGE': timedelta(days=7),
 }
 
 if hasattr(settings, 'OSMAXX_CONVERSION_SERVICE'):
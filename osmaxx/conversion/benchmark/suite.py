@@ -0,0 +1,197 @@
+"""
+Runs the conversions end to end on synthetic data (see synthetic.py) and times them stage by stage, so the figures
+of a change can be compared against those of a baseline run.
+
+The conversions run in the worker's environment, using its database and tools, but with the synthetic data in
+place of the planet and without the caches the workers keep between jobs, so each run starts cold.
+"""
+import os
+import platform
+import shutil
+import statistics
+import time
+import zipfile
+from contextlib import contextmanager
+
+from django.contrib.gis.geos import Polygon
+from django.utils import timezone
+
+import osmaxx
+from osmaxx.clipping_area.to_polyfile import create_poly_file_string
+from osmaxx.conversion import output_format
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
+from osmaxx.conversion.benchmark import synthetic
+from osmaxx.conversion.converters.converter import convert
+from osmaxx.conversion.converters.converter_gis.detail_levels import DETAIL_LEVEL_ALL
+from osmaxx.conversion.job_dispatcher import heartbeats
+
+DEFAULT_FORMATS = (output_format.GPKG, output_format.GARMIN, output_format.PBF)
+# cells per side of the synthetic areas, see synthetic.py
+SCALES = {
+    'small': 10,
+    'medium': 50,
+    'large': 200,
+}
+DEFAULT_TOLERANCE = 0.2
+# differences of durations below this are noise rather than regressions
+NOISE_FLOOR_SECONDS = 2.0
+_COLD_SETTINGS = {
+    'INCREMENTAL_EXPORTS': False,
+    'GARMIN_TILE_CACHE_DIRECTORY': None,
+    'GARMIN_SPLIT_CACHE_DIRECTORY': None,
+    'GARMIN_ADDITIONAL_DATA_INDEX_DIRECTORY': None,
+    'TRANSLITERATION_CACHE_FILE_PATH': None,
+}
+
+
+class StageTimer:
+    """
+    Takes the place of the heartbeat of a job (see `heartbeats.reporting_to`) to time the stages of a conversion.
+    """
+
+    def __init__(self):
+        self.stage_seconds = {}
+        self.throughputs = {}
+        self._stage = 'started'
+        self._stage_started_at = time.monotonic()
+
+    def set_stage(self, stage):
+        self.stop()
+        self._stage = stage
+        self._stage_started_at = time.monotonic()
+
+    def record_throughput(self, stage, byte_count, seconds):
+        self.throughputs[stage] = byte_count / max(seconds, 1e-3)
+
+    def stop(self):
+        now = time.monotonic()
+        self.stage_seconds[self._stage] = self.stage_seconds.get(self._stage, 0) + now - self._stage_started_at
+        self._stage_started_at = now
+
+
+def run(*, scenarios, scales, formats, work_dir, repeat=1):
+    """
+    Returns:
+        the results document, `{'meta': {...}, 'results': [...]}`, one result per scenario, scale and format with
+        the median figures of its `repeat` runs
+    """
+    started_at = timezone.now()
+    results = []
+    for scenario in scenarios:
+        for scale in scales:
+            results.extend(run_scenario(scenario, scale, formats=formats, work_dir=work_dir, repeat=repeat))
+    return {'meta': _meta(started_at), 'results': results}
+
+
+def run_scenario(scenario, scale, *, formats, work_dir, repeat=1):
+    scenario_dir = os.path.join(work_dir, '{}-{}'.format(scenario, scale))
+    os.makedirs(scenario_dir, exist_ok=True)
+    planet_file_path = os.path.join(scenario_dir, 'planet.osm.pbf')
+    extent = synthetic.generate(scenario, SCALES[scale], planet_file_path)
+    polyfile_string = create_poly_file_string(Polygon.from_bbox(extent))
+    results = []
+    for conversion_format in formats:
+        runs = [
+            _convert(conversion_format, scenario, polyfile_string, planet_file_path, scenario_dir)
+            for _ in range(repeat)
+        ]
+        results.append(dict(
+            scenario=scenario, scale=scale, format=conversion_format, runs=repeat,
+            input_bytes=os.path.getsize(planet_file_path), **_medians(runs)
+        ))
+    shutil.rmtree(scenario_dir)
+    return results
+
+
+def _convert(conversion_format, scenario, polyfile_string, planet_file_path, scenario_dir):
+    output_zip_file_path = os.path.join(scenario_dir, '{}.zip'.format(conversion_format))
+    timer = StageTimer()
+    with _benchmark_settings(planet_file_path), heartbeats.reporting_to(timer):
+        start = time.monotonic()
+        convert(
+            conversion_format=conversion_format, area_name=scenario, osmosis_polygon_file_string=polyfile_string,
+            output_zip_file_path=output_zip_file_path, filename_prefix='benchmark_{}'.format(scenario),
+            out_srs='EPSG:4326', detail_level=DETAIL_LEVEL_ALL,
+        )
+        total_seconds = time.monotonic() - start
+    timer.stop()
+    with zipfile.ZipFile(output_zip_file_path) as output_zip:
+        output_unzipped_bytes = sum(info.file_size for info in output_zip.infolist())
+    figures = dict(
+        total_seconds=total_seconds,
+        stage_seconds=timer.stage_seconds,
+        throughput_bytes_per_second=timer.throughputs,
+        output_zip_bytes=os.path.getsize(output_zip_file_path),
+        output_unzipped_bytes=output_unzipped_bytes,
+    )
+    os.remove(output_zip_file_path)
+    return figures
+
+
+@contextmanager
+def _benchmark_settings(planet_file_path):
+    overrides = dict(_COLD_SETTINGS, PBF_PLANET_FILE_PATH=planet_file_path)
+    previous = {key: CONVERSION_SETTINGS[key] for key in overrides}
+    CONVERSION_SETTINGS.update(overrides)
+    try:
+        yield
+    finally:
+        CONVERSION_SETTINGS.update(previous)
+
+
+def _medians(runs):
+    def medians_by_key(dicts):
+        return {key: statistics.median([figures.get(key, 0) for figures in dicts]) for key in dicts[0]}
+    return dict(
+        total_seconds=statistics.median([figures['total_seconds'] for figures in runs]),
+        stage_seconds=medians_by_key([figures['stage_seconds'] for figures in runs]),
+        throughput_bytes_per_second=medians_by_key([figures['throughput_bytes_per_second'] for figures in runs]),
+        output_zip_bytes=statistics.median([figures['output_zip_bytes'] for figures in runs]),
+        output_unzipped_bytes=statistics.median([figures['output_unzipped_bytes'] for figures in runs]),
+    )
+
+
+def _meta(started_at):
+    return {
+        'osmaxx_version': osmaxx.__version__,
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'pbf_extraction_engine': CONVERSION_SETTINGS['PBF_EXTRACTION_ENGINE'],
+        'started_at': started_at.isoformat(),
+        'finished_at': timezone.now().isoformat(),
+    }
+
+
+def compare(results, baseline, *, tolerance=DEFAULT_TOLERANCE, noise_floor_seconds=NOISE_FLOOR_SECONDS):
+    """
+    Compares the results documents of `run`.
+
+    Returns:
+        descriptions of the regressions: durations exceeding the baseline's by more than `tolerance` (a fraction)
+        and `noise_floor_seconds`, and output sizes differing from the baseline's by more than `tolerance`
+    """
+    baseline_results = {_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        expected = baseline_results.get(_key(result))
+        if expected is None:
+            continue
+        label = '{scenario}/{scale}/{format}'.format(**result)
+        durations = [('total', result['total_seconds'], expected['total_seconds'])] + [
+            ('stage ' + stage, seconds, expected['stage_seconds'][stage])
+            for stage, seconds in result['stage_seconds'].items() if stage in expected['stage_seconds']
+        ]
+        for name, seconds, expected_seconds in durations:
+            if seconds > expected_seconds * (1 + tolerance) and seconds - expected_seconds > noise_floor_seconds:
+                regressions.append('{}: {} took {:.1f}s instead of {:.1f}s'.format(
+                    label, name, seconds, expected_seconds,
+                ))
+        for size in ['output_zip_bytes', 'output_unzipped_bytes']:
+            if abs(result[size] - expected[size]) > expected[size] * tolerance:
+                regressions.append('{}: {} is {} instead of {}'.format(label, size, result[size], expected[size]))
+    return regressions
+
+
+def _key(result):
+    return result['scenario'], result['scale'], result['format']
@@ -0,0 +1,235 @@
+"""
+Synthetic OSM data to benchmark the conversions with (see benchmark/suite.py) instead of extracts of the planet.
+
+Each scenario lays out a grid of `scale` x `scale` cells of about 200 m, filled with the features an area of its
+kind consists of, so the layers of the exports are populated much like by real data of the same size. The data
+only depends on the scenario, the scale and the seed.
+"""
+import math
+import random
+
+import osmium
+
+DENSE_URBAN, RURAL, COASTAL = 'dense_urban', 'rural', 'coastal'
+SCENARIOS = (DENSE_URBAN, RURAL, COASTAL)
+
+# south-western corners of the grids, on land of the right kind for the boundaries imported along with the data
+_ORIGINS = {
+    DENSE_URBAN: (8.50, 47.35),
+    RURAL: (9.00, 46.80),
+    COASTAL: (8.80, 44.38),
+}
+CELL_DEGREES = 0.002
+_TIMESTAMP = '2019-01-01T00:00:00Z'
+_NAMES = ['Bahnhofstrasse', 'Rue de la Gare', 'Улица Ленина', '中山路', 'Οδός Αθηνάς', 'شارع الملك']
+_AMENITIES = [('amenity', 'restaurant'), ('amenity', 'cafe'), ('amenity', 'school'), ('amenity', 'pharmacy'),
+              ('shop', 'bakery'), ('shop', 'supermarket'), ('tourism', 'hotel')]
+
+
+def generate(scenario, scale, pbf_path, *, seed=0):
+    """
+    Writes the data of `scenario` covering `scale` x `scale` cells to `pbf_path`.
+
+    Returns:
+        the extent of the data as `(min_lon, min_lat, max_lon, max_lat)`
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError('unknown scenario {}, use one of {}'.format(scenario, ', '.join(SCENARIOS)))
+    data = _OsmData()
+    grid = _Grid(*_ORIGINS[scenario])
+    _FILLERS[scenario](data, grid, scale, random.Random('{}-{}-{}'.format(scenario, scale, seed)))
+    data.write(pbf_path)
+    return grid.extent(scale)
+
+
+class _Grid:
+    def __init__(self, origin_lon, origin_lat):
+        self._origin_lon = origin_lon
+        self._origin_lat = origin_lat
+
+    def location(self, x, y):
+        """x and y in cells, fractions within the cell allowed"""
+        return round(self._origin_lon + x * CELL_DEGREES, 7), round(self._origin_lat + y * CELL_DEGREES, 7)
+
+    def extent(self, scale):
+        return self.location(0, 0) + self.location(scale, scale)
+
+
+class _OsmData:
+    """
+    Collects the elements, numbered in the order they're added, to write them sorted by type and id like the
+    planet is.
+    """
+
+    def __init__(self):
+        self._nodes, self._ways, self._relations = [], [], []
+
+    def node(self, location, **tags):
+        self._nodes.append(osmium.osm.mutable.Node(
+            id=len(self._nodes) + 1, location=location, tags=tags, **_attributes()
+        ))
+        return len(self._nodes)
+
+    def way(self, node_ids, **tags):
+        self._ways.append(osmium.osm.mutable.Way(
+            id=len(self._ways) + 1, nodes=list(node_ids), tags=tags, **_attributes()
+        ))
+        return len(self._ways)
+
+    def line(self, locations, **tags):
+        """a way along `locations`"""
+        return self.way([self.node(location) for location in locations], **tags)
+
+    def ring(self, locations, **tags):
+        """a closed way along `locations`"""
+        node_ids = [self.node(location) for location in locations]
+        return self.way(node_ids + node_ids[:1], **tags)
+
+    def multipolygon(self, outer_way_id, inner_way_ids, **tags):
+        members = [('w', outer_way_id, 'outer')] + [('w', way_id, 'inner') for way_id in inner_way_ids]
+        self._relations.append(osmium.osm.mutable.Relation(
+            id=len(self._relations) + 1, members=members, tags=dict(tags, type='multipolygon'), **_attributes()
+        ))
+
+    def write(self, pbf_path):
+        writer = osmium.SimpleWriter(pbf_path)
+        try:
+            for node in self._nodes:
+                writer.add_node(node)
+            for way in self._ways:
+                writer.add_way(way)
+            for relation in self._relations:
+                writer.add_relation(relation)
+        finally:
+            writer.close()
+
+
+def _attributes():
+    return dict(version=1, changeset=1, uid=1, user='osmaxx', timestamp=_TIMESTAMP)
+
+
+def _rectangle(grid, x, y, width, height):
+    return [grid.location(x, y), grid.location(x + width, y), grid.location(x + width, y + height),
+            grid.location(x, y + height)]
+
+
+def _street_grid(data, grid, scale, rnd, *, every, x_range=None):
+    """
+    Streets along every `every`th line of the grid, those along every fifth line of them being primary roads.
+    """
+    x_range = x_range or range(0, scale + 1, every)
+    crossings = {
+        (x, y): data.node(grid.location(x, y))
+        for x in x_range for y in range(0, scale + 1, every)
+    }
+    columns = sorted({x for x, _ in crossings})
+    rows = sorted({y for _, y in crossings})
+    for index, x in enumerate(columns):
+        data.way([crossings[x, y] for y in rows], **_street_tags(index, rnd))
+    for index, y in enumerate(rows):
+        data.way([crossings[x, y] for x in columns], **_street_tags(index, rnd))
+
+
+def _street_tags(index, rnd):
+    return {
+        'highway': 'primary' if index % 5 == 0 else 'residential',
+        'name': '{} {}'.format(rnd.choice(_NAMES), index),
+        'maxspeed': '50' if index % 5 == 0 else '30',
+        'surface': 'asphalt',
+    }
+
+
+def _buildings(data, grid, x, y, rnd, *, per_side):
+    """`per_side` x `per_side` buildings within the cell at `x`, `y`, set back from the streets"""
+    lot = 1 / per_side
+    for i in range(per_side):
+        for j in range(per_side):
+            tags = {
+                'building': rnd.choice(['yes', 'apartments', 'commercial', 'house']),
+                'building:levels': str(rnd.randint(1, 8)),
+                'addr:street': rnd.choice(_NAMES),
+                'addr:housenumber': str(rnd.randint(1, 200)),
+            }
+            data.ring(_rectangle(grid, x + (i + 0.15) * lot, y + (j + 0.15) * lot, 0.7 * lot, 0.7 * lot), **tags)
+
+
+def _points_of_interest(data, grid, x, y, rnd, *, count):
+    for _ in range(count):
+        key, value = rnd.choice(_AMENITIES)
+        data.node(grid.location(x + rnd.random(), y + rnd.random()), **{
+            key: value, 'name': '{} {}'.format(rnd.choice(_NAMES), rnd.randint(1, 99)),
+            'opening_hours': 'Mo-Fr 08:00-18:00',
+        })
+
+
+def _dense_urban(data, grid, scale, rnd):
+    _street_grid(data, grid, scale, rnd, every=1)
+    for x in range(scale):
+        for y in range(scale):
+            if rnd.random() < 0.1:
+                park = data.ring(_rectangle(grid, x + 0.05, y + 0.05, 0.9, 0.9))
+                pond = data.ring(_rectangle(grid, x + 0.4, y + 0.4, 0.2, 0.2))
+                data.multipolygon(park, [pond], leisure='park', name='Park')
+                for _ in range(10):
+                    data.node(grid.location(x + rnd.random(), y + rnd.random()), natural='tree')
+                continue
+            _buildings(data, grid, x, y, rnd, per_side=2)
+            _points_of_interest(data, grid, x, y, rnd, count=rnd.randint(0, 3))
+            data.node(grid.location(x, y + 0.5), highway='bus_stop', name='{} {}'.format(rnd.choice(_NAMES), y))
+
+
+def _rural(data, grid, scale, rnd):
+    _street_grid(data, grid, scale, rnd, every=8)
+    for x in range(scale):
+        for y in range(scale):
+            if x % 8 == 0 or y % 8 == 0:
+                continue
+            if rnd.random() < 0.2:
+                forest = data.ring(_rectangle(grid, x, y, 1, 1))
+                clearing = data.ring(_rectangle(grid, x + 0.3, y + 0.3, 0.4, 0.4))
+                data.multipolygon(forest, [clearing], landuse='forest', leaf_type='mixed')
+            else:
+                data.ring(_rectangle(grid, x, y, 1, 1), landuse=rnd.choice(['farmland', 'meadow', 'orchard']))
+            if rnd.random() < 0.05:
+                _buildings(data, grid, x, y, rnd, per_side=1)
+    for x in range(4, scale, 10):
+        for y in range(4, scale, 10):
+            data.node(grid.location(x, y), place='village', name='{} {}-{}'.format(rnd.choice(_NAMES), x, y))
+            _buildings(data, grid, x, y, rnd, per_side=3)
+    for x in range(3, scale, 8):
+        # meandering northwards
+        stream = [grid.location(x + 0.3 * math.sin(y / 2), y) for y in range(scale + 1)]
+        data.line(stream, waterway='stream', name='{} {}'.format(rnd.choice(_NAMES), x))
+
+
+def _coastal(data, grid, scale, rnd):
+    """the land in the west, the sea in the east, the coastline meandering northwards in between"""
+    coast_x = [scale / 2 + scale / 10 * math.sin(y / 3) for y in range(scale + 1)]
+    land_columns = range(0, int(min(coast_x)))
+    _street_grid(data, grid, scale, rnd, every=2, x_range=range(0, int(min(coast_x)) - 1, 2))
+    for x in land_columns:
+        for y in range(scale):
+            if rnd.random() < 0.5:
+                _buildings(data, grid, x, y, rnd, per_side=1)
+                _points_of_interest(data, grid, x, y, rnd, count=rnd.randint(0, 1))
+    # the land to the left of the coastline's direction
+    data.line([grid.location(x, y) for y, x in enumerate(coast_x)], natural='coastline')
+    for y in range(0, scale, 4):
+        beach_x = coast_x[y] - 0.3
+        data.ring(_rectangle(grid, beach_x, y, 0.25, 1), natural='beach', surface='sand')
+        data.line([grid.location(coast_x[y] - 0.1, y + 0.5), grid.location(coast_x[y] + 0.5, y + 0.5)], man_made='pier')
+    harbour_y = scale // 2
+    data.ring(_rectangle(grid, coast_x[harbour_y] - 1, harbour_y, 1, 1), landuse='harbour', name='Porto')
+    ferry = [grid.location(coast_x[harbour_y] + 0.5, harbour_y + 0.5), grid.location(scale, scale)]
+    data.line(ferry, route='ferry', name='{} ferry'.format(rnd.choice(_NAMES)))
+    if len(land_columns) > 4:
+        lake = data.ring(_rectangle(grid, 1, 1, 3, 3))
+        island = data.ring(_rectangle(grid, 2, 2, 1, 1))
+        data.multipolygon(lake, [island], natural='water', water='lake', name='Lago')
+
+
+_FILLERS = {
+    DENSE_URBAN: _dense_urban,
+    RURAL: _rural,
+    COASTAL: _coastal,
+}
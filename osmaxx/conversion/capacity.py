@@ -0,0 +1,176 @@
+"""
+The work queued and running at the conversion service, in estimated worker-seconds, for scaling the workers.
+
+A job's duration is estimated from the size of its extract, by a linear regression of the durations of the jobs of
+the same format converted recently - much like `size_estimator` estimates the size of the result.
+"""
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from osmaxx.conversion import metrics, status
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
+from osmaxx.conversion.converters.converter_gis.tuning_profiles import size_class_for
+from osmaxx.conversion.models import Job, PregeneratedExport
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SIZE_CLASS_UNKNOWN = 'unknown'
+# a regression needs jobs of at least this many different sizes
+MIN_DISTINCT_SIZES = 4
+
+
+class DurationEstimator:
+    def __init__(self, durations_by_format, *, default_seconds):
+        """
+        Args:
+            durations_by_format: `{out_format: [(estimated_pbf_size, duration_seconds), ...]}` of converted jobs
+            default_seconds: the estimate for formats without enough converted jobs
+        """
+        self._default_seconds = default_seconds
+        all_durations = [duration for durations in durations_by_format.values() for duration in durations]
+        self._fallback = _fit(all_durations)
+        self._fits = {out_format: _fit(durations) for out_format, durations in durations_by_format.items()}
+
+    @classmethod
+    def from_history(cls):
+        history_length = CONVERSION_SETTINGS['CAPACITY_DURATION_HISTORY_JOBS']
+        durations_by_format = defaultdict(list)
+        converted_jobs = Job.objects.filter(
+            status=status.FINISHED, estimated_pbf_size__isnull=False, extraction_duration__isnull=False,
+        ).order_by('-id').values_list('parametrization__out_format', 'estimated_pbf_size', 'extraction_duration')
+        for out_format, estimated_pbf_size, extraction_duration in converted_jobs[:history_length]:
+            durations_by_format[out_format].append((estimated_pbf_size, extraction_duration.total_seconds()))
+        return cls(durations_by_format, default_seconds=CONVERSION_SETTINGS['CAPACITY_DEFAULT_JOB_SECONDS'])
+
+    def seconds(self, out_format, estimated_pbf_size):
+        fit = self._fits.get(out_format) or self._fallback
+        if fit is None:
+            return self._default_seconds
+        return fit(estimated_pbf_size)
+
+
+def _fit(durations):
+    """
+    Returns:
+        a function estimating the duration of a job from its `estimated_pbf_size`, `None` if there are too few
+        durations to fit one
+    """
+    import scipy.stats
+    if len({size for size, _ in durations}) < MIN_DISTINCT_SIZES:
+        return None
+    sizes, seconds = zip(*durations)
+    regression = scipy.stats.linregress(x=sizes, y=seconds)
+    median_seconds = statistics.median(seconds)
+    # an extract is never converted faster than the fastest one was, whatever the intercept says
+    fastest = min(seconds)
+
+    def estimate(estimated_pbf_size):
+        if estimated_pbf_size is None:
+            return median_seconds
+        return max(estimated_pbf_size * regression.slope + regression.intercept, fastest)
+    return estimate
+
+
+def backlog(estimator=None):
+    """
+    Returns:
+        `{queue_name: {state: {size_class: {'jobs': ..., 'worker_seconds': ...}}}}` of the queued and running jobs,
+        running ones counting with the work estimated to be left
+    """
+    estimator = estimator or DurationEstimator.from_history()
+    now = timezone.now()
+    # every queue is reported, even if empty
+    report = {queue_name: _empty_queue() for queue_name in settings.RQ_QUEUE_NAMES}
+    for queue_name, out_format, job_status, estimated_pbf_size, started_at in _active_work():
+        worker_seconds = estimator.seconds(out_format, estimated_pbf_size)
+        state = RUNNING if job_status == status.STARTED else QUEUED
+        if state == RUNNING and started_at is not None:
+            worker_seconds = max(worker_seconds - (now - started_at).total_seconds(), 0)
+        size_class = size_class_for(estimated_pbf_size) if estimated_pbf_size is not None else SIZE_CLASS_UNKNOWN
+        work = report.setdefault(queue_name, _empty_queue())
+        work[state][size_class]['jobs'] += 1
+        work[state][size_class]['worker_seconds'] += worker_seconds
+    return {
+        queue_name: {state: dict(by_size_class) for state, by_size_class in work.items()}
+        for queue_name, work in report.items()
+    }
+
+
+def drain_rate():
+    """
+    Returns:
+        `{queue_name: {'jobs_per_hour': ..., 'worker_seconds_per_second': ...}}` of the jobs finished within
+        `CAPACITY_DRAIN_RATE_WINDOW`; worker-seconds per second is about the number of workers kept busy
+    """
+    window = CONVERSION_SETTINGS['CAPACITY_DRAIN_RATE_WINDOW']
+    finished = Job.objects.filter(status=status.FINISHED, conversion_finished_at__gte=timezone.now() - window)\
+        .values('queue_name').annotate(jobs=Count('id'), duration=Sum('extraction_duration'))
+    rates = {
+        queue_name: {'jobs_per_hour': 0.0, 'worker_seconds_per_second': 0.0} for queue_name in settings.RQ_QUEUE_NAMES
+    }
+    for row in finished:
+        rates[row['queue_name']] = {
+            'jobs_per_hour': row['jobs'] * 3600 / window.total_seconds(),
+            'worker_seconds_per_second':
+                row['duration'].total_seconds() / window.total_seconds() if row['duration'] else 0.0,
+        }
+    return rates
+
+
+def report():
+    drain_rates = drain_rate()
+    return {
+        'drain_rate_window_seconds': CONVERSION_SETTINGS['CAPACITY_DRAIN_RATE_WINDOW'].total_seconds(),
+        'queues': {
+            queue_name: dict(work, drain_rate=drain_rates.get(queue_name))
+            for queue_name, work in backlog().items()
+        },
+    }
+
+
+def publish_metrics():
+    """
+    Records the backlog and the drain rate as gauges, see metrics.py.
+    """
+    work_by_queue = backlog()
+    for measure, metric_name in [('jobs', 'osmaxx_backlog_jobs'), ('worker_seconds', 'osmaxx_backlog_worker_seconds')]:
+        metrics.set_gauge(metric_name, [
+            ({'queue': queue_name, 'state': state, 'size_class': size_class}, work[measure])
+            for queue_name, by_state in work_by_queue.items()
+            for state, by_size_class in by_state.items()
+            for size_class, work in by_size_class.items()
+        ])
+    drain_rates = drain_rate()
+    for rate, metric_name in [
+        ('jobs_per_hour', 'osmaxx_drain_rate_jobs_per_hour'),
+        ('worker_seconds_per_second', 'osmaxx_drain_rate_worker_seconds_per_second'),
+    ]:
+        metrics.set_gauge(metric_name, [({'queue': queue_name}, rates[rate]) for queue_name, rates in drain_rates.items()])
+
+
+def _active_work():
+    """
+    Yields:
+        `(queue_name, out_format, status, estimated_pbf_size, started_at)` of the jobs and pre-generated exports
+        not done yet
+    """
+    yield from Job.objects.exclude(status__in=status.FINAL_STATUSES).exclude(rq_job_id__isnull=True).values_list(
+        'queue_name', 'parametrization__out_format', 'status', 'estimated_pbf_size', 'conversion_started_at',
+    )
+    pregeneration_queue_name = CONVERSION_SETTINGS['PREGENERATION_QUEUE_NAME']
+    for out_format, job_status, estimated_pbf_size, started_at in PregeneratedExport.objects.exclude(
+            status__in=status.FINAL_STATUSES).exclude(rq_job_id__isnull=True).values_list(
+            'parametrization__out_format', 'status', 'estimated_pbf_size', 'conversion_started_at'):
+        yield pregeneration_queue_name, out_format, job_status, estimated_pbf_size, started_at
+
+
+def _empty_queue():
+    return {QUEUED: defaultdict(_empty_work), RUNNING: defaultdict(_empty_work)}
+
+
+def _empty_work():
+    return {'jobs': 0, 'worker_seconds': 0.0}
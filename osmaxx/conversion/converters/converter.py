@@ -1,7 +1,11 @@
-from osmaxx.conversion import output_format
+from rq import get_current_job
+
+from osmaxx.conversion import output_format, status
 from osmaxx.conversion.converters import converter_garmin
 from osmaxx.conversion.converters import converter_gis
 from osmaxx.conversion.converters import converter_pbf
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
+from osmaxx.conversion.job_dispatcher import cancellation, events, heartbeats, polygon_files
 from osmaxx.conversion.job_dispatcher.rq_dispatcher import rq_enqueue_with_settings
 from osmaxx.utils.frozendict import frozendict
 
@@ -18,9 +22,14 @@ _format_converter = frozendict(
 
 
 def convert(
-        *, conversion_format, area_name, osmosis_polygon_file_string, output_zip_file_path, filename_prefix,
-        out_srs, detail_level, use_worker=False, queue_name='default'
+        *, conversion_format, area_name, output_zip_file_path, filename_prefix, out_srs, detail_level,
+        osmosis_polygon_file_string=None, osmosis_polygon_file_path=None, use_worker=False, queue_name='default'
 ):
+    """
+    Exports the area given either as `osmosis_polygon_file_string` or as the path of a file holding it.
+    """
+    if osmosis_polygon_file_path is not None:
+        osmosis_polygon_file_string = polygon_files.load(osmosis_polygon_file_path)
     params = dict(
         conversion_format=conversion_format,
         area_name=area_name,
@@ -33,6 +42,8 @@ def convert(
 
     # TODO: find a cleaner way for this recursion magic!
     if use_worker:
+        # the polygon is passed by reference, it would make up most of the job kept in Redis otherwise
+        params['osmosis_polygon_file_path'] = polygon_files.store(params.pop('osmosis_polygon_file_string'))
         return rq_enqueue_with_settings(
             convert,
             use_worker=False,
@@ -40,5 +51,25 @@ def convert(
             **params
         ).id
     converter = _format_converter[conversion_format]
-    converter.perform_export(**params)
+    job = get_current_job()
+    if job is None:
+        converter.perform_export(**params)
+        return None
+    heartbeat = heartbeats.Heartbeat(
+        job.connection, rq_job_id=job.id, interval_seconds=CONVERSION_SETTINGS['HEARTBEAT_INTERVAL_SECONDS'],
+        conversion_format=conversion_format,
+    )
+    events.publish(job.connection, rq_job_id=job.id, status=status.STARTED)
+    try:
+        with heartbeat:
+            converter.perform_export(**params)
+            heartbeat.record_output_size(output_zip_file_path)
+    except Exception as e:
+        events.publish(job.connection, rq_job_id=job.id, status=status.FAILED)
+        if cancellation.is_cancelled():
+            # whatever was interrupted by the cancellation failed merely as a consequence of it
+            raise cancellation.JobCancelled() from e
+        raise
+    # the result and the job's meta data are complete by now, even though RQ hasn't marked the job finished yet
+    events.publish(job.connection, rq_job_id=job.id, status=status.FINISHED)
     return None
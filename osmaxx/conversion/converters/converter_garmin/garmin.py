@@ -6,9 +6,20 @@ from django.utils import timezone
 from rq import get_current_job
 
 from osmaxx.conversion._settings import CONVERSION_SETTINGS, odb_license, copying_notice, creative_commons_license
+from osmaxx.conversion.converters.converter_garmin.split_cache import SplitCache
+from osmaxx.conversion.converters.converter_garmin.tile_cache import (
+    TileCache, img_path, read_tiles, write_tiles,
+)
+from osmaxx.conversion.converters.converter_garmin.tiled_archive import (
+    TiledArchive, degrees_to_map_units, read_areas_extent, union_extent,
+)
 from osmaxx.conversion.converters.converter_pbf.to_pbf import cut_pbf_along_polyfile
 
-from osmaxx.conversion.converters.utils import zip_folders_relative, recursive_getsize, logged_check_call
+from osmaxx.conversion.converters.utils import (
+    zip_folders_relative, recursive_getsize, logged_check_call, file_fingerprint,
+)
+from osmaxx.conversion.job_dispatcher import heartbeats
+from osmaxx.utils import polyfile_helpers
 
 
 def perform_export(*, output_zip_file_path, area_name, osmosis_polygon_file_string, **__):
@@ -60,20 +71,51 @@ class Garmin:
         _splitter_path = os.path.abspath(os.path.join(_path_to_commandline_utils, 'splitter', 'splitter.jar'))
         _pbf_file_path = os.path.join('/tmp', 'pbf_cutted.pbf')
         cut_pbf_along_polyfile(self._area_polyfile_string, _pbf_file_path)
+        heartbeats.stage('split')
+
+        split_cache = self._split_cache()
+        if split_cache is None:
+            geonames_file_path, cached_areas_file_path = _path_to_geonames_zip, None
+        else:
+            geonames_file_path = split_cache.geonames_file_path(
+                polyfile_helpers.parse_poly_string(self._area_polyfile_string).extent
+            )
+            cached_areas_file_path = split_cache.areas_file_path
+        split_options = []
+        if cached_areas_file_path is not None:
+            split_options.append('--split-file={0}'.format(cached_areas_file_path))
+
         logged_check_call([
             'java',
             memory_option,
             '-jar', _splitter_path,
             '--output-dir={0}'.format(workdir),
             '--description={0}'.format(self._map_description),
-            '--geonames-file={0}'.format(_path_to_geonames_zip),
+            '--geonames-file={0}'.format(geonames_file_path),
             '--polygon-file={}'.format(self._polyfile_path),
+        ] + split_options + [
             _pbf_file_path,
         ])
+        if split_cache is not None and cached_areas_file_path is None:
+            split_cache.store_areas(workdir)
         config_file_path = os.path.join(workdir, 'template.args')
         return config_file_path
 
+    def _split_cache(self):
+        split_cache_dir = CONVERSION_SETTINGS['GARMIN_SPLIT_CACHE_DIRECTORY']
+        if split_cache_dir is None:
+            return None
+        split_cache = SplitCache(
+            split_cache_dir,
+            polyfile_string=self._area_polyfile_string,
+            geonames_file_path=_path_to_geonames_zip,
+            max_age=CONVERSION_SETTINGS['GARMIN_SPLIT_CACHE_MAX_AGE'],
+        )
+        split_cache.delete_expired()
+        return split_cache
+
     def _produce_garmin(self, config_file_path, out_dir):
+        heartbeats.stage('mkgmap')
         out_dir = os.path.join(out_dir, 'garmin')  # hack to get a subdirectory in the zipfile.
         os.makedirs(out_dir, exist_ok=True)
 
@@ -84,16 +126,66 @@ class Garmin:
         _mkgmap_path = os.path.abspath(os.path.join(_path_to_commandline_utils, 'mkgmap', 'mkgmap.jar'))
         mkg_map_command = ['java', '-jar', _mkgmap_path]
         output_dir = ['--output-dir={0}'.format(out_dir)]
-        config = [
-            '--bounds={0}'.format(_path_to_bounds_zip),
-            '--precomp-sea={0}'.format(_path_to_sea_zip),
-            '--read-config={0}'.format(config_file_path),
-            '--gmapsupp',
+        bounds_path, sea_path = self._sea_and_bounds(os.path.dirname(config_file_path))
+        compile_options = [
+            '--bounds={0}'.format(bounds_path),
+            '--precomp-sea={0}'.format(sea_path),
             '--route',
+            '--max-jobs={0}'.format(CONVERSION_SETTINGS['GARMIN_MKGMAP_MAX_JOBS']),
         ]
 
-        logged_check_call(mkg_map_command + output_dir + config)
+        tile_cache_dir = CONVERSION_SETTINGS['GARMIN_TILE_CACHE_DIRECTORY']
+        if tile_cache_dir is None:
+            config = compile_options + ['--read-config={0}'.format(config_file_path), '--gmapsupp']
+            logged_check_call(mkg_map_command + output_dir + config)
+        else:
+            tile_cache = TileCache(
+                tile_cache_dir,
+                compile_options=[
+                    # the worker count doesn't affect the result and the sea and bounds are fingerprinted below
+                    option for option in compile_options
+                    if not option.startswith(('--max-jobs', '--bounds', '--precomp-sea'))
+                ] + [file_fingerprint(path) for path in [_mkgmap_path, _path_to_bounds_zip, _path_to_sea_zip]],
+                max_bytes=CONVERSION_SETTINGS['GARMIN_TILE_CACHE_MAX_BYTES'],
+            )
+            tiles = tile_cache.rename(read_tiles(config_file_path))
+            tiles_to_compile = [tile for tile in tiles if not tile_cache.fetch(tile, out_dir)]
+            if tiles_to_compile:
+                compile_config_file_path = write_tiles(
+                    tiles_to_compile, os.path.join(os.path.dirname(config_file_path), 'uncached_tiles.args')
+                )
+                config = compile_options + ['--read-config={0}'.format(compile_config_file_path)]
+                logged_check_call(mkg_map_command + output_dir + config)
+                for tile in tiles_to_compile:
+                    tile_cache.store(tile, out_dir)
+                tile_cache.evict()
+            # combine the compiled tiles, just like the single mkgmap run above would, named after the area as the
+            # cached tiles aren't
+            combine_options = ['--gmapsupp', '--description={0}'.format(self._map_description)]
+            tile_img_paths = [img_path(tile, out_dir) for tile in tiles]
+            logged_check_call(mkg_map_command + output_dir + combine_options + tile_img_paths)
         self._unzipped_result_size = recursive_getsize(out_dir)
 
+    def _sea_and_bounds(self, split_dir):
+        """
+        Returns:
+            paths of the bounds and the precompiled sea to pass to mkgmap; subsets for the extract, if enabled
+        """
+        index_dir = CONVERSION_SETTINGS['GARMIN_ADDITIONAL_DATA_INDEX_DIRECTORY']
+        if index_dir is None:
+            return _path_to_bounds_zip, _path_to_sea_zip
+        extent = degrees_to_map_units(polyfile_helpers.parse_poly_string(self._area_polyfile_string).extent)
+        areas_file_path = os.path.join(split_dir, 'areas.list')
+        if os.path.exists(areas_file_path):
+            # splitter's tiles may reach beyond the polygon
+            areas_extent = read_areas_extent(areas_file_path)
+            if areas_extent is not None:
+                extent = union_extent(extent, areas_extent)
+        return tuple(
+            TiledArchive(archive_path, index_dir).extract_subset(extent, os.path.join(split_dir, subset_dir_name))
+            for archive_path, subset_dir_name in [(_path_to_bounds_zip, 'bounds'), (_path_to_sea_zip, 'sea')]
+        )
+
     def _create_zip(self, data_dir):
+        heartbeats.stage('zip')
         zip_folders_relative([data_dir], self._resulting_zip_file_path)
@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import os
+import shutil
+import time
+
+from osmaxx.conversion.converters.utils import atomic_write, file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+AREAS_FILE_NAME = 'areas.list'
+GEONAMES_FILE_NAME = 'geonames.txt'
+
+# generous, as splitter's tiles reach beyond the polygon and are named after cities inside of them
+_GEONAMES_MARGIN_DEGREES = 1.0
+_GEONAMES_LATITUDE_COLUMN = 4
+_GEONAMES_LONGITUDE_COLUMN = 5
+
+
+class SplitCache:
+    """
+    Keeps splitter's results for an extract polygon, across planet versions.
+
+    The areas splitter computes in its density analysis (`areas.list`) depend on the polygon and on the density of
+    the data within it. As the density hardly changes between the (hourly) planet versions, the areas are computed
+    once and passed to the runs of the following `max_age` using `--split-file`, whichever planet version they cut
+    the extract from. Along with them, the geonames (used by splitter to name the tiles) within reach of the polygon
+    are kept, so splitter doesn't have to read those of the whole world every time.
+
+    Entries not used for `max_age` are deleted by `delete_expired`. The cache directory can be shared between
+    workers.
+    """
+
+    def __init__(self, cache_dir, *, polyfile_string, geonames_file_path, max_age):
+        self._cache_dir = cache_dir
+        self._geonames_file_path = geonames_file_path
+        self._max_age = max_age
+        sha256 = hashlib.sha256()
+        for part in [polyfile_string, file_fingerprint(geonames_file_path)]:
+            sha256.update(part.encode('utf-8'))
+            sha256.update(b'\0')
+        self._entry_dir = os.path.join(cache_dir, sha256.hexdigest())
+
+    @property
+    def areas_file_path(self):
+        """
+        Path of the cached areas, `None` if there are none yet or they're older than `max_age`.
+        """
+        areas_file_path = os.path.join(self._entry_dir, AREAS_FILE_NAME)
+        try:
+            computed_at = os.path.getmtime(areas_file_path)
+        except FileNotFoundError:
+            return None
+        if computed_at < self._oldest_kept():
+            return None
+        logger.info('reusing cached splitter areas %s', areas_file_path)
+        # marks the entry as used recently, see `delete_expired`
+        os.utime(self._entry_dir)
+        return areas_file_path
+
+    def store_areas(self, split_dir):
+        """
+        Adds the areas splitter wrote to `split_dir` to the cache.
+        """
+        os.makedirs(self._entry_dir, exist_ok=True)
+        areas_file_path = os.path.join(self._entry_dir, AREAS_FILE_NAME)
+        with atomic_write(areas_file_path) as cached_file, \
+                open(os.path.join(split_dir, AREAS_FILE_NAME), 'rb') as areas:
+            shutil.copyfileobj(areas, cached_file)
+
+    def delete_expired(self):
+        """
+        Deletes the entries, of any polygon, not used for `max_age`.
+        """
+        if not os.path.isdir(self._cache_dir):
+            return
+        oldest_kept = self._oldest_kept()
+        for entry in os.scandir(self._cache_dir):
+            if entry.is_dir() and entry.stat().st_mtime < oldest_kept:
+                shutil.rmtree(entry.path, ignore_errors=True)  # deleted by another worker meanwhile
+
+    def _oldest_kept(self):
+        return time.time() - self._max_age.total_seconds()
+
+    def geonames_file_path(self, extent):
+        """
+        Path of a geonames file limited to the surroundings of `extent`, created if not cached yet.
+
+        Args:
+            extent: `(min_lon, min_lat, max_lon, max_lat)` of the extract polygon
+        """
+        geonames_file_path = os.path.join(self._entry_dir, GEONAMES_FILE_NAME)
+        if not os.path.exists(geonames_file_path):
+            os.makedirs(self._entry_dir, exist_ok=True)
+            with atomic_write(geonames_file_path) as limited_geonames:
+                _write_geonames_within(self._geonames_file_path, limited_geonames, extent)
+        return geonames_file_path
+
+
+def _write_geonames_within(geonames_file_path, out_file, extent):
+    min_lon, min_lat, max_lon, max_lat = extent
+    min_lon, min_lat = min_lon - _GEONAMES_MARGIN_DEGREES, min_lat - _GEONAMES_MARGIN_DEGREES
+    max_lon, max_lat = max_lon + _GEONAMES_MARGIN_DEGREES, max_lat + _GEONAMES_MARGIN_DEGREES
+    with open(geonames_file_path, 'rb') as geonames:
+        for line in geonames:
+            columns = line.split(b'\t')
+            try:
+                latitude = float(columns[_GEONAMES_LATITUDE_COLUMN])
+                longitude = float(columns[_GEONAMES_LONGITUDE_COLUMN])
+            except (IndexError, ValueError):
+                continue
+            if min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon:
+                out_file.write(line)
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import shutil
+from collections import namedtuple
+
+from osmaxx.conversion.converters.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+Tile = namedtuple('Tile', ['mapname', 'description', 'input_file'])
+
+_READ_BUFFER_SIZE = 1024 * 1024
+# splitter numbers the tiles from 63240001 on, the cached tiles are named within [10000000, 60000000)
+_FIRST_MAPNAME = 10000000
+_MAPNAMES = 50000000
+_CACHED_TILE_DESCRIPTION = 'OSMaxx'
+
+
+def read_tiles(config_file_path):
+    """
+    Reads the tiles listed in a `template.args` file as written by splitter.
+
+    Returns:
+        list of `Tile`s, with `input_file` made absolute
+    """
+    config_dir = os.path.dirname(os.path.abspath(config_file_path))
+    tiles = []
+    tile = {}
+    with open(config_file_path, 'r') as config_file:
+        for line in config_file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            key, _, value = line.partition(':')
+            key, value = key.strip(), value.strip()
+            if key == 'mapname':
+                tile = dict(mapname=value, description='')
+            elif key == 'description':
+                tile['description'] = value
+            elif key == 'input-file':
+                tiles.append(Tile(input_file=os.path.join(config_dir, value), **tile))
+    return tiles
+
+
+def write_tiles(tiles, config_file_path):
+    """
+    Writes the given tiles in the format of `template.args`, so they can be passed to mkgmap's `--read-config`.
+    """
+    with open(config_file_path, 'w') as config_file:
+        for tile in tiles:
+            config_file.write('mapname: {}\n'.format(tile.mapname))
+            config_file.write('description: {}\n'.format(tile.description))
+            config_file.write('input-file: {}\n\n'.format(tile.input_file))
+    return config_file_path
+
+
+class TileCache:
+    """
+    Keeps compiled Garmin tiles (`<mapname>.img`) across exports.
+
+    A tile is identified by the content of its splitter output (which includes its bounds) and the options it's
+    compiled with only, so exports of the same or an overlapping area reuse every tile that has been split
+    identically before, whatever splitter numbered it in either run. For the compiled tiles to be interchangeable,
+    the tiles are renamed after their content before being compiled (see `rename`).
+
+    The tiles used least recently are evicted once the cache exceeds `max_bytes`. The cache directory can be
+    shared between workers.
+    """
+
+    def __init__(self, cache_dir, compile_options, *, max_bytes=None):
+        """
+        Args:
+            cache_dir: directory the compiled tiles are kept in
+            compile_options: everything besides the tile itself affecting the compiled tile, e.g. mkgmap's
+                command line options and fingerprints of mkgmap and the files it reads
+            max_bytes: the size the cache is limited to by `evict`, unlimited if `None`
+        """
+        self._cache_dir = cache_dir
+        self._compile_options = compile_options
+        self._max_bytes = max_bytes
+        # keyed by the input file, as the tiles are renamed
+        self._keys = {}
+        self._cacheable = set()
+
+    def key(self, tile):
+        if tile.input_file not in self._keys:
+            self._keys[tile.input_file] = self._compute_key(tile)
+        return self._keys[tile.input_file]
+
+    def _compute_key(self, tile):
+        sha256 = hashlib.sha256()
+        for part in self._compile_options:
+            sha256.update(part.encode('utf-8'))
+            sha256.update(b'\0')
+        with open(tile.input_file, 'rb') as tile_input:
+            for chunk in iter(lambda: tile_input.read(_READ_BUFFER_SIZE), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def rename(self, tiles):
+        """
+        Names the tiles after their content, so their compiled tiles are the same in any export.
+
+        The names are taken from a range below the one splitter numbers the tiles in. A tile whose name is taken
+        already by another one of the export keeps its name and isn't cached.
+
+        Returns:
+            the renamed tiles, in the same order
+        """
+        renamed_tiles, mapnames = [], set()
+        for tile in tiles:
+            mapname = str(_FIRST_MAPNAME + int(self.key(tile), 16) % _MAPNAMES)
+            if mapname in mapnames:
+                logger.info('Garmin tile %s has the name of another tile, not caching it', tile.mapname)
+                renamed_tiles.append(tile)
+                continue
+            mapnames.add(mapname)
+            renamed_tile = tile._replace(mapname=mapname, description=_CACHED_TILE_DESCRIPTION)
+            self._cacheable.add(renamed_tile)
+            renamed_tiles.append(renamed_tile)
+        return renamed_tiles
+
+    def fetch(self, tile, out_dir):
+        """
+        Copies the cached, compiled tile to `out_dir`, if there is one.
+
+        Returns:
+            whether the tile was found in the cache
+        """
+        if tile not in self._cacheable:
+            return False
+        cached_path = self._cached_path(tile)
+        try:
+            shutil.copyfile(cached_path, img_path(tile, out_dir))
+            # marks the tile as used recently, see `evict`
+            os.utime(cached_path)
+        except FileNotFoundError:  # not cached (anymore)
+            return False
+        logger.info('reusing cached Garmin tile %s', tile.mapname)
+        return True
+
+    def store(self, tile, out_dir):
+        """
+        Adds the tile compiled to `out_dir` to the cache.
+        """
+        if tile not in self._cacheable:
+            return
+        os.makedirs(self._cache_dir, exist_ok=True)
+        with atomic_write(self._cached_path(tile)) as cached_file, open(img_path(tile, out_dir), 'rb') as img:
+            shutil.copyfileobj(img, cached_file)
+
+    def evict(self):
+        """
+        Deletes the tiles used least recently until the cache doesn't exceed `max_bytes` anymore.
+        """
+        if self._max_bytes is None or not os.path.isdir(self._cache_dir):
+            return
+        entries = [entry for entry in os.scandir(self._cache_dir) if entry.name.endswith('.img')]
+        stats = {entry.path: entry.stat() for entry in entries}
+        total_bytes = sum(stat.st_size for stat in stats.values())
+        for path in sorted(stats, key=lambda path: stats[path].st_mtime):
+            if total_bytes <= self._max_bytes:
+                return
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # evicted by another worker
+                pass
+            total_bytes -= stats[path].st_size
+
+    def _cached_path(self, tile):
+        return os.path.join(self._cache_dir, self.key(tile) + '.img')
+
+
+def img_path(tile, out_dir):
+    return os.path.join(out_dir, '{}.img'.format(tile.mapname))
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import zipfile
+from functools import reduce
+
+from osmaxx.conversion.converters.utils import atomic_write, file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Garmin map units, as used in the file names of the tiles
+MAP_UNITS_PER_DEGREE = 2 ** 24 / 360
+
+# e.g. `bounds_2150000_400000.bnd` or `sea_2162688_393216.pbf`, named after their south-west corner
+_TILE_NAME_PATTERN = re.compile(r'_(?P<lat>-?\d+)_(?P<lon>-?\d+)\.\w+$')
+# e.g. `63240001: 2068480,-57344 to 2201600,233472`, as written by splitter
+_AREA_PATTERN = re.compile(r'^\d+:\s*(-?\d+),(-?\d+)\s+to\s+(-?\d+),(-?\d+)')
+
+
+def degrees_to_map_units(extent):
+    """
+    Args:
+        extent: `(min_lon, min_lat, max_lon, max_lat)` in degrees
+
+    Returns:
+        the extent as `(min_lat, min_lon, max_lat, max_lon)` in map units
+    """
+    min_lon, min_lat, max_lon, max_lat = extent
+    return (
+        math.floor(min_lat * MAP_UNITS_PER_DEGREE), math.floor(min_lon * MAP_UNITS_PER_DEGREE),
+        math.ceil(max_lat * MAP_UNITS_PER_DEGREE), math.ceil(max_lon * MAP_UNITS_PER_DEGREE),
+    )
+
+
+def read_areas_extent(areas_file_path):
+    """
+    Returns:
+        the extent covered by all areas of splitter's `areas.list` as `(min_lat, min_lon, max_lat, max_lon)`
+        in map units, `None` if there are none
+    """
+    areas = []
+    with open(areas_file_path, 'r') as areas_file:
+        for line in areas_file:
+            match = _AREA_PATTERN.match(line.strip())
+            if match:
+                areas.append([int(coordinate) for coordinate in match.groups()])
+    if not areas:
+        return None
+    return union_extent(*areas)
+
+
+def union_extent(*extents):
+    min_lats, min_lons, max_lats, max_lons = zip(*extents)
+    return min(min_lats), min(min_lons), max(max_lats), max(max_lons)
+
+
+class TiledArchive:
+    """
+    A zip archive of equally sized tiles, like mkgmap's `bounds.zip` and `sea.zip`.
+
+    The tiles are listed in an index, built once per version of the archive, so the tiles needed
+    for an extract can be extracted without scanning the whole archive.
+    """
+
+    def __init__(self, archive_path, index_dir):
+        self._archive_path = archive_path
+        fingerprint = hashlib.sha256(file_fingerprint(archive_path).encode('utf-8')).hexdigest()
+        self._index_path = os.path.join(
+            index_dir, '{}-{}.json'.format(os.path.basename(archive_path), fingerprint)
+        )
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            if not os.path.exists(self._index_path):
+                os.makedirs(os.path.dirname(self._index_path), exist_ok=True)
+                with atomic_write(self._index_path, mode='w') as index_file:
+                    json.dump(self._build_index(), index_file)
+            with open(self._index_path, 'r') as index_file:
+                self._index = json.load(index_file)
+        return self._index
+
+    def _build_index(self):
+        logger.info('indexing tiles of %s', self._archive_path)
+        tiles, other_entries = [], []
+        with zipfile.ZipFile(self._archive_path) as archive:
+            for name in archive.namelist():
+                match = _TILE_NAME_PATTERN.search(name)
+                if match:
+                    tiles.append([name, int(match.group('lat')), int(match.group('lon'))])
+                elif not name.endswith('/'):
+                    other_entries.append(name)
+        # the tiles form a grid anchored at 0/0, so their size is the greatest common divisor of their positions
+        tile_size = reduce(math.gcd, (abs(coordinate) for _, lat, lon in tiles for coordinate in (lat, lon)), 0)
+        return dict(tile_size=tile_size, tiles=tiles, other_entries=other_entries)
+
+    def tiles_within(self, extent):
+        """
+        Args:
+            extent: `(min_lat, min_lon, max_lat, max_lon)` in map units
+
+        Returns:
+            names of the tiles intersecting the extent, grown by one tile on each side
+        """
+        min_lat, min_lon, max_lat, max_lon = extent
+        tile_size = self.index['tile_size']
+
+        def _is_needed(lat, lon):
+            # a tile covers [lat, lat + tile_size) x [lon, lon + tile_size)
+            return all([
+                min_lat - 2 * tile_size < lat <= max_lat + tile_size,
+                min_lon - 2 * tile_size < lon <= max_lon + tile_size,
+            ])
+        return [name for name, lat, lon in self.index['tiles'] if _is_needed(lat, lon)]
+
+    def extract_subset(self, extent, target_dir):
+        """
+        Extracts the tiles needed for the extent (see `tiles_within`) and all entries that aren't tiles,
+        e.g. the index of the precompiled sea, to `target_dir`, which mkgmap accepts in place of the archive.
+        """
+        entries = self.tiles_within(extent) + self.index['other_entries']
+        os.makedirs(target_dir, exist_ok=True)
+        with zipfile.ZipFile(self._archive_path) as archive:
+            for name in entries:
+                target_path = os.path.join(target_dir, os.path.basename(name))
+                with archive.open(name) as entry, open(target_path, 'wb') as target_file:
+                    shutil.copyfileobj(entry, target_file)
+        logger.info(
+            'extracted %s of %s entries of %s', len(entries), len(self.index['tiles']) + len(self.index['other_entries']),
+            self._archive_path,
+        )
+        return target_dir
@@ -1,3 +1,4 @@
 from .bootstrap import BootStrapper
+from .incremental import IncrementalBootStrapper
 
-__all__ = ['BootStrapper']
+__all__ = ['BootStrapper', 'IncrementalBootStrapper']
@@ -1,15 +1,24 @@
 import glob
+import logging
 import os
+from contextlib import contextmanager
 
 from memoize import mproperty
 
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
 from osmaxx.conversion.converters.converter_gis.detail_levels import DETAIL_LEVEL_ALL, DETAIL_LEVEL_TABLES
 from osmaxx.conversion.converters.converter_gis.helper.default_postgres import get_default_postgres_wrapper
 from osmaxx.conversion.converters.converter_gis.helper.osm_boundaries_importer import OSMBoundariesImporter
+from osmaxx.conversion.converters.converter_gis.helper.postgres_wrapper import libpq_options
+from osmaxx.conversion.converters.converter_gis.helper.transliteration_cache import TransliterationCache
+from osmaxx.conversion.converters.converter_gis.tuning_profiles import SIZE_CLASS_SMALL, TUNING_PROFILES, size_class_for
 from osmaxx.conversion.converters.converter_pbf.to_pbf import cut_pbf_along_polyfile
 from osmaxx.conversion.converters.utils import logged_check_call
+from osmaxx.conversion.job_dispatcher import cancellation, heartbeats
 from osmaxx.utils import polyfile_helpers
 
+logger = logging.getLogger(__name__)
+
 
 class BootStrapper:
     def __init__(self, area_polyfile_string, *, detail_level=DETAIL_LEVEL_ALL):
@@ -20,16 +29,45 @@ class BootStrapper:
         self._style_path = os.path.join(self._script_base_dir, 'styles', 'style.lua')
         self._pbf_file_path = os.path.join('/tmp', 'pbf_cutted.pbf')
         self._detail_level = DETAIL_LEVEL_TABLES[detail_level]
+        self._tuning_profile = TUNING_PROFILES[SIZE_CLASS_SMALL]
+        self.output_schema = 'view_osmaxx'
+
+    @property
+    def database_name(self):
+        """
+        The database the area is bootstrapped in, for the export to be extracted from.
+        """
+        return self._postgres.get_db_name()
+
+    @contextmanager
+    def database_in_use(self):
+        """
+        Keeps others from changing the database until the export has been extracted from it.
+
+        If the job is cancelled meanwhile, the queries running in the database are ended and the database is dropped.
+        """
+        try:
+            with cancellation.on_cancel(self._postgres.terminate_sessions):
+                yield
+        except Exception:
+            if cancellation.is_cancelled():
+                self._postgres.dispose()
+                self._postgres.drop_db()
+            raise
 
     def bootstrap(self):
         self._reset_database()
         cut_pbf_along_polyfile(self.area_polyfile_string, self._pbf_file_path)
+        self._apply_tuning_profile()
         self._import_boundaries()
         self._import_pbf()
         self._setup_db_functions()
         self._harmonize_database()
+        self._transliterate_names()
         self._filter_data()
         self._create_views()
+        if CONVERSION_SETTINGS['CLUSTER_OUTPUT_TABLES']:
+            self._cluster_output_tables()
 
     @mproperty
     def geom(self):
@@ -47,9 +85,17 @@ class BootStrapper:
         drop_and_recreate_script_folder = os.path.join(self._script_base_dir, 'sql', 'drop_and_recreate')
         self._execute_sql_scripts_in_folder(drop_and_recreate_script_folder)
 
+    def _apply_tuning_profile(self):
+        size_class = size_class_for(os.path.getsize(self._pbf_file_path))
+        logger.info('bootstrapping with the %s tuning profile', size_class)
+        self._tuning_profile = TUNING_PROFILES[size_class]
+        self._postgres.set_session_settings(self._tuning_profile['session_settings'])
+
     def _import_boundaries(self):
-        osm_importer = OSMBoundariesImporter()
-        osm_importer.load_area_specific_data(extent=self.geom)
+        self._boundaries_importer().load_area_specific_data(extent=self.geom)
+
+    def _boundaries_importer(self):
+        return OSMBoundariesImporter(database=self._postgres.get_db_name())
 
     def _setup_db_functions(self):
         self._execute_sql_scripts_in_folder(os.path.join(self._script_base_dir, 'sql', 'functions'))
@@ -58,7 +104,16 @@ class BootStrapper:
         cleanup_sql_path = os.path.join(self._script_base_dir, 'sql', 'sweeping_data.sql')
         self._postgres.execute_sql_file(cleanup_sql_path)
 
-    def _filter_data(self):
+    def _transliterate_names(self):
+        transliteration_cache = TransliterationCache(
+            self._postgres, CONVERSION_SETTINGS['TRANSLITERATION_CACHE_FILE_PATH'],
+            max_bytes=CONVERSION_SETTINGS['TRANSLITERATION_CACHE_MAX_BYTES'],
+        )
+        transliteration_cache.load()
+        self._postgres.execute_sql_file(os.path.join(self._script_base_dir, 'sql', 'transliterate_names.sql'))
+        transliteration_cache.store_new_entries()
+
+    def _filter_data(self, *, filter_function=lambda x: True):
         filter_sql_script_folders = [
             'address',
             'adminarea_boundary',
@@ -82,7 +137,7 @@ class BootStrapper:
         base_dir = os.path.join(self._script_base_dir, 'sql', 'filter')
         for script_folder in filter_sql_script_folders:
             script_folder_path = os.path.join(base_dir, script_folder)
-            self._execute_sql_scripts_in_folder(script_folder_path)
+            self._execute_sql_scripts_in_folder(script_folder_path, filter_function=filter_function)
 
     def _create_views(self):
         create_view_sql_script_folder = os.path.join(self._script_base_dir, 'sql', 'create_view')
@@ -95,6 +150,10 @@ class BootStrapper:
 
         self._execute_sql_scripts_in_folder(create_view_sql_script_folder, filter_function=filter_script_names)
 
+    def _cluster_output_tables(self):
+        self._postgres.execute_sql_file(os.path.join(self._script_base_dir, 'sql', 'cluster_output_tables.sql'))
+        self.output_schema = 'clustered_osmaxx'
+
     def _level_adapted_script_path(self, script_path):
         script_directory = os.path.dirname(script_path)
         script_name = os.path.basename(script_path)
@@ -112,12 +171,14 @@ class BootStrapper:
             self._postgres.execute_sql_file(script_path)
 
     def _import_pbf(self):
+        with heartbeats.throughput('import', lambda: os.path.getsize(self._pbf_file_path)):
+            self._run_osm2pgsql(['--create', '--input-reader', 'pbf'], self._pbf_file_path)
+
+    def _run_osm2pgsql(self, mode_options, input_file_path):
         db_name = self._postgres.get_db_name()
         postgres_user = self._postgres.get_user()
 
-        osm_2_pgsql_command = [
-            'osm2pgsql',
-            '--create',
+        osm_2_pgsql_command = ['osm2pgsql'] + mode_options + [
             '--extra-attributes',
             '--slim',
             '--latlon',
@@ -126,9 +187,13 @@ class BootStrapper:
             '--style', self._terminal_style_path,
             '--tag-transform-script', self._style_path,
             '--number-processes', '8',
+            '--cache', str(self._tuning_profile['osm2pgsql_cache_mb']),
+            '--unlogged',
             '--username', postgres_user,
             '--hstore-all',
-            '--input-reader', 'pbf',
-            self._pbf_file_path,
+            input_file_path,
         ]
-        logged_check_call(osm_2_pgsql_command)
+        osm_2_pgsql_environment = dict(
+            os.environ, PGOPTIONS=libpq_options(self._tuning_profile['session_settings']),
+        )
+        logged_check_call(osm_2_pgsql_command, env=osm_2_pgsql_environment)
@@ -0,0 +1,239 @@
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
+from osmaxx.conversion.converters.converter_gis.bootstrap.bootstrap import BootStrapper
+from osmaxx.conversion.converters.converter_gis.detail_levels import DETAIL_LEVEL_ALL
+from osmaxx.conversion.converters.converter_gis.helper.default_postgres import get_default_postgres_wrapper
+from osmaxx.conversion.converters.converter_gis.tuning_profiles import TUNING_PROFILES, size_class_for
+from osmaxx.conversion.converters.utils import logged_check_call
+
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME_PREFIX = 'osmaxx_incremental_'
+# the databases live in the worker's own database server, so they're locked by files local to the worker
+LOCK_DIRECTORY = os.path.join(tempfile.gettempdir(), 'osmaxx-incremental-exports')
+# osmupdate's exit code if there are no changes since the given timestamp
+OSMUPDATE_UP_TO_DATE = 21
+_DEFINES_TABLE_OR_VIEW = re.compile(r'CREATE\s+(UNLOGGED\s+)?TABLE|CREATE\s+(OR\s+REPLACE\s+)?VIEW', re.IGNORECASE)
+
+
+def database_name_for(area_polyfile_string):
+    return DATABASE_NAME_PREFIX + hashlib.sha256(area_polyfile_string.encode('utf-8')).hexdigest()[:16]
+
+
+class IncrementalBootStrapper(BootStrapper):
+    """
+    Keeps the database of an area between its exports.
+
+    The first export bootstraps it like `BootStrapper` does. Later exports apply the OSM changes since then
+    using `osm2pgsql --append` and only harmonize and filter the changed objects again, instead of cutting
+    the area from the planet and bootstrapping it from scratch.
+
+    At most `INCREMENTAL_EXPORT_DATABASES` databases are kept, those of the areas exported least recently
+    are dropped.
+    """
+
+    def __init__(self, area_polyfile_string, *, detail_level=DETAIL_LEVEL_ALL):
+        super().__init__(area_polyfile_string, detail_level=detail_level)
+        self._postgres = get_default_postgres_wrapper(db_name=database_name_for(area_polyfile_string))
+        self._change_file_path = os.path.join('/tmp', 'changes_since_last_export.osc.gz')
+        self._incremental_sql_dir = os.path.join(self._script_base_dir, 'sql', 'incremental')
+
+    @contextmanager
+    def database_in_use(self):
+        # a cancelled update leaves the database half updated, so it's dropped like that of a plain export
+        with _locked(self._postgres.get_db_name(), fcntl.LOCK_EX), super().database_in_use():
+            yield
+        drop_least_recently_used_databases(keep=CONVERSION_SETTINGS['INCREMENTAL_EXPORT_DATABASES'])
+
+    def bootstrap(self):
+        state = self._state()
+        if state is None:
+            logger.info('bootstrapping %s, to be updated incrementally', self._postgres.get_db_name())
+            super().bootstrap()
+            self._setup_state()
+            return
+        data_timestamp, size_class = state
+        self._tuning_profile = TUNING_PROFILES[size_class]
+        self._postgres.set_session_settings(self._tuning_profile['session_settings'])
+        new_data_timestamp = self._fetch_changes_since(data_timestamp)
+        if new_data_timestamp is not None:
+            logger.info('applying the changes from %s to %s', data_timestamp, new_data_timestamp)
+            self._apply_changes()
+            self._execute_incremental_sql('restrict_to_changed_objects.sql')
+            self._reprocess_changed_objects()
+            self._execute_incremental_sql('release_changed_objects.sql')
+            self._postgres.execute_sql_command(
+                "UPDATE osmaxx_incremental.state SET data_timestamp = '{}';".format(new_data_timestamp)
+            )
+        self._recreate_views()
+        self._postgres.execute_sql_command('UPDATE osmaxx_incremental.state SET last_used = now();')
+
+    def _state(self):
+        """
+        Returns:
+            `(data_timestamp, size_class)` of the database, `None` if it needs to be bootstrapped
+        """
+        if not self._postgres.db_exists():
+            return None
+        if self._postgres.execute_sql_command("SELECT to_regclass('osmaxx_incremental.state');").scalar() is None:
+            return None
+        return self._postgres.execute_sql_command(
+            'SELECT data_timestamp, size_class FROM osmaxx_incremental.state;'
+        ).first()
+
+    def _setup_state(self):
+        data_timestamp = _osm_data_timestamp(self._pbf_file_path)
+        if data_timestamp is None:
+            logger.warning('%s has no timestamp, it will be bootstrapped again next time', self._pbf_file_path)
+            return
+        self._execute_incremental_sql('setup_state.sql')
+        self._postgres.execute_sql_command(
+            """
+            INSERT INTO osmaxx_incremental.area (geom) VALUES (ST_Multi(ST_GeomFromText('{area}', 4326)));
+            INSERT INTO osmaxx_incremental.state (data_timestamp, size_class) VALUES ('{timestamp}', '{size_class}');
+            """.format(
+                area=self.geom.wkt, timestamp=data_timestamp,
+                size_class=size_class_for(os.path.getsize(self._pbf_file_path)),
+            )
+        )
+        self._mark_transliterations_as_stored()
+
+    def _fetch_changes_since(self, data_timestamp):
+        """
+        Fetches the changes within the area only, so the database grows with the changes of the area rather than
+        those of the planet.
+
+        Returns:
+            the timestamp of the data once the fetched changes are applied, `None` if there are no changes
+        """
+        osmupdate_directory = CONVERSION_SETTINGS['INCREMENTAL_EXPORT_OSMUPDATE_DIRECTORY']
+        os.makedirs(osmupdate_directory, exist_ok=True)
+        if os.path.exists(self._change_file_path):
+            os.remove(self._change_file_path)
+        # the downloaded diffs are shared by the workers
+        with open(os.path.join(osmupdate_directory, '.lock'), 'a') as lock_file, \
+                tempfile.NamedTemporaryFile('w', suffix='.poly') as polyfile:
+            polyfile.write(self.area_polyfile_string)
+            polyfile.flush()
+            osmupdate_command = [
+                'osmupdate', '-v', '--keep-tempfiles', '-t={}'.format(os.path.join(osmupdate_directory, 'temp')),
+                '-B={}'.format(polyfile.name), '--hour', '--day', data_timestamp, self._change_file_path,
+            ]
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _delete_old_diffs(osmupdate_directory, max_age=CONVERSION_SETTINGS['INCREMENTAL_EXPORT_OSMUPDATE_MAX_AGE'])
+            try:
+                logged_check_call(osmupdate_command)
+            except subprocess.CalledProcessError as e:
+                if e.returncode == OSMUPDATE_UP_TO_DATE:
+                    return None
+                raise
+        return _osm_data_timestamp(self._change_file_path)
+
+    def _apply_changes(self):
+        self._execute_incremental_sql('start_recording_changed_objects.sql')
+        try:
+            self._run_osm2pgsql(['--append'], self._change_file_path)
+        finally:
+            self._execute_incremental_sql('stop_recording_changed_objects.sql')
+
+    def _reprocess_changed_objects(self):
+        session_settings = self._postgres.get_session_settings()
+        self._postgres.set_session_settings(dict(session_settings, search_path='osmaxx_changed,public'))
+        try:
+            self._harmonize_database()
+            self._transliterate_names()
+            # the tables and views the filters fill are kept, only the rows of the changed objects are replaced
+            self._filter_data(filter_function=_fills_rows)
+        finally:
+            self._postgres.set_session_settings(session_settings)
+        self._mark_transliterations_as_stored()
+
+    def _mark_transliterations_as_stored(self):
+        # the cache table is kept along with the database, so its entries must only be stored once
+        self._postgres.execute_sql_command('UPDATE transliteration_cache SET is_new = FALSE WHERE is_new;')
+
+    def _recreate_views(self):
+        # the views depend on the detail level, which can differ between exports of the area
+        self._postgres.execute_sql_command('DROP SCHEMA IF EXISTS view_osmaxx CASCADE; CREATE SCHEMA view_osmaxx;')
+        # the boundaries tables are kept along with the database, only their views are dropped with the schema
+        self._boundaries_importer().create_views(extent=self.geom)
+        self._create_views()
+        if CONVERSION_SETTINGS['CLUSTER_OUTPUT_TABLES']:
+            self._cluster_output_tables()
+
+    def _execute_incremental_sql(self, file_name):
+        self._postgres.execute_sql_file(os.path.join(self._incremental_sql_dir, file_name))
+
+
+def _delete_old_diffs(osmupdate_directory, *, max_age):
+    """
+    Deletes the diffs osmupdate kept that are older than `max_age`, they're downloaded again if still needed.
+    """
+    oldest_kept = time.time() - max_age.total_seconds()
+    for entry in os.scandir(osmupdate_directory):
+        if entry.name != '.lock' and entry.stat().st_mtime < oldest_kept:
+            os.remove(entry.path)
+
+
+def _fills_rows(script_path):
+    with open(script_path, 'r') as script_file:
+        return _DEFINES_TABLE_OR_VIEW.search(script_file.read()) is None
+
+
+def _osm_data_timestamp(osm_file_path):
+    """
+    Returns:
+        the timestamp of the data in the file, as osmupdate expects it, `None` if the file doesn't have one
+    """
+    output = subprocess.check_output(['osmconvert', '--out-timestamp', osm_file_path], universal_newlines=True)
+    timestamp = output.strip()
+    if not timestamp or 'invalid' in timestamp:
+        return None
+    return timestamp
+
+
+@contextmanager
+def _locked(db_name, operation):
+    os.makedirs(LOCK_DIRECTORY, exist_ok=True)
+    with open(os.path.join(LOCK_DIRECTORY, db_name + '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, operation)
+        yield
+
+
+def drop_least_recently_used_databases(*, keep):
+    """
+    Drops the databases of all but the `keep` areas exported most recently. Databases in use are kept.
+    """
+    server = get_default_postgres_wrapper(db_name='postgres')
+    db_names = [
+        db_name for (db_name,) in server.execute_sql_command(
+            "SELECT datname FROM pg_database WHERE datname LIKE '{}%';".format(DATABASE_NAME_PREFIX)
+        )
+    ]
+    last_used = {}
+    for db_name in db_names:
+        postgres = get_default_postgres_wrapper(db_name=db_name)
+        has_state = postgres.execute_sql_command("SELECT to_regclass('osmaxx_incremental.state');").scalar()
+        last_used[db_name] = postgres.execute_sql_command(
+            'SELECT max(last_used) FROM osmaxx_incremental.state;'
+        ).scalar() if has_state else None
+    # databases without a state were left behind by a failed bootstrap or a crash and are dropped first
+    by_last_use = sorted(
+        db_names, key=lambda db_name: last_used[db_name].timestamp() if last_used[db_name] else float('-inf')
+    )
+    for db_name in by_last_use[:max(len(by_last_use) - keep, 0)]:
+        try:
+            with _locked(db_name, fcntl.LOCK_EX | fcntl.LOCK_NB):
+                get_default_postgres_wrapper(db_name=db_name).drop_db()
+                logger.info('dropped %s, the database of an area not exported recently', db_name)
+        except BlockingIOError:
+            logger.info('%s is in use, keeping it', db_name)
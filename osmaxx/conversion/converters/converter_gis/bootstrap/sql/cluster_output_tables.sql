@@ -0,0 +1,26 @@
+------------------------------------------------------------------
+-- Materializes every layer of view_osmaxx into a table of its own,
+-- physically ordered along a space-filling curve, so neighbouring
+-- features end up next to each other in the exported files.
+-- The geohash of the center of a feature's bounding box is used as
+-- sort key, which orders the features along a Z-order curve.
+-- Spatial indexes are only built once a table has been filled.
+------------------------------------------------------------------
+DROP SCHEMA IF EXISTS clustered_osmaxx CASCADE;
+CREATE SCHEMA clustered_osmaxx;
+
+DO $$
+DECLARE
+    layer_name text;
+BEGIN
+    FOR layer_name IN SELECT table_name FROM information_schema.views WHERE table_schema = 'view_osmaxx' LOOP
+        EXECUTE format(
+            'CREATE UNLOGGED TABLE clustered_osmaxx.%1$I AS SELECT * FROM view_osmaxx.%1$I
+                ORDER BY CASE WHEN ST_IsEmpty(geom) THEN NULL ELSE ST_GeoHash(ST_Centroid(ST_Envelope(geom))) END',
+            layer_name
+        );
+        EXECUTE format('CREATE INDEX ON clustered_osmaxx.%I USING GIST (geom)', layer_name);
+        EXECUTE format('ANALYZE clustered_osmaxx.%I', layer_name);
+    END LOOP;
+END
+$$;
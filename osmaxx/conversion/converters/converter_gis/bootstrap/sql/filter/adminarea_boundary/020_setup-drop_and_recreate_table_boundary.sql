@@ -2,7 +2,7 @@
 --  boundary_l --
 -----------------
 DROP TABLE if exists osmaxx.boundary_l;
-CREATE TABLE osmaxx.boundary_l (
+CREATE UNLOGGED TABLE osmaxx.boundary_l (
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype text,
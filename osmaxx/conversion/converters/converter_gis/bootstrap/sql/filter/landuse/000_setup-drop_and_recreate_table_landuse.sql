@@ -2,7 +2,7 @@
 --  landuse_a  --
 -----------------
 DROP TABLE if exists osmaxx.landuse_a;
-CREATE TABLE osmaxx.landuse_a (
+CREATE UNLOGGED TABLE osmaxx.landuse_a (
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype char(1),
@@ -2,7 +2,7 @@
 --  military_a --
 -----------------
 DROP TABLE if exists osmaxx.military_a;
-CREATE TABLE osmaxx.military_a (
+CREATE UNLOGGED TABLE osmaxx.military_a (
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype char(1),
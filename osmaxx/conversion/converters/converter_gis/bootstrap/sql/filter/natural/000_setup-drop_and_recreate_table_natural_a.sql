@@ -2,7 +2,7 @@
 --  natural_a  --
 -----------------
 DROP TABLE if exists osmaxx.natural_a;
-CREATE TABLE osmaxx.natural_a (
+CREATE UNLOGGED TABLE osmaxx.natural_a (
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype char(1),
@@ -20,13 +20,13 @@ INSERT INTO osmaxx.natural_a
     "name:de" as name_de,
     int_name as name_int,
     case
-        when name is not null AND name = osml10n_translit(name) then name
+        when name is not null AND name = osmaxx_translit(name) then name
         when "name:en" is not null then "name:en"
         when "name:fr" is not null then "name:fr"
         when "name:es" is not null then "name:es"
         when "name:de" is not null then "name:de"
-        when int_name is not null then osml10n_translit(int_name)
-        when name is not null then osml10n_translit(name)
+        when int_name is not null then osmaxx_translit(int_name)
+        when name is not null then osmaxx_translit(name)
         else NULL
     end as label,
     cast(tags as text) as tags
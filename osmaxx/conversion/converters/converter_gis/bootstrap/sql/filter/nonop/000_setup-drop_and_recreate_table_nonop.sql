@@ -3,7 +3,7 @@
 -----------------
 -- Planned Infrastructure not usable for Traffic  or transport --
 DROP TABLE if exists osmaxx.nonop_l;
-CREATE TABLE osmaxx.nonop_l (
+CREATE UNLOGGED TABLE osmaxx.nonop_l (
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype char(1),
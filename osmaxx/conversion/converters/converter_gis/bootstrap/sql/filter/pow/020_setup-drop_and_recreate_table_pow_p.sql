@@ -2,7 +2,7 @@
 ----  pow_p ----
 -----------------
 DROP TABLE if exists osmaxx.pow_p;
-CREATE TABLE osmaxx.pow_p (
+CREATE UNLOGGED TABLE osmaxx.pow_p (
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype text,
@@ -2,7 +2,7 @@
 --   route_l   --
 -----------------
 DROP TABLE if exists osmaxx.route_l;
-CREATE TABLE osmaxx.route_l(
+CREATE UNLOGGED TABLE osmaxx.route_l(
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype char(1),
@@ -2,7 +2,7 @@
 -- transport_p --
 -----------------
 DROP TABLE if exists osmaxx.transport_p;
-CREATE TABLE osmaxx.transport_p(
+CREATE UNLOGGED TABLE osmaxx.transport_p(
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype text,
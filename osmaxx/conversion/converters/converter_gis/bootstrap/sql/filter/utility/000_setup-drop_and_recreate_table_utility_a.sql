@@ -2,7 +2,7 @@
 --  utility_a  --
 -----------------
 DROP TABLE if exists osmaxx.utility_a;
-CREATE TABLE osmaxx.utility_a(
+CREATE UNLOGGED TABLE osmaxx.utility_a(
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype char(1),
@@ -2,7 +2,7 @@
 --  utility_l  --
 -----------------
 DROP TABLE if exists osmaxx.utility_l;
-CREATE TABLE osmaxx.utility_l(
+CREATE UNLOGGED TABLE osmaxx.utility_l(
     osm_id bigint,
     lastchange timestamp without time zone,
     geomtype text,
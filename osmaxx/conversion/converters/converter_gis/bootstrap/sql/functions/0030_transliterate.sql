@@ -6,3 +6,23 @@
 ---------------------------------------------------------------------------------------
 CREATE EXTENSION IF NOT EXISTS postgis CASCADE;
 CREATE EXTENSION IF NOT EXISTS osml10n CASCADE;
+
+------------------------------------------------------------------
+-- Cache for osml10n_translit(), which is by far the most expensive
+-- function used for computing the labels. transliterate_names.sql
+-- fills the cache once for every distinct name before filtering, so
+-- the filter scripts only need an index lookup per row.
+-- Dependencies: osml10n extension
+------------------------------------------------------------------
+CREATE UNLOGGED TABLE IF NOT EXISTS transliteration_cache (
+    name text PRIMARY KEY,
+    transliterated text,
+    is_new boolean NOT NULL DEFAULT TRUE -- FALSE if loaded from the persistent cache
+);
+
+CREATE OR REPLACE FUNCTION osmaxx_translit(name text) RETURNS text AS $$
+    SELECT coalesce(
+        (SELECT transliterated FROM transliteration_cache WHERE transliteration_cache.name = $1),
+        osml10n_translit($1)
+    );
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,4 @@
+DROP SCHEMA IF EXISTS osmaxx_changed CASCADE;
+DROP INDEX IF EXISTS osmaxx_incremental.changed_objects_osm_id_idx;
+TRUNCATE osmaxx_incremental.changed_objects;
+ANALYZE osm_point, osm_line, osm_polygon, osm_roads;
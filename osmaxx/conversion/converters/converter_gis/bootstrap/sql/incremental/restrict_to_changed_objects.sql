@@ -0,0 +1,37 @@
+-- Removes the rows derived from the changed objects and shadows the imported tables by views
+-- of only the changed objects within the area. With `osmaxx_changed` first in the search path,
+-- the harmonizing and filter scripts then only (re-)derive the rows of the changed objects.
+DO $$
+DECLARE
+    osmaxx_table text;
+BEGIN
+    FOR osmaxx_table IN
+        SELECT columns.table_name FROM information_schema.columns
+        JOIN information_schema.tables USING (table_schema, table_name)
+        WHERE columns.table_schema = 'osmaxx' AND columns.column_name = 'osm_id' AND tables.table_type = 'BASE TABLE'
+    LOOP
+        EXECUTE format(
+            'DELETE FROM osmaxx.%I WHERE osm_id IN (SELECT osm_id FROM osmaxx_incremental.changed_objects)',
+            osmaxx_table
+        );
+    END LOOP;
+END
+$$;
+
+DROP SCHEMA IF EXISTS osmaxx_changed CASCADE;
+CREATE SCHEMA osmaxx_changed;
+
+DO $$
+DECLARE
+    osm_table text;
+BEGIN
+    FOREACH osm_table IN ARRAY ARRAY['osm_point', 'osm_line', 'osm_polygon', 'osm_roads'] LOOP
+        EXECUTE format(
+            'CREATE VIEW osmaxx_changed.%1$I AS SELECT * FROM public.%1$I
+                WHERE osm_id IN (SELECT osm_id FROM osmaxx_incremental.changed_objects)
+                AND ST_Intersects(way, (SELECT ST_Collect(geom) FROM osmaxx_incremental.area))',
+            osm_table
+        );
+    END LOOP;
+END
+$$;
@@ -0,0 +1,30 @@
+-- Bookkeeping of a database kept between exports of its area, see bootstrap/incremental.py.
+-- Unlogged like the imported data, so both are gone together after a crash of the database server.
+DROP SCHEMA IF EXISTS osmaxx_incremental CASCADE;
+CREATE SCHEMA osmaxx_incremental;
+
+CREATE UNLOGGED TABLE osmaxx_incremental.state (
+    data_timestamp text NOT NULL,  -- of the OSM data imported so far, as understood by osmupdate
+    size_class text NOT NULL,
+    last_used timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE UNLOGGED TABLE osmaxx_incremental.area (
+    geom geometry(MULTIPOLYGON, 4326) NOT NULL
+);
+
+-- the objects osm2pgsql (re-)inserted or deleted while applying changes
+CREATE UNLOGGED TABLE osmaxx_incremental.changed_objects (
+    osm_id bigint NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION osmaxx_incremental.record_changed_object() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO osmaxx_incremental.changed_objects (osm_id) VALUES (OLD.osm_id);
+        RETURN OLD;
+    END IF;
+    INSERT INTO osmaxx_incremental.changed_objects (osm_id) VALUES (NEW.osm_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,18 @@
+-- osm2pgsql replaces changed objects (and the ways and relations whose geometry depends on them)
+-- by deleting and re-inserting them, which these triggers record.
+TRUNCATE osmaxx_incremental.changed_objects;
+
+DO $$
+DECLARE
+    osm_table text;
+BEGIN
+    FOREACH osm_table IN ARRAY ARRAY['osm_point', 'osm_line', 'osm_polygon', 'osm_roads'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS record_changed_objects ON public.%I', osm_table);
+        EXECUTE format(
+            'CREATE TRIGGER record_changed_objects AFTER INSERT OR DELETE ON public.%I
+                FOR EACH ROW EXECUTE PROCEDURE osmaxx_incremental.record_changed_object()',
+            osm_table
+        );
+    END LOOP;
+END
+$$;
@@ -0,0 +1,12 @@
+DO $$
+DECLARE
+    osm_table text;
+BEGIN
+    FOREACH osm_table IN ARRAY ARRAY['osm_point', 'osm_line', 'osm_polygon', 'osm_roads'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS record_changed_objects ON public.%I', osm_table);
+    END LOOP;
+END
+$$;
+
+CREATE INDEX ON osmaxx_incremental.changed_objects (osm_id);
+ANALYZE osmaxx_incremental.changed_objects;
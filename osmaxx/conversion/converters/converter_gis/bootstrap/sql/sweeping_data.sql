@@ -779,7 +779,7 @@ where population is not null;
 
 /*Building Height*/
 UPDATE osm_polygon
-SET height=building_height(tags)
+SET height=building_height(height, "building:height", "building:levels", levels)
 WHERE building is not null and height is null
 
 
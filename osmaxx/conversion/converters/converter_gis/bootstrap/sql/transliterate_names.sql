@@ -0,0 +1,18 @@
+/*
+Transliterate every distinct name only once (instead of up to twice per row and layer)
+and only if it isn't in the transliteration cache already.
+*/
+INSERT INTO transliteration_cache (name, transliterated)
+    SELECT names.name, osml10n_translit(names.name)
+    FROM (
+        SELECT name FROM osm_point
+        UNION SELECT int_name FROM osm_point
+        UNION SELECT name FROM osm_line
+        UNION SELECT int_name FROM osm_line
+        UNION SELECT name FROM osm_polygon
+        UNION SELECT int_name FROM osm_polygon
+    ) AS names
+    LEFT JOIN transliteration_cache cached ON cached.name = names.name
+    WHERE names.name IS NOT NULL AND cached.name IS NULL;
+
+ANALYZE transliteration_cache;
@@ -28,9 +28,10 @@ FORMATS = {
 }
 
 
-def extract_to(*, to_format, output_dir, base_filename, out_srs):
+def extract_to(*, to_format, output_dir, base_filename, out_srs, schema='view_osmaxx', db_name=None):
     conversion_service_settings = CONVERSION_SETTINGS
-    db_name = conversion_service_settings['GIS_CONVERSION_DB_NAME']
+    if db_name is None:
+        db_name = conversion_service_settings['GIS_CONVERSION_DB_NAME']
     db_user = conversion_service_settings['GIS_CONVERSION_DB_USER']
     db_pass = conversion_service_settings['GIS_CONVERSION_DB_PASSWORD']
 
@@ -44,10 +45,11 @@ def extract_to(*, to_format, output_dir, base_filename, out_srs):
     ogr2ogr_command = [
         'ogr2ogr', '-f', str(ogr_name), output_path,
         '-t_srs', out_srs,
-        'PG:dbname={dbname} user={user} password={password} schemas=view_osmaxx'.format(
+        'PG:dbname={dbname} user={user} password={password} schemas={schema}'.format(
             dbname=db_name,
             user=db_user,
             password=db_pass,
+            schema=schema,
         ),
     ]
     ogr2ogr_command += extraction_options
@@ -12,10 +12,11 @@ from jinja2 import Environment, PackageLoader
 from rq import get_current_job
 
 from osmaxx.conversion import output_format
-from osmaxx.conversion._settings import odb_license
-from osmaxx.conversion.converters.converter_gis.bootstrap import BootStrapper
+from osmaxx.conversion._settings import CONVERSION_SETTINGS, odb_license
+from osmaxx.conversion.converters.converter_gis.bootstrap import BootStrapper, IncrementalBootStrapper
 from osmaxx.conversion.converters.converter_gis.extract.db_to_format.extract import extract_to
 from osmaxx.conversion.converters.utils import zip_folders_relative, recursive_getsize
+from osmaxx.conversion.job_dispatcher import heartbeats
 
 
 def perform_export(
@@ -67,23 +68,35 @@ class GISConverter:
         self._env.globals.update(zip=zip)
         self._detail_level = detail_level
         self._start_time = None
+        self._output_schema = None
+        self._database_name = None
 
     def create_gis_export(self):
         self._start_time = timezone.now()
 
-        _bootstrapper = BootStrapper(self._polyfile_string, detail_level=self._detail_level)
-        _bootstrapper.bootstrap()
-        geom_in_qgis_display_srs = _bootstrapper.geom.transform(QGIS_DISPLAY_SRID, clone=True)
-
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            data_dir = os.path.join(tmp_dir, 'data')
-            data_location = self._dump_gis_data(data_dir, tmp_dir)
-            unzipped_result_size = recursive_getsize(data_dir)
-
-            symbology_dir = os.path.join(tmp_dir, 'symbology')
-            self._dump_qgis_symbology(data_location, geom_in_qgis_display_srs, target_dir=symbology_dir)
-
-            zip_folders_relative([tmp_dir], zip_out_file_path=self._out_zip_file_path)
+        if CONVERSION_SETTINGS['INCREMENTAL_EXPORTS']:
+            _bootstrapper = IncrementalBootStrapper(self._polyfile_string, detail_level=self._detail_level)
+        else:
+            _bootstrapper = BootStrapper(self._polyfile_string, detail_level=self._detail_level)
+        with _bootstrapper.database_in_use():
+            heartbeats.stage('bootstrap')
+            _bootstrapper.bootstrap()
+            self._output_schema = _bootstrapper.output_schema
+            self._database_name = _bootstrapper.database_name
+            geom_in_qgis_display_srs = _bootstrapper.geom.transform(QGIS_DISPLAY_SRID, clone=True)
+
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                data_dir = os.path.join(tmp_dir, 'data')
+                heartbeats.stage('extract')
+                with heartbeats.throughput('extract', lambda: recursive_getsize(data_dir)):
+                    data_location = self._dump_gis_data(data_dir, tmp_dir)
+                unzipped_result_size = recursive_getsize(data_dir)
+
+                symbology_dir = os.path.join(tmp_dir, 'symbology')
+                self._dump_qgis_symbology(data_location, geom_in_qgis_display_srs, target_dir=symbology_dir)
+
+                heartbeats.stage('zip')
+                zip_folders_relative([tmp_dir], zip_out_file_path=self._out_zip_file_path)
 
         job = get_current_job()
         if job:
@@ -102,7 +115,9 @@ class GISConverter:
             to_format=self._conversion_format,
             output_dir=data_dir,
             base_filename=self._base_file_name,
-            out_srs=self._out_srs
+            out_srs=self._out_srs,
+            schema=self._output_schema,
+            db_name=self._database_name,
         )
         return data_location
 
@@ -5,7 +5,7 @@ from geoalchemy2 import Geometry, Geography
 
 
 class OSMBoundariesImporter:
-    def __init__(self):
+    def __init__(self, *, database='osmaxx_db'):
         self._osm_boundaries_tables = ['coastline_l', 'landmass_a', 'sea_a']
 
         _osm_boundaries_db_connection_parameters = dict(
@@ -22,7 +22,7 @@ class OSMBoundariesImporter:
             username='postgres',
             password='postgres',
             port=5432,
-            database='osmaxx_db',
+            database=database,
         )
         local_db_connection = URL('postgresql', **_local_db_connection_parameters)
         self._local_db_engine = create_engine(local_db_connection)
@@ -46,18 +46,19 @@ class OSMBoundariesImporter:
     def load_area_specific_data(self, *, extent):
         self._create_tables_on_local_db()
         self._load_boundaries_tables(extent)
+        self.create_views(extent=extent)
+
+    def create_views(self, *, extent):
+        """
+        (Re-)creates the views of the boundaries tables clipped to `extent` in the `view_osmaxx` schema.
+        """
+        for table_name in self._osm_boundaries_tables:
+            self._create_view(self._table_metas[table_name], extent)
 
     def _create_tables_on_local_db(self):
         self._db_meta_data.create_all(self._local_db_engine)
 
     def _load_boundaries_tables(self, extent):
-        multipolygon_cast = Geometry(geometry_type='MULTIPOLYGON', srid=4326)
-        multilinestring_cast = Geometry(geometry_type='MULTILINESTRING', srid=4326)
-        table_casts = {
-            'sea_a': multipolygon_cast,
-            'landmass_a': multipolygon_cast,
-            'coastline_l': multilinestring_cast,
-        }
         for table_name in self._osm_boundaries_tables:
             source_table_meta = self._table_metas[table_name]
             query = select([
@@ -67,28 +68,38 @@ class OSMBoundariesImporter:
             ])
             query = query.where(func.ST_Intersects(source_table_meta.c.wkb_geometry, extent.ewkt))
             self._execute_and_insert_into_local_db(query, source_table_meta, source_engine=self._osm_boundaries_db_engine)
-            from sqlalchemy_views import CreateView
-            view_definition_query = select([
-                source_table_meta.c.ogc_fid,
-                source_table_meta.c.fid,
-                expression.cast(
-                    func.ST_Multi(func.ST_Intersection(source_table_meta.c.wkb_geometry, extent.ewkt)),
-                    table_casts[table_name]
-                ).label('geom')
-            ]).where(func.ST_Intersects(source_table_meta.c.wkb_geometry, extent.ewkt))
-            view_meta = MetaData()
-            view = Table(table_name, view_meta, schema='view_osmaxx')
 
-            from sqlalchemy.dialects import postgresql
-            from sqlalchemy.sql import text
-            query_defintion_string = str(
-                view_definition_query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
-            )
-            query_defintion_string = query_defintion_string.replace('ST_AsEWKB(CAST', 'CAST')
-            query_defintion_string = query_defintion_string.replace('))) AS geom', ')) AS geom')
-            query_defintion_text = text(query_defintion_string)
-            create_view = CreateView(view, query_defintion_text, or_replace=True)
-            self._local_db_engine.execute(create_view)
+    def _create_view(self, source_table_meta, extent):
+        multipolygon_cast = Geometry(geometry_type='MULTIPOLYGON', srid=4326)
+        multilinestring_cast = Geometry(geometry_type='MULTILINESTRING', srid=4326)
+        table_casts = {
+            'sea_a': multipolygon_cast,
+            'landmass_a': multipolygon_cast,
+            'coastline_l': multilinestring_cast,
+        }
+        table_name = source_table_meta.name
+        from sqlalchemy_views import CreateView
+        view_definition_query = select([
+            source_table_meta.c.ogc_fid,
+            source_table_meta.c.fid,
+            expression.cast(
+                func.ST_Multi(func.ST_Intersection(source_table_meta.c.wkb_geometry, extent.ewkt)),
+                table_casts[table_name]
+            ).label('geom')
+        ]).where(func.ST_Intersects(source_table_meta.c.wkb_geometry, extent.ewkt))
+        view_meta = MetaData()
+        view = Table(table_name, view_meta, schema='view_osmaxx')
+
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.sql import text
+        query_defintion_string = str(
+            view_definition_query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        )
+        query_defintion_string = query_defintion_string.replace('ST_AsEWKB(CAST', 'CAST')
+        query_defintion_string = query_defintion_string.replace('))) AS geom', ')) AS geom')
+        query_defintion_text = text(query_defintion_string)
+        create_view = CreateView(view, query_defintion_text, or_replace=True)
+        self._local_db_engine.execute(create_view)
 
     def _execute_and_insert_into_local_db(self, query, table_meta, source_engine=None):
         query_result = source_engine.execute(query)
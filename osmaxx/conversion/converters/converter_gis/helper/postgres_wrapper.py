@@ -8,8 +8,18 @@ from sqlalchemy_utils import functions as sql_alchemy_utils
 logger = logging.getLogger()
 
 
+def libpq_options(session_settings):
+    """
+    Renders run-time parameters in the format of libpq's `options` connection parameter (and `PGOPTIONS`).
+    """
+    return ' '.join(
+        '-c {name}={value}'.format(name=name, value=value) for name, value in sorted(session_settings.items())
+    )
+
+
 class Postgres:
     def __init__(self, user, password, db_name, host=None, port=5432):
+        self._session_settings = {}
         self._connection_parameters = {
             'username': user,
             'password': password,
@@ -18,8 +28,24 @@ class Postgres:
         }
         if host:
             self._connection_parameters['host'] = host
+        self._engine = self._create_engine()
+
+    def _create_engine(self):
         connection_url = URL('postgresql', **self._connection_parameters)
-        self._engine = create_engine(connection_url)
+        if self._session_settings:
+            return create_engine(connection_url, connect_args={'options': libpq_options(self._session_settings)})
+        return create_engine(connection_url)
+
+    def set_session_settings(self, session_settings):
+        """
+        Applies the given run-time parameters (e.g. `{'work_mem': '64MB'}`) to all connections opened from now on.
+        """
+        self._session_settings = dict(session_settings)
+        self._engine.dispose()
+        self._engine = self._create_engine()
+
+    def get_session_settings(self):
+        return dict(self._session_settings)
 
     def execute_sql_file(self, file_path):
         try:
@@ -35,6 +61,33 @@ class Postgres:
             result = connection.execute(sqlalchemy.text(sql))
         return result
 
+    def copy_from_file(self, file, table_name, columns):
+        """
+        Bulk loads `file` (in PostgreSQL's COPY text format) into the given columns of `table_name`.
+        """
+        copy_statement = 'COPY {table_name} ({columns}) FROM STDIN'.format(
+            table_name=table_name, columns=', '.join(columns)
+        )
+        self._copy_expert(copy_statement, file)
+
+    def copy_to_file(self, file, query):
+        """
+        Writes the result of `query` to `file` (in PostgreSQL's COPY text format).
+        """
+        self._copy_expert('COPY ({query}) TO STDOUT'.format(query=query), file)
+
+    def _copy_expert(self, copy_statement, file):
+        connection = self._engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(copy_statement, file)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def db_exists(self):
+        return sql_alchemy_utils.database_exists(self._engine.url)
+
     def create_db(self):
         if not sql_alchemy_utils.database_exists(self._engine.url):
             sql_alchemy_utils.create_database(self._engine.url)
@@ -49,6 +102,21 @@ class Postgres:
         if sql_alchemy_utils.database_exists(self._engine.url):
             sql_alchemy_utils.drop_database(self._engine.url)
 
+    def terminate_sessions(self):
+        """
+        Ends the queries running in the database by terminating all other sessions connected to it.
+        """
+        self.execute_sql_command(
+            'SELECT pg_terminate_backend(pid) FROM pg_stat_activity '
+            'WHERE datname = current_database() AND pid <> pg_backend_pid();'
+        )
+
+    def dispose(self):
+        """
+        Closes the pooled connections, e.g. those whose sessions have been terminated.
+        """
+        self._engine.dispose()
+
     def get_db_name(self):
         return self._connection_parameters['database']
 
@@ -0,0 +1,105 @@
+import fcntl
+import logging
+import os
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_CACHE_TABLE = 'transliteration_cache'
+_IMPORT_TABLE = 'transliteration_cache_import'
+
+
+@contextmanager
+def _locked(file, operation):
+    fcntl.flock(file, operation)
+    try:
+        yield file
+    finally:
+        fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class TransliterationCache:
+    """
+    Keeps the results of `osml10n_translit` across conversion jobs.
+
+    The job database is dropped after each export, so the transliterations are persisted to a file
+    (in PostgreSQL's COPY text format) that can be shared between workers. Entries are appended, until the file
+    exceeds `max_bytes`: then it's compacted to the latest half of its distinct entries, so loading it into each
+    job stays cheap.
+    """
+
+    def __init__(self, postgres, store_file_path, *, max_bytes=None):
+        """
+        Args:
+            postgres: the `Postgres` wrapper of the job database, which must already contain the cache table
+            store_file_path: path of the persistent cache file; `None` disables persisting the cache
+            max_bytes: the size the cache file is limited to, unlimited if `None`
+        """
+        self._postgres = postgres
+        self._store_file_path = store_file_path
+        self._max_bytes = max_bytes
+
+    def load(self):
+        """
+        Fills the cache table of the job database with all transliterations persisted so far.
+        """
+        if self._store_file_path is None or not os.path.exists(self._store_file_path):
+            return
+        self._postgres.execute_sql_command(
+            'DROP TABLE IF EXISTS {import_table}; '
+            'CREATE UNLOGGED TABLE {import_table} (name text, transliterated text);'.format(import_table=_IMPORT_TABLE)
+        )
+        with open(self._store_file_path, 'r', encoding='utf-8') as store_file, _locked(store_file, fcntl.LOCK_SH):
+            self._postgres.copy_from_file(store_file, _IMPORT_TABLE, columns=['name', 'transliterated'])
+        # entries may be duplicated in the file when two jobs transliterated the same name concurrently
+        self._postgres.execute_sql_command(
+            """
+            INSERT INTO {cache_table} (name, transliterated, is_new)
+                SELECT DISTINCT ON (name) name, transliterated, FALSE FROM {import_table}
+            ON CONFLICT (name) DO NOTHING;
+            DROP TABLE {import_table};
+            """.format(cache_table=_CACHE_TABLE, import_table=_IMPORT_TABLE)
+        )
+
+    def store_new_entries(self):
+        """
+        Appends the transliterations computed by this job to the persistent cache file.
+        """
+        if self._store_file_path is None:
+            return
+        os.makedirs(os.path.dirname(self._store_file_path), exist_ok=True)
+        with open(self._store_file_path, 'a', encoding='utf-8') as store_file, _locked(store_file, fcntl.LOCK_EX):
+            self._postgres.copy_to_file(
+                store_file,
+                'SELECT name, transliterated FROM {cache_table} WHERE is_new'.format(cache_table=_CACHE_TABLE),
+            )
+            store_file.flush()
+            if self._max_bytes is not None and os.fstat(store_file.fileno()).st_size > self._max_bytes:
+                self._compact(store_file)
+            os.fsync(store_file.fileno())
+        logger.info('transliteration cache at %s updated', self._store_file_path)
+
+    def _compact(self, store_file):
+        """
+        Rewrites the locked `store_file` in place with the latest entries of each name, as many as fit into half of
+        `max_bytes`.
+        """
+        with open(self._store_file_path, 'r', encoding='utf-8') as entries_file:
+            entries = entries_file.readlines()
+        kept_entries, kept_names, kept_bytes = [], set(), 0
+        for entry in reversed(entries):
+            name = entry.partition('\t')[0]
+            if name in kept_names:
+                continue
+            kept_bytes += len(entry.encode('utf-8'))
+            if kept_bytes > self._max_bytes // 2:
+                break
+            kept_names.add(name)
+            kept_entries.append(entry)
+        store_file.truncate(0)
+        store_file.writelines(reversed(kept_entries))
+        store_file.flush()
+        logger.info(
+            'transliteration cache at %s compacted from %d to %d entries',
+            self._store_file_path, len(entries), len(kept_entries),
+        )
@@ -0,0 +1,80 @@
+import math
+
+# The job database is dropped and recreated for every export, so durability is of no value while bootstrapping:
+# tables are created UNLOGGED and commits don't wait for the WAL to be flushed.
+# What remains is sizing the memory and parallelism of the sessions to the amount of data being transformed.
+#
+# work_mem:                          the filter scripts sort and hash whole osm_* tables (DISTINCT, GROUP BY, joins);
+#                                    spilling those to disk dominates the runtime of large extracts.
+# maintenance_work_mem:              used by CREATE INDEX and ANALYZE; osm2pgsql builds all its indexes after loading.
+# max_parallel_workers_per_gather:   parallel scans only pay off once the tables are large enough to amortize starting
+#                                    the workers, so small extracts don't use them.
+# max_parallel_maintenance_workers:  parallel index builds, same reasoning as above.
+#
+# Memory settings are per sort/hash node (and per parallel worker), so they have to stay well below what the worker
+# machine has available, as several of them can be in use at once.
+#
+# The values below are provisional: the size thresholds (50 MB and 1 GB of cut PBF) and the memory and parallelism
+# of each profile are estimates following the reasoning above, not measurements. Replace them with values measured
+# on the production workers, e.g. by timing the bootstrap stages (see `benchmark_conversions`) of real extracts
+# close to the thresholds with the neighbouring profiles. The synthetic areas of the benchmark are all small ones.
+
+SIZE_CLASS_SMALL = 'small'
+SIZE_CLASS_MEDIUM = 'medium'
+SIZE_CLASS_LARGE = 'large'
+
+_COMMON_SESSION_SETTINGS = dict(
+    synchronous_commit='off',
+)
+
+TUNING_PROFILES = {
+    SIZE_CLASS_SMALL: dict(
+        max_pbf_size=50 * 1024 ** 2,
+        session_settings=dict(
+            _COMMON_SESSION_SETTINGS,
+            work_mem='64MB',
+            maintenance_work_mem='256MB',
+            max_parallel_workers_per_gather=0,
+            max_parallel_maintenance_workers=0,
+        ),
+        osm2pgsql_cache_mb=800,
+    ),
+    SIZE_CLASS_MEDIUM: dict(
+        max_pbf_size=1024 ** 3,
+        session_settings=dict(
+            _COMMON_SESSION_SETTINGS,
+            work_mem='256MB',
+            maintenance_work_mem='1GB',
+            max_parallel_workers_per_gather=2,
+            max_parallel_maintenance_workers=2,
+        ),
+        osm2pgsql_cache_mb=2000,
+    ),
+    SIZE_CLASS_LARGE: dict(
+        max_pbf_size=math.inf,
+        session_settings=dict(
+            _COMMON_SESSION_SETTINGS,
+            work_mem='512MB',
+            maintenance_work_mem='2GB',
+            max_parallel_workers_per_gather=4,
+            max_parallel_maintenance_workers=4,
+        ),
+        osm2pgsql_cache_mb=4000,
+    ),
+}
+
+_SIZE_CLASSES_ASCENDING = [SIZE_CLASS_SMALL, SIZE_CLASS_MEDIUM, SIZE_CLASS_LARGE]
+
+
+def size_class_for(pbf_size):
+    """
+    Args:
+        pbf_size: size in bytes of the (already cut) PBF file of the extract
+
+    Returns:
+        the smallest size class the extract fits into
+    """
+    return next(
+        size_class for size_class in _SIZE_CLASSES_ASCENDING
+        if pbf_size <= TUNING_PROFILES[size_class]['max_pbf_size']
+    )
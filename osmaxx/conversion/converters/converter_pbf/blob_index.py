@@ -0,0 +1,129 @@
+"""
+Reads the blob index sidecar of the planet PBF, built by the PBF updater (see `osm_pbf_updater/pbf_blob_index.py`
+for the format), to hand the cutter only the blobs that may contain data of the area being cut.
+"""
+import logging
+import math
+import mmap
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_SUFFIX = '.blobindex.npz'
+
+KIND_HEADER = 0
+KIND_RELATIONS = 3
+
+_COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def index_path_for(pbf_path):
+    return pbf_path + INDEX_FILE_SUFFIX
+
+
+def _segment_sums(values, offsets):
+    """
+    Sums of `values[offsets[i]:offsets[i+1]]` for each i, which (unlike `np.add.reduceat`) copes with empty segments.
+    """
+    cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+
+
+def _gather(values, offsets, selected):
+    """
+    Concatenation of `values[offsets[i]:offsets[i+1]]` for each i in `selected`.
+    """
+    starts, ends = offsets[selected], offsets[np.asarray(selected) + 1]
+    if starts.size == 0:
+        return np.zeros(0, dtype=values.dtype)
+    return np.concatenate([values[start:end] for start, end in zip(starts, ends)])
+
+
+class BlobIndex:
+    def __init__(self, index_path):
+        with np.load(index_path) as index:
+            self._index = {name: index[name] for name in index.files}
+
+    @classmethod
+    def for_pbf(cls, pbf_path):
+        """
+        Returns:
+            the index of the PBF file, `None` if there is none or it belongs to another version of the file
+        """
+        index_path = index_path_for(pbf_path)
+        if not os.path.exists(index_path):
+            return None
+        blob_index = cls(index_path)
+        pbf_stat = os.stat(pbf_path)
+        if (blob_index._index['pbf_size'], blob_index._index['pbf_mtime_ns']) != (pbf_stat.st_size, pbf_stat.st_mtime_ns):
+            logger.warning('ignoring outdated blob index %s', index_path)
+            return None
+        return blob_index
+
+    def blobs_within(self, extent):
+        """
+        Args:
+            extent: `(min_lon, min_lat, max_lon, max_lat)` in degrees
+
+        Returns:
+            sorted numbers of all blobs needed to cut the extent with `--complete-ways --complex-ways`
+        """
+        index = self._index
+        wanted_cells = np.zeros(180 * 360, dtype=bool)
+        min_lon, min_lat, max_lon, max_lat = extent
+        lat_cells = np.arange(_cell(min_lat, 90, 179), _cell(max_lat, 90, 179) + 1)
+        lon_cells = np.arange(_cell(min_lon, 180, 359), _cell(max_lon, 180, 359) + 1)
+        wanted_cells[(lat_cells[:, np.newaxis] * 360 + lon_cells).ravel()] = True
+
+        kinds = index['kinds']
+        selected = _segment_sums(wanted_cells[index['cells']], index['cell_offsets']) > 0
+        # the relations are few, so leave filtering them to osmconvert
+        selected |= (kinds == KIND_HEADER) | (kinds == KIND_RELATIONS)
+
+        # complete the multipolygons and boundaries with members in the selected blobs ...
+        complex_relation_way_blobs = index['complex_relation_way_blobs']
+        complex_relation_offsets = index['complex_relation_offsets']
+        touched_relations = np.flatnonzero(
+            _segment_sums(selected[complex_relation_way_blobs], complex_relation_offsets) > 0
+        )
+        selected[_gather(complex_relation_way_blobs, complex_relation_offsets, touched_relations)] = True
+        # ... and the ways of all selected blobs
+        selected[_gather(index['dependencies'], index['dependency_offsets'], np.flatnonzero(selected))] = True
+        return np.flatnonzero(selected)
+
+    def write_blobs(self, pbf_path, blob_numbers, out_path):
+        """
+        Writes the given blobs of the PBF file at `pbf_path`, in their original order, to a PBF file at `out_path`.
+        """
+        offsets, lengths = self._index['offsets'], self._index['lengths']
+        with open(pbf_path, 'rb') as pbf_file, open(out_path, 'wb') as out_file:
+            with mmap.mmap(pbf_file.fileno(), 0, access=mmap.ACCESS_READ) as pbf:
+                for start, end in _contiguous_ranges(offsets[blob_numbers], lengths[blob_numbers]):
+                    for chunk_start in range(start, end, _COPY_CHUNK_SIZE):
+                        out_file.write(pbf[chunk_start:min(chunk_start + _COPY_CHUNK_SIZE, end)])
+        logger.info(
+            'reduced %s to %s of %s blobs (%s bytes)',
+            pbf_path, len(blob_numbers), offsets.size, os.path.getsize(out_path),
+        )
+
+    def __len__(self):
+        return self._index['offsets'].size
+
+
+def _cell(degrees, offset, maximum):
+    return min(max(math.floor(degrees) + offset, 0), maximum)
+
+
+def _contiguous_ranges(offsets, lengths):
+    """
+    Merges adjacent blobs, so they're copied at once.
+    """
+    ranges = []
+    for offset, length in zip(offsets.tolist(), lengths.tolist()):
+        if ranges and ranges[-1][1] == offset:
+            ranges[-1][1] = offset + length
+        else:
+            ranges.append([offset, offset + length])
+    return ranges
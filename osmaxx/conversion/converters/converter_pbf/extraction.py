@@ -0,0 +1,360 @@
+"""
+Cuts an area out of a PBF file like `osmconvert --complete-ways --complex-ways -B=<polyfile>` does,
+but decodes the file in a pool of processes using libosmium.
+
+The file is split into chunks of consecutive blobs, which the processes read from the file directly, in several
+passes:
+
+1. nodes: which of the nodes are inside the polygon
+2. ways: which ways reference any of these nodes, and which nodes they reference
+3. relations: which relations reference any of these nodes or ways (or any relation found so far),
+   and which ways the multipolygons and boundaries among them consist of
+4. ways (only if there are any multipolygon or boundary members not found in pass 2): which nodes these reference
+5. writing the selected elements of each chunk, which are then put together in order
+
+Relying on the file being sorted by type and id (as the planet is), the passes only read the chunks
+that may contain elements of their type.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from array import array
+
+import numpy as np
+import osmium
+
+from osmaxx.conversion.converters.converter_pbf import pbf_blobs
+
+logger = logging.getLogger(__name__)
+
+BLOBS_PER_CHUNK = 64
+
+_COMPLEX_RELATION_TYPES = {'multipolygon', 'boundary'}
+_NO_IDS = np.zeros(0, dtype=np.int64)
+
+_worker_state = {}
+
+
+def extract(pbf_path, polygon_filter, out_path, *, processes=None, work_dir=None):
+    """
+    Args:
+        pbf_path: the PBF file to cut from, sorted by type and id
+        polygon_filter: a `PolygonFilter` of the area to cut
+        out_path: where to write the resulting PBF file
+        processes: number of processes decoding the file, defaults to the number of CPUs
+        work_dir: where to keep the selected ids and the written chunks, defaults to the temp directory
+
+    Returns:
+        the numbers of nodes, ways and relations written, as a dict
+    """
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        chunks = _split(pbf_path)
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(pbf_path, polygon_filter)) as pool:
+            return _Extraction(pool, chunks, tmp_dir).run(out_path)
+
+
+class _Extraction:
+    def __init__(self, pool, chunks, tmp_dir):
+        self._pool = pool
+        self._chunks = chunks
+        self._tmp_dir = tmp_dir
+
+    def run(self, out_path):
+        all_chunks = list(range(len(self._chunks)))
+
+        results = self._pass('nodes', _nodes_inside, all_chunks)
+        node_ranges = _id_ranges(results, all_chunks)
+        inside_nodes = _union(result['ids'] for result in results)
+        way_chunks = _chunks_from_last(all_chunks, node_ranges)
+
+        inside_nodes_path = self._save('inside_nodes', inside_nodes)
+        results = self._pass('ways', _ways_touching, way_chunks, inside_nodes_path)
+        way_ranges = _id_ranges(results, way_chunks)
+        selected_ways = _union(result['ids'] for result in results)
+        needed_nodes = _union([inside_nodes] + [result['node_ids'] for result in results])
+        relation_chunks = _chunks_from_last(way_chunks, way_ranges)
+
+        results = self._pass(
+            'relations', _relations_touching, relation_chunks,
+            inside_nodes_path, self._save('selected_ways', selected_ways),
+        )
+        relation_ranges = _id_ranges(results, relation_chunks)
+        selected_relations = _with_parent_relations(
+            _union(result['ids'] for result in results),
+            np.concatenate([result['relation_members'] for result in results] or [np.zeros((0, 2), dtype=np.int64)]),
+        )
+        complex_relation_ways = _union(result['complex_relation_way_ids'] for result in results)
+        missing_ways = np.setdiff1d(complex_relation_ways, selected_ways, assume_unique=True)
+        if missing_ways.size > 0:
+            results = self._pass(
+                'ways of multipolygons and boundaries', _nodes_of_ways, way_chunks, self._save('missing_ways', missing_ways),
+            )
+            needed_nodes = _union([needed_nodes] + [result['node_ids'] for result in results])
+            selected_ways = _union([selected_ways, missing_ways])
+
+        chunk_out_paths = [os.path.join(self._tmp_dir, 'out-{:06d}.osm.pbf'.format(chunk)) for chunk in all_chunks]
+        write_tasks = [
+            (
+                self._chunks[chunk], chunk_out_paths[chunk],
+                _ids_within(needed_nodes, node_ranges.get(chunk)),
+                _ids_within(selected_ways, way_ranges.get(chunk)),
+                _ids_within(selected_relations, relation_ranges.get(chunk)),
+            )
+            for chunk in all_chunks
+        ]
+        start = time.monotonic()
+        counts = self._pool.starmap(_write_chunk, write_tasks)
+        pbf_blobs.concatenate(chunk_out_paths, out_path)
+        logger.info('written %s in %.1fs', out_path, time.monotonic() - start)
+        return {kind: sum(count[kind] for count in counts) for kind in ['nodes', 'ways', 'relations']}
+
+    def _pass(self, name, function, chunks, *shared_paths):
+        start = time.monotonic()
+        results = self._pool.starmap(function, [(self._chunks[chunk],) + shared_paths for chunk in chunks])
+        logger.info('read %s of %s chunks in %.1fs', name, len(chunks), time.monotonic() - start)
+        return results
+
+    def _save(self, name, ids):
+        path = os.path.join(self._tmp_dir, '{}.npy'.format(name))
+        np.save(path, ids)
+        return path
+
+
+def _split(pbf_path):
+    """
+    Splits the PBF file into chunks of `BLOBS_PER_CHUNK` blobs, each preceded by the header of the file.
+
+    Returns:
+        the blob positions (see `pbf_blobs.read_blob_positions`) of each chunk, for the processes to read
+    """
+    with open(pbf_path, 'rb') as pbf_file:
+        positions = pbf_blobs.read_blob_positions(pbf_file)
+    header = [position for position in positions if position[2] == pbf_blobs.HEADER_BLOB_TYPE]
+    data = [position for position in positions if position[2] == pbf_blobs.DATA_BLOB_TYPE]
+    return [header + data[start:start + BLOBS_PER_CHUNK] for start in range(0, max(len(data), 1), BLOBS_PER_CHUNK)]
+
+
+def _id_ranges(results, chunks):
+    """
+    Returns:
+        `{chunk: (min_id, max_id)}` of the chunks containing elements of the type read
+    """
+    ranges = {chunk: result['id_range'] for chunk, result in zip(chunks, results) if result['id_range'] is not None}
+    ordered = [ranges[chunk] for chunk in sorted(ranges)]
+    if any(previous[1] >= following[0] for previous, following in zip(ordered, ordered[1:])):
+        raise ValueError('the PBF file is not sorted by type and id')
+    return ranges
+
+
+def _chunks_from_last(chunks, ranges):
+    """
+    The elements of the next type start in the last chunk containing elements of the current type.
+    """
+    if not ranges:
+        return chunks
+    return chunks[chunks.index(max(ranges)):]
+
+
+def _union(id_arrays):
+    id_arrays = list(id_arrays)
+    if not id_arrays:
+        return _NO_IDS
+    return np.unique(np.concatenate(id_arrays))
+
+
+def _ids_within(ids, id_range):
+    if id_range is None:
+        return _NO_IDS
+    return ids[np.searchsorted(ids, id_range[0]):np.searchsorted(ids, id_range[1], side='right')]
+
+
+def _contained_in(values, sorted_ids):
+    if sorted_ids.size == 0:
+        return np.zeros(values.shape, dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_ids, values), sorted_ids.size - 1)
+    return sorted_ids[positions] == values
+
+
+def _any_per_segment(flags, lengths):
+    cumulative = np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+    ends = np.cumsum(lengths)
+    return cumulative[ends] - cumulative[ends - lengths] > 0
+
+
+def _with_parent_relations(selected_relations, relation_members):
+    """
+    Adds the relations (recursively) referencing any of the selected relations.
+
+    Args:
+        relation_members: `(parent_id, member_id)` of each relation being member of another one
+    """
+    while True:
+        parents = relation_members[_contained_in(relation_members[:, 1], selected_relations), 0]
+        extended = _union([selected_relations, parents])
+        if extended.size == selected_relations.size:
+            return selected_relations
+        selected_relations = extended
+
+
+# --- run in the pool ---
+
+def _init_worker(pbf_path, polygon_filter):
+    _worker_state.update(pbf_path=pbf_path, polygon_filter=polygon_filter, shared_ids={})
+
+
+def _read(handler, chunk):
+    with open(_worker_state['pbf_path'], 'rb') as pbf_file:
+        handler.apply_buffer(pbf_blobs.read_blobs(pbf_file, chunk), 'pbf')
+
+
+def _shared_ids(path):
+    shared_ids = _worker_state['shared_ids']
+    if path not in shared_ids:
+        shared_ids[path] = np.load(path, mmap_mode='r')
+    return shared_ids[path]
+
+
+def _id_range_of(ids):
+    if ids.size == 0:
+        return None
+    return int(ids.min()), int(ids.max())
+
+
+class _NodeReader(osmium.SimpleHandler):
+    def __init__(self):
+        super().__init__()
+        self.ids, self.lons, self.lats = array('q'), array('d'), array('d')
+
+    def node(self, node):
+        location = node.location
+        self.ids.append(node.id)
+        if location.valid():
+            self.lons.append(location.lon)
+            self.lats.append(location.lat)
+        else:
+            self.lons.append(float('nan'))
+            self.lats.append(float('nan'))
+
+
+class _WayReader(osmium.SimpleHandler):
+    def __init__(self):
+        super().__init__()
+        self.ids, self.node_counts, self.node_ids = array('q'), array('q'), array('q')
+
+    def way(self, way):
+        self.ids.append(way.id)
+        node_ids = [node.ref for node in way.nodes]
+        self.node_counts.append(len(node_ids))
+        self.node_ids.extend(node_ids)
+
+    def as_arrays(self):
+        return (
+            np.frombuffer(self.ids, dtype=np.int64), np.frombuffer(self.node_counts, dtype=np.int64),
+            np.frombuffer(self.node_ids, dtype=np.int64),
+        )
+
+
+class _RelationReader(osmium.SimpleHandler):
+    def __init__(self):
+        super().__init__()
+        self.ids, self.is_complex = array('q'), array('b')
+        self.members = {member_type: (array('q'), array('q')) for member_type in 'nwr'}
+
+    def relation(self, relation):
+        number = len(self.ids)
+        self.ids.append(relation.id)
+        self.is_complex.append(relation.tags.get('type') in _COMPLEX_RELATION_TYPES)
+        for member in relation.members:
+            relation_numbers, member_ids = self.members[member.type]
+            relation_numbers.append(number)
+            member_ids.append(member.ref)
+
+    def member_arrays(self, member_type):
+        return tuple(np.frombuffer(values, dtype=np.int64) for values in self.members[member_type])
+
+
+def _nodes_inside(chunk):
+    reader = _NodeReader()
+    _read(reader, chunk)
+    ids = np.frombuffer(reader.ids, dtype=np.int64)
+    inside = _worker_state['polygon_filter'].contains(
+        np.frombuffer(reader.lons, dtype=np.float64), np.frombuffer(reader.lats, dtype=np.float64),
+    )
+    return dict(ids=ids[inside], id_range=_id_range_of(ids))
+
+
+def _ways_touching(chunk, inside_nodes_path):
+    reader = _WayReader()
+    _read(reader, chunk)
+    ids, node_counts, node_ids = reader.as_arrays()
+    selected = _any_per_segment(_contained_in(node_ids, _shared_ids(inside_nodes_path)), node_counts)
+    return dict(
+        ids=ids[selected], node_ids=np.unique(node_ids[np.repeat(selected, node_counts)]), id_range=_id_range_of(ids),
+    )
+
+
+def _relations_touching(chunk, inside_nodes_path, selected_ways_path):
+    reader = _RelationReader()
+    _read(reader, chunk)
+    ids = np.frombuffer(reader.ids, dtype=np.int64)
+    is_complex = np.frombuffer(reader.is_complex, dtype=np.int8).astype(bool)
+    node_relations, node_ids = reader.member_arrays('n')
+    way_relations, way_ids = reader.member_arrays('w')
+    relation_relations, relation_ids = reader.member_arrays('r')
+
+    selected = np.zeros(ids.shape, dtype=bool)
+    selected[node_relations[_contained_in(node_ids, _shared_ids(inside_nodes_path))]] = True
+    relations_with_selected_ways = way_relations[_contained_in(way_ids, _shared_ids(selected_ways_path))]
+    selected[relations_with_selected_ways] = True
+    complex_relations = np.zeros(ids.shape, dtype=bool)
+    complex_relations[relations_with_selected_ways] = True
+    complex_relations &= is_complex
+    return dict(
+        ids=ids[selected],
+        complex_relation_way_ids=np.unique(way_ids[complex_relations[way_relations]]),
+        relation_members=np.column_stack((ids[relation_relations], relation_ids)),
+        id_range=_id_range_of(ids),
+    )
+
+
+def _nodes_of_ways(chunk, way_ids_path):
+    reader = _WayReader()
+    _read(reader, chunk)
+    ids, node_counts, node_ids = reader.as_arrays()
+    selected = _contained_in(ids, _shared_ids(way_ids_path))
+    return dict(node_ids=np.unique(node_ids[np.repeat(selected, node_counts)]))
+
+
+class _ChunkWriter(osmium.SimpleHandler):
+    def __init__(self, writer, node_ids, way_ids, relation_ids):
+        super().__init__()
+        self._writer = writer
+        self._ids = dict(nodes=set(node_ids.tolist()), ways=set(way_ids.tolist()), relations=set(relation_ids.tolist()))
+        self.counts = dict(nodes=0, ways=0, relations=0)
+
+    def _write(self, kind, element, add):
+        if element.id in self._ids[kind]:
+            add(element)
+            self.counts[kind] += 1
+
+    def node(self, node):
+        self._write('nodes', node, self._writer.add_node)
+
+    def way(self, way):
+        self._write('ways', way, self._writer.add_way)
+
+    def relation(self, relation):
+        self._write('relations', relation, self._writer.add_relation)
+
+
+def _write_chunk(chunk, out_path, node_ids, way_ids, relation_ids):
+    writer = osmium.SimpleWriter(out_path)
+    try:
+        chunk_writer = _ChunkWriter(writer, node_ids, way_ids, relation_ids)
+        if node_ids.size + way_ids.size + relation_ids.size > 0:
+            _read(chunk_writer, chunk)
+    finally:
+        writer.close()
+    return chunk_writer.counts
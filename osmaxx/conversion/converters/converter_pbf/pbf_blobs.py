@@ -0,0 +1,143 @@
+"""
+Just enough of the PBF format to split a PBF file into blobs and put blobs of several files together.
+
+A PBF file is a sequence of blobs, each prefixed by its 4 byte big endian header length and its header,
+whose field 1 is the blob type (`OSMHeader` or `OSMData`) and field 3 the size of the blob data.
+
+Shared with the PBF updater, which builds the blob index (see `osm_pbf_updater/pbf_blob_index.py`) and has this
+module copied into its image, so it must not depend on anything beyond the standard library.
+"""
+import io
+import shutil
+import struct
+import zlib
+
+HEADER_BLOB_TYPE = 'OSMHeader'
+DATA_BLOB_TYPE = 'OSMData'
+
+_COPY_BUFFER_SIZE = 16 * 1024 * 1024
+
+_WIRE_TYPE_VARINT, _WIRE_TYPE_64BIT, _WIRE_TYPE_LENGTH_DELIMITED, _WIRE_TYPE_32BIT = 0, 1, 2, 5
+
+
+def read_varint(buffer, position):
+    """
+    Returns:
+        `(value, position)` of the varint at `position` of `buffer` and the position following it
+    """
+    result, shift = 0, 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+
+
+def fields(buffer):
+    """
+    Yields `(field_number, value)` of a protocol buffers message; `value` is an int for varints, a memoryview
+    otherwise.
+    """
+    buffer = memoryview(buffer)
+    position, end = 0, len(buffer)
+    while position < end:
+        key, position = read_varint(buffer, position)
+        field_number, wire_type = key >> 3, key & 0x07
+        if wire_type == _WIRE_TYPE_VARINT:
+            value, position = read_varint(buffer, position)
+        elif wire_type == _WIRE_TYPE_LENGTH_DELIMITED:
+            length, position = read_varint(buffer, position)
+            value, position = buffer[position:position + length], position + length
+        elif wire_type == _WIRE_TYPE_64BIT:
+            value, position = buffer[position:position + 8], position + 8
+        elif wire_type == _WIRE_TYPE_32BIT:
+            value, position = buffer[position:position + 4], position + 4
+        else:
+            raise ValueError('unsupported wire type {}'.format(wire_type))
+        yield field_number, value
+
+
+def read_blob_positions(pbf_file):
+    """
+    Returns:
+        list of `(offset, length, blob_type)` of all blobs in the file, found by only reading their headers
+    """
+    positions = []
+    offset = 0
+    while True:
+        pbf_file.seek(offset)
+        length_prefix = pbf_file.read(4)
+        if len(length_prefix) < 4:
+            return positions
+        header_length, = struct.unpack('!I', length_prefix)
+        blob_type, data_size = None, 0
+        for field_number, value in fields(pbf_file.read(header_length)):
+            if field_number == 1:
+                blob_type = bytes(value).decode('utf-8')
+            elif field_number == 3:
+                data_size = value
+        length = 4 + header_length + data_size
+        positions.append((offset, length, blob_type))
+        offset += length
+
+
+def blob_data(pbf_buffer, offset, length):
+    """
+    Returns:
+        the uncompressed content of the blob at `offset` of `pbf_buffer` (e.g. the memory mapped file)
+    """
+    header_length, = struct.unpack('!I', pbf_buffer[offset:offset + 4])
+    blob = pbf_buffer[offset + 4 + header_length:offset + length]
+    raw = zlib_data = None
+    for field_number, value in fields(blob):
+        if field_number == 1:
+            raw = value
+        elif field_number == 3:
+            zlib_data = value
+    if raw is not None:
+        return bytes(raw)
+    if zlib_data is not None:
+        return zlib.decompress(zlib_data)
+    raise ValueError('unsupported blob compression at offset {}'.format(offset))
+
+
+def copy_blobs(pbf_file, positions, out_file):
+    """
+    Appends the blobs at `positions` (as returned by `read_blob_positions`) of `pbf_file` to `out_file`.
+    """
+    for offset, length, _ in positions:
+        pbf_file.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = pbf_file.read(min(_COPY_BUFFER_SIZE, remaining))
+            if not chunk:
+                raise ValueError('{} ends within a blob'.format(pbf_file.name))
+            out_file.write(chunk)
+            remaining -= len(chunk)
+
+
+def read_blobs(pbf_file, positions):
+    """
+    Returns:
+        the blobs at `positions` (as returned by `read_blob_positions`) of `pbf_file`, as a PBF file's bytes
+    """
+    out_file = io.BytesIO()
+    copy_blobs(pbf_file, positions, out_file)
+    return out_file.getvalue()
+
+
+def concatenate(pbf_paths, out_path):
+    """
+    Puts PBF files, each sorted and holding elements following those of the previous one, together into one,
+    keeping the header of the first.
+    """
+    with open(out_path, 'wb') as out_file:
+        for number, pbf_path in enumerate(pbf_paths):
+            with open(pbf_path, 'rb') as pbf_file:
+                if number == 0:
+                    shutil.copyfileobj(pbf_file, out_file, _COPY_BUFFER_SIZE)
+                    continue
+                positions = read_blob_positions(pbf_file)
+                copy_blobs(pbf_file, [position for position in positions if position[2] == DATA_BLOB_TYPE], out_file)
@@ -0,0 +1,80 @@
+"""
+The PBF updater (see `osm_pbf_updater/pbf_updater.py`) publishes each version of the planet as a generation
+directory and switches `PBF_PLANET_FILE_PATH` to the latest one. Generations being read aren't deleted.
+Along with the planet, a generation holds the artifacts derived from it (see `osm_pbf_updater/artifacts.py`).
+"""
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+# keep in sync with osm_pbf_updater/pbf_updater.py and osm_pbf_updater/artifacts.py
+GENERATION_LOCK_FILE_NAME = '.lock'
+MANIFEST_FILE_NAME = 'artifacts.json'
+
+# a generation can only vanish between resolving and locking it if several generations are published meanwhile
+_RESOLVE_ATTEMPTS = 3
+
+
+@contextmanager
+def planet_generation(planet_file_path):
+    """
+    Resolves the planet to the file of its current generation, which is kept until leaving the context,
+    however often the planet is updated meanwhile.
+
+    Yields:
+        the path of the planet file of the generation, to be used instead of `planet_file_path` within the context
+    """
+    if not os.path.islink(planet_file_path):
+        # not published as a generation, e.g. a planet put in place by hand
+        yield os.path.realpath(planet_file_path)
+        return
+    for _ in range(_RESOLVE_ATTEMPTS):
+        generation_planet_file_path = os.path.realpath(planet_file_path)
+        lock_file_path = os.path.join(os.path.dirname(generation_planet_file_path), GENERATION_LOCK_FILE_NAME)
+        try:
+            lock_file = open(lock_file_path, 'r')
+        except FileNotFoundError:
+            continue
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            if os.path.exists(generation_planet_file_path):
+                yield generation_planet_file_path
+                return
+    raise FileNotFoundError('no generation of {} could be locked'.format(planet_file_path))
+
+
+def bounded_extracts(generation_planet_file_path):
+    """
+    Returns:
+        `(path, bbox)` of the extracts built along with the planet's generation which were cut along a bounding box
+    """
+    generation_dir = os.path.dirname(generation_planet_file_path)
+    manifest_path = os.path.join(generation_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return []
+    with open(manifest_path, 'r') as manifest_file:
+        manifest = json.load(manifest_file)
+    return [
+        (os.path.join(generation_dir, artifact['path']), tuple(artifact['bbox']))
+        for artifact in manifest['artifacts'].values() if artifact['type'] == 'extract' and 'bbox' in artifact
+    ]
+
+
+def smallest_extract_containing(extracts, extent):
+    """
+    Args:
+        extracts: `(path, bbox)` as returned by `bounded_extracts`
+        extent: `(min_lon, min_lat, max_lon, max_lat)`
+
+    Returns:
+        the path of the smallest extract containing everything within `extent`, `None` if there is none
+    """
+    min_lon, min_lat, max_lon, max_lat = extent
+    candidates = [
+        ((bbox[2] - bbox[0]) * (bbox[3] - bbox[1]), path) for path, bbox in extracts
+        if bbox[0] <= min_lon and bbox[1] <= min_lat and max_lon <= bbox[2] and max_lat <= bbox[3]
+    ]
+    if not candidates:
+        return None
+    return min(candidates)[1]
@@ -0,0 +1,61 @@
+import numpy as np
+
+# points x edges compared at once, bounding the size of the intermediate arrays
+_POINTS_PER_BLOCK = 4096
+_EDGES_PER_BLOCK = 256
+
+
+class PolygonFilter:
+    """
+    Tells which points lie inside a (multi)polygon, for many points at once.
+
+    Uses the even-odd rule over all rings, so holes and several polygons need no special treatment,
+    as long as the polygons don't overlap, which the polygons of a polygon filter file never do.
+    """
+
+    def __init__(self, rings):
+        """
+        Args:
+            rings: sequences of `(lon, lat)` of all outer rings and holes
+        """
+        edges = []
+        for ring in rings:
+            ring = np.asarray(ring, dtype=np.float64)
+            if not np.array_equal(ring[0], ring[-1]):
+                ring = np.vstack((ring, ring[:1]))
+            edges.append(np.hstack((ring[:-1], ring[1:])))
+        edges = np.vstack(edges)
+        # horizontal edges are never crossed by the horizontal rays used
+        self._edges = edges[edges[:, 1] != edges[:, 3]]
+        self.extent = (
+            self._edges[:, [0, 2]].min(), self._edges[:, [1, 3]].min(),
+            self._edges[:, [0, 2]].max(), self._edges[:, [1, 3]].max(),
+        )
+
+    @classmethod
+    def from_multipolygon(cls, multipolygon):
+        return cls([ring for polygon in multipolygon.coords for ring in polygon])
+
+    def contains(self, lons, lats):
+        """
+        Returns:
+            boolean array telling which of the points are inside
+        """
+        lons, lats = np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64)
+        min_lon, min_lat, max_lon, max_lat = self.extent
+        inside = np.zeros(lons.shape, dtype=bool)
+        candidates = np.flatnonzero((lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat))
+        for start in range(0, candidates.size, _POINTS_PER_BLOCK):
+            block = candidates[start:start + _POINTS_PER_BLOCK]
+            inside[block] = self._crossings_are_odd(lons[block, np.newaxis], lats[block, np.newaxis])
+        return inside
+
+    def _crossings_are_odd(self, lons, lats):
+        crossings = np.zeros(lons.shape[0], dtype=np.int64)
+        for start in range(0, self._edges.shape[0], _EDGES_PER_BLOCK):
+            lon_1, lat_1, lon_2, lat_2 = self._edges[start:start + _EDGES_PER_BLOCK].T
+            # cast a ray from each point eastwards and count the edges it crosses
+            spans_lat = (lat_1 > lats) != (lat_2 > lats)
+            crossing_lon = lon_1 + (lats - lat_1) * (lon_2 - lon_1) / (lat_2 - lat_1)
+            crossings += np.count_nonzero(spans_lat & (lons < crossing_lon), axis=1)
+        return crossings % 2 == 1
@@ -7,10 +7,62 @@ from django.utils import timezone
 from rq import get_current_job
 
 from osmaxx.conversion._settings import CONVERSION_SETTINGS, odb_license
+from osmaxx.conversion.converters.converter_pbf import extraction, planet
+from osmaxx.conversion.converters.converter_pbf.blob_index import BlobIndex
+from osmaxx.conversion.converters.converter_pbf.polygon_filter import PolygonFilter
 from osmaxx.conversion.converters.utils import zip_folders_relative, recursive_getsize, logged_check_call
+from osmaxx.conversion.job_dispatcher import heartbeats
+from osmaxx.utils import polyfile_helpers
 
 
 def cut_area_from_pbf(pbf_result_file_path, extent_polyfile_path):
+    with planet.planet_generation(CONVERSION_SETTINGS["PBF_PLANET_FILE_PATH"]) as planet_file_path:
+        _cut_area_from_planet(planet_file_path, pbf_result_file_path, extent_polyfile_path)
+
+
+def _cut_area_from_planet(planet_file_path, pbf_result_file_path, extent_polyfile_path):
+    extracts = planet.bounded_extracts(planet_file_path)
+    blob_index = BlobIndex.for_pbf(planet_file_path)
+    if not extracts and blob_index is None:
+        _cut_area(planet_file_path, pbf_result_file_path, extent_polyfile_path)
+        return
+    extent = _read_polyfile(extent_polyfile_path).extent
+    extract_path = planet.smallest_extract_containing(extracts, extent)
+    if extract_path is not None:
+        _cut_area(extract_path, pbf_result_file_path, extent_polyfile_path)
+    elif blob_index is None:
+        _cut_area(planet_file_path, pbf_result_file_path, extent_polyfile_path)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            reduced_pbf_path = os.path.join(tmp_dir, 'reduced.osm.pbf')
+            blob_index.write_blobs(planet_file_path, blob_index.blobs_within(extent), reduced_pbf_path)
+            _cut_area(reduced_pbf_path, pbf_result_file_path, extent_polyfile_path)
+
+
+def _read_polyfile(polyfile_path):
+    with open(polyfile_path, 'r') as polyfile:
+        return polyfile_helpers.parse_poly(polyfile.readlines())
+
+
+def _cut_area(source_pbf_path, pbf_result_file_path, extent_polyfile_path):
+    if CONVERSION_SETTINGS['PBF_EXTRACTION_ENGINE'] == 'osmium':
+        cut_area_with_osmium(
+            source_pbf_path, pbf_result_file_path, extent_polyfile_path,
+            processes=CONVERSION_SETTINGS['PBF_EXTRACTION_PROCESSES'],
+        )
+    else:
+        cut_area_with_osmconvert(source_pbf_path, pbf_result_file_path, extent_polyfile_path)
+
+
+def cut_area_with_osmium(source_pbf_path, pbf_result_file_path, extent_polyfile_path, *, processes):
+    polygon_filter = PolygonFilter.from_multipolygon(_read_polyfile(extent_polyfile_path))
+    return extraction.extract(
+        source_pbf_path, polygon_filter, pbf_result_file_path,
+        processes=processes, work_dir=os.path.dirname(os.path.abspath(pbf_result_file_path)),
+    )
+
+
+def cut_area_with_osmconvert(source_pbf_path, pbf_result_file_path, extent_polyfile_path):
     command = [
         "osmconvert",
         "--out-pbf",
@@ -18,17 +70,19 @@ def cut_area_from_pbf(pbf_result_file_path, extent_polyfile_path):
         "--complex-ways",
         "-o={}".format(pbf_result_file_path),
         "-B={}".format(extent_polyfile_path),
-        "{}".format(CONVERSION_SETTINGS["PBF_PLANET_FILE_PATH"]),
+        "{}".format(source_pbf_path),
     ]
     logged_check_call(command)
 
 
 def cut_pbf_along_polyfile(polyfile_string, pbf_out_path):
+    heartbeats.stage('cut')
     with tempfile.NamedTemporaryFile('w') as polyfile:
         polyfile.write(polyfile_string)
         polyfile.flush()
         os.fsync(polyfile)
-        cut_area_from_pbf(pbf_out_path, polyfile.name)
+        with heartbeats.throughput('cut', lambda: os.path.getsize(pbf_out_path)):
+            cut_area_from_pbf(pbf_out_path, polyfile.name)
 
 
 def produce_pbf(*, output_zip_file_path, filename_prefix, osmosis_polygon_file_string, **__):
@@ -45,6 +99,7 @@ def produce_pbf(*, output_zip_file_path, filename_prefix, osmosis_polygon_file_s
 
         unzipped_result_size = recursive_getsize(out_dir)
 
+        heartbeats.stage('zip')
         zip_folders_relative([tmp_dir], output_zip_file_path)
 
     job = get_current_job()
@@ -1,8 +1,10 @@
 import logging
 import os
 import subprocess
+import tempfile
 import uuid
 import zipfile
+from contextlib import contextmanager
 from os import scandir
 
 logger = logging.getLogger(__name__)
@@ -47,3 +49,30 @@ def logged_check_call(*args, **kwargs):
     except subprocess.CalledProcessError as e:
         logger.error('Command `{}` exited with return value {}\nOutput:\n{}'.format(e.cmd, e.returncode, e.output))
         raise
+
+
+def file_fingerprint(path):
+    """
+    Identifies a version of the file at `path` without reading it, for use in cache keys.
+    """
+    stat = os.stat(path)
+    return '{}:{}:{}'.format(os.path.basename(path), stat.st_size, stat.st_mtime_ns)
+
+
+@contextmanager
+def atomic_write(target_path, mode='wb'):
+    """
+    Opens a temporary file next to `target_path`, which replaces `target_path` once written completely.
+
+    Readers, e.g. concurrent jobs sharing a cache, thus never see partially written files.
+    """
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(target_path), prefix='.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(file_descriptor, mode) as temporary_file:
+            yield temporary_file
+        os.replace(temporary_path, target_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
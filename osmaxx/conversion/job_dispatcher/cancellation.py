@@ -0,0 +1,132 @@
+"""
+Running jobs are cancelled cooperatively.
+
+The conversion service flags the job in Redis. The heartbeat thread of the worker running the job notices the flag
+(see heartbeats.py), kills all processes the job has started and runs the job's cancel callbacks, e.g. terminating
+its database sessions. The job then fails with the command or query it was running, or at its next stage at the
+latest.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+KEY_TEMPLATE = 'osmaxx:conversion:cancelled:{}'
+# the flag only needs to outlive the job it cancels
+REQUEST_TTL_SECONDS = 2 * 24 * 60 * 60
+KILL_GRACE_SECONDS = 5
+
+_cancelled = threading.Event()
+_callbacks = []
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def request(connection, rq_job_id):
+    connection.set(KEY_TEMPLATE.format(rq_job_id), 1, ex=REQUEST_TTL_SECONDS)
+
+
+def is_requested(connection, rq_job_id):
+    return bool(connection.exists(KEY_TEMPLATE.format(rq_job_id)))
+
+
+def is_cancelled():
+    """
+    Whether the job run by this worker has been cancelled.
+    """
+    return _cancelled.is_set()
+
+
+def raise_if_cancelled():
+    if _cancelled.is_set():
+        raise JobCancelled()
+
+
+def reset():
+    _cancelled.clear()
+
+
+@contextmanager
+def on_cancel(callback):
+    """
+    Calls `callback` if the job is cancelled while in the context.
+    """
+    _callbacks.append(callback)
+    try:
+        yield
+    finally:
+        _callbacks.remove(callback)
+
+
+def cancel_current_job():
+    _cancelled.set()
+    kill_descendant_processes()
+    for callback in list(_callbacks):
+        try:
+            callback()
+        except Exception:  # the other callbacks still have to run
+            logger.exception('cancel callback %s failed', callback)
+
+
+def kill_descendant_processes():
+    """
+    Terminates all processes started by this one, directly or not, and kills those still running after
+    `KILL_GRACE_SECONDS`.
+    """
+    pids = _descendants(os.getpid())
+    _signal_all(pids, signal.SIGTERM)
+    deadline = time.monotonic() + KILL_GRACE_SECONDS
+    while pids and time.monotonic() < deadline:
+        time.sleep(0.1)
+        pids = [pid for pid in pids if _is_running(pid)]
+    _signal_all(pids, signal.SIGKILL)
+
+
+def _descendants(pid):
+    children = {}
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(os.path.join(entry.path, 'stat')) as stat_file:
+                stat = stat_file.read()
+        except OSError:  # gone in the meantime
+            continue
+        # the command name in parentheses may contain spaces, the parent's pid is the second field after it
+        parent_pid = int(stat[stat.rindex(')') + 2:].split()[1])
+        children.setdefault(parent_pid, []).append(int(entry.name))
+    descendants = []
+    parents = [pid]
+    while parents:
+        for child in children.get(parents.pop(), []):
+            descendants.append(child)
+            parents.append(child)
+    return descendants
+
+
+def _signal_all(pids, signal_number):
+    for pid in pids:
+        try:
+            os.kill(pid, signal_number)
+        except ProcessLookupError:
+            pass
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # terminated children of this process remain as zombies until they're waited for
+    try:
+        with open('/proc/{}/stat'.format(pid)) as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return False
+    return stat[stat.rindex(')') + 2:].split()[0] != 'Z'
@@ -0,0 +1,84 @@
+"""
+Conversion jobs publish their progress as events to a Redis stream, which the result harvester consumes as
+they arrive instead of polling every job.
+
+An event carries the id of the RQ job and the status it has reached. Events are only a shortcut: the harvester
+still reconciles the jobs with RQ now and then, in case a worker died before publishing an event.
+"""
+import logging
+
+from redis.exceptions import RedisError, ResponseError
+
+logger = logging.getLogger(__name__)
+
+STREAM = 'osmaxx:conversion:events'
+# events are consumed within seconds, so the stream only needs to bridge a restart of the harvester
+STREAM_MAX_LENGTH = 10000
+CONSUMER_GROUP = 'result_harvester'
+
+
+def publish(connection, *, rq_job_id, status):
+    """
+    Publishes that the job has reached `status`. Failing to publish is logged, but doesn't affect the job,
+    the harvester notices the status when reconciling anyway.
+    """
+    try:
+        connection.xadd(STREAM, {'rq_job_id': rq_job_id, 'status': status}, maxlen=STREAM_MAX_LENGTH)
+    except RedisError:
+        logger.exception('failed to publish that job %s is %s', rq_job_id, status)
+
+
+def published_at(event_id):
+    """
+    Returns:
+        when the event has been published, in seconds since the epoch, as told by its id
+    """
+    if isinstance(event_id, bytes):
+        event_id = event_id.decode()
+    return int(event_id.split('-')[0]) / 1000
+
+
+class EventConsumer:
+    """
+    Reads the events as a member of the harvester's consumer group, so events published while the harvester
+    was down are read after its restart.
+    """
+
+    def __init__(self, connection, *, consumer_name):
+        self._connection = connection
+        self._consumer_name = consumer_name
+        try:
+            self._connection.xgroup_create(STREAM, CONSUMER_GROUP, id='$', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        # events read, but not acknowledged before a restart are read again first
+        self._next_id = '0'
+
+    def read(self, *, block_seconds, count=100):
+        """
+        Waits up to `block_seconds` for events.
+
+        Returns:
+            `(event_id, rq_job_id, status)` of the events, to be acknowledged once handled; `rq_job_id` and
+            `status` are `None` if an event has been trimmed from the stream before being acknowledged
+        """
+        response = self._connection.xreadgroup(
+            CONSUMER_GROUP, self._consumer_name, {STREAM: self._next_id}, count=count,
+            block=None if self._next_id != '>' else max(int(block_seconds * 1000), 1),
+        )
+        events = [
+            (event_id, _decoded(fields, b'rq_job_id'), _decoded(fields, b'status'))
+            for _, stream_events in response or [] for event_id, fields in stream_events
+        ]
+        if self._next_id != '>' and not events:
+            self._next_id = '>'
+        return events
+
+    def acknowledge(self, event_id):
+        self._connection.xack(STREAM, CONSUMER_GROUP, event_id)
+
+
+def _decoded(fields, key):
+    value = (fields or {}).get(key)
+    return value.decode() if value is not None else None
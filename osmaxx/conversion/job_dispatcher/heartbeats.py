@@ -0,0 +1,200 @@
+"""
+Workers send heartbeats for each job they run, along with the stage the job is in. The harvester can then tell
+within minutes that a job's worker is gone, instead of waiting for RQ's timeout of days.
+
+Each beat sets the job's score in a sorted set to the time of the beat, so the jobs whose last beat is too old
+are found with a single range query.
+
+The heartbeat thread also watches for the job being cancelled, see cancellation.py. Along with the stages, the
+workers record the metrics of their jobs (see metrics.py), which the conversion service then exposes.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from redis.exceptions import RedisError
+
+from osmaxx.conversion import metrics
+from osmaxx.conversion.job_dispatcher import cancellation
+
+logger = logging.getLogger(__name__)
+
+BEATS = 'osmaxx:conversion:heartbeats'
+STAGES = 'osmaxx:conversion:heartbeat_stages'
+CANCELLATION_POLL_SECONDS = 5
+# upper bounds of the buckets
+STAGE_DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400, 43200)  # seconds
+THROUGHPUT_BUCKETS = (1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8, 1e9)  # bytes per second
+OUTPUT_SIZE_BUCKETS = (1e5, 1e6, 1e7, 1e8, 5e8, 1e9, 5e9, 1e10, 5e10)  # bytes
+
+_current_heartbeat = None
+
+
+class Heartbeat:
+    """
+    Beats every `interval_seconds` from a thread of its own while the job runs, and cancels the job once that has
+    been requested.
+    """
+
+    def __init__(self, connection, *, rq_job_id, interval_seconds, conversion_format=None):
+        self._connection = connection
+        self._rq_job_id = rq_job_id
+        self._interval_seconds = interval_seconds
+        self._labels = {'format': conversion_format} if conversion_format is not None else {}
+        self._stage = 'started'
+        self._stage_started_at = time.monotonic()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._beat_until_stopped, daemon=True)
+
+    def __enter__(self):
+        global _current_heartbeat
+        cancellation.reset()
+        self._beat()
+        self._cancel_if_requested()
+        self._thread.start()
+        _current_heartbeat = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _current_heartbeat
+        _current_heartbeat = None
+        self._stopped.set()
+        self._thread.join()
+        self._observe_stage_duration()
+        try:
+            forget(self._connection, [self._rq_job_id])
+        except RedisError:
+            logger.exception('failed to stop the heartbeats of job %s', self._rq_job_id)
+
+    def set_stage(self, stage):
+        cancellation.raise_if_cancelled()
+        self._observe_stage_duration()
+        self._stage = stage
+        self._stage_started_at = time.monotonic()
+        self._beat()
+
+    def record_throughput(self, stage, byte_count, seconds):
+        metrics.observe(
+            'osmaxx_stage_throughput_bytes_per_second', byte_count / max(seconds, 1e-3), buckets=THROUGHPUT_BUCKETS,
+            labels=dict(self._labels, stage=stage), connection=self._connection,
+        )
+
+    def record_output_size(self, output_path):
+        try:
+            output_size = os.path.getsize(output_path)
+        except OSError:
+            logger.exception('failed to record the size of %s', output_path)
+            return
+        metrics.observe(
+            'osmaxx_output_size_bytes', output_size, buckets=OUTPUT_SIZE_BUCKETS, labels=self._labels,
+            connection=self._connection,
+        )
+
+    def _observe_stage_duration(self):
+        metrics.observe(
+            'osmaxx_stage_duration_seconds', time.monotonic() - self._stage_started_at, buckets=STAGE_DURATION_BUCKETS,
+            labels=dict(self._labels, stage=self._stage), connection=self._connection,
+        )
+
+    def _beat_until_stopped(self):
+        next_beat = time.monotonic() + self._interval_seconds
+        while not self._stopped.wait(min(CANCELLATION_POLL_SECONDS, self._interval_seconds)):
+            self._cancel_if_requested()
+            if time.monotonic() >= next_beat:
+                self._beat()
+                next_beat += self._interval_seconds
+
+    def _cancel_if_requested(self):
+        if cancellation.is_cancelled():
+            return
+        try:
+            requested = cancellation.is_requested(self._connection, self._rq_job_id)
+        except RedisError:
+            logger.exception('failed to check whether job %s has been cancelled', self._rq_job_id)
+            return
+        if requested:
+            logger.info('cancelling job %s', self._rq_job_id)
+            cancellation.cancel_current_job()
+
+    def _beat(self):
+        try:
+            with self._connection.pipeline(transaction=False) as pipeline:
+                pipeline.zadd(BEATS, {self._rq_job_id: time.time()})
+                pipeline.hset(STAGES, self._rq_job_id, json.dumps(
+                    {'stage': self._stage, 'worker': socket.gethostname()}
+                ))
+                pipeline.execute()
+        except RedisError:
+            logger.exception('failed to send a heartbeat of job %s', self._rq_job_id)
+
+
+def stage(name):
+    """
+    Reports that the job run by this worker has reached the stage `name`. Does nothing outside of a job.
+
+    Raises:
+        JobCancelled: if the job has been cancelled
+    """
+    if _current_heartbeat is not None:
+        _current_heartbeat.set_stage(name)
+
+
+@contextmanager
+def throughput(stage_name, byte_count):
+    """
+    Records the bytes per second the work in the context processes, `byte_count()` telling how many bytes it
+    processed once done. Does nothing outside of a job.
+    """
+    start = time.monotonic()
+    yield
+    if _current_heartbeat is None:
+        return
+    seconds = time.monotonic() - start
+    try:
+        processed_bytes = byte_count()
+    except OSError:
+        logger.exception('failed to record the throughput of stage %s', stage_name)
+        return
+    _current_heartbeat.record_throughput(stage_name, processed_bytes, seconds)
+
+
+@contextmanager
+def reporting_to(reporter):
+    """
+    Reports the stages and throughputs of the work in the context to `reporter` instead of the heartbeat of a job,
+    e.g. to time a conversion run outside of a worker. `reporter` needs `set_stage` and `record_throughput` like
+    `Heartbeat`.
+    """
+    global _current_heartbeat
+    previous, _current_heartbeat = _current_heartbeat, reporter
+    try:
+        yield reporter
+    finally:
+        _current_heartbeat = previous
+
+
+def stale(connection, *, timeout_seconds):
+    """
+    Returns:
+        `(rq_job_id, last_beat, stage)` of the jobs without a heartbeat for `timeout_seconds`, `last_beat` as
+        seconds since the epoch and `stage` as `{'stage': ..., 'worker': ...}`
+    """
+    beats = connection.zrangebyscore(BEATS, 0, time.time() - timeout_seconds, withscores=True)
+    if not beats:
+        return []
+    stages = connection.hmget(STAGES, [rq_job_id for rq_job_id, _ in beats])
+    return [
+        (rq_job_id.decode(), last_beat, json.loads(job_stage.decode()) if job_stage is not None else {})
+        for (rq_job_id, last_beat), job_stage in zip(beats, stages)
+    ]
+
+
+def forget(connection, rq_job_ids):
+    with connection.pipeline(transaction=False) as pipeline:
+        pipeline.zrem(BEATS, *rq_job_ids)
+        pipeline.hdel(STAGES, *rq_job_ids)
+        pipeline.execute()
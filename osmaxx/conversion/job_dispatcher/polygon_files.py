@@ -0,0 +1,51 @@
+"""
+Clipping polygons are handed to the workers as files on the storage they share with the conversion service,
+so the payloads of the RQ jobs kept in Redis don't carry them.
+
+The files are named after their content, so an area exported again reuses the file of its polygon.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
+
+
+def store(polyfile_string):
+    """
+    Returns:
+        the path of the file holding the polygon
+    """
+    directory = CONVERSION_SETTINGS['POLYGON_FILE_DIRECTORY']
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, hashlib.sha256(polyfile_string.encode('utf-8')).hexdigest() + '.poly')
+    try:
+        # keeps it from being deleted as unused
+        os.utime(path)
+    except FileNotFoundError:
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as polygon_file:
+            polygon_file.write(polyfile_string)
+        os.replace(polygon_file.name, path)
+    return path
+
+
+def load(path):
+    with open(path, 'r') as polygon_file:
+        return polygon_file.read()
+
+
+def delete_unused(*, max_age):
+    """
+    Deletes the polygons not stored again for `max_age`, which must exceed the time a job may be queued.
+    """
+    directory = CONVERSION_SETTINGS['POLYGON_FILE_DIRECTORY']
+    if not os.path.isdir(directory):
+        return
+    oldest_kept = time.time() - max_age.total_seconds()
+    for entry in os.scandir(directory):
+        if entry.stat().st_mtime < oldest_kept:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:  # deleted by another harvester
+                pass
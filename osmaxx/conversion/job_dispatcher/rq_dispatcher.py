@@ -1,6 +1,9 @@
-from django_rq import get_queue
+from django_rq import get_connection, get_queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job as RQJob, JobStatus
 
 from osmaxx.conversion import _settings
+from osmaxx.conversion.job_dispatcher import cancellation
 
 
 def enqueue(func, *args, **kwargs):
@@ -12,6 +15,22 @@ def rq_enqueue_with_settings(function, *args, **kwargs):
     return enqueue(
         function,
         result_ttl=_settings.CONVERSION_SETTINGS['RESULT_TTL'],
+        failure_ttl=_settings.CONVERSION_SETTINGS['FAILURE_TTL'],
         *args,
         **kwargs
     )
+
+
+def cancel(rq_job_id):
+    """
+    Cancels the job: a job still waiting is removed from its queue, a running one is stopped by its worker.
+    """
+    connection = get_connection()
+    # requested in any case, the job may be started by a worker right now
+    cancellation.request(connection, rq_job_id)
+    try:
+        rq_job = RQJob.fetch(rq_job_id, connection=connection)
+    except NoSuchJobError:
+        return
+    if rq_job.get_status() in (JobStatus.QUEUED, JobStatus.DEFERRED):
+        rq_job.delete()
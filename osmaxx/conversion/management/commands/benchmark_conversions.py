@@ -0,0 +1,51 @@
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from osmaxx.conversion import output_format
+from osmaxx.conversion.benchmark import suite, synthetic
+
+
+class Command(BaseCommand):
+    help = 'converts synthetic areas to each format end to end, reports the run times of the stages and the sizes ' \
+           'of the outputs as JSON, and compares them against those of a baseline run - to be run within a worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', dest='scenarios', nargs='+', choices=synthetic.SCENARIOS, default=list(synthetic.SCENARIOS),
+        )
+        parser.add_argument(
+            '--scale', dest='scales', nargs='+', choices=list(suite.SCALES), default=['small', 'medium'],
+            help='cells of about 200 m per side of the areas: {}'.format(
+                ', '.join('{} {}'.format(name, cells) for name, cells in suite.SCALES.items())
+            ),
+        )
+        parser.add_argument(
+            '--format', dest='formats', nargs='+', choices=list(output_format.ALL), default=list(suite.DEFAULT_FORMATS),
+        )
+        parser.add_argument('--repeat', type=int, default=1, help='runs per conversion, the median being reported')
+        parser.add_argument('--output', help='file to write the results to, instead of standard output')
+        parser.add_argument('--baseline', help='results of an earlier run to compare against')
+        parser.add_argument(
+            '--tolerance', type=float, default=suite.DEFAULT_TOLERANCE,
+            help='fraction by which durations and output sizes may exceed those of the baseline',
+        )
+        parser.add_argument('--work-dir', help='where to keep the synthetic data and the outputs while running')
+
+    def handle(self, *args, scenarios, scales, formats, repeat, output, baseline, tolerance, work_dir, **options):
+        with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+            results = suite.run(scenarios=scenarios, scales=scales, formats=formats, work_dir=tmp_dir, repeat=repeat)
+        if output is None:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            with open(output, 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+        if baseline is None:
+            return
+        with open(baseline, 'r') as baseline_file:
+            regressions = suite.compare(results, json.load(baseline_file), tolerance=tolerance)
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError('{} regressions against {}'.format(len(regressions), baseline))
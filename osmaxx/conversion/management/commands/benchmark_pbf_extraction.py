@@ -0,0 +1,37 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from osmaxx.conversion.converters.converter_pbf.to_pbf import cut_area_with_osmconvert, cut_area_with_osmium
+
+
+class Command(BaseCommand):
+    help = 'cuts an area from a PBF file using osmconvert and the osmium based engine, and compares the run times'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pbf_path')
+        parser.add_argument('polyfile_path')
+        parser.add_argument(
+            '--processes', type=int, nargs='+', default=[1, 4, 16],
+            help='numbers of processes to run the osmium based engine with',
+        )
+
+    def handle(self, *args, pbf_path, polyfile_path, processes, **options):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out_path = os.path.join(tmp_dir, 'osmconvert.osm.pbf')
+            self._report('osmconvert', out_path, _timed(cut_area_with_osmconvert, pbf_path, out_path, polyfile_path))
+            for process_count in processes:
+                out_path = os.path.join(tmp_dir, 'osmium-{}.osm.pbf'.format(process_count))
+                duration = _timed(cut_area_with_osmium, pbf_path, out_path, polyfile_path, processes=process_count)
+                self._report('osmium, {} processes'.format(process_count), out_path, duration)
+
+    def _report(self, engine, out_path, duration):
+        self.stdout.write('{:<24} {:>10.1f}s {:>14} bytes'.format(engine, duration, os.path.getsize(out_path)))
+
+
+def _timed(function, *args, **kwargs):
+    start = time.monotonic()
+    function(*args, **kwargs)
+    return time.monotonic() - start
@@ -0,0 +1,148 @@
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+
+import django_rq
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from osmaxx.clipping_area.models import ClippingArea
+from osmaxx.conversion import models as conversion_models, status
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
+from osmaxx.conversion.management.commands.result_harvester import add_meta_data_to_job, aware_timestamp, fetch_jobs
+
+logging.basicConfig()
+logger = logging.getLogger(__name__)
+
+# the time the exports have been ranked at last, as a unix timestamp
+RANKED_AT = 'osmaxx:conversion:pregeneration_ranked_at'
+
+
+class Command(BaseCommand):
+    help = 'converts the most ordered exports ahead of being ordered, during off-peak hours - runs until interrupted'
+
+    def handle(self, *args, **options):
+        while True:
+            now = timezone.localtime()
+            if CONVERSION_SETTINGS['PREGENERATED_EXPORTS'] > 0 and is_off_peak(now) and not ranked_since(
+                    off_peak_start(now)):
+                logger.info('pre-generating the most ordered exports')
+                pregenerate_most_ordered_exports()
+                # also if no export qualified, so the ranking isn't repeated within the off-peak period
+                record_ranking(now)
+            logger.info('handling pre-generated exports')
+            harvest_pregenerated_exports()
+            delete_stale_pregenerated_exports()
+            time.sleep(CONVERSION_SETTINGS['result_harvest_interval_seconds'])
+
+
+def is_off_peak(local_time):
+    start, end = CONVERSION_SETTINGS['PREGENERATION_OFF_PEAK_HOURS']
+    if start <= end:
+        return start <= local_time.hour < end
+    return local_time.hour >= start or local_time.hour < end
+
+
+def off_peak_start(local_time):
+    """
+    Returns:
+        the start of the latest off-peak period started at `local_time`
+    """
+    start, _ = CONVERSION_SETTINGS['PREGENERATION_OFF_PEAK_HOURS']
+    period_start = local_time.replace(hour=start, minute=0, second=0, microsecond=0)
+    if period_start > local_time:
+        period_start -= timedelta(days=1)
+    return period_start
+
+
+def ranked_since(point_in_time, *, connection=None):
+    ranked_at = (connection or django_rq.get_connection()).get(RANKED_AT)
+    return ranked_at is not None and float(ranked_at) >= point_in_time.timestamp()
+
+
+def record_ranking(point_in_time, *, connection=None):
+    (connection or django_rq.get_connection()).set(RANKED_AT, point_in_time.timestamp())
+
+
+def most_ordered_parametrizations(*, count, min_orders, history_jobs):
+    """
+    Ranks the exports ordered by the latest `history_jobs` finished jobs by how often they were ordered.
+
+    Orders are of the same export if they have the same parameters and clip the very same area, which is
+    what the countries and administrative areas offered by the frontend do.
+
+    Returns:
+        `(order_count, parametrization)` of the `count` most ordered exports ordered at least `min_orders` times,
+        along with the latest parametrization of each
+    """
+    latest_jobs = conversion_models.Job.objects.filter(status=status.FINISHED).order_by('-id')[:history_jobs]
+    orders = list(latest_jobs.values_list(
+        'parametrization_id', 'parametrization__clipping_area_id', 'parametrization__clipping_area__name',
+        'parametrization__out_format', 'parametrization__out_srs', 'parametrization__detail_level',
+    ))
+    area_ids = {clipping_area_id for _, clipping_area_id, *_ in orders}
+    polygon_hashes = {
+        clipping_area.id: conversion_models.polygon_hash(clipping_area)
+        for clipping_area in ClippingArea.objects.filter(id__in=area_ids)
+    }
+
+    order_counts = Counter()
+    latest_parametrization_ids = {}
+    for parametrization_id, clipping_area_id, *parameters in orders:
+        export = (polygon_hashes[clipping_area_id],) + tuple(parameters)
+        order_counts[export] += 1
+        latest_parametrization_ids.setdefault(export, parametrization_id)
+
+    ranking = [
+        (order_count, latest_parametrization_ids[export])
+        for export, order_count in order_counts.most_common(count) if order_count >= min_orders
+    ]
+    parametrizations = conversion_models.Parametrization.objects.in_bulk(
+        [parametrization_id for _, parametrization_id in ranking]
+    )
+    return [(order_count, parametrizations[parametrization_id]) for order_count, parametrization_id in ranking]
+
+
+def pregenerate_most_ordered_exports():
+    ranking = most_ordered_parametrizations(
+        count=CONVERSION_SETTINGS['PREGENERATED_EXPORTS'],
+        min_orders=CONVERSION_SETTINGS['PREGENERATION_MIN_ORDERS'],
+        history_jobs=CONVERSION_SETTINGS['PREGENERATION_HISTORY_JOBS'],
+    )
+    for order_count, parametrization in ranking:
+        pregenerated_export = conversion_models.PregeneratedExport.objects.create(
+            parametrization=parametrization,
+            polygon_hash=conversion_models.polygon_hash(parametrization.clipping_area),
+            order_count=order_count,
+        )
+        pregenerated_export.start_conversion()
+        logger.info('pre-generating %s, ordered %d times', parametrization, order_count)
+    return len(ranking)
+
+
+def harvest_pregenerated_exports():
+    pending_exports = conversion_models.PregeneratedExport.objects.exclude(status__in=status.FINAL_STATUSES)\
+        .exclude(rq_job_id=None).select_related('parametrization__clipping_area')
+    rq_jobs = fetch_jobs([pregenerated_export.rq_job_id for pregenerated_export in pending_exports])
+    for pregenerated_export in pending_exports:
+        rq_job = rq_jobs.get(pregenerated_export.rq_job_id)
+        if rq_job is None:
+            logger.error('job %s of %s not found in queue', pregenerated_export.rq_job_id, pregenerated_export)
+            pregenerated_export.status = status.FAILED
+            pregenerated_export.save()
+            continue
+        pregenerated_export.status = rq_job.get_status()
+        if pregenerated_export.status == status.STARTED:
+            pregenerated_export.conversion_started_at = aware_timestamp(rq_job.started_at)
+        if pregenerated_export.status == status.FINISHED:
+            # the worker has already written the result to where it belongs
+            pregenerated_export.resulting_file.name = pregenerated_export.zip_file_relative_path()
+            add_meta_data_to_job(conversion_job=pregenerated_export, rq_job=rq_job)
+        pregenerated_export.save()
+
+
+def delete_stale_pregenerated_exports():
+    fresh_exports = conversion_models.PregeneratedExport.objects.fresh()
+    for pregenerated_export in conversion_models.PregeneratedExport.objects.exclude(id__in=fresh_exports):
+        pregenerated_export.delete()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from osmaxx.conversion.converters.converter_gis.helper.default_postgres import get_default_postgres_wrapper
+
+
+class Command(BaseCommand):
+    help = "drops the database GIS exports are bootstrapped in, left behind by a job whose worker was lost - " \
+           "to be run when the worker starts, the harvester can't reach the worker's database server"
+
+    def handle(self, *args, **options):
+        postgres = get_default_postgres_wrapper()
+        if postgres.db_exists():
+            postgres.drop_db()
+            self.stdout.write('dropped {}'.format(postgres.get_db_name()))
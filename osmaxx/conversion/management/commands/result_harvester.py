@@ -3,76 +3,193 @@ import time
 
 import django_rq
 import os
-import requests
 import shutil
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from pbf_file_size_estimation import estimate_size
+from rq.job import Job as RQJob
+from rq.registry import FinishedJobRegistry
 
-from osmaxx.conversion import models as conversion_models, status
+from osmaxx.conversion import capacity, metrics, models as conversion_models, status
 from osmaxx.conversion._settings import CONVERSION_SETTINGS
+from osmaxx.conversion.job_dispatcher import cancellation, events, heartbeats, polygon_files
+from osmaxx.conversion.notifications import NotificationDispatcher
 
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 
+# job hashes loaded per round trip to Redis
+FETCH_BATCH_SIZE = 500
+# upper bounds of the buckets, in seconds
+STALE_JOB_RECOVERY_BUCKETS = (60, 120, 180, 240, 300, 600, 900, 1800, 3600)
+RECONCILIATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600)
+
 
 class Command(BaseCommand):
-    help = 'updates currently active jobs - runs until interrupted'
+    help = 'updates currently active jobs as their events arrive - runs until interrupted'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._notifications = NotificationDispatcher.from_settings()
 
     def handle(self, *args, **options):
+        consumer = events.EventConsumer(django_rq.get_connection(), consumer_name='result_harvester')
+        next_reconciliation = next_heartbeat_check = time.monotonic()
         while True:
-            logger.info('handling running jobs')
-            self._handle_running_jobs()
-            logger.info('handling failed jobs')
-            self._handle_failed_jobs()
-            cleanup_old_jobs()
-            time.sleep(CONVERSION_SETTINGS['result_harvest_interval_seconds'])
-
-    def _handle_failed_jobs(self):
-        from django.conf import settings
-        for queue_name in settings.RQ_QUEUES:
-            queue = django_rq.get_queue(queue_name)
-
-            for rq_job_id in queue.failed_job_registry.get_job_ids():
+            if time.monotonic() >= next_heartbeat_check:
+                self._handle_stale_jobs()
+                capacity.publish_metrics()
+                next_heartbeat_check = time.monotonic() + CONVERSION_SETTINGS['heartbeat_check_interval_seconds']
+            if time.monotonic() >= next_reconciliation:
+                self._reconcile()
+                next_reconciliation = time.monotonic() + CONVERSION_SETTINGS['result_reconciliation_interval_seconds']
+            for event_id, rq_job_id, job_status in consumer.read(
+                    block_seconds=max(min(next_reconciliation, next_heartbeat_check) - time.monotonic(), 0)):
                 try:
-                    conversion_job = conversion_models.Job.objects.get(rq_job_id=rq_job_id)
-                except ObjectDoesNotExist as e:
-                    logger.exception(e)
-                    continue
-                self._set_failed_unless_final(conversion_job, rq_job_id=rq_job_id)
-                self._notify(conversion_job)
+                    if rq_job_id is not None:
+                        self._handle_event(rq_job_id=rq_job_id, job_status=job_status)
+                except Exception:  # the next reconciliation takes care of the job
+                    logger.exception('failed to handle the event of job %s being %s', rq_job_id, job_status)
+                finally:
+                    consumer.acknowledge(event_id)
+                    # from the worker publishing the event until it's been handled
+                    metrics.observe(
+                        'osmaxx_harvester_event_latency_seconds', time.time() - events.published_at(event_id),
+                        buckets=metrics.LATENCY_BUCKETS,
+                    )
 
-    def _handle_running_jobs(self):
-        active_jobs = conversion_models.Job.objects.exclude(status__in=status.FINAL_STATUSES)\
-            .values_list('rq_job_id', flat=True)
-        for job_id in active_jobs:
-            self._update_job(rq_job_id=job_id)
+    def _reconcile(self):
+        """
+        Updates the jobs from RQ, in case their events got lost, e.g. because a worker died.
+        """
+        start = time.monotonic()
+        logger.info('handling running jobs')
+        self._handle_running_jobs()
+        logger.info('handling failed jobs')
+        self._handle_failed_jobs()
+        cleanup_old_jobs()
+        metrics.observe(
+            'osmaxx_harvester_reconciliation_seconds', time.monotonic() - start, buckets=RECONCILIATION_BUCKETS,
+        )
 
-    def _update_job(self, rq_job_id):
-        if rq_job_id is None:
-            logger.error("rq_job_id is None, None is not a valid id!")
+    def _handle_stale_jobs(self):
+        """
+        Re-queues the jobs whose worker stopped sending heartbeats, or fails them once they have been re-queued
+        `STALE_JOB_MAX_REQUEUES` times.
+        """
+        connection = django_rq.get_connection()
+        stale_jobs = heartbeats.stale(connection, timeout_seconds=CONVERSION_SETTINGS['HEARTBEAT_TIMEOUT_SECONDS'])
+        if not stale_jobs:
             return
+        rq_job_ids = [rq_job_id for rq_job_id, _, _ in stale_jobs]
+        rq_jobs = fetch_jobs(rq_job_ids)
+        conversion_jobs = {
+            conversion_job.rq_job_id: conversion_job
+            for conversion_job in conversion_models.Job.objects.filter(rq_job_id__in=rq_job_ids)
+            .select_related('parametrization__clipping_area')
+        }
+        for rq_job_id, last_beat, job_stage in stale_jobs:
+            rq_job = rq_jobs.get(rq_job_id)
+            if rq_job is not None and rq_job.get_status() in status.FINAL_STATUSES:
+                continue  # done after all, only its last heartbeat hasn't been cleared
+            logger.error(
+                'job %s has sent no heartbeat for %d seconds, it was at stage %s on worker %s',
+                rq_job_id, time.time() - last_beat, job_stage.get('stage'), job_stage.get('worker'),
+            )
+            # the worker may be alive after all, e.g. if merely its heartbeats didn't get through
+            cancellation.request(connection, rq_job_id)
+            if rq_job is not None:
+                rq_job.delete()  # frees its slot in the registry of started jobs
+            conversion_job = conversion_jobs.get(rq_job_id)
+            if conversion_job is not None and conversion_job.status not in status.FINAL_STATUSES:
+                self._recover(conversion_job)
+            conversion_models.PregeneratedExport.objects.filter(rq_job_id=rq_job_id)\
+                .exclude(status__in=status.FINAL_STATUSES).update(status=status.FAILED)
+            metrics.observe(
+                'osmaxx_stale_job_recovery_seconds', time.time() - last_beat, buckets=STALE_JOB_RECOVERY_BUCKETS,
+            )
+        heartbeats.forget(connection, rq_job_ids)
 
-        job = fetch_job(rq_job_id, from_queues=settings.RQ_QUEUE_NAMES)
+    def _recover(self, conversion_job):
+        if conversion_job.requeue_count < CONVERSION_SETTINGS['STALE_JOB_MAX_REQUEUES']:
+            conversion_job.requeue_count += 1
+            conversion_job.start_conversion()
+            if conversion_job.status not in status.FINAL_STATUSES:  # unless completed from a pre-generated export
+                conversion_job.status = status.QUEUED
+                conversion_job.conversion_started_at = None
+            logger.info('re-queued job %s as %s', conversion_job.id, conversion_job.rq_job_id)
+        else:
+            conversion_job.status = status.FAILED
+        conversion_job.save()
+        self._notify(conversion_job)
 
+    def _handle_event(self, *, rq_job_id, job_status):
         try:
             conversion_job = conversion_models.Job.objects.get(rq_job_id=rq_job_id)
-        except ObjectDoesNotExist as e:
-            logger.exception(e)
+        except ObjectDoesNotExist:
+            return  # not a job ordered by the frontend, e.g. of a pre-generated export
+        if conversion_job.status in status.FINAL_STATUSES:
             return
+        if job_status == status.FINISHED:
+            rq_job = fetch_jobs([rq_job_id]).get(rq_job_id)
+            if rq_job is None:
+                return
+            add_file_to_job(conversion_job=conversion_job, result_zip_file=rq_job.kwargs['output_zip_file_path'])
+            add_meta_data_to_job(conversion_job=conversion_job, rq_job=rq_job)
+        if job_status == status.STARTED:
+            # tells how much of the job is left, see capacity.py
+            conversion_job.conversion_started_at = timezone.now()
+        logger.info('job %s is %s', rq_job_id, job_status)
+        conversion_job.status = job_status
+        conversion_job.save()
+        self._notify(conversion_job)
 
-        if job is None:  # already processed by someone else
+    def _handle_failed_jobs(self):
+        failed_rq_job_ids = {
+            rq_job_id
+            for queue_name in settings.RQ_QUEUE_NAMES
+            for rq_job_id in django_rq.get_queue(name=queue_name).failed_job_registry.get_job_ids()
+        }
+        conversion_jobs = conversion_models.Job.objects.filter(rq_job_id__in=failed_rq_job_ids)
+        pregenerated_rq_job_ids = conversion_models.PregeneratedExport.objects\
+            .filter(rq_job_id__in=failed_rq_job_ids).values_list('rq_job_id', flat=True)
+        unknown_rq_job_ids = failed_rq_job_ids.difference(
+            [conversion_job.rq_job_id for conversion_job in conversion_jobs], pregenerated_rq_job_ids,
+        )
+        for rq_job_id in unknown_rq_job_ids:
+            logger.error('failed job %s belongs to no conversion job', rq_job_id)
+        for conversion_job in conversion_jobs:
+            self._set_failed_unless_final(conversion_job, rq_job_id=conversion_job.rq_job_id)
+            self._notify(conversion_job)
+
+    def _handle_running_jobs(self):
+        active_jobs = conversion_models.Job.objects.exclude(status__in=status.FINAL_STATUSES)\
+            .select_related('parametrization__clipping_area')
+        rq_jobs = fetch_jobs([conversion_job.rq_job_id for conversion_job in active_jobs if conversion_job.rq_job_id])
+        for conversion_job in active_jobs:
+            self._update_job(conversion_job, rq_job=rq_jobs.get(conversion_job.rq_job_id))
+
+    def _update_job(self, conversion_job, *, rq_job):
+        rq_job_id = conversion_job.rq_job_id
+        if rq_job_id is None:
+            logger.error("rq_job_id is None, None is not a valid id!")
+            return
+
+        if rq_job is None:  # already processed by someone else
             self._set_failed_unless_final(conversion_job, rq_job_id=rq_job_id)
             self._notify(conversion_job)
             return
 
-        logger.info('updating job %d', rq_job_id)
-        conversion_job.status = job.get_status()
+        logger.info('updating job %s', rq_job_id)
+        conversion_job.status = rq_job.get_status()
 
-        if job.get_status() == status.FINISHED:
-            add_file_to_job(conversion_job=conversion_job, result_zip_file=job.kwargs['output_zip_file_path'])
-            add_meta_data_to_job(conversion_job=conversion_job, rq_job=job)
+        if conversion_job.status == status.STARTED and conversion_job.conversion_started_at is None:
+            conversion_job.conversion_started_at = aware_timestamp(rq_job.started_at)
+        if conversion_job.status == status.FINISHED:
+            add_file_to_job(conversion_job=conversion_job, result_zip_file=rq_job.kwargs['output_zip_file_path'])
+            add_meta_data_to_job(conversion_job=conversion_job, rq_job=rq_job)
         conversion_job.save()
         self._notify(conversion_job)
 
@@ -86,13 +203,7 @@ class Command(BaseCommand):
             conversion_job.save()
 
     def _notify(self, conversion_job):
-        data = {'status': conversion_job.status, 'job': conversion_job.get_absolute_url()}
-        try:
-            requests.get(conversion_job.callback_url, params=data)
-        except:  # noqa:  E722 do not use bare 'except'
-            logger.error('failed to send notification for job {} using {} as URL.'.format(
-                conversion_job.id, conversion_job.callback_url)
-            )
+        self._notifications.notify(conversion_job)
 
 
 def add_file_to_job(*, conversion_job, result_zip_file):
@@ -121,30 +232,55 @@ def add_meta_data_to_job(*, conversion_job, rq_job):
     conversion_job.unzipped_result_size = rq_job.meta['unzipped_result_size']
     conversion_job.extraction_duration = rq_job.meta['duration']
     conversion_job.estimated_pbf_size = estimated_pbf_size
+    # RQ forgets the job after RESULT_TTL
+    conversion_job.conversion_started_at = aware_timestamp(rq_job.started_at)
+    # not set yet if harvested as soon as the worker published that the job is finished
+    conversion_job.conversion_finished_at = aware_timestamp(rq_job.ended_at) or timezone.now()
 
 
-def fetch_job(rq_job_id, from_queues):
+def aware_timestamp(rq_timestamp):
+    # RQ's timestamps are naive UTC
+    if rq_timestamp is not None and timezone.is_naive(rq_timestamp):
+        return timezone.make_aware(rq_timestamp, timezone.utc)
+    return rq_timestamp
+
+
+def fetch_jobs(rq_job_ids, *, batch_size=FETCH_BATCH_SIZE):
     """
-    :return: None if job couldn't be found in any queue else RQ job.
+    Loads the RQ jobs in pipelined batches, no matter which queue they are in.
+
+    :return: the RQ jobs by their id, jobs that couldn't be found are left out
     """
-    for queue_name in from_queues:
-        queue = django_rq.get_queue(name=queue_name)
-        rq_job = queue.fetch_job(rq_job_id)
-        if rq_job is not None:
-            return rq_job
-    return None
+    rq_job_ids = list(rq_job_ids)
+    connection = django_rq.get_connection()
+    rq_jobs = {}
+    for start in range(0, len(rq_job_ids), batch_size):
+        for rq_job in RQJob.fetch_many(rq_job_ids[start:start + batch_size], connection=connection):
+            if rq_job is not None:
+                rq_jobs[rq_job.id] = rq_job
+    return rq_jobs
 
 
 def cleanup_old_jobs():
-    queues = [django_rq.get_queue(name=queue_name) for queue_name in settings.RQ_QUEUE_NAMES]
-
-    for queue in queues:
-        for job in queue.get_jobs():
-            if job.get_status() in status.FINAL_STATUSES:
-                job.delete()
-
-        failed_job_registry = queue.failed_job_registry
-        for rq_job_id in failed_job_registry.get_job_ids():
-            job = queue.fetch_job(rq_job_id)
-            if job.get_status() in status.FINAL_STATUSES:
-                job.delete()
+    """
+    Deletes the finished and failed RQ jobs whose results have been handled.
+
+    They are found through the registries of finished and failed jobs, so the cost doesn't depend on how many
+    jobs have ever been queued.
+    """
+    for queue_name in settings.RQ_QUEUE_NAMES:
+        queue = django_rq.get_queue(name=queue_name)
+        for registry in [FinishedJobRegistry(queue=queue), queue.failed_job_registry]:
+            rq_job_ids = registry.get_job_ids()
+            # jobs not handled yet are kept for the harvesters
+            unhandled_rq_job_ids = set(
+                conversion_models.Job.objects.filter(rq_job_id__in=rq_job_ids)
+                .exclude(status__in=status.FINAL_STATUSES).values_list('rq_job_id', flat=True)
+            ).union(
+                conversion_models.PregeneratedExport.objects.filter(rq_job_id__in=rq_job_ids)
+                .exclude(status__in=status.FINAL_STATUSES).values_list('rq_job_id', flat=True)
+            )
+            rq_jobs = fetch_jobs(rq_job_id for rq_job_id in rq_job_ids if rq_job_id not in unhandled_rq_job_ids)
+            for rq_job in rq_jobs.values():
+                rq_job.delete()
+    polygon_files.delete_unused(max_age=CONVERSION_SETTINGS['POLYGON_FILE_MAX_AGE'])
@@ -0,0 +1,144 @@
+"""
+Counters, gauges and histograms of the conversion service.
+
+They are kept in Redis, so every process of the service - the harvesters as well as the workers - records to
+the same metrics. Recording a metric never fails the caller: errors are logged and the value is lost.
+
+The conversion service exposes them in Prometheus' text format, see `render`.
+"""
+import logging
+
+import django_rq
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'osmaxx:conversion:metrics:'
+TYPES_KEY = KEY_PREFIX + 'types'
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# upper bounds of the buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def increment(name, amount=1, *, labels=None, connection=None):
+    try:
+        with _pipeline(connection) as pipeline:
+            pipeline.hset(TYPES_KEY, name, COUNTER)
+            pipeline.hincrbyfloat(KEY_PREFIX + name, _label_string(labels), amount)
+            pipeline.execute()
+    except RedisError:
+        logger.exception('failed to increment %s', name)
+
+
+def set_gauge(name, samples, *, connection=None):
+    """
+    Replaces all values of the gauge `name` by `samples`, given as `[(labels, value), ...]`.
+    """
+    try:
+        with (connection or django_rq.get_connection()).pipeline() as pipeline:
+            pipeline.hset(TYPES_KEY, name, GAUGE)
+            pipeline.delete(KEY_PREFIX + name)
+            if samples:
+                pipeline.hmset(KEY_PREFIX + name, {_label_string(labels): value for labels, value in samples})
+            pipeline.execute()
+    except RedisError:
+        logger.exception('failed to set %s', name)
+
+
+def observe(name, value, *, buckets, labels=None, connection=None):
+    """
+    Records `value` in the histogram `name`, whose buckets are counted cumulatively like Prometheus does.
+    """
+    label_string = _label_string(labels)
+    try:
+        with _pipeline(connection) as pipeline:
+            pipeline.hset(TYPES_KEY, name, HISTOGRAM)
+            for upper_bound in list(buckets) + [float('inf')]:
+                if value <= upper_bound:
+                    pipeline.hincrby(KEY_PREFIX + name, _field(label_string, 'bucket', _format(upper_bound)), 1)
+            pipeline.hincrbyfloat(KEY_PREFIX + name, _field(label_string, 'sum'), value)
+            pipeline.hincrby(KEY_PREFIX + name, _field(label_string, 'count'), 1)
+            pipeline.execute()
+    except RedisError:
+        logger.exception('failed to observe %s', name)
+
+
+def snapshot(connection=None):
+    """
+    Returns:
+        `{name: (type, {field: value})}` of all metrics recorded; the fields of counters and gauges are their
+        label strings, those of a histogram `(label_string, 'bucket', upper_bound)`, `(label_string, 'sum')`
+        and `(label_string, 'count')`
+    """
+    connection = connection or django_rq.get_connection()
+    metrics = {}
+    for name, metric_type in connection.hgetall(TYPES_KEY).items():
+        name, metric_type = name.decode(), metric_type.decode()
+        fields = {}
+        for field, value in connection.hgetall(KEY_PREFIX + name).items():
+            field = field.decode()
+            if metric_type == HISTOGRAM:
+                field = tuple(field.split('|'))
+            fields[field] = float(value)
+        metrics[name] = (metric_type, fields)
+    return metrics
+
+
+def gauge(samples):
+    """
+    Returns:
+        the gauge of the `[(labels, value), ...]` given, as found in a `snapshot`
+    """
+    return GAUGE, {_label_string(labels): value for labels, value in samples}
+
+
+def render(metric_snapshot):
+    """
+    Renders the metrics of a `snapshot` in Prometheus' text exposition format.
+    """
+    lines = []
+    for name, (metric_type, fields) in sorted(metric_snapshot.items()):
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+        if metric_type != HISTOGRAM:
+            lines.extend(_sample(name, label_string, value) for label_string, value in sorted(fields.items()))
+            continue
+        for field in sorted(fields, key=_histogram_order):
+            label_string, suffix = field[0], field[1]
+            if suffix == 'bucket':
+                label_string = ','.join(filter(None, [label_string, 'le="{}"'.format(field[2])]))
+            lines.append(_sample('{}_{}'.format(name, suffix), label_string, fields[field]))
+    return ''.join(line + '\n' for line in lines)
+
+
+def _sample(name, label_string, value):
+    if label_string:
+        return '{}{{{}}} {}'.format(name, label_string, _format(value))
+    return '{} {}'.format(name, _format(value))
+
+
+def _histogram_order(field):
+    # the buckets of each series in ascending order, followed by its sum and count
+    label_string, suffix = field[0], field[1]
+    if suffix == 'bucket':
+        return label_string, 0, float(field[2])
+    return label_string, 1 if suffix == 'sum' else 2, 0.0
+
+
+def _pipeline(connection):
+    return (connection or django_rq.get_connection()).pipeline(transaction=False)
+
+
+def _label_string(labels):
+    return ','.join('{}="{}"'.format(key, value) for key, value in sorted((labels or {}).items()))
+
+
+def _field(label_string, *parts):
+    return '|'.join((label_string,) + parts)
+
+
+def _format(number):
+    return '+Inf' if number == float('inf') else repr(float(number))
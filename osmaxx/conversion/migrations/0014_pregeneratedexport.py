@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.20 on 2026-10-18 09:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import osmaxx.conversion.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversion', '0013_auto_20170712_1825'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PregeneratedExport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('polygon_hash', models.CharField(db_index=True, help_text='SHA-256 of the clipping area as WKB', max_length=64, verbose_name='polygon hash')),
+                ('order_count', models.IntegerField(help_text='how often it had been ordered when pre-generated', verbose_name='order count')),
+                ('rq_job_id', models.CharField(max_length=250, null=True, verbose_name='rq job id')),
+                ('status', models.CharField(choices=[('received', 'received'), ('queued', 'queued'), ('finished', 'finished'), ('failed', 'failed'), ('started', 'started'), ('deferred', 'deferred')], default='received', max_length=20, verbose_name='job status')),
+                ('resulting_file', models.FileField(max_length=250, null=True, upload_to=osmaxx.conversion.models.pregenerated_export_directory_path, verbose_name='resulting file')),
+                ('estimated_pbf_size', models.FloatField(null=True, verbose_name='estimated pbf size in bytes')),
+                ('unzipped_result_size', models.FloatField(help_text='without the static files, only the conversion result', null=True, verbose_name='file size in bytes')),
+                ('extraction_duration', models.DurationField(help_text='time needed to generate the extraction', null=True, verbose_name='extraction duration')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='created at')),
+                ('parametrization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='conversion.Parametrization', verbose_name='parametrization')),
+            ],
+        ),
+    ]
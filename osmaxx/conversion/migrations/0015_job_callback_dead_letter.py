@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.20 on 2026-10-18 11:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversion', '0014_pregeneratedexport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='callback_error',
+            field=models.TextField(blank=True, default='', verbose_name='callback error'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='callback_failed_at',
+            field=models.DateTimeField(blank=True, help_text='when the last notification of the callback url was given up', null=True, verbose_name='callback failed at'),
+        ),
+    ]
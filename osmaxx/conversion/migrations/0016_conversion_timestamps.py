@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.20 on 2026-10-18 12:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversion', '0015_job_callback_dead_letter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='conversion_finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='conversion finished at'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='conversion_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='conversion started at'),
+        ),
+        migrations.AddField(
+            model_name='pregeneratedexport',
+            name='conversion_finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='conversion finished at'),
+        ),
+        migrations.AddField(
+            model_name='pregeneratedexport',
+            name='conversion_started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='conversion started at'),
+        ),
+    ]
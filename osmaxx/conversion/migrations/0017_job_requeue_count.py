@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.20 on 2026-10-18 13:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversion', '0016_conversion_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='requeue_count',
+            field=models.PositiveIntegerField(default=0, help_text='how often the job has been re-queued after its worker was lost', verbose_name='requeue count'),
+        ),
+    ]
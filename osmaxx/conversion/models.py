@@ -1,22 +1,54 @@
+import hashlib
+import logging
 import os
+import shutil
 import time
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from rest_framework.reverse import reverse
 
 from osmaxx.conversion import coordinate_reference_system as crs, output_format, status
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
 from osmaxx.clipping_area.models import ClippingArea
 from osmaxx.conversion.converters.converter import convert
 from osmaxx.conversion.converters.converter_gis.detail_levels import DETAIL_LEVEL_CHOICES, DETAIL_LEVEL_ALL
+from osmaxx.conversion.job_dispatcher import rq_dispatcher
+
+logger = logging.getLogger(__name__)
 
 
 def job_directory_path(instance, filename):
     return 'job_result_files/{0}/{1}'.format(instance.id, filename)
 
 
+def pregenerated_export_directory_path(instance, filename):
+    # below job_result_files, since the workers only share that directory with the conversion service
+    return 'job_result_files/pregenerated/{0}/{1}'.format(instance.id, filename)
+
+
+def polygon_hash(clipping_area):
+    return hashlib.sha256(bytes(clipping_area.clipping_multi_polygon.wkb)).hexdigest()
+
+
+def estimate_pbf_size(clipping_area):
+    """
+    Returns:
+        the estimated size in bytes of the area's PBF extract, `None` if it can't be estimated
+    """
+    from pbf_file_size_estimation.app_settings import PBF_FILE_SIZE_ESTIMATION_CSV_FILE_PATH
+    from pbf_file_size_estimation.estimate_size import estimate_size_of_extent
+    west, south, east, north = clipping_area.clipping_multi_polygon.extent
+    try:
+        return estimate_size_of_extent(PBF_FILE_SIZE_ESTIMATION_CSV_FILE_PATH, west, south, east, north)
+    except Exception:  # merely used to estimate the backlog, see capacity.py
+        logger.exception('pbf estimation of %s failed', clipping_area.name)
+        return None
+
+
 class Parametrization(models.Model):
     out_format = models.CharField(verbose_name=_("out format"), choices=output_format.CHOICES, max_length=100)
     out_srs = models.IntegerField(
@@ -47,6 +79,8 @@ class Job(models.Model):
     extraction_duration = models.DurationField(
         _('extraction duration'), help_text=_('time needed to generate the extraction'), null=True
     )
+    conversion_started_at = models.DateTimeField(_('conversion started at'), null=True, blank=True)
+    conversion_finished_at = models.DateTimeField(_('conversion finished at'), null=True, blank=True)
     own_base_url = models.CharField(
         _('own base url'), help_text=_('the url from which this job is reachable'), max_length=250
     )
@@ -54,13 +88,27 @@ class Job(models.Model):
         _('queue name'), help_text=_('queue name for processing'), default='default',
         max_length=50, choices=[(key, key) for key in settings.RQ_QUEUE_NAMES]
     )
+    callback_failed_at = models.DateTimeField(
+        _('callback failed at'), help_text=_('when the last notification of the callback url was given up'),
+        null=True, blank=True,
+    )
+    callback_error = models.TextField(_('callback error'), blank=True, default='')
+    requeue_count = models.PositiveIntegerField(
+        _('requeue count'), help_text=_('how often the job has been re-queued after its worker was lost'), default=0,
+    )
 
     def start_conversion(self, *, use_worker=True):
+        pregenerated_export = PregeneratedExport.objects.matching(self.parametrization)
+        if pregenerated_export is not None:
+            self._complete_from(pregenerated_export)
+            return
+        if self.estimated_pbf_size is None:
+            self.estimated_pbf_size = estimate_pbf_size(self.parametrization.clipping_area)
         self.rq_job_id = convert(
             conversion_format=self.parametrization.out_format,
             area_name=self.parametrization.clipping_area.name,
             osmosis_polygon_file_string=self.parametrization.clipping_area.osmosis_polygon_file_string,
-            output_zip_file_path=self._out_zip_path(),
+            output_zip_file_path=self._attempt_zip_path(),
             filename_prefix=self._filename_prefix(),
             detail_level=self.parametrization.detail_level,
             out_srs=self.parametrization.epsg,
@@ -69,6 +117,33 @@ class Job(models.Model):
         )
         self.save()
 
+    def _complete_from(self, pregenerated_export):
+        self.resulting_file.name = self.zip_file_relative_path()
+        result_path = self._out_zip_path()
+        try:
+            # the frontend moves the result away, which leaves the pre-generated file in place
+            os.link(pregenerated_export.resulting_file.path, result_path)
+        except OSError:
+            shutil.copyfile(pregenerated_export.resulting_file.path, result_path)
+        self.status = status.FINISHED
+        # finished now as far as the drain rate and the duration history are concerned, see capacity
+        self.conversion_started_at = self.conversion_finished_at = timezone.now()
+        self.unzipped_result_size = pregenerated_export.unzipped_result_size
+        self.extraction_duration = pregenerated_export.extraction_duration
+        self.estimated_pbf_size = pregenerated_export.estimated_pbf_size
+        self.save()
+
+    def cancel(self):
+        """
+        Stops the conversion, which then counts as failed. Does nothing if the job is done already.
+        """
+        if self.status in status.FINAL_STATUSES:
+            return
+        if self.rq_job_id is not None:
+            rq_dispatcher.cancel(self.rq_job_id)
+        self.status = status.FAILED
+        self.save()
+
     def zip_file_relative_path(self):
         return job_directory_path(self, '{}.{}'.format(self._filename_prefix(), 'zip'))
 
@@ -86,6 +161,16 @@ class Job(models.Model):
         os.makedirs(os.path.dirname(complete_zip_file_path), exist_ok=True)
         return complete_zip_file_path
 
+    def _attempt_zip_path(self):
+        """
+        The path the worker writes the result to, which the harvester moves it from to `_out_zip_path` when done.
+        Each re-queued attempt gets its own, in case the worker of an earlier attempt is still writing its result.
+        """
+        if self.requeue_count == 0:
+            return self._out_zip_path()
+        root, extension = os.path.splitext(self._out_zip_path())
+        return '{}_attempt_{}{}'.format(root, self.requeue_count, extension)
+
     @property
     def get_absolute_file_path(self):
         if self.has_file:
@@ -112,3 +197,103 @@ class Job(models.Model):
 
     def __str__(self):
         return _("job {} with rq_id {} ({})").format(self.id, self.rq_job_id, self.parametrization.clipping_area.name)
+
+
+class PregeneratedExportQuerySet(models.QuerySet):
+    def fresh(self):
+        max_age = CONVERSION_SETTINGS['PREGENERATED_EXPORT_MAX_AGE']
+        return self.filter(created_at__gte=timezone.now() - max_age)
+
+    def of(self, parametrization):
+        return self.filter(
+            parametrization__clipping_area__name=parametrization.clipping_area.name,
+            polygon_hash=polygon_hash(parametrization.clipping_area),
+            parametrization__out_format=parametrization.out_format,
+            parametrization__out_srs=parametrization.out_srs,
+            parametrization__detail_level=parametrization.detail_level,
+        )
+
+    def matching(self, parametrization):
+        """
+        Returns:
+            the latest finished, fresh pre-generated export with the same parameters, `None` if there is none
+        """
+        return self.fresh().of(parametrization).filter(status=status.FINISHED).order_by('-created_at').first()
+
+
+class PregeneratedExport(models.Model):
+    """
+    An export of one of the most ordered areas, converted during off-peak hours ahead of being ordered.
+
+    Jobs ordering the same export are completed immediately from its result, see `pregenerate_exports`.
+    """
+    parametrization = models.ForeignKey(verbose_name=_('parametrization'), to=Parametrization, on_delete=models.CASCADE)
+    polygon_hash = models.CharField(
+        _('polygon hash'), help_text=_('SHA-256 of the clipping area as WKB'), max_length=64, db_index=True
+    )
+    order_count = models.IntegerField(_('order count'), help_text=_('how often it had been ordered when pre-generated'))
+    rq_job_id = models.CharField(_('rq job id'), max_length=250, null=True)
+    status = models.CharField(_('job status'), choices=status.CHOICES, default=status.RECEIVED, max_length=20)
+    resulting_file = models.FileField(
+        _('resulting file'), upload_to=pregenerated_export_directory_path, null=True, max_length=250
+    )
+    estimated_pbf_size = models.FloatField(_('estimated pbf size in bytes'), null=True)
+    unzipped_result_size = models.FloatField(
+        _('file size in bytes'), null=True, help_text=_("without the static files, only the conversion result")
+    )
+    extraction_duration = models.DurationField(
+        _('extraction duration'), help_text=_('time needed to generate the extraction'), null=True
+    )
+    conversion_started_at = models.DateTimeField(_('conversion started at'), null=True, blank=True)
+    conversion_finished_at = models.DateTimeField(_('conversion finished at'), null=True, blank=True)
+    created_at = models.DateTimeField(_('created at'), default=timezone.now, db_index=True)
+
+    objects = PregeneratedExportQuerySet.as_manager()
+
+    def start_conversion(self, *, use_worker=True):
+        if self.estimated_pbf_size is None:
+            self.estimated_pbf_size = estimate_pbf_size(self.parametrization.clipping_area)
+        self.rq_job_id = convert(
+            conversion_format=self.parametrization.out_format,
+            area_name=self.parametrization.clipping_area.name,
+            osmosis_polygon_file_string=self.parametrization.clipping_area.osmosis_polygon_file_string,
+            output_zip_file_path=self._out_zip_path(),
+            filename_prefix=self._filename_prefix(),
+            detail_level=self.parametrization.detail_level,
+            out_srs=self.parametrization.epsg,
+            use_worker=use_worker,
+            queue_name=CONVERSION_SETTINGS['PREGENERATION_QUEUE_NAME'],
+        )
+        self.status = status.QUEUED
+        self.save()
+
+    def zip_file_relative_path(self):
+        return pregenerated_export_directory_path(self, '{}.{}'.format(self._filename_prefix(), 'zip'))
+
+    def _out_zip_path(self):
+        complete_zip_file_path = os.path.join(settings.MEDIA_ROOT, self.zip_file_relative_path())
+        os.makedirs(os.path.dirname(complete_zip_file_path), exist_ok=True)
+        return complete_zip_file_path
+
+    def _filename_prefix(self):
+        return '{basename}_{srs}_{date}_{out_format}_{detail_level}'.format(
+            basename=slugify(self.parametrization.clipping_area.name),
+            srs=slugify(self.parametrization.get_out_srs_display()),
+            date=self.created_at.strftime("%Y-%m-%d"),
+            out_format=self.parametrization.out_format,
+            detail_level=slugify(self.parametrization.get_detail_level_display()),
+        )
+
+    @property
+    def has_file(self):
+        return bool(self.resulting_file)
+
+    def delete(self, *args, **kwargs):
+        if self.has_file and os.path.exists(self.resulting_file.path):
+            shutil.rmtree(os.path.dirname(self.resulting_file.path))
+        return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return _("pre-generated export {} of {} ({})").format(
+            self.id, self.parametrization.clipping_area.name, self.get_status_display()
+        )
@@ -0,0 +1,145 @@
+"""
+Delivers the status of the jobs to the callback URLs given by the frontend.
+
+Notifications are sent by a bounded pool of threads sharing pooled HTTP connections, so a slow or unreachable
+frontend doesn't hold up the harvester. Failed attempts are retried with an exponential backoff; a notification
+that still can't be delivered is recorded on its job.
+
+The notifications of a job are delivered one after the other, in order. A newer one replaces the job's notification
+waiting to be delivered or retried, so the frontend is never told an outdated status after a newer one.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from django.db import close_old_connections
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from osmaxx.conversion import metrics, models as conversion_models
+from osmaxx.conversion._settings import CONVERSION_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    def __init__(self, *, max_concurrent_deliveries, timeout_seconds, max_attempts, backoff_seconds):
+        self._timeout_seconds = timeout_seconds
+        self._max_attempts = max_attempts
+        self._backoff_seconds = backoff_seconds
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_concurrent_deliveries)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_deliveries)
+        self._lock = threading.Lock()
+        # {conversion_job_id: (callback_url, params, future)} of the latest notification not being delivered yet
+        self._pending = {}
+        # ids of the jobs whose notifications are being delivered by a thread of the pool
+        self._delivering = set()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_concurrent_deliveries=CONVERSION_SETTINGS['CALLBACK_MAX_CONCURRENT_DELIVERIES'],
+            timeout_seconds=CONVERSION_SETTINGS['CALLBACK_TIMEOUT_SECONDS'],
+            max_attempts=CONVERSION_SETTINGS['CALLBACK_MAX_ATTEMPTS'],
+            backoff_seconds=CONVERSION_SETTINGS['CALLBACK_BACKOFF_SECONDS'],
+        )
+
+    def notify(self, conversion_job):
+        """
+        Queues the delivery of the job's current status and returns right away.
+
+        Returns:
+            a future of whether the notification has been delivered, `False` as well if it has been superseded by
+            a newer notification of the job before being delivered
+        """
+        future = Future()
+        params = {'status': conversion_job.status, 'job': conversion_job.get_absolute_url()}
+        with self._lock:
+            superseded = self._pending.get(conversion_job.id)
+            self._pending[conversion_job.id] = (conversion_job.callback_url, params, future)
+            start_delivering = conversion_job.id not in self._delivering
+            self._delivering.add(conversion_job.id)
+        if superseded is not None:
+            superseded[2].set_result(False)
+        if start_delivering:
+            self._executor.submit(self._deliver_in_order, conversion_job.id)
+        return future
+
+    def shutdown(self, *, wait=True):
+        self._executor.shutdown(wait=wait)
+        self._session.close()
+
+    def _deliver_in_order(self, conversion_job_id):
+        while True:
+            with self._lock:
+                if conversion_job_id not in self._pending:
+                    self._delivering.discard(conversion_job_id)
+                    return
+                callback_url, params, future = self._pending.pop(conversion_job_id)
+            try:
+                future.set_result(
+                    self._deliver(conversion_job_id=conversion_job_id, callback_url=callback_url, params=params)
+                )
+            except Exception as e:
+                future.set_exception(e)
+
+    def _is_superseded(self, conversion_job_id):
+        with self._lock:
+            return conversion_job_id in self._pending
+
+    def _deliver(self, *, conversion_job_id, callback_url, params):
+        error = None
+        for attempt in range(1, self._max_attempts + 1):
+            if attempt > 1:
+                time.sleep(self._backoff_seconds * 2 ** (attempt - 2))
+                if self._is_superseded(conversion_job_id):
+                    logger.info('notification of job %s being %s superseded', conversion_job_id, params['status'])
+                    return False
+            start = time.monotonic()
+            try:
+                response = self._session.get(callback_url, params=params, timeout=self._timeout_seconds)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                error = e
+                metrics.increment('osmaxx_callback_delivery_errors_total', labels={'reason': _reason(e)})
+                # the frontend won't accept a request it has rejected once
+                retry = getattr(e.response, 'status_code', 500) >= 500
+                logger.warning(
+                    'attempt %d to notify %s of job %s failed: %s', attempt, callback_url, conversion_job_id, e,
+                )
+                if not retry:
+                    break
+                continue
+            metrics.observe(
+                'osmaxx_callback_delivery_seconds', time.monotonic() - start, buckets=metrics.LATENCY_BUCKETS,
+            )
+            # a notification delivered after an earlier one of the job failed supersedes it
+            self._record(conversion_job_id, callback_failed_at=None, callback_error='')
+            return True
+        logger.error('failed to send notification for job {} using {} as URL.'.format(conversion_job_id, callback_url))
+        metrics.increment('osmaxx_callback_dead_letters_total')
+        self._record(conversion_job_id, callback_failed_at=timezone.now(), callback_error=str(error))
+        return False
+
+    def _record(self, conversion_job_id, **fields):
+        # the threads of the pool keep their own database connections
+        close_old_connections()
+        try:
+            conversion_models.Job.objects.filter(id=conversion_job_id).exclude(**fields).update(**fields)
+        except Exception:  # the outcome of the notification has been logged anyway
+            logger.exception('failed to record the notification of job %s', conversion_job_id)
+
+
+def _reason(error):
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.ConnectionError):
+        return 'connection'
+    if isinstance(error, requests.HTTPError):
+        return 'status_{}'.format(error.response.status_code)
+    return 'other'
@@ -2,7 +2,8 @@ from django.conf.urls import url, include
 from rest_framework.routers import DefaultRouter
 
 from osmaxx.clipping_area.viewsets import ClippingAreaViewSet
-from osmaxx.conversion.viewsets import JobViewSet, ParametrizationViewSet, FormatSizeEstimationView
+from osmaxx.conversion.views import show_metrics
+from osmaxx.conversion.viewsets import CapacityView, JobViewSet, ParametrizationViewSet, FormatSizeEstimationView
 from pbf_file_size_estimation.views import SizeEstimationView
 
 router = DefaultRouter()
@@ -11,7 +12,9 @@ router.register(r'format_size_estimation', FormatSizeEstimationView, base_name='
 router.register(r'clipping_area', ClippingAreaViewSet, base_name='clipping_area')
 router.register(r'conversion_job', JobViewSet, base_name='conversion_job')
 router.register(r'conversion_parametrization', ParametrizationViewSet, base_name='conversion_parametrization')
+router.register(r'capacity', CapacityView, base_name='capacity')
 
 urlpatterns = [
     url(r'^', include(router.urls)),
+    url(r'^metrics/$', show_metrics, name='metrics'),
 ]
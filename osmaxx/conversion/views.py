@@ -0,0 +1,53 @@
+import django_rq
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rq.registry import DeferredJobRegistry, StartedJobRegistry
+
+from osmaxx.conversion import metrics
+from osmaxx.conversion.models import Job, PregeneratedExport
+
+
+class _PlainTextRenderer(BaseRenderer):
+    """
+    Lets clients accepting the Prometheus text format only, as Prometheus may, be told they aren't authorized.
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return str(data).encode('utf-8')
+
+
+@api_view(['GET'])
+@renderer_classes([JSONRenderer, _PlainTextRenderer])
+def show_metrics(request):
+    """
+    Exposes the metrics recorded by the harvesters and the workers to Prometheus, along with the depths of the
+    queues and the number of jobs per status as of now.
+
+    Like the rest of the API, it's only accessible to authenticated users; Prometheus can use basic authentication.
+    """
+    metric_snapshot = metrics.snapshot()
+    metric_snapshot['osmaxx_queue_jobs'] = metrics.gauge(_queue_depths())
+    metric_snapshot['osmaxx_jobs'] = metrics.gauge(_status_counts(Job))
+    metric_snapshot['osmaxx_pregenerated_exports'] = metrics.gauge(_status_counts(PregeneratedExport))
+    return HttpResponse(metrics.render(metric_snapshot), content_type=metrics.CONTENT_TYPE)
+
+
+def _queue_depths():
+    for queue_name in settings.RQ_QUEUE_NAMES:
+        queue = django_rq.get_queue(queue_name)
+        yield {'queue': queue_name, 'state': 'queued'}, queue.count
+        yield {'queue': queue_name, 'state': 'started'}, StartedJobRegistry(queue=queue).count
+        yield {'queue': queue_name, 'state': 'deferred'}, DeferredJobRegistry(queue=queue).count
+        yield {'queue': queue_name, 'state': 'failed'}, queue.failed_job_registry.count
+
+
+def _status_counts(model):
+    return [
+        ({'status': row['status']}, row['count'])
+        for row in model.objects.values('status').annotate(count=Count('id')).order_by()
+    ]
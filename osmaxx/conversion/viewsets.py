@@ -1,7 +1,9 @@
 from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from . import capacity
 from .models import Job, Parametrization
 from .serializers import JobSerializer, ParametrizationSerializer, FormatSizeEstimationSerializer
 
@@ -17,6 +19,15 @@ class JobViewSet(viewsets.ModelViewSet):
         super().perform_create(serializer=serializer)
         serializer.instance.start_conversion()
 
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """
+        Stops the conversion of the job, which then fails.
+        """
+        job = self.get_object()
+        job.cancel()
+        return Response(self.get_serializer(job).data)
+
 
 class ParametrizationViewSet(viewsets.ModelViewSet):
     queryset = Parametrization.objects.all()
@@ -43,3 +54,16 @@ class FormatSizeEstimationView(viewsets.ViewSet):
         serializer.is_valid(raise_exception=True)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, headers=headers)
+
+
+class CapacityView(viewsets.ViewSet):
+    """
+    Returns the estimated worker-seconds of the queued and running jobs per queue and size class, along with the
+    rate the queues have been drained at recently
+    """
+    permission_classes = (
+        permissions.IsAuthenticated,
+    )
+
+    def list(self, request):
+        return Response(capacity.report())
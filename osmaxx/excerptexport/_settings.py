@@ -7,6 +7,8 @@ POLYFILE_LOCATION = os.path.abspath(os.path.join(os.path.dirname(__file__), 'dat
 EXTRACTION_PROCESSING_TIMEOUT_TIMEDELTA = timedelta(hours=48)  # default to 48h
 OLD_RESULT_FILES_REMOVAL_CHECK_INTERVAL = timedelta(hours=1)  # default every hour
 RESULT_FILE_AVAILABILITY_DURATION = timedelta(days=14)  # default to two weeks
+# cancellations are requested while deleting exports, which mustn't hang on a slow conversion service
+CONVERSION_CANCELLATION_TIMEOUT_SECONDS = 5
 
 OSMAXX_DATETIME_STRFTIME_FORMAT = "%F %T"
 
@@ -0,0 +1,183 @@
+"""
+Load tests the frontend against the stub conversion service (see `api_client/stub_conversion_service.py`).
+
+Virtual users, each in a thread of its own, repeatedly estimate the size of an area, order exports of it and list
+their exports, while the status changes of the ordered exports are delivered to the tracker like the conversion
+service does. The requests are made in-process using Django's test client, so the database queries of each request
+can be counted, whereas the frontend calls the stub over HTTP like it calls the conversion service.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from collections import defaultdict, namedtuple
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from osmaxx.conversion.converters.converter_gis.detail_levels import DETAIL_LEVEL_ALL
+from osmaxx.excerptexport.models import Excerpt
+from osmaxx.profile.models import Profile
+
+logger = logging.getLogger(__name__)
+
+ESTIMATE_SIZE, ESTIMATE_FORMAT_SIZES, ORDER, LIST_EXPORTS, SHOW_EXPORTS, TRACK = \
+    'estimate_size', 'estimate_format_sizes', 'order', 'list_exports', 'show_exports', 'track'
+PERCENTILES = (50, 90, 95, 99)
+# the areas ordered are of about this size, somewhere around this point
+_AREA_DEGREES = 0.02
+_AREA_CENTER = (8.8, 47.2)
+
+Sample = namedtuple('Sample', ['action', 'status_code', 'seconds', 'queries'])
+
+
+class LoadTest:
+    def __init__(
+            self, service, *, users, duration_seconds, think_seconds=1.0, formats=('fgdb',), host='localhost',
+            seed=0):
+        """
+        Args:
+            service: the running `StubConversionService` the frontend is configured to use, keeping the status
+                changes for the load test to deliver
+            users: the number of virtual users, ordering concurrently
+            think_seconds: the pause of each user between iterations
+        """
+        self._service = service
+        self._users = users
+        self._duration_seconds = duration_seconds
+        self._think_seconds = think_seconds
+        self._formats = list(formats)
+        self._host = host
+        self._seed = seed
+        self._samples = []
+        self._samples_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def run(self):
+        """
+        Returns:
+            the report of the load test, see `summarize`
+        """
+        users = [_load_test_user(index) for index in range(self._users)]
+        threads = [
+            threading.Thread(target=self._act_as, args=(user, random.Random('{}-{}'.format(self._seed, user.pk))))
+            for user in users
+        ]
+        threads.append(threading.Thread(target=self._track))
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        self._stopped.wait(self._duration_seconds)
+        self._stopped.set()
+        for thread in threads:
+            thread.join()
+        return summarize(self._samples, time.monotonic() - start, service_requests=self._service.requests)
+
+    def _act_as(self, user, rnd):
+        client = Client(HTTP_HOST=self._host)
+        client.force_login(user)
+        try:
+            while not self._stopped.is_set():
+                self._iterate(client, user, rnd)
+                self._stopped.wait(self._think_seconds)
+        finally:
+            connection.close()
+
+    def _iterate(self, client, user, rnd):
+        west, south = _AREA_CENTER[0] + rnd.uniform(-1, 1), _AREA_CENTER[1] + rnd.uniform(-1, 1)
+        east, north = west + _AREA_DEGREES, south + _AREA_DEGREES
+        self._request(client, ESTIMATE_SIZE, 'get', '/api/estimated_file_size/', dict(
+            north=north, east=east, south=south, west=west,
+        ))
+        self._request(client, ESTIMATE_FORMAT_SIZES, 'get', '/api/format_size_estimation/', dict(
+            estimated_pbf_file_size_in_bytes=1e6, detail_level=DETAIL_LEVEL_ALL,
+        ))
+        self._request(client, ORDER, 'post', reverse('excerptexport:order_new_excerpt'), dict(
+            name='load test {}'.format(rnd.randint(0, 10 ** 6)),
+            bounding_geometry=_polygon_json(west, south, east, north),
+            formats=self._formats,
+            coordinate_reference_system=4326,
+            detail_level=DETAIL_LEVEL_ALL,
+        ))
+        self._request(client, LIST_EXPORTS, 'get', reverse('excerptexport:export_list'))
+        excerpt = Excerpt.objects.filter(owner=user).order_by('-pk').first()
+        if excerpt is not None:
+            export_detail_url = reverse('excerptexport:export_detail', kwargs={'id': excerpt.pk})
+            self._request(client, SHOW_EXPORTS, 'get', export_detail_url)
+
+    def _track(self):
+        """delivers the status changes of the exports, like the conversion service does"""
+        client = Client(HTTP_HOST=self._host)
+        try:
+            while not self._stopped.wait(0.1):
+                for callback_url, params in self._service.pop_due_callbacks():
+                    self._request(client, TRACK, 'get', urlsplit(callback_url).path, params)
+        finally:
+            connection.close()
+
+    def _request(self, client, action, method, path, data=None):
+        start = time.monotonic()
+        status_code = None
+        with CaptureQueriesContext(connection) as queries:
+            try:
+                status_code = getattr(client, method)(path, data).status_code
+            except Exception:
+                logger.exception('%s %s failed', method.upper(), path)
+        sample = Sample(action, status_code, time.monotonic() - start, len(queries))
+        with self._samples_lock:
+            self._samples.append(sample)
+
+
+def _load_test_user(index):
+    username = 'load-test-{}'.format(index)
+    email = '{}@example.com'.format(username)
+    user, _ = User.objects.update_or_create(username=username, defaults={'email': email})
+    Profile.objects.update_or_create(associated_user=user, defaults={'unverified_email': email})
+    return user
+
+
+def _polygon_json(west, south, east, north):
+    return '{{"type":"Polygon","coordinates":[[[{w},{s}],[{e},{s}],[{e},{n}],[{w},{n}],[{w},{s}]]]}}'.format(
+        w=west, s=south, e=east, n=north,
+    )
+
+
+def summarize(samples, duration_seconds, *, service_requests):
+    """
+    Returns:
+        `{'duration_seconds': ..., 'requests_per_second': ..., 'actions': {action: {...}},
+        'conversion_service_requests': {endpoint: count}}`, each action with its number of requests and errors,
+        the percentiles of its latency in milliseconds and the mean and maximum number of queries
+    """
+    samples_by_action = defaultdict(list)
+    for sample in samples:
+        samples_by_action[sample.action].append(sample)
+    actions = {}
+    for action, action_samples in samples_by_action.items():
+        latencies = sorted(sample.seconds * 1000 for sample in action_samples)
+        queries = [sample.queries for sample in action_samples]
+        latency_ms = {'p{}'.format(percentile): _percentile(latencies, percentile) for percentile in PERCENTILES}
+        latency_ms['max'] = latencies[-1]
+        actions[action] = {
+            'requests': len(action_samples),
+            'errors': sum(1 for sample in action_samples if sample.status_code is None or sample.status_code >= 400),
+            'latency_ms': latency_ms,
+            'queries': {'mean': sum(queries) / len(queries), 'max': max(queries)},
+        }
+    return {
+        'duration_seconds': duration_seconds,
+        'requests_per_second': len(samples) / duration_seconds if duration_seconds > 0 else 0.0,
+        'actions': actions,
+        'conversion_service_requests': dict(service_requests),
+    }
+
+
+def _percentile(sorted_values, percentile):
+    """nearest-rank percentile of the non-empty `sorted_values`"""
+    rank = max(math.ceil(percentile * len(sorted_values) / 100), 1)
+    return sorted_values[rank - 1]
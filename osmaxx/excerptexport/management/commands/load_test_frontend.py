@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from osmaxx.conversion import output_format
+from osmaxx.excerptexport import load_test
+from osmaxx.excerptexport.management.commands.stub_conversion_service import add_stub_arguments, stub_from_options
+
+
+class Command(BaseCommand):
+    help = 'orders exports, lists them and tracks their status as concurrent users would, against a stub of the ' \
+           'conversion service, and reports the latencies and database queries of the requests - creates users ' \
+           'and exports in the configured database, so never run it against production'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='virtual users ordering concurrently')
+        parser.add_argument('--duration', type=float, default=60, help='seconds')
+        parser.add_argument('--think-time', type=float, default=1.0, help='seconds each user waits between orders')
+        parser.add_argument(
+            '--format', dest='formats', nargs='+', choices=list(output_format.ALL), default=[output_format.FGDB],
+            help='formats of each order',
+        )
+        parser.add_argument('--host', default='localhost', help='the host the requests are made to, as allowed')
+        parser.add_argument('--json', dest='as_json', action='store_true', help='report as JSON')
+        add_stub_arguments(parser)
+
+    def handle(self, *args, users, duration, think_time, formats, host, as_json, **options):
+        with stub_from_options(options, deliver_callbacks=False) as service:
+            report = load_test.LoadTest(
+                service, users=users, duration_seconds=duration, think_seconds=think_time, formats=formats, host=host,
+            ).run()
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write('{:.0f}s, {:.1f} requests/s'.format(
+            report['duration_seconds'], report['requests_per_second'],
+        ))
+        self.stdout.write('{:<22} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9} {:>13}'.format(
+            'action', 'requests', 'errors', 'p50 ms', 'p90 ms', 'p95 ms', 'p99 ms', 'max ms', 'queries mean',
+        ))
+        for action, figures in sorted(report['actions'].items()):
+            latency_ms = figures['latency_ms']
+            self.stdout.write('{:<22} {:>8} {:>7} {:>9.0f} {:>9.0f} {:>9.0f} {:>9.0f} {:>9.0f} {:>13.1f}'.format(
+                action, figures['requests'], figures['errors'], latency_ms['p50'], latency_ms['p90'],
+                latency_ms['p95'], latency_ms['p99'], latency_ms['max'], figures['queries']['mean'],
+            ))
+        self.stdout.write('conversion service requests: {}'.format(report['conversion_service_requests']))
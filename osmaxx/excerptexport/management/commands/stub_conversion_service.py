@@ -0,0 +1,64 @@
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from osmaxx.api_client.stub_conversion_service import StubConversionService
+
+
+class Command(BaseCommand):
+    help = 'runs a stand-in for the conversion service at the CONVERSION_SERVICE_URL the frontend is configured ' \
+           'with, converting nothing but notifying the frontend of its jobs progressing - runs until interrupted'
+
+    def add_arguments(self, parser):
+        add_stub_arguments(parser)
+
+    def handle(self, *args, **options):
+        service = stub_from_options(options, deliver_callbacks=True)
+        with service:
+            self.stdout.write('stub conversion service listening at {}'.format(service.url))
+            try:
+                while True:
+                    time.sleep(60)
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write('requests per endpoint: {}'.format(dict(service.requests)))
+
+
+def add_stub_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the stub takes to answer a request')
+    parser.add_argument(
+        '--endpoint-latency', nargs='+', default=[], metavar='ENDPOINT=SECONDS',
+        help='latencies of single endpoints, e.g. conversion_job=0.5',
+    )
+    parser.add_argument('--queue-time', type=float, default=5.0, help='seconds until a job is started')
+    parser.add_argument('--conversion-time', type=float, default=30.0, help='seconds until a job is done')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of the jobs failing')
+
+
+def stub_from_options(options, *, deliver_callbacks):
+    """
+    Returns:
+        a `StubConversionService` listening at the conversion service URL of the settings, which has to be local
+    """
+    service_url = urlsplit(settings.OSMAXX['CONVERSION_SERVICE_URL'])
+    try:
+        endpoint_latency_seconds = {
+            endpoint: float(seconds)
+            for endpoint, seconds in (option.split('=', 1) for option in options['endpoint_latency'])
+        }
+    except ValueError:
+        raise CommandError('endpoint latencies are to be given as ENDPOINT=SECONDS')
+    try:
+        return StubConversionService(
+            host=service_url.hostname, port=service_url.port or 80, base_path=service_url.path or '/',
+            latency_seconds=options['latency'], endpoint_latency_seconds=endpoint_latency_seconds,
+            queue_seconds=options['queue_time'], conversion_seconds=options['conversion_time'],
+            failure_rate=options['failure_rate'], deliver_callbacks=deliver_callbacks,
+        )
+    except OSError as e:
+        raise CommandError(
+            "can't listen at {}, point DJANGO_OSMAXX_CONVERSION_SERVICE_URL to a free local port instead, e.g. "
+            "http://localhost:8901/api/ ({})".format(settings.OSMAXX['CONVERSION_SERVICE_URL'], e)
+        )
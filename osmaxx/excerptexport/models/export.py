@@ -2,14 +2,19 @@ import logging
 import os
 import shutil
 
+import requests
 from django.conf import settings
 from django.db import models
+from django.db.models.signals import pre_delete
+from django.dispatch.dispatcher import receiver
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from rest_framework.reverse import reverse
 
 from osmaxx.conversion import output_format, status
-from osmaxx.excerptexport._settings import RESULT_FILE_AVAILABILITY_DURATION, EXTRACTION_PROCESSING_TIMEOUT_TIMEDELTA
+from osmaxx.excerptexport._settings import (
+    RESULT_FILE_AVAILABILITY_DURATION, EXTRACTION_PROCESSING_TIMEOUT_TIMEDELTA, CONVERSION_CANCELLATION_TIMEOUT_SECONDS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -65,10 +70,24 @@ class Export(TimeStampModelMixin, models.Model):
             parametrization_json, self.get_full_status_update_uri(incoming_request), user=self.extraction_order.orderer
         )
         self.conversion_service_job_id = job_json['id']
+        if job_json['status'] in status.FINAL_STATUSES:
+            # completed right away, e.g. from an export the conversion service pre-generated
+            self.save()
+            self.set_and_handle_new_status(job_json['status'], incoming_request=incoming_request)
+            return job_json
         self.status = job_json['status']
         self.save()
         return job_json
 
+    def cancel_conversion(self, *, timeout=None):
+        """
+        Stops the conversion of this export by the conversion service, unless it's done already.
+        """
+        from osmaxx.api_client.conversion_api_client import ConversionApiClient
+        if self.conversion_service_job_id is None or self.is_status_final:
+            return
+        ConversionApiClient().cancel_job(self.conversion_service_job_id, timeout=timeout)
+
     def get_full_status_update_uri(self, request):
         return request.build_absolute_uri(self.status_update_url)
 
@@ -189,3 +208,16 @@ class Export(TimeStampModelMixin, models.Model):
             status.DEFERRED: 'default',
         }
         return status_map.get(self.status, default_class)
+
+
+@receiver(pre_delete, sender=Export)
+def cancel_conversion(sender, instance, **kwargs):
+    """
+    Frees the worker converting a deleted export, be it deleted by itself or along with its excerpt.
+    """
+    try:
+        # deleting an excerpt deletes all of its exports within the same request
+        instance.cancel_conversion(timeout=CONVERSION_CANCELLATION_TIMEOUT_SECONDS)
+    except requests.RequestException:
+        # the export is deleted anyway, the conversion then merely runs on in vain
+        logger.exception('failed to cancel the conversion of export %s', instance.id)
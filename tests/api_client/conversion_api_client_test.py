@@ -171,6 +171,16 @@ def test_create_job_returns_post_request_response_json_payload_as_dict(mocker, u
     assert result == c.authorized_post.return_value.json.return_value
 
 
+def test_cancel_job_logs_in_and_posts_within_timeout(mocker):
+    c = ConversionApiClient()
+    mocker.patch.object(c, 'post', autospec=True)
+    c.cancel_job(23, timeout=sentinel.TIMEOUT)
+    (login_args, login_kwargs), (cancel_args, cancel_kwargs) = c.post.call_args_list
+    assert login_kwargs['timeout'] == sentinel.TIMEOUT
+    assert cancel_args[0] == '/conversion_job/23/cancel/'
+    assert cancel_kwargs['timeout'] == sentinel.TIMEOUT
+
+
 @pytest.fixture
 def geos_multipolygon():
     return MultiPolygon(
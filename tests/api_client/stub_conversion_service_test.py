@@ -0,0 +1,60 @@
+import os
+import time
+
+import pytest
+import requests
+
+from osmaxx.api_client import conversion_api_client
+from osmaxx.api_client.stub_conversion_service import StubConversionService
+from osmaxx.conversion import status
+
+
+@pytest.fixture
+def stub_service(mocker, tmpdir):
+    service = StubConversionService(
+        queue_seconds=0.2, conversion_seconds=0.2, deliver_callbacks=False, result_dir=str(tmpdir),
+    )
+    mocker.patch.object(conversion_api_client, 'SERVICE_BASE_URL', service.url)
+    with service:
+        yield service
+
+
+def _create_job(client, mocker):
+    user = mocker.Mock(**{'groups.filter.return_value.exists.return_value': False})
+    parametrization = client.create_parametrization(
+        boundary={'id': 1}, out_format='fgdb', detail_level=60, out_srs=4326,
+    )
+    return client.create_job(parametrization, 'http://localhost/job_progress/tracker/1/', user=user)
+
+
+def test_stub_answers_the_requests_of_the_conversion_api_client(stub_service, mocker):
+    client = conversion_api_client.ConversionApiClient()
+
+    job = _create_job(client, mocker)
+
+    assert job['status'] == status.QUEUED
+    assert client.estimated_file_size(north=47.3, west=8.5, south=47.2, east=8.6)['estimated_file_size_in_bytes'] > 0
+    assert client.format_size_estimation(1000, 60)['fgdb'] > 0
+    assert stub_service.requests['token_auth'] == 1
+
+
+def test_stub_progresses_the_jobs_and_keeps_their_status_changes(stub_service, mocker):
+    client = conversion_api_client.ConversionApiClient()
+    job = _create_job(client, mocker)
+
+    deadline = time.monotonic() + 5
+    callbacks = []
+    while len(callbacks) < 2 and time.monotonic() < deadline:
+        callbacks.extend(stub_service.pop_due_callbacks())
+        time.sleep(0.1)
+
+    assert [(url, params['status']) for url, params in callbacks] == [
+        ('http://localhost/job_progress/tracker/1/', status.STARTED),
+        ('http://localhost/job_progress/tracker/1/', status.FINISHED),
+    ]
+    assert os.path.exists(client.get_result_file_path(job['id']))
+
+
+def test_stub_requires_the_token(stub_service):
+    response = requests.get(stub_service.url + 'conversion_job/1/')
+    assert response.status_code == 401
@@ -143,6 +143,9 @@ def pytest_configure():
         },
         OSMAXX_CONVERSION_SERVICE={
             'PBF_PLANET_FILE_PATH': os.path.join(test_data_dir, 'osm', 'monaco-latest.osm.pbf'),
+            'GARMIN_TILE_CACHE_DIRECTORY': None,
+            'GARMIN_SPLIT_CACHE_DIRECTORY': None,
+            'GARMIN_ADDITIONAL_DATA_INDEX_DIRECTORY': None,
         },
         _OSMAXX_POLYFILE_LOCATION=os.path.join(test_data_dir, 'polyfiles'),
         OSMAXX_TEST_SETTINGS={
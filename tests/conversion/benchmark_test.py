@@ -0,0 +1,107 @@
+import hashlib
+
+import osmium
+import pytest
+
+from osmaxx.conversion.benchmark import suite, synthetic
+from osmaxx.conversion.job_dispatcher import heartbeats
+
+
+class _Tags(osmium.SimpleHandler):
+    def __init__(self):
+        super().__init__()
+        self.ids = {'node': [], 'way': [], 'relation': []}
+        self.tags = set()
+
+    def node(self, node):
+        self._add('node', node)
+
+    def way(self, way):
+        self._add('way', way)
+
+    def relation(self, relation):
+        self._add('relation', relation)
+
+    def _add(self, element_type, element):
+        self.ids[element_type].append(element.id)
+        self.tags.update((tag.k, tag.v) for tag in element.tags)
+
+
+@pytest.mark.parametrize('scenario', synthetic.SCENARIOS)
+def test_generate_writes_the_same_sorted_data_for_the_same_scale(scenario, tmpdir):
+    first_path, second_path = str(tmpdir.join('first.osm.pbf')), str(tmpdir.join('second.osm.pbf'))
+
+    extent = synthetic.generate(scenario, 10, first_path)
+    synthetic.generate(scenario, 10, second_path)
+
+    min_lon, min_lat, max_lon, max_lat = extent
+    assert max_lon - min_lon == pytest.approx(10 * synthetic.CELL_DEGREES)
+    assert max_lat - min_lat == pytest.approx(10 * synthetic.CELL_DEGREES)
+    contents = _Tags()
+    contents.apply_file(first_path)
+    for ids in contents.ids.values():
+        assert ids == sorted(ids)
+    with open(first_path, 'rb') as first, open(second_path, 'rb') as second:
+        assert hashlib.sha1(first.read()).digest() == hashlib.sha1(second.read()).digest()
+
+
+@pytest.mark.parametrize('scenario, expected_tag', [
+    (synthetic.DENSE_URBAN, ('highway', 'bus_stop')),
+    (synthetic.RURAL, ('landuse', 'forest')),
+    (synthetic.COASTAL, ('natural', 'coastline')),
+])
+def test_generate_writes_the_features_of_the_scenario(scenario, expected_tag, tmpdir):
+    pbf_path = str(tmpdir.join('scenario.osm.pbf'))
+    synthetic.generate(scenario, 20, pbf_path)
+    contents = _Tags()
+    contents.apply_file(pbf_path)
+    assert expected_tag in contents.tags
+
+
+def test_stage_timer_times_the_stages_reported():
+    timer = suite.StageTimer()
+
+    with heartbeats.reporting_to(timer):
+        heartbeats.stage('cut')
+        with heartbeats.throughput('cut', lambda: 1000):
+            pass
+        heartbeats.stage('zip')
+    timer.stop()
+
+    assert list(timer.stage_seconds) == ['started', 'cut', 'zip']
+    assert list(timer.throughputs) == ['cut']
+    heartbeats.stage('outside of a run')
+    assert list(timer.stage_seconds) == ['started', 'cut', 'zip']
+
+
+def _results(total_seconds, extract_seconds, output_zip_bytes=1000, scenario=synthetic.RURAL):
+    return {'meta': {}, 'results': [{
+        'scenario': scenario, 'scale': 'small', 'format': 'gpkg', 'total_seconds': total_seconds,
+        'stage_seconds': {'bootstrap': total_seconds - extract_seconds, 'extract': extract_seconds},
+        'output_zip_bytes': output_zip_bytes, 'output_unzipped_bytes': 4 * output_zip_bytes,
+    }]}
+
+
+def test_compare_reports_the_durations_exceeding_the_baseline():
+    regressions = suite.compare(_results(100, 50), _results(60, 10), tolerance=0.2)
+    assert regressions == [
+        'rural/small/gpkg: total took 100.0s instead of 60.0s',
+        'rural/small/gpkg: stage extract took 50.0s instead of 10.0s',
+    ]
+
+
+def test_compare_ignores_differences_within_the_tolerance_or_the_noise():
+    assert suite.compare(_results(110, 11), _results(100, 10), tolerance=0.2) == []
+    assert suite.compare(_results(3, 2), _results(1, 0.5), tolerance=0.2, noise_floor_seconds=2) == []
+
+
+def test_compare_reports_changed_output_sizes():
+    regressions = suite.compare(_results(100, 10, output_zip_bytes=500), _results(100, 10), tolerance=0.2)
+    assert regressions == [
+        'rural/small/gpkg: output_zip_bytes is 500 instead of 1000',
+        'rural/small/gpkg: output_unzipped_bytes is 2000 instead of 4000',
+    ]
+
+
+def test_compare_skips_results_missing_from_the_baseline():
+    assert suite.compare(_results(100, 50), _results(10, 5, scenario=synthetic.COASTAL)) == []
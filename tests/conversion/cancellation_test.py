@@ -0,0 +1,47 @@
+import subprocess
+from unittest.mock import MagicMock
+
+import pytest
+
+from osmaxx.conversion.job_dispatcher import cancellation
+
+
+@pytest.fixture
+def reset_cancellation(request):
+    request.addfinalizer(cancellation.reset)
+
+
+def test_request_flags_the_job_until_it_expires():
+    connection = MagicMock()
+    cancellation.request(connection, 'rq-job-id')
+    connection.set.assert_called_once_with(
+        'osmaxx:conversion:cancelled:rq-job-id', 1, ex=cancellation.REQUEST_TTL_SECONDS,
+    )
+
+
+def test_cancel_current_job_kills_the_processes_started_by_the_job(reset_cancellation):
+    process = subprocess.Popen(['sleep', '60'])
+    assert process.pid in cancellation._descendants(cancellation.os.getpid())
+
+    cancellation.cancel_current_job()
+
+    assert process.wait(timeout=cancellation.KILL_GRACE_SECONDS) != 0
+    assert cancellation.is_cancelled()
+    with pytest.raises(cancellation.JobCancelled):
+        cancellation.raise_if_cancelled()
+
+
+def test_cancel_current_job_runs_the_callbacks_of_the_current_context(mocker, reset_cancellation):
+    mocker.patch.object(cancellation, 'kill_descendant_processes')
+    failing_callback = MagicMock(side_effect=RuntimeError)
+    callback = MagicMock()
+    left_callback = MagicMock()
+    with cancellation.on_cancel(left_callback):
+        pass
+
+    with cancellation.on_cancel(failing_callback), cancellation.on_cancel(callback):
+        cancellation.cancel_current_job()
+
+    assert failing_callback.call_count == 1
+    assert callback.call_count == 1
+    assert left_callback.call_count == 0
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from osmaxx.conversion import capacity, output_format, status
+from osmaxx.conversion.converters.converter_gis.tuning_profiles import SIZE_CLASS_SMALL
+
+
+def test_duration_estimator_fits_the_durations_of_the_format():
+    estimator = capacity.DurationEstimator(
+        {output_format.GPKG: [(1000, 20), (2000, 30), (3000, 40), (4000, 50)]}, default_seconds=600,
+    )
+    assert estimator.seconds(output_format.GPKG, 5000) == pytest.approx(60)
+    assert estimator.seconds(output_format.GPKG, 0) == pytest.approx(20)  # not faster than the fastest one
+    assert estimator.seconds(output_format.GPKG, None) == pytest.approx(35)
+    # formats with too few jobs are estimated from those of all formats
+    assert estimator.seconds(output_format.GARMIN, 5000) == pytest.approx(60)
+
+
+def test_duration_estimator_falls_back_to_the_default_without_history():
+    estimator = capacity.DurationEstimator({output_format.GPKG: [(1000, 20), (1000, 30)]}, default_seconds=600)
+    assert estimator.seconds(output_format.GPKG, 1000) == 600
+
+
+@pytest.mark.django_db()
+def test_backlog_counts_the_work_left_per_queue_state_and_size_class(conversion_job, started_conversion_job):
+    conversion_job.rq_job_id = 'queued-rq-job-id'
+    conversion_job.status = status.QUEUED
+    conversion_job.estimated_pbf_size = 1000
+    conversion_job.save()
+    started_conversion_job.conversion_started_at = timezone.now() - timedelta(seconds=200)
+    started_conversion_job.save()
+    estimator = capacity.DurationEstimator({}, default_seconds=600)
+
+    backlog = capacity.backlog(estimator)
+
+    assert backlog['default'][capacity.QUEUED] == {SIZE_CLASS_SMALL: {'jobs': 1, 'worker_seconds': 600}}
+    running = backlog['default'][capacity.RUNNING][capacity.SIZE_CLASS_UNKNOWN]
+    assert running['jobs'] == 1
+    assert running['worker_seconds'] == pytest.approx(400, abs=5)
+
+
+@pytest.mark.django_db()
+def test_drain_rate_is_derived_from_the_jobs_finished_recently(finished_conversion_job):
+    finished_conversion_job.extraction_duration = timedelta(minutes=30)
+    finished_conversion_job.conversion_finished_at = timezone.now()
+    finished_conversion_job.save()
+
+    rates = capacity.drain_rate()
+
+    assert rates['default'] == {'jobs_per_hour': 1.0, 'worker_seconds_per_second': 0.5}
+
+
+@pytest.mark.django_db()
+def test_capacity_is_reported_to_authenticated_clients(authenticated_api_client, api_client):
+    from rest_framework.reverse import reverse
+    assert api_client.get(reverse('capacity-list')).status_code == 403
+    response = authenticated_api_client.get(reverse('capacity-list'))
+    assert response.status_code == 200
+    assert set(response.json()['queues']['default']) == {capacity.QUEUED, capacity.RUNNING, 'drain_rate'}
@@ -1,5 +1,8 @@
+import os
 from unittest import mock
 
+import pytest
+
 from osmaxx.conversion.converters.converter_gis.bootstrap import bootstrap
 from osmaxx.conversion.converters.converter_gis.detail_levels import DETAIL_LEVEL_REDUCED
 
@@ -61,3 +64,75 @@ def test_function_scripts_are_executed_in_correct_order(sql_scripts_create_funct
             mock.call(relative_script_path) for relative_script_path in sql_scripts_create_functions
         ]
         assert expected_calls == postgres_mock.execute_sql_file.mock_calls
+
+
+def test_transliteration_cache_is_loaded_before_and_stored_after_transliterating(area_polyfile_string, mocker):
+    bootstrapper = bootstrap.BootStrapper(area_polyfile_string=area_polyfile_string)
+    cache_mock = mocker.patch.object(bootstrap, 'TransliterationCache').return_value
+    call_order = []
+    cache_mock.load.side_effect = lambda: call_order.append('load')
+    cache_mock.store_new_entries.side_effect = lambda: call_order.append('store_new_entries')
+    with mock.patch.object(bootstrapper, '_postgres') as postgres_mock:
+        postgres_mock.execute_sql_file.side_effect = lambda path: call_order.append(os.path.basename(path))
+        bootstrapper._transliterate_names()
+
+    assert call_order == ['load', 'transliterate_names.sql', 'store_new_entries']
+
+
+def test_tuning_profile_is_chosen_by_size_of_cut_pbf_and_applied_to_postgres_and_osm2pgsql(
+        area_polyfile_string, mocker
+):
+    from osmaxx.conversion.converters.converter_gis.tuning_profiles import SIZE_CLASS_MEDIUM, TUNING_PROFILES
+    bootstrapper = bootstrap.BootStrapper(area_polyfile_string=area_polyfile_string)
+    mocker.patch('os.path.getsize', return_value=100 * 1024 ** 2)
+    check_call_mock = mocker.patch.object(bootstrap, 'logged_check_call')
+    with mock.patch.object(bootstrapper, '_postgres') as postgres_mock:
+        bootstrapper._apply_tuning_profile()
+        bootstrapper._import_pbf()
+
+    medium_profile = TUNING_PROFILES[SIZE_CLASS_MEDIUM]
+    postgres_mock.set_session_settings.assert_called_once_with(medium_profile['session_settings'])
+    (osm2pgsql_command,), osm2pgsql_kwargs = check_call_mock.call_args
+    assert '--unlogged' in osm2pgsql_command
+    assert osm2pgsql_command[osm2pgsql_command.index('--cache') + 1] == str(medium_profile['osm2pgsql_cache_mb'])
+    assert '-c work_mem=256MB' in osm2pgsql_kwargs['env']['PGOPTIONS']
+    assert '-c synchronous_commit=off' in osm2pgsql_kwargs['env']['PGOPTIONS']
+
+
+@pytest.mark.parametrize('cluster_output_tables, expected_output_schema', [
+    (False, 'view_osmaxx'),
+    (True, 'clustered_osmaxx'),
+])
+def test_output_tables_are_clustered_after_creating_views_if_enabled(
+        area_polyfile_string, mocker, cluster_output_tables, expected_output_schema
+):
+    mocker.patch.dict(bootstrap.CONVERSION_SETTINGS, CLUSTER_OUTPUT_TABLES=cluster_output_tables)
+    mocker.patch.object(bootstrap, 'cut_pbf_along_polyfile')
+    bootstrapper = bootstrap.BootStrapper(area_polyfile_string=area_polyfile_string)
+    for step in [
+        '_reset_database', '_apply_tuning_profile', '_import_boundaries', '_import_pbf', '_setup_db_functions',
+        '_harmonize_database', '_transliterate_names', '_filter_data',
+    ]:
+        mocker.patch.object(bootstrapper, step)
+    call_order = []
+    mocker.patch.object(bootstrapper, '_create_views', side_effect=lambda: call_order.append('create_views'))
+    with mock.patch.object(bootstrapper, '_postgres') as postgres_mock:
+        postgres_mock.execute_sql_file.side_effect = lambda path: call_order.append(os.path.basename(path))
+        bootstrapper.bootstrap()
+
+    if cluster_output_tables:
+        assert call_order == ['create_views', 'cluster_output_tables.sql']
+    else:
+        assert call_order == ['create_views']
+    assert bootstrapper.output_schema == expected_output_schema
+
+
+def test_boundaries_are_imported_into_the_database_bootstrapped(area_polyfile_string, mocker):
+    importer_class = mocker.patch.object(bootstrap, 'OSMBoundariesImporter')
+    bootstrapper = bootstrap.BootStrapper(area_polyfile_string=area_polyfile_string)
+    with mock.patch.object(bootstrapper, '_postgres') as postgres_mock:
+        postgres_mock.get_db_name.return_value = 'osmaxx_incremental_0123456789abcdef'
+        bootstrapper._import_boundaries()
+
+    importer_class.assert_called_once_with(database='osmaxx_incremental_0123456789abcdef')
+    importer_class.return_value.load_area_specific_data.assert_called_once_with(extent=bootstrapper.geom)
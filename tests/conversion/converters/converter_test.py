@@ -20,6 +20,7 @@ def test_calls_converter_and_returns_none_when_use_worker_is_omitted(conversion_
 
 def test_convert_returns_id_when_use_worker_is_true(conversion_format, area_name, simple_osmosis_line_string, output_zip_file_path, filename_prefix, detail_level, out_srs, rq_mock_return, mocker, monkeypatch):
     mocker.patch('osmaxx.conversion.converters.converter.rq_enqueue_with_settings', return_value=rq_mock_return())
+    mocker.patch('osmaxx.conversion.converters.converter.polygon_files.store', return_value='/tmp/area.poly')
     # returns True if has been called
     convert_return_value = convert(
         conversion_format=conversion_format,
@@ -32,3 +33,45 @@ def test_convert_returns_id_when_use_worker_is_true(conversion_format, area_name
         use_worker=True,
     )
     assert convert_return_value == 42
+
+
+def test_convert_publishes_the_progress_of_the_job_when_run_by_a_worker(area_name, simple_osmosis_line_string, output_zip_file_path, filename_prefix, mocker):
+    from osmaxx.conversion import output_format, status
+    mocker.patch('osmaxx.conversion.converters.converter.converter_pbf.perform_export', autospec=True)
+    job = mocker.Mock(id='rq-job-id')
+    mocker.patch('osmaxx.conversion.converters.converter.get_current_job', return_value=job)
+    publish = mocker.patch('osmaxx.conversion.converters.converter.events.publish')
+    mocker.patch('osmaxx.conversion.converters.converter.heartbeats.Heartbeat')
+    convert(
+        conversion_format=output_format.PBF,
+        area_name=area_name,
+        osmosis_polygon_file_string=simple_osmosis_line_string,
+        output_zip_file_path=output_zip_file_path,
+        filename_prefix=filename_prefix,
+        detail_level=None,
+        out_srs='EPSG:4326',
+    )
+    assert publish.call_args_list == [
+        mocker.call(job.connection, rq_job_id='rq-job-id', status=status.STARTED),
+        mocker.call(job.connection, rq_job_id='rq-job-id', status=status.FINISHED),
+    ]
+
+
+def test_convert_passes_the_polygon_to_the_worker_by_reference(area_name, simple_osmosis_line_string, output_zip_file_path, filename_prefix, rq_mock_return, mocker, tmpdir):
+    from osmaxx.conversion import output_format
+    from osmaxx.conversion.converters import converter
+    mocker.patch.dict(converter.polygon_files.CONVERSION_SETTINGS, POLYGON_FILE_DIRECTORY=str(tmpdir))
+    enqueue = mocker.patch.object(converter, 'rq_enqueue_with_settings', return_value=rq_mock_return())
+    convert(
+        conversion_format=output_format.PBF,
+        area_name=area_name,
+        osmosis_polygon_file_string=simple_osmosis_line_string,
+        output_zip_file_path=output_zip_file_path,
+        filename_prefix=filename_prefix,
+        detail_level=None,
+        out_srs='EPSG:4326',
+        use_worker=True,
+    )
+    _, enqueued_params = enqueue.call_args
+    assert 'osmosis_polygon_file_string' not in enqueued_params
+    assert converter.polygon_files.load(enqueued_params['osmosis_polygon_file_path']) == simple_osmosis_line_string
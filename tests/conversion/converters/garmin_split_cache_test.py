@@ -0,0 +1,132 @@
+import os
+import time
+from datetime import timedelta
+
+import pytest
+
+from osmaxx.conversion.converters.converter_garmin import garmin
+from osmaxx.conversion.converters.converter_garmin.split_cache import SplitCache
+
+GEONAMES = [
+    '2657896\tZürich\tZurich\tZuerich\t47.36667\t8.55\tP\tPPLA\tCH\t\t25\t112\t261\t\t341730\t\t429\tEurope/Zurich\t2012-03-04\n',
+    '2950159\tBerlin\tBerlin\t\t52.52437\t13.41053\tP\tPPLC\tDE\t\t16\t00\t11000\t11000000\t3426354\t\t74\tEurope/Berlin\t2019-09-05\n',
+    '2661604\tBasel\tBasel\t\t47.55839\t7.57327\tP\tPPLA\tCH\t\t06\t1\t2701\t\t164488\t\t260\tEurope/Zurich\t2013-05-09\n',
+]
+
+
+@pytest.fixture
+def planet_file(tmpdir):
+    planet_file = tmpdir.join('planet.osm.pbf')
+    planet_file.write_binary(b'planet')
+    return planet_file
+
+
+@pytest.fixture
+def geonames_file(tmpdir):
+    geonames_file = tmpdir.join('cities1000.txt')
+    geonames_file.write_text(''.join(GEONAMES), encoding='utf-8')
+    return geonames_file
+
+
+@pytest.fixture
+def split_cache(tmpdir, geonames_file, simple_osmosis_line_string):
+    return SplitCache(
+        str(tmpdir.join('cache')),
+        polyfile_string=simple_osmosis_line_string,
+        geonames_file_path=str(geonames_file),
+        max_age=timedelta(days=7),
+    )
+
+
+def test_geonames_are_limited_to_the_surroundings_of_the_extent(split_cache):
+    switzerland_extent = (5.9, 45.8, 10.5, 47.8)
+    with open(split_cache.geonames_file_path(switzerland_extent), encoding='utf-8') as geonames:
+        assert geonames.readlines() == [GEONAMES[0], GEONAMES[2]]
+
+
+def test_stored_areas_are_cached(split_cache, tmpdir):
+    assert split_cache.areas_file_path is None
+    split_dir = tmpdir.mkdir('split')
+    split_dir.join('areas.list').write('63240001: 2068480,-57344 to 2201600,233472\n')
+
+    split_cache.store_areas(str(split_dir))
+
+    with open(split_cache.areas_file_path) as areas:
+        assert areas.read() == '63240001: 2068480,-57344 to 2201600,233472\n'
+
+
+def _store_areas(split_cache, tmpdir):
+    split_dir = tmpdir.mkdir('split')
+    split_dir.join('areas.list').write('63240001: 2068480,-57344 to 2201600,233472\n')
+    split_cache.store_areas(str(split_dir))
+
+
+def _age(path, age):
+    timestamp = time.time() - age.total_seconds()
+    os.utime(path, (timestamp, timestamp))
+
+
+def test_areas_are_reused_for_another_planet_version(split_cache, tmpdir, planet_file):
+    _store_areas(split_cache, tmpdir)
+
+    planet_file.write_binary(b'updated planet')
+    os.utime(str(planet_file), ns=(0, 0))
+
+    assert split_cache.areas_file_path is not None
+
+
+def test_areas_are_not_reused_beyond_the_max_age(split_cache, tmpdir):
+    _store_areas(split_cache, tmpdir)
+    _age(split_cache.areas_file_path, timedelta(days=8))
+
+    assert split_cache.areas_file_path is None
+
+
+def test_entries_not_used_for_the_max_age_are_deleted(
+        split_cache, tmpdir, geonames_file, simple_osmosis_line_string
+):
+    _store_areas(split_cache, tmpdir)
+    other_split_cache = SplitCache(
+        str(tmpdir.join('cache')), polyfile_string=simple_osmosis_line_string + '\n',
+        geonames_file_path=str(geonames_file), max_age=timedelta(days=7),
+    )
+    other_split_cache.geonames_file_path((5.9, 45.8, 10.5, 47.8))
+    unused_entry, used_entry = sorted(
+        tmpdir.join('cache').listdir(), key=lambda entry: entry.join('areas.list').exists(),
+    )
+    _age(str(unused_entry), timedelta(days=8))
+    _age(str(used_entry), timedelta(days=8))
+    assert split_cache.areas_file_path is not None
+
+    split_cache.delete_expired()
+
+    assert not unused_entry.exists()
+    assert used_entry.exists()
+
+
+def test_split_passes_cached_areas_to_splitter(
+        tmpdir, mocker, planet_file, geonames_file, area_name, simple_osmosis_line_string
+):
+    mocker.patch.dict(
+        garmin.CONVERSION_SETTINGS,
+        GARMIN_SPLIT_CACHE_DIRECTORY=str(tmpdir.join('cache')), PBF_PLANET_FILE_PATH=str(planet_file),
+    )
+    mocker.patch.object(garmin, '_path_to_geonames_zip', str(geonames_file))
+    mocker.patch.object(garmin, 'cut_pbf_along_polyfile')
+
+    def _fake_splitter(command):
+        out_dir = next(arg for arg in command if arg.startswith('--output-dir=')).partition('=')[2]
+        with open(os.path.join(out_dir, 'areas.list'), 'w') as areas:
+            areas.write('63240001: 2068480,-57344 to 2201600,233472\n')
+    check_call_mock = mocker.patch.object(garmin, 'logged_check_call', side_effect=_fake_splitter)
+    garmin_converter = garmin.Garmin(
+        output_zip_file_path='/dev/null', area_name=area_name, polyfile_string=simple_osmosis_line_string,
+    )
+
+    garmin_converter._split(str(tmpdir.mkdir('first_split')))
+    (first_command,), _ = check_call_mock.call_args
+    garmin_converter._split(str(tmpdir.mkdir('second_split')))
+    (second_command,), _ = check_call_mock.call_args
+
+    assert not any(arg.startswith('--split-file=') for arg in first_command)
+    assert any(arg.startswith('--split-file=') for arg in second_command)
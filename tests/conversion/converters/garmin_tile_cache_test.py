@@ -0,0 +1,145 @@
+import os
+import time
+
+import pytest
+
+from osmaxx.conversion.converters.converter_garmin import garmin
+from osmaxx.conversion.converters.converter_garmin.tile_cache import Tile, TileCache, read_tiles, write_tiles
+
+TEMPLATE_ARGS = """\
+# template.args
+#   You can use this file to specify the tiles to mkgmap
+
+mapname: 63240001
+# description: OSM Map
+description: Middle Earth
+input-file: 63240001.osm.pbf
+
+mapname: 63240002
+# description: OSM Map
+description: Middle Earth
+input-file: 63240002.osm.pbf
+"""
+
+
+@pytest.fixture
+def split_dir(tmpdir):
+    split_dir = tmpdir.mkdir('split')
+    split_dir.join('template.args').write(TEMPLATE_ARGS)
+    split_dir.join('63240001.osm.pbf').write_binary(b'first tile')
+    split_dir.join('63240002.osm.pbf').write_binary(b'second tile')
+    return split_dir
+
+
+def test_read_tiles(split_dir):
+    assert read_tiles(str(split_dir.join('template.args'))) == [
+        Tile(mapname='63240001', description='Middle Earth', input_file=str(split_dir.join('63240001.osm.pbf'))),
+        Tile(mapname='63240002', description='Middle Earth', input_file=str(split_dir.join('63240002.osm.pbf'))),
+    ]
+
+
+def test_written_tiles_are_read_back_unchanged(split_dir):
+    tiles = read_tiles(str(split_dir.join('template.args')))
+    assert read_tiles(write_tiles(tiles, str(split_dir.join('written.args')))) == tiles
+
+
+def test_tile_key_depends_on_tile_content_and_compile_options(split_dir):
+    first_tile, second_tile = read_tiles(str(split_dir.join('template.args')))
+    tile_cache = TileCache('/nonexistent', compile_options=['--route'])
+    assert tile_cache.key(first_tile) == TileCache('/nonexistent', compile_options=['--route']).key(first_tile)
+    assert tile_cache.key(first_tile) != tile_cache.key(second_tile)
+    assert tile_cache.key(first_tile) != TileCache('/nonexistent', compile_options=[]).key(first_tile)
+
+
+def test_tile_key_is_independent_of_the_name_splitter_gave_the_tile(split_dir):
+    tile, _ = read_tiles(str(split_dir.join('template.args')))
+    renumbered_tile = tile._replace(mapname='63240017', description='Mordor')
+    split_dir.join('63240017.osm.pbf').write_binary(b'first tile')
+    renumbered_tile = renumbered_tile._replace(input_file=str(split_dir.join('63240017.osm.pbf')))
+    tile_cache = TileCache('/nonexistent', compile_options=['--route'])
+    assert tile_cache.key(tile) == tile_cache.key(renumbered_tile)
+    [renamed_tile], [renamed_renumbered_tile] = tile_cache.rename([tile]), tile_cache.rename([renumbered_tile])
+    assert renamed_tile.mapname == renamed_renumbered_tile.mapname
+
+
+def test_tiles_are_renamed_after_their_content(split_dir):
+    tiles = read_tiles(str(split_dir.join('template.args')))
+    renamed_tiles = TileCache('/nonexistent', compile_options=[]).rename(tiles)
+    assert [tile.input_file for tile in renamed_tiles] == [tile.input_file for tile in tiles]
+    assert len({tile.mapname for tile in renamed_tiles}) == 2
+    for tile in renamed_tiles:
+        assert len(tile.mapname) == 8
+        assert tile.mapname < '63240001'
+
+
+def test_stored_tile_is_fetched(split_dir, tmpdir):
+    tile_cache = TileCache(str(tmpdir.join('cache')), compile_options=[])
+    tile, _ = tile_cache.rename(read_tiles(str(split_dir.join('template.args'))))
+    first_out_dir, second_out_dir = tmpdir.mkdir('first_out'), tmpdir.mkdir('second_out')
+    assert not tile_cache.fetch(tile, str(first_out_dir))
+
+    first_out_dir.join(tile.mapname + '.img').write_binary(b'compiled tile')
+    tile_cache.store(tile, str(first_out_dir))
+
+    assert tile_cache.fetch(tile, str(second_out_dir))
+    assert second_out_dir.join(tile.mapname + '.img').read_binary() == b'compiled tile'
+
+
+def test_tiles_not_renamed_are_not_cached(split_dir, tmpdir):
+    tile, _ = read_tiles(str(split_dir.join('template.args')))
+    tile_cache = TileCache(str(tmpdir.join('cache')), compile_options=[])
+    out_dir = tmpdir.mkdir('out')
+    out_dir.join('63240001.img').write_binary(b'compiled tile')
+    tile_cache.store(tile, str(out_dir))
+
+    assert not tmpdir.join('cache').exists()
+    assert not tile_cache.fetch(tile, str(out_dir))
+
+
+def test_tiles_used_least_recently_are_evicted_beyond_the_max_size(split_dir, tmpdir):
+    tile_cache = TileCache(str(tmpdir.join('cache')), compile_options=[], max_bytes=20)
+    first_tile, second_tile = tile_cache.rename(read_tiles(str(split_dir.join('template.args'))))
+    out_dir = tmpdir.mkdir('out')
+    for tile in [first_tile, second_tile]:
+        out_dir.join(tile.mapname + '.img').write_binary(b'compiled tile')
+        tile_cache.store(tile, str(out_dir))
+    two_days_ago = time.time() - 2 * 24 * 3600
+    for cached_tile in tmpdir.join('cache').listdir():
+        os.utime(str(cached_tile), (two_days_ago, two_days_ago))
+    assert tile_cache.fetch(second_tile, str(out_dir))
+
+    tile_cache.evict()
+
+    assert not tile_cache.fetch(first_tile, str(out_dir))
+    assert tile_cache.fetch(second_tile, str(out_dir))
+
+
+def test_produce_garmin_compiles_only_uncached_tiles(split_dir, tmpdir, mocker, area_name):
+    for additional_data in ['bounds.zip', 'sea.zip']:
+        tmpdir.join(additional_data).write_binary(b'')
+    mocker.patch.object(garmin, '_path_to_bounds_zip', str(tmpdir.join('bounds.zip')))
+    mocker.patch.object(garmin, '_path_to_sea_zip', str(tmpdir.join('sea.zip')))
+    mocker.patch.dict(garmin.CONVERSION_SETTINGS, GARMIN_TILE_CACHE_DIRECTORY=str(tmpdir.join('cache')))
+
+    def _fake_mkgmap(command):
+        out_dir = next(arg for arg in command if arg.startswith('--output-dir=')).partition('=')[2]
+        read_config = [arg for arg in command if arg.startswith('--read-config=')]
+        if read_config:
+            for tile in read_tiles(read_config[0].partition('=')[2]):
+                with open(os.path.join(out_dir, tile.mapname + '.img'), 'wb') as img:
+                    img.write(b'compiled')
+    check_call_mock = mocker.patch.object(garmin, 'logged_check_call', side_effect=_fake_mkgmap)
+    garmin_converter = garmin.Garmin(output_zip_file_path='/dev/null', area_name=area_name, polyfile_string='')
+
+    garmin_converter._produce_garmin(str(split_dir.join('template.args')), str(tmpdir.join('first_out')))
+    assert check_call_mock.call_count == 2  # compile all tiles, combine them
+
+    check_call_mock.reset_mock()
+    garmin_converter._produce_garmin(str(split_dir.join('template.args')), str(tmpdir.join('second_out')))
+    (combine_command,), _ = check_call_mock.call_args
+    assert check_call_mock.call_count == 1  # only combine them
+    assert '--gmapsupp' in combine_command
+    tile_images = [arg for arg in combine_command if arg.endswith('.img')]
+    assert len(tile_images) == 2
+    assert all(os.path.exists(tile_image) for tile_image in tile_images)
+    assert '--description={}'.format(area_name) in combine_command
@@ -0,0 +1,66 @@
+import os
+import zipfile
+
+import pytest
+
+from osmaxx.conversion.converters.converter_garmin.tiled_archive import (
+    TiledArchive, degrees_to_map_units, read_areas_extent,
+)
+
+TILE_SIZE = 1 << 15
+
+
+@pytest.fixture
+def sea_zip(tmpdir):
+    sea_zip_path = str(tmpdir.join('sea.zip'))
+    with zipfile.ZipFile(sea_zip_path, 'w') as sea_zip:
+        sea_zip.writestr('index.txt.gz', b'index')
+        for lat in range(-3, 3):
+            for lon in range(-3, 3):
+                sea_zip.writestr(
+                    'sea_{}_{}.pbf'.format(lat * TILE_SIZE, lon * TILE_SIZE), b'tile'
+                )
+    return sea_zip_path
+
+
+def test_index_derives_tile_size_and_separates_other_entries(sea_zip, tmpdir):
+    index = TiledArchive(sea_zip, str(tmpdir.join('index'))).index
+    assert index['tile_size'] == TILE_SIZE
+    assert len(index['tiles']) == 36
+    assert index['other_entries'] == ['index.txt.gz']
+
+
+def test_index_is_built_once_per_archive_version(sea_zip, tmpdir, mocker):
+    TiledArchive(sea_zip, str(tmpdir.join('index'))).index
+    build_index_mock = mocker.patch.object(TiledArchive, '_build_index')
+    TiledArchive(sea_zip, str(tmpdir.join('index'))).index
+    assert build_index_mock.call_count == 0
+
+
+def test_tiles_within_includes_a_margin_of_one_tile(sea_zip, tmpdir):
+    tiled_archive = TiledArchive(sea_zip, str(tmpdir.join('index')))
+    within_first_tile = (1, 1, TILE_SIZE - 1, TILE_SIZE - 1)
+    assert sorted(tiled_archive.tiles_within(within_first_tile)) == sorted(
+        'sea_{}_{}.pbf'.format(lat * TILE_SIZE, lon * TILE_SIZE) for lat in range(-1, 2) for lon in range(-1, 2)
+    )
+
+
+def test_extract_subset_extracts_needed_tiles_and_other_entries(sea_zip, tmpdir):
+    tiled_archive = TiledArchive(sea_zip, str(tmpdir.join('index')))
+    subset_dir = tiled_archive.extract_subset((1, 1, TILE_SIZE - 1, TILE_SIZE - 1), str(tmpdir.join('subset')))
+    assert len(os.listdir(subset_dir)) == 9 + 1
+
+
+def test_degrees_to_map_units():
+    assert degrees_to_map_units((-180, -90, 180, 90)) == (-2 ** 22, -2 ** 23, 2 ** 22, 2 ** 23)
+
+
+def test_read_areas_extent(tmpdir):
+    areas_file = tmpdir.join('areas.list')
+    areas_file.write(
+        '# List of areas\n'
+        '63240001: 2068480,-57344 to 2201600,233472\n'
+        '#       : 44.384766,-1.230469 to 47.241211,5.009766\n'
+        '63240002: 2201600,-57344 to 2260992,364544\n'
+    )
+    assert read_areas_extent(str(areas_file)) == (2068480, -57344, 2260992, 364544)
@@ -0,0 +1,147 @@
+import os
+import subprocess
+import time
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+
+from osmaxx.conversion.converters.converter_gis.bootstrap import incremental
+
+FILTER_DIR = os.path.join(
+    os.path.dirname(incremental.__file__), 'sql', 'filter',
+)
+
+
+@pytest.fixture
+def bootstrapper(area_polyfile_string, mocker, tmpdir):
+    mocker.patch.dict(incremental.CONVERSION_SETTINGS, INCREMENTAL_EXPORT_OSMUPDATE_DIRECTORY=str(tmpdir))
+    return incremental.IncrementalBootStrapper(area_polyfile_string=area_polyfile_string)
+
+
+def test_database_is_named_after_the_area(area_polyfile_string):
+    db_name = incremental.database_name_for(area_polyfile_string)
+    assert db_name.startswith(incremental.DATABASE_NAME_PREFIX)
+    assert db_name == incremental.database_name_for(area_polyfile_string)
+    assert db_name != incremental.database_name_for(area_polyfile_string + '\n')
+
+
+@pytest.mark.parametrize('script, fills_rows', [
+    ('road/000_setup-drop_and_recreate_table_road.sql', False),
+    ('water/000_water_abl_create_tables.sql', False),
+    ('nonop/005_lifecycle_view.sql', False),
+    ('road/010_road.sql', True),
+    ('nonop/010_nonop.sql', True),
+])
+def test_only_filter_scripts_filling_rows_are_replayed(script, fills_rows):
+    assert incremental._fills_rows(os.path.join(FILTER_DIR, script)) == fills_rows
+
+
+def test_area_without_database_is_bootstrapped_from_scratch(bootstrapper, mocker):
+    full_bootstrap = mocker.patch.object(incremental.BootStrapper, 'bootstrap')
+    mocker.patch.object(bootstrapper, '_setup_state')
+    with mock.patch.object(bootstrapper, '_postgres') as postgres_mock:
+        postgres_mock.db_exists.return_value = False
+        bootstrapper.bootstrap()
+
+    assert full_bootstrap.call_count == 1
+    assert bootstrapper._setup_state.call_count == 1
+
+
+def test_changes_are_applied_and_only_changed_objects_reprocessed(bootstrapper, mocker):
+    mocker.patch.object(bootstrapper, '_state', return_value=('2019-05-01T00:00:00Z', 'small'))
+    full_bootstrap = mocker.patch.object(incremental.BootStrapper, 'bootstrap')
+    osmupdate_call = mocker.patch.object(incremental, 'logged_check_call')
+    osm2pgsql_call = mocker.patch('osmaxx.conversion.converters.converter_gis.bootstrap.bootstrap.logged_check_call')
+    mocker.patch.object(incremental, '_osm_data_timestamp', return_value='2019-05-08T00:00:00Z')
+    mocker.patch.object(incremental, 'TUNING_PROFILES', {
+        'small': {'session_settings': {'work_mem': '64MB'}, 'osm2pgsql_cache_mb': 512},
+    })
+    call_order = []
+    mocker.patch.object(bootstrapper, '_boundaries_importer')
+    for step in ['_harmonize_database', '_transliterate_names', '_filter_data', '_create_views']:
+        mocker.patch.object(bootstrapper, step, side_effect=lambda *args, step=step, **kwargs: call_order.append(step))
+    with mock.patch.object(bootstrapper, '_postgres') as postgres_mock:
+        postgres_mock.get_session_settings.return_value = {'work_mem': '64MB'}
+        postgres_mock.execute_sql_file.side_effect = lambda path: call_order.append(os.path.basename(path))
+        postgres_mock.set_session_settings.side_effect = lambda settings: call_order.append(settings)
+        bootstrapper.bootstrap()
+
+    assert full_bootstrap.call_count == 0
+    (osmupdate_command,), _ = osmupdate_call.call_args
+    (osm2pgsql_command,), _ = osm2pgsql_call.call_args
+    assert osmupdate_command[0] == 'osmupdate'
+    assert '2019-05-01T00:00:00Z' in osmupdate_command
+    assert any(argument.startswith('-B=') for argument in osmupdate_command)
+    assert osm2pgsql_command[:2] == ['osm2pgsql', '--append']
+    assert call_order == [
+        {'work_mem': '64MB'},
+        'start_recording_changed_objects.sql',
+        'stop_recording_changed_objects.sql',
+        'restrict_to_changed_objects.sql',
+        {'work_mem': '64MB', 'search_path': 'osmaxx_changed,public'},
+        '_harmonize_database',
+        '_transliterate_names',
+        '_filter_data',
+        {'work_mem': '64MB'},
+        'release_changed_objects.sql',
+        '_create_views',
+    ]
+
+
+def test_diffs_older_than_the_max_age_are_deleted(tmpdir):
+    old_diff, new_diff = tmpdir.join('temp.h123.osc.gz'), tmpdir.join('temp.h124.osc.gz')
+    lock_file = tmpdir.join('.lock')
+    for path in [old_diff, new_diff, lock_file]:
+        path.write('')
+    two_days_ago = time.time() - timedelta(days=2).total_seconds()
+    os.utime(str(old_diff), (two_days_ago, two_days_ago))
+    os.utime(str(lock_file), (two_days_ago, two_days_ago))
+
+    incremental._delete_old_diffs(str(tmpdir), max_age=timedelta(days=1))
+
+    assert not old_diff.exists()
+    assert new_diff.exists()
+    assert lock_file.exists()
+
+
+def test_views_are_recreated_without_applying_anything_if_up_to_date(bootstrapper, mocker):
+    mocker.patch.object(bootstrapper, '_state', return_value=('2019-05-01T00:00:00Z', 'small'))
+    check_call = mocker.patch.object(
+        incremental, 'logged_check_call',
+        side_effect=subprocess.CalledProcessError(incremental.OSMUPDATE_UP_TO_DATE, 'osmupdate'),
+    )
+    apply_changes = mocker.patch.object(bootstrapper, '_apply_changes')
+    create_views = mocker.patch.object(bootstrapper, '_create_views')
+    boundaries_importer = mocker.patch.object(bootstrapper, '_boundaries_importer')
+    with mock.patch.object(bootstrapper, '_postgres'):
+        bootstrapper.bootstrap()
+
+    assert check_call.call_count == 1
+    assert apply_changes.call_count == 0
+    assert create_views.call_count == 1
+    boundaries_importer.return_value.create_views.assert_called_once_with(extent=bootstrapper.geom)
+
+
+def test_export_is_extracted_from_the_database_of_the_area(area_polyfile_string, mocker, tmpdir):
+    from osmaxx.conversion import output_format
+    from osmaxx.conversion.converters.converter_gis import gis
+    from osmaxx.conversion.converters.converter_gis.detail_levels import DETAIL_LEVEL_ALL
+    from osmaxx.conversion.converters.converter_gis.extract.db_to_format import extract
+    mocker.patch.dict(gis.CONVERSION_SETTINGS, INCREMENTAL_EXPORTS=True)
+    for attribute in ['database_in_use', 'bootstrap', 'geom']:
+        mocker.patch.object(incremental.IncrementalBootStrapper, attribute)
+    mocker.patch.object(gis.GISConverter, '_dump_qgis_symbology')
+    mocker.patch.object(gis, 'zip_folders_relative')
+    mocker.patch.object(gis, 'heartbeats')
+    mocker.patch.object(gis, 'get_current_job', return_value=None)
+    ogr2ogr_call = mocker.patch.object(extract.subprocess, 'check_output')
+    gis.GISConverter(
+        conversion_format=output_format.GPKG, output_zip_file_path=str(tmpdir.join('export.zip')),
+        base_file_name='export', out_srs='EPSG:4326', polyfile_string=area_polyfile_string,
+        detail_level=DETAIL_LEVEL_ALL,
+    ).create_gis_export()
+
+    (ogr2ogr_command,), _ = ogr2ogr_call.call_args
+    dsn, = [argument for argument in ogr2ogr_command if argument.startswith('PG:')]
+    assert 'dbname={} '.format(incremental.database_name_for(area_polyfile_string)) in dsn
@@ -0,0 +1,40 @@
+from contextlib import closing
+
+import pytest
+import sqlalchemy
+
+from tests.conversion.converters.inside_worker_test.conftest import slow
+
+
+@pytest.fixture(params=[
+    # height, building:height, building:levels, levels, expected height
+    ('12.3', 'x', 'x', 'x', 12),
+    ('x', '12.3', 'x', 'x', 12),
+    ('x', 'x', '3.4', 'x', 9),
+    ('x', 'x', 'x', '4.5', 12),
+    ('12.3', 'x', '3.4', 'x', 12),
+    (None, None, None, None, None),
+])
+def building_height_tags(request):
+    return request.param
+
+
+@slow
+def test_building_height_from_columns_and_from_hstore_agree(osmaxx_functions, building_height_tags):
+    engine = osmaxx_functions
+    height, building_height, building_levels, levels, expected_height = building_height_tags
+    tags = {'height': height, 'building:height': building_height, 'building:levels': building_levels, 'levels': levels}
+    with closing(
+        engine.execute(
+            sqlalchemy.text(
+                "select building_height(:height, :building_height, :building_levels, :levels) as from_columns, "
+                "building_height(hstore(CAST(:keys AS text[]), CAST(:values AS text[]))) as from_hstore;"
+            ).bindparams(
+                height=height, building_height=building_height, building_levels=building_levels, levels=levels,
+                keys=list(tags.keys()), values=list(tags.values()),
+            ).execution_options(autocommit=True)
+        )
+    ) as result:
+        row = result.fetchone()
+        assert row['from_columns'] == expected_height
+        assert row['from_hstore'] == expected_height
@@ -160,6 +160,9 @@ def data_import(osmaxx_schemas, clean_osm_tables, monkeypatch, mocker, area_poly
         def _reset_database(self):
             pass  # Already taken care of by clean_osm_tables fixture.
 
+        def _apply_tuning_profile(self):
+            pass  # No PBF file is cut, so there is no extract size to choose a profile by.
+
         def _import_pbf(self):
             pass
 
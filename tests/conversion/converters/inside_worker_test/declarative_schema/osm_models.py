@@ -30,6 +30,8 @@ t_osm_line = Table(
     Column('bridge', Text),
     Column('boundary', Text),
     Column('building', Text),
+    Column('building:height', Text),
+    Column('building:levels', Text),
     Column('bus', Text),
     Column('contact:phone', Text),
     Column('cuisine', Text),
@@ -48,6 +50,7 @@ t_osm_line = Table(
     Column('landuse', Text),
     Column('layer', Text),
     Column('leisure', Text),
+    Column('levels', Text),
     Column('man_made', Text),
     Column('maxspeed', Text),
     Column('military', Text),
@@ -230,6 +233,8 @@ t_osm_polygon = Table(
     Column('bridge', Text),
     Column('boundary', Text),
     Column('building', Text),
+    Column('building:height', Text),
+    Column('building:levels', Text),
     Column('bus', Text),
     Column('contact:phone', Text),
     Column('cuisine', Text),
@@ -248,6 +253,7 @@ t_osm_polygon = Table(
     Column('landuse', Text),
     Column('layer', Text),
     Column('leisure', Text),
+    Column('levels', Text),
     Column('man_made', Text),
     Column('maxspeed', Text),
     Column('military', Text),
@@ -337,6 +343,8 @@ t_osm_roads = Table(
     Column('bridge', Text),
     Column('boundary', Text),
     Column('building', Text),
+    Column('building:height', Text),
+    Column('building:levels', Text),
     Column('bus', Text),
     Column('contact:phone', Text),
     Column('cuisine', Text),
@@ -355,6 +363,7 @@ t_osm_roads = Table(
     Column('landuse', Text),
     Column('layer', Text),
     Column('leisure', Text),
+    Column('levels', Text),
     Column('man_made', Text),
     Column('maxspeed', Text),
     Column('military', Text),
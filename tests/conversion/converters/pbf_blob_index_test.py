@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from osmaxx.conversion.converters.converter_pbf.blob_index import BlobIndex, index_path_for
+
+MONACO_EXTENT = (7.40, 43.72, 7.44, 43.76)
+MONACO_CELL = (43 + 90) * 360 + (7 + 180)
+FAR_AWAY_CELL = (10 + 90) * 360 + (20 + 180)
+
+# header, nodes in Monaco, nodes far away, ways in Monaco, ways far away, relations
+BLOB_CONTENTS = [b'header', b'monaco-nodes', b'far-nodes', b'monaco-ways', b'far-ways', b'relations']
+BLOB_KINDS = [0, 1, 1, 2, 2, 3]
+BLOB_CELLS = [[], [MONACO_CELL], [FAR_AWAY_CELL], [MONACO_CELL], [FAR_AWAY_CELL], []]
+BLOB_DEPENDENCIES = [[], [], [], [1], [2], []]
+
+
+def _csr(lists, dtype):
+    offsets = np.concatenate(([0], np.cumsum([len(values) for values in lists]))).astype(np.int64)
+    return offsets, np.array([value for values in lists for value in values], dtype=dtype)
+
+
+def _write_pbf_and_index(pbf_path, complex_relations):
+    with open(pbf_path, 'wb') as pbf_file:
+        pbf_file.write(b''.join(BLOB_CONTENTS))
+    pbf_stat = os.stat(pbf_path)
+    lengths = np.array([len(content) for content in BLOB_CONTENTS], dtype=np.int64)
+    cell_offsets, cells = _csr(BLOB_CELLS, np.uint16)
+    dependency_offsets, dependencies = _csr(BLOB_DEPENDENCIES, np.int64)
+    complex_relation_offsets, complex_relation_way_blobs = _csr(complex_relations, np.int64)
+    with open(index_path_for(pbf_path), 'wb') as index_file:
+        np.savez(
+            index_file,
+            offsets=np.concatenate(([0], np.cumsum(lengths)[:-1])),
+            lengths=lengths,
+            kinds=np.array(BLOB_KINDS, dtype=np.int8),
+            cell_offsets=cell_offsets,
+            cells=cells,
+            dependency_offsets=dependency_offsets,
+            dependencies=dependencies,
+            complex_relation_offsets=complex_relation_offsets,
+            complex_relation_way_blobs=complex_relation_way_blobs,
+            pbf_size=np.int64(pbf_stat.st_size),
+            pbf_mtime_ns=np.int64(pbf_stat.st_mtime_ns),
+        )
+
+
+@pytest.fixture
+def pbf_path(tmpdir):
+    return str(tmpdir.join('planet.osm.pbf'))
+
+
+def test_for_pbf_returns_none_without_index(pbf_path):
+    with open(pbf_path, 'wb') as pbf_file:
+        pbf_file.write(b''.join(BLOB_CONTENTS))
+    assert BlobIndex.for_pbf(pbf_path) is None
+
+
+def test_for_pbf_ignores_index_of_another_version_of_the_file(pbf_path):
+    _write_pbf_and_index(pbf_path, complex_relations=[])
+    with open(pbf_path, 'ab') as pbf_file:
+        pbf_file.write(b'updated')
+    assert BlobIndex.for_pbf(pbf_path) is None
+
+
+def test_blobs_within_selects_header_relations_and_blobs_of_the_extent(pbf_path):
+    _write_pbf_and_index(pbf_path, complex_relations=[])
+    assert BlobIndex.for_pbf(pbf_path).blobs_within(MONACO_EXTENT).tolist() == [0, 1, 3, 5]
+
+
+def test_blobs_within_completes_complex_relations_reaching_into_the_extent(pbf_path):
+    _write_pbf_and_index(pbf_path, complex_relations=[[3, 4]])
+    assert BlobIndex.for_pbf(pbf_path).blobs_within(MONACO_EXTENT).tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def test_write_blobs_copies_selected_blobs_in_order(pbf_path, tmpdir):
+    _write_pbf_and_index(pbf_path, complex_relations=[])
+    blob_index = BlobIndex.for_pbf(pbf_path)
+    out_path = str(tmpdir.join('reduced.osm.pbf'))
+    blob_index.write_blobs(pbf_path, blob_index.blobs_within(MONACO_EXTENT), out_path)
+    with open(out_path, 'rb') as reduced_pbf:
+        assert reduced_pbf.read() == b'header' + b'monaco-nodes' + b'monaco-ways' + b'relations'
@@ -0,0 +1,89 @@
+import os
+
+import osmium
+import pytest
+
+from osmaxx.conversion.converters.converter_pbf import extraction
+from osmaxx.conversion.converters.converter_pbf.polygon_filter import PolygonFilter
+
+MONACO_PBF_PATH = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'test_data', 'osm', 'monaco-latest.osm.pbf')
+# the western part of Monaco, with a hole
+POLYGON_FILTER = PolygonFilter([
+    [(7.40, 43.72), (7.43, 43.72), (7.43, 43.745), (7.40, 43.745)],
+    [(7.41, 43.73), (7.42, 43.73), (7.42, 43.735), (7.41, 43.735)],
+])
+
+
+class _Contents(osmium.SimpleHandler):
+    def __init__(self):
+        super().__init__()
+        self.nodes, self.ways, self.relations = {}, {}, {}
+
+    def node(self, node):
+        self.nodes[node.id] = (node.location.lon, node.location.lat)
+
+    def way(self, way):
+        self.ways[way.id] = [node.ref for node in way.nodes]
+
+    def relation(self, relation):
+        self.relations[relation.id] = (
+            relation.tags.get('type'), [(member.type, member.ref) for member in relation.members],
+        )
+
+
+def _contents(pbf_path):
+    contents = _Contents()
+    contents.apply_file(pbf_path)
+    return contents
+
+
+@pytest.fixture(scope='module')
+def monaco():
+    return _contents(MONACO_PBF_PATH)
+
+
+@pytest.fixture(scope='module')
+def extracted(tmpdir_factory):
+    out_path = str(tmpdir_factory.mktemp('extraction').join('extract.osm.pbf'))
+    counts = extraction.extract(MONACO_PBF_PATH, POLYGON_FILTER, out_path, processes=2)
+    return counts, _contents(out_path)
+
+
+def test_extract_contains_all_nodes_inside_the_polygon(monaco, extracted):
+    _, contents = extracted
+    node_ids, locations = zip(*monaco.nodes.items())
+    inside = POLYGON_FILTER.contains(*zip(*locations))
+    assert {node_id for node_id, is_inside in zip(node_ids, inside) if is_inside} <= set(contents.nodes)
+
+
+def test_extract_contains_ways_completely(monaco, extracted):
+    _, contents = extracted
+    assert contents.ways
+    for way_id, node_ids in contents.ways.items():
+        assert node_ids == monaco.ways[way_id]
+        assert set(node_ids) <= set(contents.nodes)
+
+
+def test_extract_contains_multipolygons_and_boundaries_completely(monaco, extracted):
+    _, contents = extracted
+    complex_relations = [
+        members for relation_type, members in contents.relations.values() if relation_type in ('multipolygon', 'boundary')
+    ]
+    assert complex_relations
+    for members in complex_relations:
+        way_ids = {ref for member_type, ref in members if member_type == 'w'}
+        assert way_ids & set(monaco.ways) <= set(contents.ways)
+
+
+def test_extract_counts_the_written_elements(extracted):
+    counts, contents = extracted
+    assert counts == dict(nodes=len(contents.nodes), ways=len(contents.ways), relations=len(contents.relations))
+
+
+def test_extract_is_independent_of_chunking_and_process_count(extracted, tmpdir, monkeypatch):
+    monkeypatch.setattr(extraction, 'BLOBS_PER_CHUNK', 1)
+    out_path = str(tmpdir.join('extract.osm.pbf'))
+    counts = extraction.extract(MONACO_PBF_PATH, POLYGON_FILTER, out_path, processes=3)
+    _, contents = extracted
+    assert counts == extracted[0]
+    assert set(_contents(out_path).ways) == set(contents.ways)
@@ -0,0 +1,93 @@
+import fcntl
+import json
+import os
+
+import pytest
+
+from osmaxx.conversion.converters.converter_pbf.planet import (
+    GENERATION_LOCK_FILE_NAME, MANIFEST_FILE_NAME, bounded_extracts, planet_generation, smallest_extract_containing,
+)
+
+
+@pytest.fixture
+def published_planet(tmpdir):
+    generation_dir = tmpdir.mkdir('pbf').mkdir('generations').mkdir('20190601T000000Z')
+    generation_dir.join(GENERATION_LOCK_FILE_NAME).write('')
+    generation_dir.join('planet-latest.osm.pbf').write_binary(b'planet')
+    os.symlink('generations/20190601T000000Z', str(tmpdir.join('pbf', 'current')))
+    os.symlink('current/planet-latest.osm.pbf', str(tmpdir.join('pbf', 'planet-latest.osm.pbf')))
+    return str(tmpdir.join('pbf', 'planet-latest.osm.pbf'))
+
+
+def _is_locked(lock_file_path):
+    with open(lock_file_path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        return False
+
+
+def test_planet_generation_resolves_and_locks_the_current_generation(published_planet, tmpdir):
+    generation_dir = tmpdir.join('pbf', 'generations', '20190601T000000Z')
+    with planet_generation(published_planet) as planet_file_path:
+        assert planet_file_path == str(generation_dir.join('planet-latest.osm.pbf'))
+        assert _is_locked(str(generation_dir.join(GENERATION_LOCK_FILE_NAME)))
+    assert not _is_locked(str(generation_dir.join(GENERATION_LOCK_FILE_NAME)))
+
+
+def test_planet_generation_keeps_the_generation_when_the_planet_is_switched(published_planet, tmpdir):
+    with planet_generation(published_planet) as planet_file_path:
+        tmpdir.join('pbf', 'generations').mkdir('20190601T010000Z')
+        os.remove(str(tmpdir.join('pbf', 'current')))
+        os.symlink('generations/20190601T010000Z', str(tmpdir.join('pbf', 'current')))
+        assert '20190601T000000Z' in planet_file_path
+
+
+def test_planet_generation_retries_if_the_generation_is_deleted_after_resolving(published_planet, tmpdir, monkeypatch):
+    new_generation_dir = tmpdir.join('pbf', 'generations').mkdir('20190601T010000Z')
+    new_generation_dir.join(GENERATION_LOCK_FILE_NAME).write('')
+    new_generation_dir.join('planet-latest.osm.pbf').write_binary(b'planet')
+    realpath = os.path.realpath
+
+    def resolve_and_collect_garbage(path):
+        resolved_path = realpath(path)
+        if '20190601T000000Z' in resolved_path:
+            os.remove(str(tmpdir.join('pbf', 'current')))
+            os.symlink('generations/20190601T010000Z', str(tmpdir.join('pbf', 'current')))
+            tmpdir.join('pbf', 'generations', '20190601T000000Z').remove()
+        return resolved_path
+    monkeypatch.setattr(os.path, 'realpath', resolve_and_collect_garbage)
+
+    with planet_generation(published_planet) as planet_file_path:
+        assert planet_file_path == str(new_generation_dir.join('planet-latest.osm.pbf'))
+
+
+def test_planet_generation_passes_plain_planet_files(tmpdir):
+    planet = tmpdir.join('planet-latest.osm.pbf')
+    planet.write_binary(b'planet')
+    with planet_generation(str(planet)) as planet_file_path:
+        assert planet_file_path == str(planet)
+
+
+def test_smallest_extract_containing_picks_the_smallest_box_around_the_extent(tmpdir):
+    generation_dir = tmpdir.mkdir('generation')
+    generation_dir.join(MANIFEST_FILE_NAME).write(json.dumps(dict(
+        generation='generation',
+        artifacts={
+            'blob-index': dict(type='blob_index', path='planet-latest.osm.pbf.blobindex.npz'),
+            'europe': dict(type='extract', path='artifacts/europe.osm.pbf', bbox=[-25, 34, 45, 72]),
+            'switzerland': dict(type='extract', path='artifacts/switzerland.osm.pbf', bbox=[5.9, 45.8, 10.5, 47.9]),
+            'monaco': dict(type='extract', path='artifacts/monaco.osm.pbf'),
+        },
+        failed=[],
+    )))
+    extracts = bounded_extracts(str(generation_dir.join('planet-latest.osm.pbf')))
+    assert len(extracts) == 2
+    assert smallest_extract_containing(extracts, (8.5, 47.3, 8.6, 47.4)) == str(generation_dir.join('artifacts', 'switzerland.osm.pbf'))
+    assert smallest_extract_containing(extracts, (2.3, 48.8, 2.4, 48.9)) == str(generation_dir.join('artifacts', 'europe.osm.pbf'))
+    assert smallest_extract_containing(extracts, (-74.1, 40.6, -73.9, 40.9)) is None
+
+
+def test_bounded_extracts_is_empty_without_manifest(tmpdir):
+    assert bounded_extracts(str(tmpdir.join('planet-latest.osm.pbf'))) == []
@@ -0,0 +1,25 @@
+from osmaxx.conversion.converters.converter_pbf.polygon_filter import PolygonFilter
+
+SQUARE_WITH_HOLE = [
+    [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)],
+    [(4, 4), (6, 4), (6, 6), (4, 6), (4, 4)],
+]
+OTHER_SQUARE = [(20, 0), (30, 0), (30, 10), (20, 10)]
+
+
+def test_contains_respects_holes():
+    polygon_filter = PolygonFilter(SQUARE_WITH_HOLE)
+    assert polygon_filter.contains([1, 5, 9, 11, -1], [1, 5, 9, 5, 5]).tolist() == [True, False, True, False, False]
+
+
+def test_contains_handles_several_polygons_and_unclosed_rings():
+    polygon_filter = PolygonFilter(SQUARE_WITH_HOLE + [OTHER_SQUARE])
+    assert polygon_filter.contains([25, 15, 2], [5, 5, 2]).tolist() == [True, False, True]
+
+
+def test_contains_treats_missing_locations_as_outside():
+    assert PolygonFilter(SQUARE_WITH_HOLE).contains([float('nan')], [float('nan')]).tolist() == [False]
+
+
+def test_extent_covers_all_rings():
+    assert PolygonFilter(SQUARE_WITH_HOLE + [OTHER_SQUARE]).extent == (0, 0, 30, 10)
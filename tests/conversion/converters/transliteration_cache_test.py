@@ -0,0 +1,56 @@
+import os
+from unittest import mock
+
+from osmaxx.conversion.converters.converter_gis.helper.transliteration_cache import TransliterationCache
+
+
+def test_load_without_persisted_cache_does_not_touch_the_database(tmpdir):
+    postgres_mock = mock.Mock()
+    TransliterationCache(postgres_mock, os.path.join(str(tmpdir), 'not_yet_existing.tsv')).load()
+    assert postgres_mock.mock_calls == []
+
+
+def test_load_copies_persisted_cache_into_database(tmpdir):
+    store_file_path = os.path.join(str(tmpdir), 'transliteration_cache.tsv')
+    with open(store_file_path, 'w', encoding='utf-8') as store_file:
+        store_file.write('Москва\tMoskva\n')
+    postgres_mock = mock.Mock()
+    TransliterationCache(postgres_mock, store_file_path).load()
+    assert postgres_mock.copy_from_file.call_count == 1
+    _, table_name = postgres_mock.copy_from_file.call_args[0]
+    assert table_name == 'transliteration_cache_import'
+
+
+def test_store_new_entries_appends_only_new_entries(tmpdir):
+    store_file_path = os.path.join(str(tmpdir), 'cache', 'transliteration_cache.tsv')
+    postgres_mock = mock.Mock()
+    postgres_mock.copy_to_file.side_effect = lambda file, query: file.write('Київ\tKyïv\n')
+    cache = TransliterationCache(postgres_mock, store_file_path)
+    cache.store_new_entries()
+    cache.store_new_entries()
+
+    _, query = postgres_mock.copy_to_file.call_args[0]
+    assert 'WHERE is_new' in query
+    with open(store_file_path, encoding='utf-8') as store_file:
+        assert store_file.read() == 'Київ\tKyïv\n' * 2
+
+
+def test_disabled_cache_does_nothing():
+    postgres_mock = mock.Mock()
+    cache = TransliterationCache(postgres_mock, None)
+    cache.load()
+    cache.store_new_entries()
+    assert postgres_mock.mock_calls == []
+
+
+def test_store_new_entries_compacts_the_file_beyond_the_max_size(tmpdir):
+    store_file_path = os.path.join(str(tmpdir), 'transliteration_cache.tsv')
+    with open(store_file_path, 'w', encoding='utf-8') as store_file:
+        store_file.write('Αθήνα\tAthina\n' + 'Москва\tMoskva\n' * 2 + 'Київ\tKyiv\n')
+    postgres_mock = mock.Mock()
+    postgres_mock.copy_to_file.side_effect = lambda file, query: file.write('Київ\tKyïv\n')
+    cache = TransliterationCache(postgres_mock, store_file_path, max_bytes=70)
+    cache.store_new_entries()
+
+    with open(store_file_path, encoding='utf-8') as store_file:
+        assert store_file.read() == 'Москва\tMoskva\nКиїв\tKyïv\n'
@@ -0,0 +1,28 @@
+import pytest
+
+from osmaxx.conversion.converters.converter_gis.helper.postgres_wrapper import libpq_options
+from osmaxx.conversion.converters.converter_gis.tuning_profiles import (
+    SIZE_CLASS_LARGE, SIZE_CLASS_MEDIUM, SIZE_CLASS_SMALL, TUNING_PROFILES, size_class_for,
+)
+
+
+@pytest.mark.parametrize('pbf_size, expected_size_class', [
+    (0, SIZE_CLASS_SMALL),
+    (50 * 1024 ** 2, SIZE_CLASS_SMALL),
+    (50 * 1024 ** 2 + 1, SIZE_CLASS_MEDIUM),
+    (1024 ** 3, SIZE_CLASS_MEDIUM),
+    (1024 ** 3 + 1, SIZE_CLASS_LARGE),
+    (50 * 1024 ** 3, SIZE_CLASS_LARGE),
+])
+def test_size_class_for(pbf_size, expected_size_class):
+    assert size_class_for(pbf_size) == expected_size_class
+
+
+@pytest.mark.parametrize('size_class', TUNING_PROFILES.keys())
+def test_every_profile_turns_off_synchronous_commit(size_class):
+    assert TUNING_PROFILES[size_class]['session_settings']['synchronous_commit'] == 'off'
+
+
+def test_libpq_options():
+    assert libpq_options(dict(work_mem='64MB', max_parallel_workers_per_gather=2)) == \
+        '-c max_parallel_workers_per_gather=2 -c work_mem=64MB'
@@ -0,0 +1,39 @@
+from unittest.mock import Mock
+
+from redis.exceptions import ResponseError
+
+from osmaxx.conversion import status
+from osmaxx.conversion.job_dispatcher import events
+
+
+def test_publish_adds_the_status_of_the_job_to_the_stream():
+    connection = Mock()
+    events.publish(connection, rq_job_id='abc', status=status.FINISHED)
+    connection.xadd.assert_called_once_with(
+        events.STREAM, {'rq_job_id': 'abc', 'status': status.FINISHED}, maxlen=events.STREAM_MAX_LENGTH,
+    )
+
+
+def test_consumer_joins_an_existing_consumer_group():
+    connection = Mock(**{'xgroup_create.side_effect': ResponseError('BUSYGROUP Consumer Group name already exists')})
+    events.EventConsumer(connection, consumer_name='harvester')
+    assert connection.xgroup_create.call_count == 1
+
+
+def test_consumer_reads_unacknowledged_events_before_waiting_for_new_ones():
+    pending_events = [(events.STREAM.encode(), [(b'1-0', {b'rq_job_id': b'abc', b'status': b'started'}), (b'2-0', None)])]
+    connection = Mock(**{'xreadgroup.side_effect': [pending_events, [], []]})
+    consumer = events.EventConsumer(connection, consumer_name='harvester')
+
+    assert consumer.read(block_seconds=5) == [(b'1-0', 'abc', 'started'), (b'2-0', None, None)]
+    assert consumer.read(block_seconds=5) == []
+    assert consumer.read(block_seconds=5) == []
+
+    read_ids_and_blocking = [
+        (call[0][2], call[1]['block']) for call in connection.xreadgroup.call_args_list
+    ]
+    assert read_ids_and_blocking == [({events.STREAM: '0'}, None), ({events.STREAM: '0'}, None), ({events.STREAM: '>'}, 5000)]
+
+
+def test_published_at_is_told_by_the_event_id():
+    assert events.published_at(b'1557300000123-0') == 1557300000.123
@@ -0,0 +1,67 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from osmaxx.conversion.job_dispatcher import cancellation, heartbeats
+
+
+def test_heartbeat_reports_the_stage_while_the_job_runs():
+    connection = MagicMock(**{'exists.return_value': 0})
+    pipeline = connection.pipeline.return_value.__enter__.return_value
+
+    with heartbeats.Heartbeat(connection, rq_job_id='rq-job-id', interval_seconds=3600):
+        heartbeats.stage('extract')
+
+    def reported_stages():
+        return [json.loads(args[2])['stage'] for args, _ in pipeline.hset.call_args_list if args[0] == heartbeats.STAGES]
+    assert reported_stages() == ['started', 'extract']
+    pipeline.zrem.assert_called_once_with(heartbeats.BEATS, 'rq-job-id')
+    heartbeats.stage('outside of a job')
+    assert len(reported_stages()) == 2
+
+
+def test_stale_returns_the_jobs_whose_last_beat_is_too_old():
+    connection = MagicMock(**{
+        'zrangebyscore.return_value': [(b'stale', 1000.0), (b'without-stage', 1010.0)],
+        'hmget.return_value': [json.dumps({'stage': 'bootstrap', 'worker': 'worker-1'}).encode(), None],
+    })
+
+    assert heartbeats.stale(connection, timeout_seconds=180) == [
+        ('stale', 1000.0, {'stage': 'bootstrap', 'worker': 'worker-1'}),
+        ('without-stage', 1010.0, {}),
+    ]
+
+
+def test_heartbeat_cancels_the_job_once_requested(mocker):
+    kill_descendant_processes = mocker.patch.object(cancellation, 'kill_descendant_processes')
+    connection = MagicMock(**{'exists.return_value': 1})
+
+    with pytest.raises(cancellation.JobCancelled):
+        with heartbeats.Heartbeat(connection, rq_job_id='rq-job-id', interval_seconds=3600):
+            heartbeats.stage('extract')
+
+    connection.exists.assert_called_with(cancellation.KEY_TEMPLATE.format('rq-job-id'))
+    assert kill_descendant_processes.call_count == 1
+    cancellation.reset()
+
+
+def test_heartbeat_records_the_metrics_of_the_job(mocker):
+    observe = mocker.patch.object(heartbeats.metrics, 'observe')
+    byte_count = mocker.Mock(return_value=1000)
+    connection = MagicMock(**{'exists.return_value': 0})
+
+    with heartbeats.Heartbeat(connection, rq_job_id='rq-job-id', interval_seconds=3600, conversion_format='gpkg'):
+        heartbeats.stage('extract')
+        with heartbeats.throughput('extract', byte_count):
+            pass
+
+    observed = [(args[0], kwargs['labels']) for args, kwargs in observe.call_args_list]
+    assert observed == [
+        ('osmaxx_stage_duration_seconds', {'format': 'gpkg', 'stage': 'started'}),
+        ('osmaxx_stage_throughput_bytes_per_second', {'format': 'gpkg', 'stage': 'extract'}),
+        ('osmaxx_stage_duration_seconds', {'format': 'gpkg', 'stage': 'extract'}),
+    ]
+    with heartbeats.throughput('extract', byte_count):
+        pass
+    assert byte_count.call_count == 1
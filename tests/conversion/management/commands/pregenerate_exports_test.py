@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from osmaxx.conversion import status
+
+
+@pytest.fixture
+def off_peak_hours(mocker):
+    from osmaxx.conversion._settings import CONVERSION_SETTINGS
+    mocker.patch.dict(CONVERSION_SETTINGS, {'PREGENERATION_OFF_PEAK_HOURS': (22, 4)})
+
+
+@pytest.mark.parametrize('hour,expected', [(21, False), (22, True), (23, True), (0, True), (3, True), (4, False)])
+def test_is_off_peak_across_midnight(off_peak_hours, hour, expected):
+    from osmaxx.conversion.management.commands.pregenerate_exports import is_off_peak
+    assert is_off_peak(datetime(2019, 5, 2, hour, 30)) == expected
+
+
+def test_off_peak_start_after_midnight_is_on_the_previous_day(off_peak_hours):
+    from osmaxx.conversion.management.commands.pregenerate_exports import off_peak_start
+    assert off_peak_start(datetime(2019, 5, 2, 1, 30)) == datetime(2019, 5, 1, 22, 0)
+    assert off_peak_start(datetime(2019, 5, 2, 23, 30)) == datetime(2019, 5, 2, 22, 0)
+
+
+def test_ranking_is_recorded_for_the_off_peak_period(off_peak_hours, mocker):
+    from osmaxx.conversion.management.commands.pregenerate_exports import off_peak_start, ranked_since, record_ranking
+    redis_values = {}
+    connection = mocker.Mock(**{'get.side_effect': redis_values.get, 'set.side_effect': redis_values.__setitem__})
+    assert not ranked_since(off_peak_start(datetime(2019, 5, 2, 1, 30)), connection=connection)
+
+    record_ranking(datetime(2019, 5, 2, 1, 30), connection=connection)
+
+    assert ranked_since(off_peak_start(datetime(2019, 5, 2, 3, 30)), connection=connection)
+    assert not ranked_since(off_peak_start(datetime(2019, 5, 2, 22, 30)), connection=connection)
+
+
+@pytest.mark.django_db()
+def test_most_ordered_parametrizations_counts_orders_of_the_same_area(conversion_parametrization, server_url):
+    from osmaxx.conversion.management.commands.pregenerate_exports import most_ordered_parametrizations
+    from osmaxx.conversion.models import Job, Parametrization
+    same_export = Parametrization.objects.create(
+        out_format=conversion_parametrization.out_format, out_srs=conversion_parametrization.out_srs,
+        detail_level=conversion_parametrization.detail_level, clipping_area=conversion_parametrization.clipping_area,
+    )
+    for parametrization in [conversion_parametrization, conversion_parametrization, same_export]:
+        Job.objects.create(own_base_url=server_url, parametrization=parametrization, status=status.FINISHED)
+    Job.objects.create(own_base_url=server_url, parametrization=conversion_parametrization, status=status.FAILED)
+
+    assert most_ordered_parametrizations(count=10, min_orders=3, history_jobs=100) == [(3, same_export)]
+    assert most_ordered_parametrizations(count=10, min_orders=4, history_jobs=100) == []
+    assert most_ordered_parametrizations(count=10, min_orders=1, history_jobs=2) == [(2, same_export)]
+
+
+@pytest.mark.django_db()
+def test_harvest_pregenerated_exports_records_the_result(mocker, conversion_parametrization, fake_rq_id):
+    from osmaxx.conversion.management.commands import pregenerate_exports
+    from osmaxx.conversion.models import PregeneratedExport
+    rq_job = mocker.Mock(**{'get_status.return_value': status.FINISHED})
+    mocker.patch.object(pregenerate_exports, 'fetch_jobs', return_value={str(fake_rq_id): rq_job})
+    add_meta_data_to_job = mocker.patch.object(pregenerate_exports, 'add_meta_data_to_job')
+    pregenerated_export = PregeneratedExport.objects.create(
+        parametrization=conversion_parametrization, polygon_hash='0' * 64, order_count=3, rq_job_id=fake_rq_id,
+        status=status.QUEUED,
+    )
+
+    pregenerate_exports.harvest_pregenerated_exports()
+
+    pregenerated_export.refresh_from_db()
+    assert pregenerated_export.status == status.FINISHED
+    assert pregenerated_export.resulting_file.name == pregenerated_export.zip_file_relative_path()
+    assert add_meta_data_to_job.call_count == 1
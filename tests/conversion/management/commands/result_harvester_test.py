@@ -5,10 +5,8 @@ from osmaxx.conversion import status
 
 
 @pytest.fixture
-def queue(fake_rq_id):
-    job = Mock(**{'get_status.return_value': status.STARTED, 'id': fake_rq_id})
-    queue = Mock(**{'fetch_job.return_value': job})
-    return queue
+def rq_job(fake_rq_id):
+    return Mock(**{'get_status.return_value': status.STARTED, 'id': str(fake_rq_id), 'started_at': None})
 
 
 @pytest.fixture
@@ -21,10 +19,11 @@ def test_handle_failed_jobs_calls_set_failed_unless_final(mocker, fake_rq_id, fa
     mocker.patch('django_rq.get_queue', return_value=failed_queue)
 
     from osmaxx.conversion.management.commands import result_harvester
-    from osmaxx.conversion.models import Job
+    from osmaxx.conversion.models import Job, PregeneratedExport
 
-    conversion_job_mock = Mock()
-    mocker.patch.object(Job.objects, 'get', return_value=conversion_job_mock)
+    conversion_job_mock = Mock(rq_job_id=fake_rq_id)
+    mocker.patch.object(Job.objects, 'filter', return_value=[conversion_job_mock])
+    mocker.patch.object(PregeneratedExport.objects, 'filter', return_value=Mock(**{'values_list.return_value': []}))
     cmd = result_harvester.Command()
     _set_failed_unless_final = mocker.patch.object(cmd, '_set_failed_unless_final')
     _update_job_mock = mocker.patch.object(cmd, '_notify')
@@ -34,27 +33,103 @@ def test_handle_failed_jobs_calls_set_failed_unless_final(mocker, fake_rq_id, fa
 
 
 @pytest.mark.django_db()
-def test_handle_successfull_jobs_calls_update_job(mocker, queue, started_conversion_job):
-    mocker.patch('django_rq.get_queue', return_value=queue)
+def test_handle_successfull_jobs_calls_update_job(mocker, rq_job, started_conversion_job):
     from osmaxx.conversion.management.commands import result_harvester
+    fetch_jobs = mocker.patch.object(result_harvester, 'fetch_jobs', return_value={rq_job.id: rq_job})
     cmd = result_harvester.Command()
     _update_job_mock = mocker.patch.object(cmd, '_update_job')
     cmd._handle_running_jobs()
-    assert _update_job_mock.call_count == 1
-    _update_job_mock.assert_called_once_with(rq_job_id=str(started_conversion_job.rq_job_id))
+    fetch_jobs.assert_called_once_with([str(started_conversion_job.rq_job_id)])
+    _update_job_mock.assert_called_once_with(started_conversion_job, rq_job=rq_job)
 
 
 @pytest.mark.django_db()
-def test_handle_update_job_informs(mocker, queue, fake_rq_id, started_conversion_job):
-    mocker.patch('django_rq.get_queue', return_value=queue)
+def test_handle_update_job_informs(mocker, rq_job, started_conversion_job):
     from osmaxx.conversion.management.commands import result_harvester
     cmd = result_harvester.Command()
     _update_job_mock = mocker.patch.object(cmd, '_notify')
-    cmd._update_job(rq_job_id=fake_rq_id)
+    cmd._update_job(started_conversion_job, rq_job=rq_job)
     assert _update_job_mock.call_count == 1
     _update_job_mock.assert_called_once_with(started_conversion_job)
 
 
+@pytest.mark.django_db()
+def test_handle_finished_event_adds_result_and_informs(mocker, fake_rq_id, started_conversion_job):
+    from osmaxx.conversion.management.commands import result_harvester
+    rq_job = Mock(kwargs={'output_zip_file_path': '/tmp/result.zip'})
+    mocker.patch.object(result_harvester, 'fetch_jobs', return_value={str(fake_rq_id): rq_job})
+    add_file_to_job = mocker.patch.object(result_harvester, 'add_file_to_job')
+    add_meta_data_to_job = mocker.patch.object(result_harvester, 'add_meta_data_to_job')
+    cmd = result_harvester.Command()
+    _notify_mock = mocker.patch.object(cmd, '_notify')
+    cmd._handle_event(rq_job_id=str(fake_rq_id), job_status=status.FINISHED)
+
+    started_conversion_job.refresh_from_db()
+    assert started_conversion_job.status == status.FINISHED
+    add_file_to_job.assert_called_once_with(conversion_job=started_conversion_job, result_zip_file='/tmp/result.zip')
+    add_meta_data_to_job.assert_called_once_with(conversion_job=started_conversion_job, rq_job=rq_job)
+    _notify_mock.assert_called_once_with(started_conversion_job)
+
+
+@pytest.mark.django_db()
+def test_handle_event_ignores_jobs_already_final(mocker, fake_rq_id, failed_conversion_job):
+    from osmaxx.conversion.management.commands import result_harvester
+    cmd = result_harvester.Command()
+    _notify_mock = mocker.patch.object(cmd, '_notify')
+    cmd._handle_event(rq_job_id=str(fake_rq_id), job_status=status.STARTED)
+
+    failed_conversion_job.refresh_from_db()
+    assert failed_conversion_job.status == status.FAILED
+    assert _notify_mock.call_count == 0
+
+
+@pytest.mark.django_db()
+def test_job_of_a_lost_worker_is_requeued(mocker, fake_rq_id, started_conversion_job):
+    from osmaxx.conversion.management.commands import result_harvester
+    connection = mocker.patch('django_rq.get_connection').return_value
+    mocker.patch.object(result_harvester.heartbeats, 'stale', return_value=[(str(fake_rq_id), 0.0, {})])
+    forget = mocker.patch.object(result_harvester.heartbeats, 'forget')
+    request_cancellation = mocker.patch.object(result_harvester.cancellation, 'request')
+    mocker.patch.object(result_harvester, 'metrics')
+    rq_job = Mock(**{'get_status.return_value': status.STARTED})
+    mocker.patch.object(result_harvester, 'fetch_jobs', return_value={str(fake_rq_id): rq_job})
+    start_conversion = mocker.patch('osmaxx.conversion.models.Job.start_conversion')
+    cmd = result_harvester.Command()
+    _notify_mock = mocker.patch.object(cmd, '_notify')
+
+    cmd._handle_stale_jobs()
+
+    started_conversion_job.refresh_from_db()
+    request_cancellation.assert_called_once_with(connection, str(fake_rq_id))
+    assert rq_job.delete.call_count == 1
+    assert start_conversion.call_count == 1
+    assert started_conversion_job.status == status.QUEUED
+    assert started_conversion_job.requeue_count == 1
+    assert _notify_mock.call_count == 1
+    forget.assert_called_once_with(mocker.ANY, [str(fake_rq_id)])
+
+
+@pytest.mark.django_db()
+def test_job_requeued_too_often_is_failed(mocker, fake_rq_id, started_conversion_job):
+    from osmaxx.conversion.management.commands import result_harvester
+    started_conversion_job.requeue_count = 1
+    started_conversion_job.save()
+    mocker.patch('django_rq.get_connection')
+    mocker.patch.object(result_harvester.heartbeats, 'stale', return_value=[(str(fake_rq_id), 0.0, {})])
+    mocker.patch.object(result_harvester.heartbeats, 'forget')
+    mocker.patch.object(result_harvester, 'metrics')
+    mocker.patch.object(result_harvester, 'fetch_jobs', return_value={})
+    start_conversion = mocker.patch('osmaxx.conversion.models.Job.start_conversion')
+    cmd = result_harvester.Command()
+    mocker.patch.object(cmd, '_notify')
+
+    cmd._handle_stale_jobs()
+
+    started_conversion_job.refresh_from_db()
+    assert start_conversion.call_count == 0
+    assert started_conversion_job.status == status.FAILED
+
+
 def test_add_meta_data_to_job_with_out_of_bounds_exception():
     from osmaxx.conversion.management.commands.result_harvester import add_meta_data_to_job
     conversion_job = MagicMock()
@@ -77,21 +152,62 @@ def test_add_meta_data_to_job_with_out_of_bounds_exception():
         assert conversion_job.estimated_pbf_size is None
 
 
-def multiple_queue_test_parameters():
-    queue_with_all_jobs = Mock()
-    queue_with_no_jobs = Mock()
-    queue_with_no_jobs.fetch_job.return_value = None
-    return [
-        ([queue_with_all_jobs, queue_with_no_jobs], queue_with_all_jobs.fetch_job.return_value),
-        ([queue_with_no_jobs, queue_with_all_jobs], queue_with_all_jobs.fetch_job.return_value),
-        ([queue_with_no_jobs, queue_with_no_jobs], None),
-    ]
+def test_add_meta_data_to_job_copies_the_timestamps_of_the_rq_job(mocker):
+    from datetime import datetime, timezone
+    from osmaxx.conversion.management.commands.result_harvester import add_meta_data_to_job
+    mocker.patch('pbf_file_size_estimation.estimate_size.estimate_size_of_extent', return_value=1000)
+    conversion_job = MagicMock()
+    conversion_job.parametrization.clipping_area.clipping_multi_polygon.extent = 8, 47, 9, 48
+    rq_job = Mock(
+        meta={'unzipped_result_size': 0, 'duration': 0},
+        started_at=datetime(2019, 5, 1, 12, 0), ended_at=datetime(2019, 5, 1, 12, 30),
+    )
+
+    add_meta_data_to_job(conversion_job=conversion_job, rq_job=rq_job)
+
+    assert conversion_job.conversion_started_at == datetime(2019, 5, 1, 12, 0, tzinfo=timezone.utc)
+    assert conversion_job.conversion_finished_at == datetime(2019, 5, 1, 12, 30, tzinfo=timezone.utc)
+
 
+def test_fetch_jobs_loads_the_jobs_in_batches(mocker):
+    from osmaxx.conversion.management.commands import result_harvester
+    mocker.patch('django_rq.get_connection')
+    fetch_many = mocker.patch.object(
+        result_harvester.RQJob, 'fetch_many',
+        side_effect=lambda rq_job_ids, connection: [
+            Mock(id=rq_job_id) if rq_job_id != 'missing' else None for rq_job_id in rq_job_ids
+        ],
+    )
+
+    rq_jobs = result_harvester.fetch_jobs(['1', '2', 'missing', '3', '4'], batch_size=2)
+
+    assert [call[0][0] for call in fetch_many.call_args_list] == [['1', '2'], ['missing', '3'], ['4']]
+    assert sorted(rq_jobs) == ['1', '2', '3', '4']
 
-@pytest.mark.parametrize("queues,expected", multiple_queue_test_parameters())
-def test_multiple_queue_fetch_job(mocker, fake_rq_id, queues, expected):
-    from osmaxx.conversion.management.commands.result_harvester import fetch_job
 
-    mocker.patch('django_rq.get_queue', side_effect=queues)
-    job = fetch_job(fake_rq_id, ['queue_one', 'queue_two'])
-    assert job is expected
+def test_cleanup_deletes_only_handled_jobs_found_through_the_registries(mocker):
+    from osmaxx.conversion.management.commands import result_harvester
+    from osmaxx.conversion.models import Job, PregeneratedExport
+    queue = Mock(**{'failed_job_registry.get_job_ids.return_value': ['failed']})
+    mocker.patch('django_rq.get_queue', return_value=queue)
+    mocker.patch.object(result_harvester, 'FinishedJobRegistry', return_value=Mock(**{
+        'get_job_ids.return_value': ['finished', 'unhandled'],
+    }))
+    mocker.patch.object(Job.objects, 'filter', return_value=Mock(**{
+        'exclude.return_value.values_list.return_value': ['unhandled'],
+    }))
+    mocker.patch.object(PregeneratedExport.objects, 'filter', return_value=Mock(**{
+        'exclude.return_value.values_list.return_value': [],
+    }))
+    rq_jobs = {'finished': Mock(), 'failed': Mock()}
+    fetch_jobs = mocker.patch.object(
+        result_harvester, 'fetch_jobs',
+        side_effect=lambda rq_job_ids: {rq_job_id: rq_jobs[rq_job_id] for rq_job_id in rq_job_ids},
+    )
+
+    result_harvester.cleanup_old_jobs()
+
+    assert fetch_jobs.call_count == 2
+    assert queue.get_jobs.call_count == 0
+    assert rq_jobs['finished'].delete.call_count == 1
+    assert rq_jobs['failed'].delete.call_count == 1
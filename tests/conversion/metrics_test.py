@@ -0,0 +1,66 @@
+from unittest.mock import MagicMock
+
+from osmaxx.conversion import metrics
+
+
+def test_histogram_buckets_are_counted_cumulatively():
+    connection = MagicMock()
+    pipeline = connection.pipeline.return_value.__enter__.return_value
+
+    metrics.observe('duration_seconds', 3, buckets=(1, 5, 10), labels={'stage': 'cut'}, connection=connection)
+
+    incremented_fields = [args[1] for args, _ in pipeline.hincrby.call_args_list]
+    assert incremented_fields == [
+        'stage="cut"|bucket|5.0', 'stage="cut"|bucket|10.0', 'stage="cut"|bucket|+Inf', 'stage="cut"|count',
+    ]
+    pipeline.hincrbyfloat.assert_called_once_with(metrics.KEY_PREFIX + 'duration_seconds', 'stage="cut"|sum', 3)
+
+
+def test_snapshot_decodes_the_recorded_metrics():
+    connection = MagicMock()
+    connection.hgetall.side_effect = lambda key: {
+        metrics.TYPES_KEY: {b'errors_total': b'counter', b'duration_seconds': b'histogram'},
+        metrics.KEY_PREFIX + 'errors_total': {b'reason="timeout"': b'2'},
+        metrics.KEY_PREFIX + 'duration_seconds': {b'|bucket|+Inf': b'1', b'|sum': b'0.5', b'|count': b'1'},
+    }[key]
+
+    assert metrics.snapshot(connection) == {
+        'errors_total': ('counter', {'reason="timeout"': 2.0}),
+        'duration_seconds': ('histogram', {('', 'bucket', '+Inf'): 1.0, ('', 'sum'): 0.5, ('', 'count'): 1.0}),
+    }
+
+
+def test_set_gauge_replaces_all_values_of_the_gauge():
+    connection = MagicMock()
+    pipeline = connection.pipeline.return_value.__enter__.return_value
+
+    metrics.set_gauge('backlog_jobs', [({'queue': 'default'}, 3), ({'queue': 'high'}, 0)], connection=connection)
+
+    pipeline.delete.assert_called_once_with(metrics.KEY_PREFIX + 'backlog_jobs')
+    pipeline.hmset.assert_called_once_with(
+        metrics.KEY_PREFIX + 'backlog_jobs', {'queue="default"': 3, 'queue="high"': 0},
+    )
+
+
+def test_render_exposes_the_metrics_in_prometheus_text_format():
+    rendered = metrics.render({
+        'errors_total': ('counter', {'reason="timeout"': 2.0}),
+        'queue_jobs': metrics.gauge([({'queue': 'default'}, 3)]),
+        'duration_seconds': ('histogram', {
+            ('', 'count'): 2.0, ('', 'bucket', '+Inf'): 2.0, ('', 'bucket', '10.0'): 2.0, ('', 'bucket', '5.0'): 1.0,
+            ('', 'sum'): 9.5,
+        }),
+    })
+
+    assert rendered == (
+        '# TYPE duration_seconds histogram\n'
+        'duration_seconds_bucket{le="5.0"} 1.0\n'
+        'duration_seconds_bucket{le="10.0"} 2.0\n'
+        'duration_seconds_bucket{le="+Inf"} 2.0\n'
+        'duration_seconds_sum 9.5\n'
+        'duration_seconds_count 2.0\n'
+        '# TYPE errors_total counter\n'
+        'errors_total{reason="timeout"} 2.0\n'
+        '# TYPE queue_jobs gauge\n'
+        'queue_jobs{queue="default"} 3.0\n'
+    )
@@ -33,3 +33,70 @@ def test_job_get_absolute_file_path_is_none_when_file_missing(conversion_job, st
     assert started_conversion_job.get_absolute_file_path is None
     assert failed_conversion_job.get_absolute_file_path is None
     assert conversion_job.get_absolute_file_path is None
+
+
+@pytest.mark.django_db()
+def test_job_is_completed_from_a_matching_pregenerated_export(request, conversion_job, mocker):
+    from osmaxx.conversion.models import PregeneratedExport, polygon_hash
+    convert = mocker.patch('osmaxx.conversion.models.convert')
+    parametrization = conversion_job.parametrization
+    pregenerated_export = PregeneratedExport.objects.create(
+        parametrization=parametrization, polygon_hash=polygon_hash(parametrization.clipping_area), order_count=3,
+        status=status.FINISHED, unzipped_result_size=42,
+    )
+    pregenerated_export.resulting_file.name = pregenerated_export.zip_file_relative_path()
+    pregenerated_export.save()
+    with open(pregenerated_export._out_zip_path(), 'wb') as pregenerated_file:
+        pregenerated_file.write(b'pre-generated')
+    request.addfinalizer(lambda: pregenerated_export.delete())
+
+    conversion_job.start_conversion()
+
+    assert convert.call_count == 0
+    assert conversion_job.status == status.FINISHED
+    assert conversion_job.unzipped_result_size == 42
+    assert conversion_job.conversion_started_at is not None
+    assert conversion_job.conversion_finished_at is not None
+    with open(conversion_job.get_absolute_file_path, 'rb') as result_file:
+        assert result_file.read() == b'pre-generated'
+    conversion_job.delete()
+    assert os.path.exists(pregenerated_export.resulting_file.path)
+
+
+@pytest.mark.django_db()
+def test_job_is_converted_if_the_pregenerated_export_is_stale(conversion_job, mocker):
+    from datetime import timedelta
+    from django.utils import timezone
+    from osmaxx.conversion.models import PregeneratedExport, polygon_hash
+    convert = mocker.patch('osmaxx.conversion.models.convert', return_value='rq-job-id')
+    parametrization = conversion_job.parametrization
+    PregeneratedExport.objects.create(
+        parametrization=parametrization, polygon_hash=polygon_hash(parametrization.clipping_area), order_count=3,
+        status=status.FINISHED, created_at=timezone.now() - timedelta(days=7),
+    )
+
+    conversion_job.start_conversion()
+
+    assert convert.call_count == 1
+    assert conversion_job.rq_job_id == 'rq-job-id'
+
+
+@pytest.mark.django_db()
+def test_requeued_job_is_converted_to_a_path_of_its_own(conversion_job, mocker):
+    convert = mocker.patch('osmaxx.conversion.models.convert', return_value='rq-job-id')
+    conversion_job.start_conversion()
+    conversion_job.requeue_count = 1
+    conversion_job.start_conversion()
+
+    (_, first_attempt_kwargs), (_, second_attempt_kwargs) = convert.call_args_list
+    assert first_attempt_kwargs['output_zip_file_path'] == conversion_job._out_zip_path()
+    assert second_attempt_kwargs['output_zip_file_path'] != conversion_job._out_zip_path()
+
+
+@pytest.mark.django_db()
+def test_cancel_leaves_a_finished_job_alone(finished_conversion_job, mocker):
+    cancel = mocker.patch('osmaxx.conversion.job_dispatcher.rq_dispatcher.cancel')
+    finished_conversion_job.cancel()
+    assert cancel.call_count == 0
+    finished_conversion_job.refresh_from_db()
+    assert finished_conversion_job.status == status.FINISHED
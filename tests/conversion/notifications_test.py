@@ -0,0 +1,87 @@
+from unittest.mock import Mock
+
+import pytest
+import requests
+import requests_mock
+
+from osmaxx.conversion import notifications
+
+CALLBACK_URL = 'http://frontend.example.com/job_progress/tracker/23/'
+
+
+@pytest.fixture
+def dispatcher(mocker):
+    mocker.patch.object(notifications, 'metrics')
+    mocker.patch.object(notifications.time, 'sleep')
+    dispatcher = notifications.NotificationDispatcher(
+        max_concurrent_deliveries=2, timeout_seconds=1, max_attempts=3, backoff_seconds=2,
+    )
+    mocker.patch.object(dispatcher, '_record')
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+@pytest.fixture
+def conversion_job():
+    return Mock(
+        id=23, callback_url=CALLBACK_URL, status='finished',
+        **{'get_absolute_url.return_value': 'http://conversion.example.com/api/conversion_job/23/'}
+    )
+
+
+def test_notification_is_delivered_in_the_background(dispatcher, conversion_job):
+    with requests_mock.Mocker() as frontend:
+        frontend.get(CALLBACK_URL)
+        assert dispatcher.notify(conversion_job).result() is True
+
+    assert frontend.last_request.qs['status'] == ['finished']
+    assert notifications.metrics.observe.call_count == 1
+    dispatcher._record.assert_called_once_with(23, callback_failed_at=None, callback_error='')
+
+
+def test_failed_attempts_are_retried_with_backoff(dispatcher, conversion_job):
+    with requests_mock.Mocker() as frontend:
+        frontend.get(CALLBACK_URL, [{'status_code': 503}, {'exc': requests.exceptions.ConnectTimeout}, {}])
+        assert dispatcher.notify(conversion_job).result() is True
+
+    assert frontend.call_count == 3
+    assert [args for (args, _) in notifications.time.sleep.call_args_list] == [(2,), (4,)]
+    assert notifications.metrics.increment.call_count == 2
+
+
+def test_undeliverable_notification_is_recorded_on_the_job(dispatcher, conversion_job):
+    with requests_mock.Mocker() as frontend:
+        frontend.get(CALLBACK_URL, exc=requests.exceptions.ConnectionError)
+        assert dispatcher.notify(conversion_job).result() is False
+
+    assert frontend.call_count == 3
+    (conversion_job_id,), fields = dispatcher._record.call_args
+    assert conversion_job_id == 23
+    assert fields['callback_failed_at'] is not None
+
+
+def test_rejected_notification_is_not_retried(dispatcher, conversion_job):
+    with requests_mock.Mocker() as frontend:
+        frontend.get(CALLBACK_URL, status_code=404)
+        assert dispatcher.notify(conversion_job).result() is False
+
+    assert frontend.call_count == 1
+    notifications.metrics.increment.assert_any_call(
+        'osmaxx_callback_delivery_errors_total', labels={'reason': 'status_404'},
+    )
+
+
+def test_retried_notification_is_replaced_by_a_newer_one_of_the_job(dispatcher, conversion_job):
+    started_job = Mock(
+        id=23, callback_url=CALLBACK_URL, status='started',
+        **{'get_absolute_url.return_value': 'http://conversion.example.com/api/conversion_job/23/'}
+    )
+    newer_notifications = []
+    notifications.time.sleep.side_effect = lambda _: newer_notifications.append(dispatcher.notify(conversion_job))
+    with requests_mock.Mocker() as frontend:
+        frontend.get(CALLBACK_URL, [{'status_code': 503}, {}])
+        assert dispatcher.notify(started_job).result() is False
+        assert newer_notifications[0].result() is True
+
+    assert [request.qs['status'] for request in frontend.request_history] == [['started'], ['finished']]
+    dispatcher._record.assert_called_once_with(23, callback_failed_at=None, callback_error='')
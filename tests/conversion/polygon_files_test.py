@@ -0,0 +1,34 @@
+import os
+import time
+from datetime import timedelta
+
+import pytest
+
+from osmaxx.conversion.job_dispatcher import polygon_files
+
+
+@pytest.fixture
+def polygon_directory(mocker, tmpdir):
+    mocker.patch.dict(polygon_files.CONVERSION_SETTINGS, POLYGON_FILE_DIRECTORY=str(tmpdir))
+    return tmpdir
+
+
+def test_polygon_is_stored_once_per_content(polygon_directory, simple_osmosis_line_string):
+    path = polygon_files.store(simple_osmosis_line_string)
+
+    assert polygon_files.store(simple_osmosis_line_string) == path
+    assert polygon_files.store(simple_osmosis_line_string + '\n') != path
+    assert polygon_files.load(path) == simple_osmosis_line_string
+    assert len(polygon_directory.listdir()) == 2
+
+
+def test_only_polygons_not_stored_recently_are_deleted(polygon_directory, simple_osmosis_line_string):
+    unused_path = polygon_files.store(simple_osmosis_line_string)
+    a_week_ago = time.time() - timedelta(days=7).total_seconds()
+    os.utime(unused_path, (a_week_ago, a_week_ago))
+    used_path = polygon_files.store(simple_osmosis_line_string + '\n')
+
+    polygon_files.delete_unused(max_age=timedelta(days=1))
+
+    assert not os.path.exists(unused_path)
+    assert os.path.exists(used_path)
@@ -106,3 +106,43 @@ def test_conversion_job_creation_enqueues(authenticated_api_client, conversion_j
     conversion_start_start_format_extraction_mock = mocker.patch('osmaxx.conversion.converters.converter.rq_enqueue_with_settings', return_value=rq_mock_return())
     authenticated_api_client.post(reverse('conversion_job-list'), conversion_job_data, format='json')
     assert conversion_start_start_format_extraction_mock.call_count == 1
+
+
+@pytest.mark.django_db()
+def test_conversion_job_cancel_fails_the_job(authenticated_api_client, started_conversion_job, mocker):
+    cancel = mocker.patch('osmaxx.conversion.job_dispatcher.rq_dispatcher.cancel')
+    response = authenticated_api_client.post(reverse('conversion_job-cancel', kwargs={'pk': started_conversion_job.id}))
+    assert response.status_code == 200
+    assert response.json()['status'] == status.FAILED
+    cancel.assert_called_once_with(started_conversion_job.rq_job_id)
+
+
+@pytest.mark.django_db()
+def test_conversion_job_cancel_access_fails(api_client, started_conversion_job):
+    response = api_client.post(reverse('conversion_job-cancel', kwargs={'pk': started_conversion_job.id}))
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db()
+def test_metrics_are_exposed_in_prometheus_text_format(authenticated_client, started_conversion_job, mocker):
+    mocker.patch('osmaxx.conversion.metrics.snapshot', return_value={
+        'osmaxx_callback_dead_letters_total': ('counter', {'': 1.0}),
+    })
+    mocker.patch('django_rq.get_queue', return_value=mocker.Mock(count=4))
+    mocker.patch('osmaxx.conversion.views.StartedJobRegistry', return_value=mocker.Mock(count=1))
+    mocker.patch('osmaxx.conversion.views.DeferredJobRegistry', return_value=mocker.Mock(count=0))
+
+    response = authenticated_client.get(reverse('metrics'))
+
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    lines = response.content.decode().splitlines()
+    assert 'osmaxx_callback_dead_letters_total 1.0' in lines
+    assert 'osmaxx_queue_jobs{queue="default",state="queued"} 4.0' in lines
+    assert 'osmaxx_jobs{status="started"} 1.0' in lines
+
+
+@pytest.mark.parametrize('accept', ['*/*', 'text/plain; version=0.0.4'])
+def test_metrics_access_for_unauthorized_user_denied(client, accept):
+    response = client.get(reverse('metrics'), HTTP_ACCEPT=accept)
+    assert response.status_code == 403
@@ -41,3 +41,30 @@ def test_export_is_deleted_without_attached_output_file(export, frontend_accessi
     request_url = reverse('excerptexport_api:export-detail', kwargs={'pk': export.id})
     response = frontend_accessible_authenticated_api_client.delete(request_url, format='json')
     assert response.status_code == DELETED_SUCCESS
+
+
+def test_running_conversion_is_cancelled_when_export_is_deleted(export, frontend_accessible_authenticated_api_client, mocker):
+    from osmaxx.api_client import ConversionApiClient
+    from osmaxx.conversion import status
+    from osmaxx.excerptexport._settings import CONVERSION_CANCELLATION_TIMEOUT_SECONDS
+    cancel_job = mocker.patch.object(ConversionApiClient, 'cancel_job')
+    export.conversion_service_job_id = 42
+    export.status = status.STARTED
+    export.save()
+    request_url = reverse('excerptexport_api:export-detail', kwargs={'pk': export.id})
+    response = frontend_accessible_authenticated_api_client.delete(request_url, format='json')
+    assert response.status_code == DELETED_SUCCESS
+    cancel_job.assert_called_once_with(42, timeout=CONVERSION_CANCELLATION_TIMEOUT_SECONDS)
+
+
+def test_export_is_deleted_when_conversion_cannot_be_cancelled(export, frontend_accessible_authenticated_api_client, mocker):
+    import requests
+    from osmaxx.api_client import ConversionApiClient
+    from osmaxx.conversion import status
+    mocker.patch.object(ConversionApiClient, 'cancel_job', side_effect=requests.ConnectionError)
+    export.conversion_service_job_id = 42
+    export.status = status.STARTED
+    export.save()
+    request_url = reverse('excerptexport_api:export-detail', kwargs={'pk': export.id})
+    response = frontend_accessible_authenticated_api_client.delete(request_url, format='json')
+    assert response.status_code == DELETED_SUCCESS
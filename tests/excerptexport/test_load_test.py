@@ -0,0 +1,24 @@
+import pytest
+
+from osmaxx.excerptexport.load_test import LIST_EXPORTS, ORDER, Sample, summarize
+
+
+def test_summarize_reports_the_latency_percentiles_and_queries_per_action():
+    samples = [Sample(ORDER, 302, seconds / 1000, 10) for seconds in range(1, 101)]
+    samples += [
+        Sample(LIST_EXPORTS, 200, 0.005, 4), Sample(LIST_EXPORTS, 500, 0.015, 8), Sample(LIST_EXPORTS, None, 1, 0),
+    ]
+
+    report = summarize(samples, 10, service_requests={'conversion_job': 100})
+
+    assert report['requests_per_second'] == pytest.approx(10.3)
+    order = report['actions'][ORDER]
+    assert order['requests'] == 100
+    assert order['errors'] == 0
+    assert order['latency_ms'] == pytest.approx({'p50': 50, 'p90': 90, 'p95': 95, 'p99': 99, 'max': 100})
+    assert order['queries'] == {'mean': 10, 'max': 10}
+    list_exports = report['actions'][LIST_EXPORTS]
+    assert list_exports['errors'] == 2
+    assert list_exports['latency_ms']['p50'] == pytest.approx(15)
+    assert list_exports['queries'] == {'mean': 4, 'max': 8}
+    assert report['conversion_service_requests'] == {'conversion_job': 100}
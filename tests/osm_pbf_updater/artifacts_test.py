@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from tests.osm_pbf_updater.conftest import MONACO_PBF_PATH
+
+
+class _FailingArtifact:
+    name = 'failing'
+
+    def build(self, planet_path):
+        raise subprocess.CalledProcessError(1, ['osmconvert'])
+
+
+def test_load_artifacts_rejects_duplicate_names(tmpdir):
+    import artifacts
+    config = tmpdir.join('artifacts.json')
+    config.write(json.dumps([{'name': 'ch', 'type': 'extract', 'bbox': [5.9, 45.8, 10.5, 47.9]}] * 2))
+    with pytest.raises(ValueError):
+        artifacts.load_artifacts(str(config))
+
+
+def test_extract_needs_either_polygon_or_bbox():
+    import artifacts
+    with pytest.raises(ValueError):
+        artifacts.Extract('ch')
+
+
+def test_extract_is_cut_throttled_and_moved_into_place(tmpdir, mocker):
+    import artifacts
+    planet_path = str(tmpdir.join('planet-latest.osm.pbf'))
+
+    def _cut(command):
+        with open(command[command.index('--complex-ways') + 2][len('-o='):], 'wb') as extract_file:
+            extract_file.write(b'extract')
+    check_call_mock = mocker.patch.object(subprocess, 'check_call', side_effect=_cut)
+    extract = artifacts.Extract('ch', bbox=[5.9, 45.8, 10.5, 47.9])
+    extract.build(planet_path)
+    command = check_call_mock.call_args[0][0]
+    assert command[:len(artifacts.THROTTLE)] == artifacts.THROTTLE
+    assert '-b=5.9,45.8,10.5,47.9' in command
+    assert tmpdir.join('artifacts', 'ch.osm.pbf').read_binary() == b'extract'
+    assert extract.manifest_entry(planet_path) == dict(type='extract', path='artifacts/ch.osm.pbf', bbox=[5.9, 45.8, 10.5, 47.9])
+
+
+def test_build_artifacts_leaves_failed_ones_out_of_the_manifest(tmpdir):
+    import artifacts
+    planet_path = str(tmpdir.join('planet-latest.osm.pbf'))
+    manifest = artifacts.build_artifacts([_FailingArtifact()], planet_path, generation='20190601T000000Z')
+    assert manifest == dict(generation='20190601T000000Z', artifacts={}, failed=['failing'])
+    with open(str(tmpdir.join(artifacts.MANIFEST_FILE_NAME))) as manifest_file:
+        assert json.load(manifest_file) == manifest
+
+
+def test_full_download_publishes_generation_with_its_artifacts(updater, monkeypatch):
+    import artifacts
+    monkeypatch.setattr(updater, 'configured_artifacts', lambda: [artifacts.BlobIndex('blob-index')])
+    updater.full_download(updater.planet_url())
+
+    generation_dir = os.path.realpath(updater.CURRENT_GENERATION)
+    with open(os.path.join(generation_dir, artifacts.MANIFEST_FILE_NAME)) as manifest_file:
+        manifest = json.load(manifest_file)
+    assert manifest['generation'] == os.path.basename(generation_dir)
+    assert manifest['artifacts']['blob-index']['path'] == 'planet-latest.osm.pbf.blobindex.npz'
+    assert os.path.exists(os.path.join(generation_dir, 'planet-latest.osm.pbf.blobindex.npz'))
+    with open(updater.PLANET_LATEST, 'rb') as planet, open(MONACO_PBF_PATH, 'rb') as monaco:
+        assert planet.read() == monaco.read()
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# the updater runs in its own container, as a script rather than a package, with `pbf_blobs` copied next to it
+_ROOT_DIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
+_PBF_BLOBS_DIR = os.path.abspath(os.path.join(_ROOT_DIR, 'osmaxx', 'conversion', 'converters', 'converter_pbf'))
+sys.path.insert(0, os.path.join(_ROOT_DIR, 'osm_pbf_updater'))
+sys.path.insert(1, _PBF_BLOBS_DIR)
+
+MONACO_PBF_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'test_data', 'osm', 'monaco-latest.osm.pbf')
+
+
+@pytest.fixture
+def local_mirror(tmpdir):
+    import local_mirror
+    local_mirror.prepare(str(tmpdir.mkdir('mirror')), MONACO_PBF_PATH)
+    server = local_mirror.serve(str(tmpdir.join('mirror')))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def updater(tmpdir, monkeypatch, local_mirror):
+    """
+    The updater, working in `tmpdir` and downloading from the local mirror.
+    """
+    import pbf_updater
+    # for the scripts run by the updater
+    monkeypatch.setenv('PYTHONPATH', _PBF_BLOBS_DIR)
+    pbf_dir = tmpdir.mkdir('pbf')
+    monkeypatch.setattr(pbf_updater, 'PBF_DIR', str(pbf_dir))
+    monkeypatch.setattr(pbf_updater, 'GENERATIONS_DIR', str(pbf_dir.join('generations')))
+    monkeypatch.setattr(pbf_updater, 'CURRENT_GENERATION', str(pbf_dir.join('current')))
+    monkeypatch.setattr(pbf_updater, 'PLANET_LATEST', str(pbf_dir.join(pbf_updater.PLANET_FILE_NAME)))
+    monkeypatch.setattr(pbf_updater, 'PLANET_DOWNLOAD', str(pbf_dir.join('download.osm.pbf')))
+    monkeypatch.setattr(pbf_updater, 'OSM_PLANET_MIRROR', local_mirror.url)
+    return pbf_updater
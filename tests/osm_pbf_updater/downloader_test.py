@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from tests.osm_pbf_updater.conftest import MONACO_PBF_PATH
+
+PLANET_PATH = '/pbf/planet-latest.osm.pbf'
+
+
+@pytest.fixture
+def downloader(monkeypatch):
+    import downloader
+    monkeypatch.setattr(downloader, 'CHUNK_SIZE', 16 * 1024)
+    monkeypatch.setattr(downloader, 'PROGRESS_SAVE_INTERVAL', 16 * 1024)
+    monkeypatch.setattr(downloader, 'RETRY_DELAY_SECONDS', 0)
+    return downloader
+
+
+def _read(path):
+    with open(path, 'rb') as downloaded_file:
+        return downloaded_file.read()
+
+
+def test_download_fetches_ranges_in_parallel_and_verifies_them(downloader, local_mirror, tmpdir):
+    target_path = str(tmpdir.join('planet.osm.pbf'))
+    metrics = downloader.download(local_mirror.url + PLANET_PATH, target_path, connections=4)
+    assert _read(target_path) == _read(MONACO_PBF_PATH)
+    assert metrics['connections'] == 4
+    assert metrics['fetched_bytes'] == metrics['bytes'] == os.path.getsize(MONACO_PBF_PATH)
+    assert sum(range_metrics['bytes'] for range_metrics in metrics['ranges']) == metrics['bytes']
+    assert not os.path.exists(target_path + '.progress')
+
+
+def test_download_resumes_interrupted_ranges(downloader, local_mirror, tmpdir, monkeypatch):
+    target_path = str(tmpdir.join('planet.osm.pbf'))
+    write_fully = downloader._write_fully
+    writes = []
+
+    def _interrupted_write(raw_file, data):
+        if len(writes) >= 8:
+            raise OSError('connection reset')
+        writes.append(len(data))
+        write_fully(raw_file, data)
+    monkeypatch.setattr(downloader, '_write_fully', _interrupted_write)
+    monkeypatch.setattr(downloader, 'RETRIES', 0)
+    with pytest.raises(downloader.DownloadError):
+        downloader.download(local_mirror.url + PLANET_PATH, target_path, connections=4)
+    assert os.path.exists(target_path + '.progress')
+
+    monkeypatch.setattr(downloader, '_write_fully', write_fully)
+    metrics = downloader.download(local_mirror.url + PLANET_PATH, target_path, connections=4)
+    assert metrics['fetched_bytes'] == metrics['bytes'] - sum(writes)
+    assert _read(target_path) == _read(MONACO_PBF_PATH)
+
+
+def test_download_rejects_files_not_matching_the_mirrors_md5(downloader, local_mirror, tmpdir):
+    mirror_md5_file = tmpdir.join('mirror', 'pbf', 'planet-latest.osm.pbf.md5')
+    mirror_md5_file.write('0123456789abcdef0123456789abcdef  planet-latest.osm.pbf\n')
+    target_path = str(tmpdir.join('planet.osm.pbf'))
+    with pytest.raises(downloader.DownloadError):
+        downloader.download(local_mirror.url + PLANET_PATH, target_path)
+    assert not os.path.exists(target_path)
+    assert not os.path.exists(target_path + '.progress')
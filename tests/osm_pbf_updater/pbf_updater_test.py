@@ -0,0 +1,20 @@
+import os
+
+
+def test_collect_garbage_deletes_the_diffs_older_than_the_generations_kept(updater, tmpdir, monkeypatch):
+    monkeypatch.setattr(updater, 'KEEP_GENERATIONS', 1)
+    monkeypatch.setattr(updater, 'OSMUPDATE_TEMP_FILES', str(tmpdir.join('osmupdate', 'temp')))
+    generations = tmpdir.join('pbf').mkdir('generations')
+    for name in ['20190501T000000Z', '20190501T010000Z', '20190501T020000Z']:
+        generations.mkdir(name).join(updater.GENERATION_LOCK_FILE_NAME).write('')
+    os.symlink(str(generations.join('20190501T020000Z')), updater.CURRENT_GENERATION)
+    diffs = tmpdir.mkdir('osmupdate')
+    for name, timestamp in [('temp.h1.osc.gz', '20190501T003000Z'), ('temp.h2.osc.gz', '20190501T013000Z')]:
+        diffs.join(name).write('')
+        modified_at = updater._created_at(timestamp)
+        os.utime(str(diffs.join(name)), (modified_at, modified_at))
+
+    updater.collect_garbage()
+
+    assert sorted(generations.listdir()) == [generations.join('20190501T010000Z'), generations.join('20190501T020000Z')]
+    assert diffs.listdir() == [diffs.join('temp.h2.osc.gz')]